@@ -0,0 +1,562 @@
+"""
+Benchmark de rendimiento de PrintFlow sin interfaz gráfica.
+
+Ejecuta el ciclo real de `PrintFlowApp` (ejecutar_ciclo -> despachador ->
+verificar_resultados -> pausa_confirmacion) contra un `BackendSimulado`, sustituyendo
+la ventana de Tkinter por un bucle de eventos mínimo. Así se pueden comparar
+cambios de planificación en cualquier máquina antes de llevarlos a la sala
+de impresión.
+
+Con `--arranque N` mide en cambio el arranque en frío de la GUI real: lanza N
+veces `main.py --medir-arranque --simular 2` y calcula cuánto tarda en
+dibujarse la ventana y en tener perfiles e impresoras cargados.
+
+Con `--servidor N` prueba de extremo a extremo el servidor de trabajos: lo
+arranca en un puerto libre de localhost y N clientes concurrentes envían
+trabajos y siguen sus eventos hasta que terminan.
+
+Uso:
+    python benchmark.py --copias 20 --paginas 450 --escala 0.005
+    python benchmark.py --arranque 10
+    python benchmark.py --servidor 50 --impresoras 4 --copias 2 --paginas 20 --escala 0.001
+"""
+import argparse
+import asyncio
+import collections
+import heapq
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from alert_system import DespachadorAvisos
+from analisis_previo import CacheAnalisis
+from backends import BackendSimulado
+from cola_trabajos import ColaTrabajos, PlanificadorCambios, clave_preparacion, contar_cambios
+from descubrimiento import IndiceImpresoras
+from diario import DiarioTrabajos
+from metricas import percentil
+from printer_utils import establecer_backend
+from servidor_trabajos import ServidorTrabajos, enviar_trabajo
+from main import PrintFlowApp, INTERVALO_HISTORIAL_MS
+
+
+class MaestroSimulado:
+    """
+    Sustituto mínimo de `tk.Tk` para ejecutar la aplicación sin pantalla.
+    Implementa `after` con una cola de prioridad; los retardos se multiplican
+    por `escala_tiempo` para que coincidan con el reloj del backend simulado.
+    """
+    def __init__(self, escala_tiempo=1.0):
+        self.escala_tiempo = escala_tiempo
+        self._eventos = []
+        self._secuencia = 0
+        self._activo = False
+
+    def title(self, *args):
+        pass
+
+    def after(self, ms, func, *args):
+        vence = time.monotonic() + ms / 1000 * self.escala_tiempo
+        self._secuencia += 1
+        heapq.heappush(self._eventos, (vence, self._secuencia, func, args))
+        return self._secuencia
+
+    def mainloop(self):
+        self._activo = True
+        while self._activo and self._eventos:
+            vence, _, func, args = heapq.heappop(self._eventos)
+            espera = vence - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+            func(*args)
+
+    def quit(self):
+        self._activo = False
+
+
+class _Valor:
+    """Sustituto de `tk.StringVar` y `tk.Entry` (solo `get`/`set`)."""
+    def __init__(self, valor=""):
+        self.valor = valor
+
+    def get(self):
+        return self.valor
+
+    def set(self, valor):
+        self.valor = valor
+
+
+class _Widget:
+    """Sustituto de un widget de Tkinter que solo recuerda su configuración."""
+    def __init__(self):
+        self.opciones = {}
+
+    def config(self, **opciones):
+        self.opciones.update(opciones)
+
+
+class AppSinCabeza(PrintFlowApp):
+    """
+    `PrintFlowApp` sin ventanas: el operador simulado confirma cada copia tras
+    `tiempo_operador` segundos y reintenta las copias fallidas tras
+    `tiempo_reintento` segundos (ambos en tiempo simulado).
+    """
+    def __init__(self, master, backend, tiempo_operador=0.0, tiempo_reintento=30.0):
+        self.backend = backend
+        self.tiempo_operador = tiempo_operador
+        self.tiempo_reintento = tiempo_reintento
+        self.confirmadas = 0
+        self.fallos = []
+        self.t_inicio = None
+        self.t_fin = None
+        # El diario va a un archivo temporal, así el benchmark incluye su coste
+        # sin tocar el diario real de la sala de impresión.
+        fd, self.ruta_diario = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+        # Las impresoras simuladas se descubren al momento y sin caché en disco.
+        indice = IndiceImpresoras(backend, ruta_cache=None)
+        indice.actualizar()
+        super().__init__(master, diario=DiarioTrabajos(self.ruta_diario), avisos=DespachadorAvisos(canales=[]),
+                         indice_impresoras=indice, cola=ColaTrabajos(ruta=None))
+
+    def setup_gui(self):
+        self.file_path_label = _Widget()
+        self.status_label = _Widget()
+        self.start_button = _Widget()
+        self.total_label = _Widget()
+        self.selected_libro = _Valor(next(iter(self.libros_data), ""))
+        self.cantidad_entry = _Valor("1")
+
+    def impresoras_seleccionadas(self):
+        # El benchmark reparte siempre el lote entre todas las impresoras simuladas.
+        return list(self.impresoras)
+
+    def construir_panel_impresoras(self):
+        pass
+
+    def iniciar_vigilancia_perfiles(self):
+        # El benchmark usa su propio perfil y no debe recargar libros_config.
+        pass
+
+    def iniciar_vigilancia_impresoras(self):
+        pass
+
+    def iniciar_vigilancia_cola(self):
+        pass
+
+    def refrescar_cola(self):
+        # Sin tabla que rellenar: solo se replanifica.
+        if not self.historial_cargado:
+            return
+        self.plan_cola = self.planificador_cola.planificar(self.cola.pendientes(), self.libros_data,
+                                                           preparacion_actual=self.preparacion_actual)
+
+    def preguntar_confirmacion(self, estado, trabajo, responder):
+        # El operador responde pasado `tiempo_operador`; mientras tanto las
+        # demás impresoras siguen su curso, como con el diálogo real.
+        self.confirmadas += 1
+        self.master.after(int(self.tiempo_operador * 1000), responder, True)
+
+    def preguntar_incierto(self, estado, trabajo, responder):
+        # En el simulador no sale nada impreso: la copia se reintenta cuando
+        # el operador reanude la impresora.
+        responder(False)
+
+    def notificar_fallo(self, estado, trabajo):
+        super().notificar_fallo(estado, trabajo)
+        self.fallos.append(trabajo.mensaje)
+        # El operador revisa la impresora y la reanuda; la copia fallida se reintenta.
+        self.master.after(int(self.tiempo_reintento * 1000), self.reanudar_impresora, estado.nombre)
+
+    def exportar_metricas(self):
+        # Los tiempos del benchmark son simulados; no se mezclan con los reales.
+        pass
+
+    def mostrar_aviso_final(self):
+        self.t_fin = self.backend.ahora()
+        self.master.quit()
+
+    def iniciar_lote(self, ruta, perfil, copias):
+        """
+        Rellena el formulario simulado y pulsa INICIAR TRABAJO en cuanto el
+        diario y la cola están cargados.
+        """
+        if not self.historial_cargado:
+            self.master.after(INTERVALO_HISTORIAL_MS, self.iniciar_lote, ruta, perfil, copias)
+            return
+        self.ruta_archivo_a_imprimir = ruta
+        self.libros_data = {"benchmark": perfil}
+        self.selected_libro.set("benchmark")
+        self.cantidad_entry.set(str(copias))
+        self.t_inicio = self.backend.ahora()
+        self.validar_e_iniciar()
+
+
+def _resumir_huecos(intervalos):
+    """
+    Calcula los huecos en los que el dispositivo estuvo parado entre dos trabajos.
+
+    :param intervalos: Lista de tuplas (inicio, fin) en segundos simulados.
+    :return: Lista con la duración de cada hueco.
+    :rtype: list[float]
+    """
+    ordenados = sorted(intervalos)
+    return [max(0.0, sig[0] - ant[1]) for ant, sig in zip(ordenados, ordenados[1:])]
+
+
+def ejecutar_benchmark(copias=10, paginas=450, impresoras=1, segundos_por_pagina=0.6, sobrecarga_trabajo=5.0,
+                       tiempo_operador=0.0, fallos=None, fallos_dispositivo=None, probabilidad_fallo=0.0,
+                       semilla=0, marca_agua_cola=0, escala_tiempo=0.01, copias_por_control=1,
+                       paginas_por_fragmento=0):
+    """
+    Ejecuta un lote completo en la aplicación sin interfaz y mide su rendimiento.
+    Con `copias_por_control` mayor que 1 el perfil usa puntos de control
+    `cada_n`, es decir, trabajos intercalados de varias copias. Con
+    `paginas_por_fragmento` cada copia se envía en fragmentos de ese tamaño.
+
+    :return: Diccionario con copias por hora, sobrecarga media por copia y
+             estadísticas de los huecos de inactividad (en segundos simulados).
+    :rtype: dict
+    """
+    if not isinstance(segundos_por_pagina, (list, tuple)):
+        segundos_por_pagina = [segundos_por_pagina]
+    nombres = [f"Simulada_{i + 1}" for i in range(impresoras)]
+    # Si se dan menos velocidades que impresoras, se repite la última.
+    velocidades = {n: segundos_por_pagina[min(i, len(segundos_por_pagina) - 1)] for i, n in enumerate(nombres)}
+
+    backend = BackendSimulado(
+        impresoras=nombres,
+        segundos_por_pagina=velocidades,
+        sobrecarga_trabajo=sobrecarga_trabajo,
+        fallos=fallos,
+        fallos_dispositivo=fallos_dispositivo,
+        probabilidad_fallo=probabilidad_fallo,
+        semilla=semilla,
+        escala_tiempo=escala_tiempo,
+    )
+    anterior = establecer_backend(backend)
+    maestro = MaestroSimulado(escala_tiempo)
+    app = AppSinCabeza(maestro, backend, tiempo_operador=tiempo_operador)
+    fd, ruta = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        perfil = {"descripcion": "Benchmark", "paginas": paginas, "marca_agua_cola": marca_agua_cola}
+        if copias_por_control > 1:
+            perfil["puntos_control"] = {"tipo": "cada_n", "n": copias_por_control}
+        if paginas_por_fragmento:
+            perfil["paginas_por_fragmento"] = paginas_por_fragmento
+        app.iniciar_lote(ruta, perfil, copias)
+        maestro.mainloop()
+    finally:
+        establecer_backend(anterior)
+        os.remove(ruta)
+        app.diario.cerrar()
+        os.remove(app.ruta_diario)
+
+    intervalos = [i for lista in backend.intervalos.values() for i in lista]
+    # Con marca de agua la aplicación puede terminar antes que la impresora;
+    # el lote acaba cuando sale la última hoja.
+    duracion = max([app.t_fin] + [fin for _, fin in intervalos]) - app.t_inicio
+    ocupado = sum(fin - inicio for inicio, fin in intervalos)
+    huecos = [h for lista in backend.intervalos.values() for h in _resumir_huecos(lista)]
+
+    return {
+        "copias": copias,
+        "impresoras": impresoras,
+        "duracion_s": round(duracion, 2),
+        "copias_por_hora": round(copias / duracion * 3600, 2),
+        "impresion_por_copia_s": round(ocupado / copias, 2),
+        "sobrecarga_por_copia_s": round((duracion * impresoras - ocupado) / copias, 2),
+        "trabajos": len(intervalos),
+        "copias_por_impresora": {n: e.copias_hechas for n, e in app.controlador.impresoras.items()},
+        "huecos": len(huecos),
+        "hueco_medio_s": round(sum(huecos) / len(huecos), 2) if huecos else 0.0,
+        "hueco_maximo_s": round(max(huecos), 2) if huecos else 0.0,
+        "fallos": len(app.fallos),
+        "confirmaciones": app.confirmadas,
+    }
+
+
+def medir_arranque(repeticiones=5, impresoras=2, tiempo_maximo=60.0):
+    """
+    Lanza la GUI en un proceso nuevo `repeticiones` veces y mide, desde el
+    lanzamiento, cuándo se dibuja el primer cuadro y cuándo está lista
+    (perfiles e impresoras cargados). Necesita una pantalla para Tkinter.
+
+    :return: Diccionario con la mediana, p95 y máximo de ambos tiempos en segundos.
+    :rtype: dict
+    """
+    principal = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    tiempos = {"primer_cuadro": [], "listo": []}
+    for _ in range(repeticiones):
+        lanzado = time.time()
+        salida = subprocess.run(
+            [sys.executable, principal, "--medir-arranque", "--simular", str(impresoras)],
+            capture_output=True, text=True, timeout=tiempo_maximo,
+        )
+        eventos = {}
+        for linea in salida.stdout.splitlines():
+            try:
+                registro = json.loads(linea)
+                eventos[registro["evento"]] = registro["t"]
+            except (ValueError, KeyError, TypeError):
+                continue
+        if not all(evento in eventos for evento in tiempos):
+            raise RuntimeError(f"main.py no informó del arranque (código {salida.returncode}): {salida.stderr.strip()}")
+        for evento, lista in tiempos.items():
+            lista.append(eventos[evento] - lanzado)
+
+    resultado = {"repeticiones": repeticiones}
+    for evento, lista in tiempos.items():
+        ordenados = sorted(lista)
+        resultado[f"{evento}_p50_s"] = round(percentil(ordenados, 0.5), 3)
+        resultado[f"{evento}_p95_s"] = round(percentil(ordenados, 0.95), 3)
+        resultado[f"{evento}_maximo_s"] = round(ordenados[-1], 3)
+    return resultado
+
+
+def medir_cola(entradas=1000, semilla=0):
+    """
+    Planifica una cola sintética de `entradas` trabajos con perfiles de varios
+    papeles y tamaños, y la compara con imprimirla en orden de llegada.
+
+    :return: Diccionario con el tiempo de planificación y, para el plan y para
+             el orden de llegada, los cambios, los segundos de cambio y las
+             entradas fuera de plazo.
+    :rtype: dict
+    """
+    aleatorio = random.Random(semilla)
+    perfiles = {}
+    for papel in ("Bond 75g", "Bond 90g", "Couché 115g", "Reciclado"):
+        for tamano in ("Carta", "Oficio", "A4"):
+            perfiles[f"{papel} {tamano}"] = {'papel': papel, 'tamano': tamano, 'paginas': aleatorio.randint(20, 400)}
+    nombres = sorted(perfiles)
+
+    ahora = time.time()
+    cola = ColaTrabajos(ruta=None)
+    for _ in range(entradas):
+        fecha_limite = ahora + aleatorio.uniform(1, 60) * 3600 if aleatorio.random() < 0.2 else None
+        cola.agregar("benchmark.pdf", aleatorio.choice(nombres), aleatorio.randint(1, 20),
+                     prioridad=aleatorio.choice((0, 0, 0, 1)), fecha_limite=fecha_limite)
+    pendientes = cola.pendientes()
+
+    planificador = PlanificadorCambios()
+    inicio = time.perf_counter()
+    plan = planificador.planificar(pendientes, perfiles, ahora=ahora)
+    planificacion = time.perf_counter() - inicio
+
+    # Referencia: las mismas entradas por prioridad y orden de llegada.
+    cambios_llegada = segundos_llegada = tardias_llegada = 0
+    anterior, t = None, ahora
+    for entrada in sorted(pendientes, key=lambda e: (-e.prioridad, e.orden)):
+        preparacion = clave_preparacion(perfiles[entrada.perfil])
+        coste = planificador.coste_cambio(anterior, preparacion)
+        cambios_llegada += coste > 0
+        segundos_llegada += coste
+        t += coste + planificador.duracion(entrada, perfiles[entrada.perfil])
+        tardias_llegada += entrada.fecha_limite is not None and t > entrada.fecha_limite
+        anterior = preparacion
+
+    segundos_plan = sum(planificador.coste_cambio(a.preparacion, b.preparacion) for a, b in zip(plan, plan[1:]))
+    return {
+        "entradas": entradas,
+        "planificacion_ms": round(planificacion * 1000, 1),
+        "cambios_plan": contar_cambios(plan),
+        "cambios_llegada": cambios_llegada,
+        "segundos_cambio_plan": round(segundos_plan),
+        "segundos_cambio_llegada": round(segundos_llegada),
+        "fuera_de_plazo_plan": sum(1 for paso in plan if paso.tarde),
+        "fuera_de_plazo_llegada": tardias_llegada,
+    }
+
+
+def medir_servidor(clientes=50, copias=2, paginas=20, impresoras=4, capacidad=16, escala_tiempo=0.001,
+                   segundos_por_pagina=0.6, sobrecarga_trabajo=5.0, probabilidad_fallo=0.0, semilla=0,
+                   espera_reintento=0.05):
+    """
+    Arranca `ServidorTrabajos` en localhost contra un `BackendSimulado` y lanza
+    `clientes` envíos concurrentes. Un cliente rechazado con 503 (cola llena)
+    vuelve a intentarlo tras `espera_reintento` segundos reales.
+
+    :return: Diccionario con trabajos terminados, rechazos por cola llena,
+             duración, trabajos por segundo y latencia del primer evento.
+    :rtype: dict
+    """
+    nombres = [f"Simulada_{i + 1}" for i in range(impresoras)]
+    backend = BackendSimulado(
+        impresoras=nombres,
+        segundos_por_pagina=segundos_por_pagina,
+        sobrecarga_trabajo=sobrecarga_trabajo,
+        probabilidad_fallo=probabilidad_fallo,
+        semilla=semilla,
+        escala_tiempo=escala_tiempo,
+    )
+    anterior = establecer_backend(backend)
+    fd, ruta = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    fd, ruta_diario = tempfile.mkstemp(suffix=".jsonl")
+    os.close(fd)
+    diario = DiarioTrabajos(ruta_diario)
+    servidor = ServidorTrabajos({"Benchmark": {"descripcion": "Benchmark", "paginas": paginas}}, nombres,
+                                puerto=0, capacidad=capacidad, diario=diario, exportar_metricas=False,
+                                salida=lambda *args: None)
+    latencias = []
+    finales = collections.Counter()
+    rechazos = 0
+
+    async def cliente(numero):
+        nonlocal rechazos
+        # La mitad de los trabajos pide una impresora concreta; el resto, las libres.
+        datos = {"archivo": ruta, "perfil": "Benchmark", "copias": copias, "prioridad": numero % 3}
+        if numero % 2:
+            datos["impresora"] = nombres[numero % impresoras]
+        while True:
+            enviado = time.perf_counter()
+            primero = None
+            async for evento in enviar_trabajo(datos, puerto=servidor.puerto):
+                if primero is None:
+                    primero = time.perf_counter() - enviado
+                final = evento["evento"]
+            if final != "rechazado":
+                latencias.append(primero)
+                finales[final] += 1
+                return
+            rechazos += 1
+            await asyncio.sleep(espera_reintento)
+
+    async def principal():
+        await servidor.iniciar()
+        try:
+            inicio = time.perf_counter()
+            await asyncio.gather(*(cliente(i) for i in range(clientes)))
+            return time.perf_counter() - inicio
+        finally:
+            await servidor.detener()
+
+    try:
+        duracion = asyncio.run(principal())
+    finally:
+        establecer_backend(anterior)
+        diario.cerrar()
+        os.remove(ruta)
+        os.remove(ruta_diario)
+
+    latencias.sort()
+    return {
+        "clientes": clientes,
+        "impresoras": impresoras,
+        "capacidad": capacidad,
+        "terminados": finales["terminado"],
+        "cancelados": finales["cancelado"],
+        "rechazos_cola_llena": rechazos,
+        "duracion_s": round(duracion, 2),
+        "trabajos_por_segundo": round(clientes / duracion, 2),
+        "primer_evento_p50_ms": round(percentil(latencias, 0.5) * 1000, 1),
+        "primer_evento_p95_ms": round(percentil(latencias, 0.95) * 1000, 1),
+    }
+
+
+def medir_analisis(ruta, repeticiones=5):
+    """
+    Mide el análisis previo de un archivo: la primera vez (se lee el
+    documento) y las siguientes (sale de la caché por hash del contenido).
+
+    :return: Diccionario con el resultado del análisis y los tiempos en segundos.
+    :rtype: dict
+    """
+    cache = CacheAnalisis(ruta=None)
+    primero = cache.analizar(ruta)
+    # Cada repetición con una caché de hashes vacía, como al elegir el archivo tras reiniciar.
+    repetidos = []
+    for _ in range(repeticiones):
+        cache._hashes.clear()
+        repetidos.append(cache.analizar(ruta).segundos)
+    return {
+        "archivo": os.path.basename(ruta),
+        "megabytes": round(os.path.getsize(ruta) / 1024 / 1024, 1),
+        "analisis": primero.resumen(),
+        "primera_vez_s": round(primero.segundos, 3),
+        "desde_cache_p50_s": round(percentil(sorted(repetidos), 0.5), 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de copias por hora de PrintFlow.")
+    parser.add_argument("--copias", type=int, default=10)
+    parser.add_argument("--paginas", type=int, default=450)
+    parser.add_argument("--impresoras", type=int, default=1, help="Impresoras simuladas en el grupo.")
+    parser.add_argument("--segundos-por-pagina", type=float, nargs="+", default=[0.6],
+                        help="Segundos por página de cada impresora (la última se repite).")
+    parser.add_argument("--sobrecarga", type=float, default=5.0, help="Segundos fijos por trabajo.")
+    parser.add_argument("--operador", type=float, default=0.0, help="Segundos que tarda el operador en confirmar.")
+    parser.add_argument("--fallos", type=int, nargs="*", default=[], help="Números de envío que el spooler rechaza.")
+    parser.add_argument("--fallos-dispositivo", type=int, nargs="*", default=[],
+                        help="Números de envío que terminan en error en la impresora.")
+    parser.add_argument("--probabilidad-fallo", type=float, default=0.0)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--marca-agua", type=int, default=0,
+                        help="Trabajos en cola a partir de los cuales se espera (0 = esperar a que termine).")
+    parser.add_argument("--copias-por-control", type=int, default=1,
+                        help="Copias por trabajo intercalado entre confirmaciones (puntos de control cada_n).")
+    parser.add_argument("--paginas-por-fragmento", type=int, default=0,
+                        help="Envía cada copia en fragmentos de estas páginas (0 = documento entero).")
+    parser.add_argument("--escala", type=float, default=0.01, help="Segundos reales por segundo simulado.")
+    parser.add_argument("--arranque", type=int, metavar="N", default=0,
+                        help="Mide N arranques en frío de la GUI en lugar de un lote.")
+    parser.add_argument("--analizar", metavar="ARCHIVO",
+                        help="Mide el análisis previo de un PDF o DOCX (primera vez y desde la caché).")
+    parser.add_argument("--cola", type=int, metavar="N", default=0,
+                        help="Planifica una cola sintética de N trabajos en lugar de imprimir un lote.")
+    parser.add_argument("--servidor", type=int, metavar="N", default=0,
+                        help="Prueba el servidor de trabajos con N clientes concurrentes en localhost.")
+    parser.add_argument("--capacidad", type=int, default=16, help="Trabajos en espera que admite el servidor.")
+    parser.add_argument("--json", action="store_true", help="Imprime el resultado en JSON.")
+    args = parser.parse_args()
+
+    if args.arranque:
+        resultado = medir_arranque(args.arranque, impresoras=max(1, args.impresoras))
+    elif args.analizar:
+        resultado = medir_analisis(args.analizar)
+    elif args.cola:
+        resultado = medir_cola(args.cola, semilla=args.semilla)
+    elif args.servidor:
+        resultado = medir_servidor(
+            clientes=args.servidor,
+            copias=args.copias,
+            paginas=args.paginas,
+            impresoras=args.impresoras,
+            capacidad=args.capacidad,
+            escala_tiempo=args.escala,
+            segundos_por_pagina=args.segundos_por_pagina[0],
+            sobrecarga_trabajo=args.sobrecarga,
+            probabilidad_fallo=args.probabilidad_fallo,
+            semilla=args.semilla,
+        )
+    else:
+        resultado = ejecutar_benchmark(
+            copias=args.copias,
+            paginas=args.paginas,
+            impresoras=args.impresoras,
+            segundos_por_pagina=args.segundos_por_pagina,
+            sobrecarga_trabajo=args.sobrecarga,
+            tiempo_operador=args.operador,
+            fallos=args.fallos,
+            fallos_dispositivo=args.fallos_dispositivo,
+            probabilidad_fallo=args.probabilidad_fallo,
+            semilla=args.semilla,
+            marca_agua_cola=args.marca_agua,
+            escala_tiempo=args.escala,
+            copias_por_control=args.copias_por_control,
+            paginas_por_fragmento=args.paginas_por_fragmento,
+        )
+    if args.json:
+        print(json.dumps(resultado, indent=2))
+    else:
+        for clave, valor in resultado.items():
+            print(f"{clave:>24}: {valor}")
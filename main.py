@@ -1,16 +1,59 @@
 import tkinter as tk
-from tkinter import messagebox, filedialog
-import threading
+from tkinter import messagebox, filedialog, ttk
+import argparse
+import collections
+import datetime
+import json
 import sys
 import os
+import threading
+import time
 
 # Agrega la carpeta 'src' al path del sistema para poder importar módulos locales.
 # Esto asegura que `data_manager` y `printer_utils` sean accesibles.
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
 
 # Importaciones de módulos personalizados
-from data_manager import cargar_datos_libros_dinamicos
-from printer_utils import listar_impresoras_disponibles, enviar_a_impresora
+from data_manager import obtener_indice
+from printer_utils import establecer_backend
+from backends import BackendSimulado, DISPOSITIVO_LISTO, DISPOSITIVO_DESCONECTADO
+from descubrimiento import IndiceImpresoras, obtener_indice_impresoras
+from alert_system import obtener_despachador, AVISO_CONFIRMACION, AVISO_FALLO, AVISO_FINAL
+from diario import DiarioTrabajos, EVENTO_LOTE_CANCELADO
+from cola_trabajos import (ColaTrabajos, PlanificadorCambios, ENTRADA_EN_CURSO, ENTRADA_TERMINADA,
+                           ENTRADA_CANCELADA, clave_preparacion, contar_cambios)
+from modo_lote import ejecutar_desde_linea_de_comandos, POLITICAS, POLITICA_TERMINAL
+from controlador import (ControladorLote, IMPRESORA_IMPRIMIENDO, IMPRESORA_CONFIRMANDO,
+                         IMPRESORA_PAUSADA, IMPRESORA_FALLO)
+
+# Cada cuántos milisegundos la GUI vacía la cola de resultados de los
+# despachadores mientras hay un lote en curso.
+INTERVALO_RESULTADOS_MS = 20
+
+# Cada cuántos milisegundos la GUI comprueba si el índice de perfiles ha
+# cambiado (el índice se actualiza en segundo plano).
+INTERVALO_PERFILES_MS = 1000
+
+# Cada cuántos milisegundos la GUI comprueba si el índice de impresoras ha
+# cambiado (la búsqueda de impresoras se hace en segundo plano).
+INTERVALO_IMPRESORAS_MS = 1000
+
+# Cada cuántos milisegundos se vuelve a planificar la cola para que las horas
+# estimadas sigan al reloj.
+INTERVALO_COLA_MS = 60000
+# Filas de la cola que se insertan en la tabla por cada vuelta del bucle de
+# Tkinter, para que una cola de miles de trabajos no congele la ventana.
+FILAS_COLA_POR_TICK = 200
+# Formato de la fecha límite que se escribe al añadir un trabajo a la cola.
+FORMATO_FECHA_LIMITE = "%Y-%m-%d %H:%M"
+
+# Cada cuántos milisegundos la GUI comprueba si ha terminado el análisis
+# previo del archivo elegido (se hace en segundo plano).
+INTERVALO_ANALISIS_MS = 100
+
+# Cada cuántos milisegundos la GUI comprueba si ya se cargaron el diario y la
+# cola guardada (se leen en segundo plano al arrancar).
+INTERVALO_HISTORIAL_MS = 50
 
 class PrintFlowApp:
     """
@@ -18,31 +61,127 @@ class PrintFlowApp:
     Gestiona la interfaz gráfica (GUI) y el flujo de trabajo de impresión
     automatizada por copias con confirmación.
     """
-    def __init__(self, master):
+    def __init__(self, master, diario=None, avisos=None, indice_impresoras=None, cola=None, cache_analisis=None):
         """
         Inicializa la aplicación, carga los datos, encuentra impresoras y configura la GUI.
 
         :param master: La ventana principal (tk.Tk) de Tkinter.
+        :param diario: `DiarioTrabajos` donde se registra el progreso (por defecto,
+                       el diario de la raíz del proyecto).
+        :param avisos: `DespachadorAvisos` para las notificaciones al operador (por
+                       defecto, el compartido de `alert_system`).
+        :param indice_impresoras: `IndiceImpresoras` a usar (por defecto, el compartido
+                                  de `descubrimiento`, con la caché en disco).
+        :param cola: `ColaTrabajos` a usar (por defecto, la de la raíz del proyecto).
+        :param cache_analisis: `CacheAnalisis` para el análisis previo de los archivos
+                               (por defecto, la compartida de `analisis_previo`).
         """
         self.master = master
         master.title("PrintFlow - Automatización de Impresión")
 
         # 1. Carga de datos iniciales
-        # Carga los perfiles de impresión (settings dinámicos) desde data_manager.
-        self.libros_data = cargar_datos_libros_dinamicos()
-        # Obtiene una lista de impresoras disponibles en el sistema.
-        self.impresoras = listar_impresoras_disponibles()
+        # Los perfiles de impresión (settings dinámicos) se leen en segundo plano
+        # desde el índice de data_manager, que solo vuelve a leer los archivos que
+        # cambian; la ventana se muestra antes, con el menú en "Cargando...".
+        self.indice_perfiles = obtener_indice()
+        self.libros_data = self.indice_perfiles.obtener()
+        self.version_perfiles = self.indice_perfiles.version
+        self.perfiles_cargados = self.indice_perfiles.cargado
+        # Impresoras del sistema: se muestran al instante desde la caché en disco
+        # y la búsqueda real (que en red puede tardar segundos) sigue en segundo plano.
+        self.indice_impresoras = indice_impresoras if indice_impresoras is not None else obtener_indice_impresoras()
+        self.impresoras = self.indice_impresoras.nombres()
+        self.version_impresoras = self.indice_impresoras.version
+        self.impresoras_cargadas = self.indice_impresoras.cargado
 
         # 2. Variables de estado de la aplicación
         self.ruta_archivo_a_imprimir = ""  # Ruta del PDF/DOCX seleccionado por el usuario.
         self.current_job = {}              # Configuración del perfil de impresión seleccionado.
-        self.copia_actual = 0              # Contador de la copia que se está procesando actualmente.
         self.total_copias = 0              # Cantidad total de copias a imprimir.
-        self.thread_result = None          # Variable para almacenar el resultado del hilo de impresión.
+        self.controlador = None            # `ControladorLote` del lote en curso (reparte las copias).
+        self.confirmaciones = collections.deque()  # Copias terminadas pendientes de confirmar.
+        self.preguntando = False           # Evita abrir dos diálogos de confirmación a la vez.
+        self.filas_impresora = {}          # Nombre de impresora -> (Label, Button) del panel de progreso.
+
+        # Diario de trabajos (permite retomar un lote tras un cierre inesperado) y
+        # cola de trabajos (se imprime en el orden que minimiza los cambios de
+        # papel/tamaño). Abrirlos repasa sus archivos enteros, así que se cargan
+        # en un hilo y la ventana se dibuja sin esperarlos (ver `cargar_historial`).
+        self.diario = diario
+        self.cola = cola
+        self.historial_cargado = False
+        # Notificaciones de escritorio/consola; se entregan en segundo plano.
+        self.avisos = avisos if avisos is not None else obtener_despachador()
+
+        self.planificador_cola = PlanificadorCambios()
+        self.plan_cola = []                # Secuencia planificada (`PasoPlan`) de las entradas pendientes.
+        self.cola_activa = False           # True mientras se imprimen las entradas de la cola una tras otra.
+        self.preparacion_actual = None     # (papel, tamaño) cargado en las impresoras, si se sabe.
+        self._generacion_cola = 0          # Invalida los rellenos de la tabla que se han quedado viejos.
+
+        # Análisis previo del archivo elegido: páginas reales, tamaños de página y color.
+        self.cache_analisis = cache_analisis  # Se crea al elegir el primer archivo.
+        self.analisis = None               # `AnalisisArchivo` de `ruta_analizada`.
+        self.ruta_analizada = None
+        self._generacion_analisis = 0      # Descarta los análisis de archivos ya sustituidos.
         
         # 3. Configuración de la interfaz
         self.setup_gui()
         self.update_status("Seleccione impresora, archivo y perfil.", "blue")
+        self.iniciar_vigilancia_perfiles()
+        self.iniciar_vigilancia_impresoras()
+        self.iniciar_vigilancia_cola()
+        self.cargar_historial()
+
+    @property
+    def listo(self):
+        """True cuando ya se conocen los perfiles, las impresoras y el historial de trabajos."""
+        return self.perfiles_cargados and self.impresoras_cargadas and self.historial_cargado
+
+    def cargar_historial(self):
+        """
+        Abre en un hilo el diario de trabajos y la cola guardada (reproducir y
+        compactar un diario largo puede tardar) y devuelve a la cola las
+        entradas cuyos lotes quedaron interrumpidos. El resultado se recoge
+        desde el hilo de la GUI en `vigilar_historial`.
+        """
+        resultado = []
+
+        def cargar():
+            try:
+                diario = self.diario if self.diario is not None else DiarioTrabajos()
+                cola = self.cola if self.cola is not None else ColaTrabajos()
+                cola.recuperar({lote.lote for lote in diario.lotes_interrumpidos()})
+                resultado.append((diario, cola))
+            except Exception as e:
+                resultado.append(e)
+
+        threading.Thread(target=cargar, name="historial", daemon=True).start()
+        self.master.after(INTERVALO_HISTORIAL_MS, self.vigilar_historial, resultado)
+
+    def vigilar_historial(self, resultado):
+        if not resultado:
+            self.master.after(INTERVALO_HISTORIAL_MS, self.vigilar_historial, resultado)
+            return
+        if isinstance(resultado[0], Exception):
+            messagebox.showerror("Error", f"No se pudo abrir el diario o la cola de trabajos: {resultado[0]}")
+            self.update_status("Sin diario de trabajos: no se puede imprimir. Revise el archivo y reinicie.", "red")
+            return
+        self.diario, self.cola = resultado[0]
+        self.historial_cargado = True
+        self.refrescar_cola()
+        # Con el diario ya leído, ofrece retomar lo que quedó a medias.
+        self.ofrecer_reanudacion()
+
+    def historial_disponible(self):
+        """
+        :return: True si el diario y la cola ya están cargados; si no, avisa al
+                 operador de que espere.
+        :rtype: bool
+        """
+        if not self.historial_cargado:
+            messagebox.showinfo("Cargando", "El historial de trabajos aún se está cargando. Inténtelo en un momento.")
+        return self.historial_cargado
 
     def update_status(self, text, color="black"):
         """
@@ -68,24 +207,18 @@ class PrintFlowApp:
         self.file_path_label.grid(row=0, column=1, sticky="w")
         tk.Button(frame, text="Examinar...", command=self.seleccionar_archivo).grid(row=0, column=2)
 
-        # 2. Selección de Impresora
-        tk.Label(frame, text="2. Seleccione Impresora:").grid(row=1, column=0, sticky="w")
-        self.selected_printer = tk.StringVar(self.master)
-        if self.impresoras:
-            self.selected_printer.set(self.impresoras[0]) # Selecciona la primera por defecto
-            tk.OptionMenu(frame, self.selected_printer, *self.impresoras).grid(row=1, column=1, columnspan=2, sticky="ew")
-        else:
-            tk.Label(frame, text="ERROR: No se encontraron impresoras.").grid(row=1, column=1, columnspan=2, sticky="ew")
+        # 2. Selección de Impresoras (se pueden marcar varias para repartir el lote)
+        tk.Label(frame, text="2. Seleccione Impresoras:").grid(row=1, column=0, sticky="nw")
+        self.printer_listbox = tk.Listbox(frame, selectmode=tk.MULTIPLE, exportselection=False, height=5)
+        self.printer_listbox.grid(row=1, column=1, columnspan=2, sticky="ew")
+        self.refrescar_lista_impresoras()
 
         # 3. Selección de Perfil de Libro
         tk.Label(frame, text="3. Perfil de Libro:").grid(row=2, column=0, sticky="w")
-        libros_nombres = list(self.libros_data.keys())
-        if libros_nombres:
-            self.selected_libro = tk.StringVar(self.master)
-            self.selected_libro.set(libros_nombres[0]) # Selecciona el primer perfil por defecto
-            tk.OptionMenu(frame, self.selected_libro, *libros_nombres).grid(row=2, column=1, columnspan=2, sticky="ew")
-        else:
-            tk.Label(frame, text="ERROR: No hay perfiles cargados.").grid(row=2, column=1, columnspan=2, sticky="ew")
+        self.selected_libro = tk.StringVar(self.master)
+        self.libro_menu = tk.OptionMenu(frame, self.selected_libro, "")
+        self.libro_menu.grid(row=2, column=1, columnspan=2, sticky="ew")
+        self.refrescar_menu_perfiles()
 
         # 4. Cantidad de Copias
         tk.Label(frame, text="4. Cantidad de Copias:").grid(row=3, column=0, sticky="w")
@@ -93,14 +226,343 @@ class PrintFlowApp:
         self.cantidad_entry.insert(0, "1")
         self.cantidad_entry.grid(row=3, column=1, sticky="w")
 
-        # Botón de Inicio del Proceso
-        self.start_button = tk.Button(self.master, text="INICIAR TRABAJO", command=self.validar_e_iniciar, font=('Arial', 12, 'bold'), bg='green', fg='white')
-        self.start_button.pack(pady=20)
+        # 5. Prioridad y fecha límite (solo para los trabajos que se añaden a la cola)
+        tk.Label(frame, text="5. Prioridad / Límite:").grid(row=4, column=0, sticky="w")
+        opciones_cola = tk.Frame(frame)
+        opciones_cola.grid(row=4, column=1, columnspan=2, sticky="w")
+        self.prioridad_entry = tk.Entry(opciones_cola, width=5)
+        self.prioridad_entry.insert(0, "0")
+        self.prioridad_entry.pack(side=tk.LEFT)
+        self.fecha_limite_entry = tk.Entry(opciones_cola, width=17)
+        self.fecha_limite_entry.pack(side=tk.LEFT, padx=5)
+        tk.Label(opciones_cola, text="AAAA-MM-DD HH:MM (opcional)", fg="gray").pack(side=tk.LEFT)
+
+        # Botones de Inicio del Proceso y de la cola
+        botones = tk.Frame(self.master)
+        botones.pack(pady=20)
+        self.start_button = tk.Button(botones, text="INICIAR TRABAJO", command=self.validar_e_iniciar, font=('Arial', 12, 'bold'), bg='green', fg='white')
+        self.start_button.pack(side=tk.LEFT, padx=5)
+        tk.Button(botones, text="AÑADIR A LA COLA", command=self.agregar_a_cola, font=('Arial', 12, 'bold')).pack(side=tk.LEFT, padx=5)
+
+        # Panel de progreso: una fila por impresora del lote y el total
+        self.progreso_frame = tk.Frame(self.master)
+        self.progreso_frame.pack(fill='x', padx=10)
+        self.total_label = tk.Label(self.master, text="", anchor="w")
+        self.total_label.pack(fill='x', padx=10)
         
+        # Cola de trabajos en el orden planificado, con sus horas estimadas
+        cola_frame = tk.LabelFrame(self.master, text="Cola de trabajos (orden planificado)", padx=5, pady=5)
+        cola_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        columnas = ("archivo", "perfil", "copias", "prioridad", "preparacion", "cambio", "inicio", "fin", "limite")
+        self.arbol_cola = ttk.Treeview(cola_frame, columns=columnas, show="headings", height=8)
+        for columna, titulo, ancho in zip(columnas,
+                                          ("Archivo", "Perfil", "Copias", "Prio.", "Papel / tamaño", "Cambio previo",
+                                           "Inicio est.", "Fin est.", "Límite"),
+                                          (150, 110, 55, 45, 140, 170, 85, 85, 85)):
+            self.arbol_cola.heading(columna, text=titulo)
+            self.arbol_cola.column(columna, width=ancho, stretch=columna in ("archivo", "cambio"))
+        self.arbol_cola.tag_configure("tarde", foreground="red")
+        self.arbol_cola.tag_configure("en_curso", foreground="blue")
+        barra = ttk.Scrollbar(cola_frame, orient=tk.VERTICAL, command=self.arbol_cola.yview)
+        self.arbol_cola.configure(yscrollcommand=barra.set)
+        self.arbol_cola.grid(row=0, column=0, columnspan=3, sticky="nsew")
+        barra.grid(row=0, column=3, sticky="ns")
+        cola_frame.grid_columnconfigure(0, weight=1)
+        cola_frame.grid_rowconfigure(0, weight=1)
+        self.resumen_cola_label = tk.Label(cola_frame, text="", anchor="w")
+        self.resumen_cola_label.grid(row=1, column=0, sticky="w")
+        tk.Button(cola_frame, text="Quitar seleccionados", command=self.quitar_de_cola).grid(row=1, column=1, padx=5)
+        self.cola_button = tk.Button(cola_frame, text="INICIAR COLA", command=self.iniciar_cola)
+        self.cola_button.grid(row=1, column=2)
+
         # Etiqueta de Estado (barra de estado)
         self.status_label = tk.Label(self.master, text="", bd=1, relief=tk.SUNKEN, anchor="w")
         self.status_label.pack(fill='x', padx=10, pady=5)
 
+    def refrescar_menu_perfiles(self):
+        """
+        Rellena el menú de perfiles con el contenido actual de `libros_data`,
+        conservando la selección si el perfil sigue existiendo.
+        """
+        libros_nombres = list(self.libros_data.keys())
+        menu = self.libro_menu["menu"]
+        menu.delete(0, tk.END)
+        for nombre in libros_nombres:
+            menu.add_command(label=nombre, command=tk._setit(self.selected_libro, nombre,
+                                                             lambda _: self.mostrar_avisos_analisis()))
+
+        if not self.perfiles_cargados:
+            self.selected_libro.set("Cargando perfiles...")
+        elif not libros_nombres:
+            self.selected_libro.set("ERROR: No hay perfiles cargados.")
+        elif self.selected_libro.get() not in self.libros_data:
+            self.selected_libro.set(libros_nombres[0]) # Selecciona el primer perfil por defecto
+
+    def refrescar_lista_impresoras(self, nombres=None):
+        """
+        Rellena la lista de impresoras con su estado y su cola, conservando la
+        selección de las que siguen existiendo.
+
+        :param nombres: Nueva lista de impresoras (por defecto, la actual).
+        """
+        seleccionadas = set(self.impresoras_seleccionadas()) if self.printer_listbox.size() else set()
+        if nombres is not None:
+            self.impresoras = nombres
+        info = self.indice_impresoras.obtener()
+        self.printer_listbox.delete(0, tk.END)
+        if not self.impresoras:
+            # Marcador hasta que llegue la primera búsqueda (no se puede seleccionar:
+            # `impresoras_seleccionadas` ignora la lista mientras esté vacía).
+            texto = "Buscando impresoras..." if not self.impresoras_cargadas else "ERROR: No se encontraron impresoras."
+            self.printer_listbox.insert(tk.END, texto)
+            self.printer_listbox.itemconfig(0, fg="gray")
+            return
+        for i, nombre in enumerate(self.impresoras):
+            datos = info.get(nombre, {})
+            self.printer_listbox.insert(tk.END, f"{nombre}  —  {datos.get('estado', '?')}, {datos.get('cola', 0)} en cola")
+            if datos.get('estado') == DISPOSITIVO_DESCONECTADO:
+                self.printer_listbox.itemconfig(i, fg="gray")
+            if nombre in seleccionadas:
+                self.printer_listbox.selection_set(i)
+
+        if not seleccionadas:
+            # Selecciona la primera impresora lista por defecto.
+            listas = [i for i, n in enumerate(self.impresoras) if info.get(n, {}).get('estado') == DISPOSITIVO_LISTO]
+            if listas or self.impresoras:
+                self.printer_listbox.selection_set((listas or [0])[0])
+
+    def iniciar_vigilancia_impresoras(self):
+        """
+        Arranca la búsqueda de impresoras en segundo plano y programa la
+        comprobación periódica que refresca la lista cuando cambia algo
+        (impresoras nuevas, desconectadas o que vuelven).
+        """
+        if not self.impresoras:
+            self.update_status("Buscando impresoras...", "blue")
+        self.indice_impresoras.iniciar_vigilancia()
+        self.master.after(INTERVALO_IMPRESORAS_MS, self.vigilar_impresoras)
+
+    def vigilar_impresoras(self):
+        """
+        Comprueba (desde el hilo de la GUI) si el índice de impresoras ha cambiado
+        y, en ese caso, actualiza la lista sin reiniciar la aplicación.
+        """
+        if (self.indice_impresoras.version != self.version_impresoras
+                or self.indice_impresoras.cargado != self.impresoras_cargadas):
+            sin_impresoras = not self.impresoras
+            self.version_impresoras = self.indice_impresoras.version
+            self.impresoras_cargadas = self.indice_impresoras.cargado
+            self.refrescar_lista_impresoras(self.indice_impresoras.nombres())
+            if sin_impresoras and self.controlador is None:
+                self.update_status(f"{len(self.impresoras)} impresora(s) encontradas.", "blue")
+        self.master.after(INTERVALO_IMPRESORAS_MS, self.vigilar_impresoras)
+
+    def iniciar_vigilancia_perfiles(self):
+        """
+        Arranca la recarga en segundo plano de `libros_config` y programa la
+        comprobación periódica que refresca el menú cuando cambia algún perfil.
+        """
+        self.indice_perfiles.iniciar_vigilancia()
+        self.master.after(INTERVALO_PERFILES_MS, self.vigilar_perfiles)
+
+    def vigilar_perfiles(self):
+        """
+        Comprueba (desde el hilo de la GUI) si el índice de perfiles ha cambiado
+        y, en ese caso, actualiza el menú sin reiniciar la aplicación.
+        """
+        if (self.indice_perfiles.version != self.version_perfiles
+                or self.indice_perfiles.cargado != self.perfiles_cargados):
+            self.version_perfiles = self.indice_perfiles.version
+            self.perfiles_cargados = self.indice_perfiles.cargado
+            self.libros_data = self.indice_perfiles.obtener()
+            self.refrescar_menu_perfiles()
+            # Las duraciones y los cambios de la cola dependen de los perfiles.
+            self.refrescar_cola()
+            self.update_status(f"Perfiles actualizados ({len(self.libros_data)} disponibles).", "blue")
+        self.master.after(INTERVALO_PERFILES_MS, self.vigilar_perfiles)
+
+    def iniciar_vigilancia_cola(self):
+        """
+        Muestra la cola guardada y programa su replanificación periódica, para
+        que las horas estimadas sigan al reloj.
+        """
+        self.refrescar_cola()
+        self.master.after(INTERVALO_COLA_MS, self.vigilar_cola)
+
+    def vigilar_cola(self):
+        self.refrescar_cola()
+        self.master.after(INTERVALO_COLA_MS, self.vigilar_cola)
+
+    def segundos_restantes_lote(self):
+        """
+        :return: Segundos estimados que le quedan al lote en curso (0 si no hay ninguno).
+        :rtype: float
+        """
+        controlador = self.controlador
+        if controlador is None or not controlador.en_curso:
+            return 0.0
+        faltan = controlador.total_copias - controlador.copias_confirmadas
+        return faltan * controlador.config.get('paginas', 100) / self.planificador_cola.ppm * 60
+
+    def refrescar_cola(self):
+        """
+        Vuelve a planificar las entradas pendientes y rellena la tabla de la cola.
+        La tabla se rellena por tandas de `FILAS_COLA_POR_TICK` filas, así que la
+        ventana sigue respondiendo aunque la cola tenga miles de trabajos.
+        """
+        if not self.historial_cargado:
+            # La cola se muestra en cuanto se termina de cargar.
+            return
+        self._generacion_cola += 1
+        self.plan_cola = self.planificador_cola.planificar(
+            self.cola.pendientes(), self.libros_data,
+            ahora=time.time() + self.segundos_restantes_lote(),
+            preparacion_actual=self.preparacion_actual,
+        )
+        self.arbol_cola.delete(*self.arbol_cola.get_children())
+
+        en_curso = [e for e in self.cola.entradas.values() if e.estado == ENTRADA_EN_CURSO]
+        for entrada in en_curso:
+            perfil = self.libros_data.get(entrada.perfil, {})
+            self.arbol_cola.insert("", tk.END, iid=entrada.id, tags=("en_curso",), values=(
+                os.path.basename(entrada.archivo), entrada.perfil, entrada.copias, entrada.prioridad,
+                " / ".join(clave_preparacion(perfil)), "", "imprimiendo", "", self._formatear_hora(entrada.fecha_limite)))
+
+        tarde = sum(1 for paso in self.plan_cola if paso.tarde)
+        texto = f"{len(self.plan_cola)} en cola, {contar_cambios(self.plan_cola)} cambio(s) de papel/tamaño"
+        if self.plan_cola:
+            texto += f", fin estimado {self._formatear_hora(self.plan_cola[-1].fin)}"
+        if tarde:
+            texto += f" — {tarde} fuera de plazo"
+        self.resumen_cola_label.config(text=texto, fg="red" if tarde else "black")
+        self._rellenar_cola(self._generacion_cola, 0)
+
+    def _rellenar_cola(self, generacion, desde):
+        if generacion != self._generacion_cola:
+            # La cola se ha vuelto a planificar mientras tanto.
+            return
+        for paso in self.plan_cola[desde:desde + FILAS_COLA_POR_TICK]:
+            entrada = paso.entrada
+            self.arbol_cola.insert("", tk.END, iid=entrada.id, tags=("tarde",) if paso.tarde else (), values=(
+                os.path.basename(entrada.archivo), entrada.perfil, entrada.copias, entrada.prioridad,
+                " / ".join(paso.preparacion), paso.cambio or "", self._formatear_hora(paso.inicio),
+                self._formatear_hora(paso.fin), self._formatear_hora(entrada.fecha_limite)))
+        if desde + FILAS_COLA_POR_TICK < len(self.plan_cola):
+            self.master.after(1, self._rellenar_cola, generacion, desde + FILAS_COLA_POR_TICK)
+
+    @staticmethod
+    def _formatear_hora(instante):
+        if instante is None:
+            return ""
+        return time.strftime("%d/%m %H:%M", time.localtime(instante))
+
+    def agregar_a_cola(self):
+        """
+        Añade a la cola el archivo, el perfil, las copias, la prioridad y la
+        fecha límite del formulario, con las impresoras marcadas.
+        """
+        if not self.historial_disponible():
+            return
+        if not self.ruta_archivo_a_imprimir or not os.path.exists(self.ruta_archivo_a_imprimir):
+            messagebox.showerror("Error", "Debe seleccionar un archivo válido.")
+            return
+        nombre_perfil = self.selected_libro.get()
+        if nombre_perfil not in self.libros_data:
+            messagebox.showerror("Error", "Debe seleccionar un perfil de libro válido.")
+            return
+        try:
+            copias = int(self.cantidad_entry.get())
+            prioridad = int(self.prioridad_entry.get() or 0)
+            if copias <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "La cantidad debe ser un número mayor a 0 y la prioridad un número entero.")
+            return
+        fecha_limite = None
+        if self.fecha_limite_entry.get().strip():
+            try:
+                fecha_limite = datetime.datetime.strptime(
+                    self.fecha_limite_entry.get().strip(), FORMATO_FECHA_LIMITE).timestamp()
+            except ValueError:
+                messagebox.showerror("Error", "La fecha límite debe tener el formato AAAA-MM-DD HH:MM.")
+                return
+
+        if not self.confirmar_analisis(self.ruta_archivo_a_imprimir, self.libros_data[nombre_perfil]):
+            return
+        paginas = self.analisis.paginas if self.ruta_analizada == self.ruta_archivo_a_imprimir else None
+        self.cola.agregar(self.ruta_archivo_a_imprimir, nombre_perfil, copias, prioridad, fecha_limite,
+                          self.impresoras_seleccionadas(), paginas=paginas)
+        self.refrescar_cola()
+        self.update_status(f"Añadido a la cola: {nombre_perfil} x {copias} ({len(self.plan_cola)} en cola).", "blue")
+
+    def quitar_de_cola(self):
+        """Quita de la cola las entradas seleccionadas en la tabla (salvo la que se imprime)."""
+        if not self.historial_disponible():
+            return
+        for iid in self.arbol_cola.selection():
+            entrada = self.cola.entradas.get(iid)
+            if entrada is not None and entrada.estado != ENTRADA_EN_CURSO:
+                self.cola.quitar(iid)
+        self.refrescar_cola()
+
+    def iniciar_cola(self):
+        """Empieza a imprimir las entradas de la cola en el orden planificado."""
+        if not self.historial_disponible():
+            return
+        if self.controlador is not None and self.controlador.en_curso:
+            messagebox.showinfo("Cola", "Hay un trabajo en curso. La cola empezará cuando lo inicie de nuevo al terminar.")
+            return
+        self.cola_activa = True
+        self.siguiente_de_cola()
+
+    def siguiente_de_cola(self):
+        """
+        Arranca la primera entrada del plan. Si necesita otro papel u otro
+        tamaño, antes pide al operador que lo cargue.
+        """
+        if not self.cola_activa:
+            return
+        self.refrescar_cola()
+        if not self.plan_cola:
+            self.cola_activa = False
+            self.update_status("✅ Cola terminada.", "green")
+            return
+
+        paso = self.plan_cola[0]
+        entrada = paso.entrada
+        perfil = self.libros_data.get(entrada.perfil)
+        if perfil is None or not os.path.exists(entrada.archivo):
+            messagebox.showwarning("Cola", f"Se descarta '{os.path.basename(entrada.archivo)}' ({entrada.perfil}): "
+                                           f"falta el archivo o el perfil.")
+            self.cola.marcar(entrada.id, ENTRADA_CANCELADA)
+            self.master.after(0, self.siguiente_de_cola)
+            return
+        grupo = [n for n in entrada.impresoras if n in self.impresoras] or self.impresoras_seleccionadas()
+        if not grupo:
+            self.cola_activa = False
+            messagebox.showerror("Error", "Seleccione al menos una impresora para la cola.")
+            return
+        if paso.preparacion != self.preparacion_actual and not messagebox.askyesno(
+                "Preparar impresoras",
+                f"El siguiente trabajo ({entrada.perfil}) necesita papel '{paso.preparacion[0]}' "
+                f"en tamaño '{paso.preparacion[1]}'.\n\n¿Está cargado?"):
+            self.cola_activa = False
+            self.update_status("Cola detenida antes de un cambio de papel.", "purple")
+            return
+
+        self.ruta_archivo_a_imprimir = entrada.archivo
+        self.current_job = dict(perfil, paginas=entrada.paginas) if entrada.paginas else perfil
+        self.total_copias = entrada.copias
+        self.preparacion_actual = paso.preparacion
+        self.file_path_label.config(text=os.path.basename(entrada.archivo), fg="green")
+        self.crear_controlador(grupo, entrada.perfil)
+        self.cola.marcar(entrada.id, ENTRADA_EN_CURSO, lote=self.controlador.lote)
+        self.start_button.config(state=tk.DISABLED, text="TRABAJO EN CURSO...")
+        self.update_status(f"Cola: {entrada.perfil} x {entrada.copias} en {len(grupo)} impresora(s) "
+                           f"({len(self.plan_cola) - 1} más en cola)", "orange")
+        self.ejecutar_ciclo()
+        self.refrescar_cola()
+
     def seleccionar_archivo(self):
         """
         Abre un diálogo de selección de archivo.
@@ -113,24 +575,187 @@ class PrintFlowApp:
         if self.ruta_archivo_a_imprimir:
             # Muestra solo el nombre del archivo en la etiqueta
             self.file_path_label.config(text=os.path.basename(self.ruta_archivo_a_imprimir), fg="green")
-            self.update_status(f"Archivo cargado: {os.path.basename(self.ruta_archivo_a_imprimir)}", "blue")
+            self.update_status(f"Archivo cargado: {os.path.basename(self.ruta_archivo_a_imprimir)} (analizando...)", "blue")
+            self.iniciar_analisis(self.ruta_archivo_a_imprimir)
         else:
             self.file_path_label.config(text="Ningún archivo seleccionado.", fg="red")
 
+    def iniciar_analisis(self, ruta):
+        """
+        Analiza el archivo en un hilo (páginas reales, tamaños de página y color)
+        para no congelar la ventana con documentos grandes. El resultado se
+        recoge desde el hilo de la GUI en `vigilar_analisis`.
+        """
+        # `analisis_previo` (y `spool_raw`, del que usa el hash) solo se carga al elegir un archivo.
+        from analisis_previo import obtener_cache_analisis
+
+        if self.cache_analisis is None:
+            self.cache_analisis = obtener_cache_analisis()
+        self.analisis = None
+        self.ruta_analizada = None
+        self._generacion_analisis += 1
+        resultado = []
+
+        def analizar():
+            try:
+                resultado.append(self.cache_analisis.analizar(ruta))
+            except Exception as e:
+                # Cualquier fallo se entrega como resultado: si el hilo muriera
+                # sin dejar nada, `vigilar_analisis` seguiría esperando.
+                resultado.append(e)
+
+        threading.Thread(target=analizar, name="analisis-previo", daemon=True).start()
+        self.master.after(INTERVALO_ANALISIS_MS, self.vigilar_analisis, self._generacion_analisis, ruta, resultado)
+
+    def vigilar_analisis(self, generacion, ruta, resultado):
+        if generacion != self._generacion_analisis:
+            # Se eligió otro archivo mientras tanto.
+            return
+        if not resultado:
+            self.master.after(INTERVALO_ANALISIS_MS, self.vigilar_analisis, generacion, ruta, resultado)
+            return
+        nombre = os.path.basename(ruta)
+        if isinstance(resultado[0], Exception):
+            self.file_path_label.config(text=f"{nombre} (sin analizar)", fg="green")
+            self.update_status(f"No se pudo analizar '{nombre}': {resultado[0]}. Se usarán las páginas del perfil.", "purple")
+            return
+        self.analisis, self.ruta_analizada = resultado[0], ruta
+        self.file_path_label.config(text=f"{nombre} — {self.analisis.resumen()}", fg="green")
+        self.mostrar_avisos_analisis()
+
+    def discrepancias_analisis(self, ruta, perfil):
+        """
+        :return: Diferencias entre el archivo y el perfil según el análisis previo
+                 (vacía si el archivo no está analizado todavía).
+        :rtype: list[str]
+        """
+        if self.analisis is None or ruta != self.ruta_analizada:
+            return []
+        return self.analisis.discrepancias(perfil)
+
+    def mostrar_avisos_analisis(self):
+        """Compara el archivo analizado con el perfil elegido y lo indica en el estado."""
+        perfil = self.libros_data.get(self.selected_libro.get())
+        if self.analisis is None or perfil is None:
+            return
+        discrepancias = self.discrepancias_analisis(self.ruta_analizada, perfil)
+        if discrepancias:
+            self.update_status("⚠️ " + " ".join(discrepancias), "red")
+        else:
+            origen = " (ya analizado)" if self.analisis.desde_cache else ""
+            self.update_status(f"Archivo analizado{origen}: {self.analisis.resumen()}. Coincide con el perfil.", "green")
+
+    def confirmar_analisis(self, ruta, perfil):
+        """
+        Si el análisis previo encontró diferencias con el perfil, pregunta al
+        operador antes de imprimir.
+
+        :return: True si se puede continuar.
+        :rtype: bool
+        """
+        discrepancias = self.discrepancias_analisis(ruta, perfil)
+        return not discrepancias or messagebox.askyesno(
+            "El archivo no coincide con el perfil",
+            "\n".join(f"• {d}" for d in discrepancias) + "\n\n¿Continuar de todos modos?"
+        )
+
+    def configuracion_real(self, ruta, perfil):
+        """
+        :return: El perfil con las páginas reales del archivo si ya se analizó,
+                 para que las esperas y las estimaciones usen el documento elegido.
+        :rtype: dict
+        """
+        if self.analisis is None or ruta != self.ruta_analizada:
+            return perfil
+        return self.analisis.aplicar(perfil)
+
+    def impresoras_seleccionadas(self):
+        """
+        :return: Nombres de las impresoras marcadas en la lista (el grupo del lote).
+        :rtype: list[str]
+        """
+        if not self.impresoras:
+            return []
+        return [self.impresoras[i] for i in self.printer_listbox.curselection()]
+
+    def construir_panel_impresoras(self):
+        """
+        Crea una fila de progreso por impresora del lote, cada una con su
+        propio botón para reanudarla si se pausa o falla.
+        """
+        for widget in self.progreso_frame.winfo_children():
+            widget.destroy()
+        self.filas_impresora = {}
+        for fila, nombre in enumerate(self.controlador.impresoras):
+            etiqueta = tk.Label(self.progreso_frame, text=nombre, anchor="w")
+            etiqueta.grid(row=fila, column=0, sticky="w")
+            boton = tk.Button(self.progreso_frame, text="Reanudar", state=tk.DISABLED,
+                              command=lambda n=nombre: self.reanudar_impresora(n))
+            boton.grid(row=fila, column=1, padx=5)
+            self.filas_impresora[nombre] = (etiqueta, boton)
+
+    def actualizar_progreso(self):
+        """
+        Refresca el panel de progreso con el estado de cada impresora y el total del lote.
+        """
+        controlador = self.controlador
+        for nombre, estado in controlador.impresoras.items():
+            if nombre not in self.filas_impresora:
+                continue
+            etiqueta, boton = self.filas_impresora[nombre]
+            if estado.estado == IMPRESORA_IMPRIMIENDO:
+                texto, color = f"imprimiendo {estado.trabajo.descripcion}", "red"
+            elif estado.estado == IMPRESORA_CONFIRMANDO:
+                texto, color = f"{estado.trabajo.descripcion} terminada(s), esperando confirmación", "orange"
+            elif estado.estado == IMPRESORA_PAUSADA:
+                texto, color = "PAUSADA", "purple"
+            elif estado.estado == IMPRESORA_FALLO:
+                texto, color = f"FALLO: {estado.ultimo_mensaje}", "red"
+            else:
+                texto, color = "en espera", "black"
+            ppm = f"{estado.rendimiento.ppm:.0f} ppm" if estado.rendimiento.ppm else "sin medir"
+            etiqueta.config(text=f"{nombre}: {texto} | {estado.copias_hechas} hechas | {ppm}", fg=color)
+            boton.config(state=tk.NORMAL if estado.estado in (IMPRESORA_PAUSADA, IMPRESORA_FALLO) else tk.DISABLED)
+
+        self.total_label.config(
+            text=f"Total: {controlador.copias_confirmadas} de {controlador.total_copias} copias confirmadas "
+                 f"({len(controlador.pendientes)} sin enviar)"
+        )
+
     def validar_e_iniciar(self):
         """
         Valida que todos los campos requeridos estén llenos correctamente
-        antes de comenzar el ciclo de impresión.
+        antes de comenzar el ciclo de impresión. Si hay un lote pausado,
+        lo reanuda en lugar de empezar uno nuevo.
         """
         try:
+            # 0. Reanudar un lote pausado o con fallos sin reiniciar sus contadores
+            if self.controlador is not None and self.controlador.en_curso:
+                self.start_button.config(state=tk.DISABLED, text="TRABAJO EN CURSO...")
+                self.update_status("Reanudando el trabajo...", "orange")
+                self.controlador.reanudar()
+                return
+            if not self.historial_disponible():
+                return
+
             # 1. Validar selección de archivo
             if not self.ruta_archivo_a_imprimir or not os.path.exists(self.ruta_archivo_a_imprimir):
                 messagebox.showerror("Error", "Debe seleccionar un archivo válido.")
                 return
             
-            # 2. Validar impresoras disponibles
+            # 2. Validar impresoras disponibles y seleccionadas
             if not self.impresoras:
-                messagebox.showerror("Error", "No hay impresoras disponibles.")
+                messagebox.showerror("Error", "No hay impresoras disponibles (la búsqueda sigue en segundo plano).")
+                return
+            grupo = self.impresoras_seleccionadas()
+            if not grupo:
+                messagebox.showerror("Error", "Seleccione al menos una impresora.")
+                return
+            info = self.indice_impresoras.obtener()
+            desconectadas = [n for n in grupo if info.get(n, {}).get('estado') == DISPOSITIVO_DESCONECTADO]
+            if desconectadas and not messagebox.askyesno(
+                    "Impresoras desconectadas",
+                    f"Estas impresoras aparecen desconectadas: {', '.join(desconectadas)}.\n\n¿Iniciar de todas formas?"):
                 return
 
             # 3. Validar cantidad de copias
@@ -141,12 +766,19 @@ class PrintFlowApp:
 
             # 4. Configurar el trabajo actual
             nombre_elegido = self.selected_libro.get()
-            self.current_job = self.libros_data[nombre_elegido]
-            self.copia_actual = 1 # Reinicia el contador de copias
+            if nombre_elegido not in self.libros_data:
+                messagebox.showerror("Error", "Debe seleccionar un perfil de libro válido.")
+                return
+            if not self.confirmar_analisis(self.ruta_archivo_a_imprimir, self.libros_data[nombre_elegido]):
+                return
+            self.current_job = self.configuracion_real(self.ruta_archivo_a_imprimir, self.libros_data[nombre_elegido])
+            self.preparacion_actual = clave_preparacion(self.current_job)
+            self.confirmaciones.clear()
+            self.crear_controlador(grupo, nombre_elegido)
             
             # 5. Deshabilitar el botón de inicio y actualizar el estado
             self.start_button.config(state=tk.DISABLED, text="TRABAJO EN CURSO...")
-            self.update_status(f"Iniciando: {nombre_elegido} x {self.total_copias}", "orange")
+            self.update_status(f"Iniciando: {nombre_elegido} x {self.total_copias} en {len(grupo)} impresora(s)", "orange")
 
             # 6. Iniciar el ciclo de impresión
             self.ejecutar_ciclo()
@@ -157,108 +789,332 @@ class PrintFlowApp:
             # Captura errores en la carga del perfil o lógica inicial.
             messagebox.showerror("Error Fatal", f"Ocurrió un error al iniciar: {e}")
 
+    def crear_controlador(self, grupo, nombre_perfil, lote=None, hechas=None):
+        """
+        Prepara el `ControladorLote` del trabajo actual y su panel de progreso.
+
+        :param grupo: Impresoras entre las que se reparte el lote.
+        :param nombre_perfil: Nombre del perfil (se guarda en el diario).
+        :param lote: Identificador de un lote interrumpido que se reanuda (opcional).
+        :param hechas: Copias ya impresas de ese lote (opcional).
+        """
+        self.confirmaciones.clear()
+        self.controlador = ControladorLote(
+            grupo,
+            self.ruta_archivo_a_imprimir,
+            self.current_job,
+            self.total_copias,
+            al_cambiar=self.actualizar_progreso,
+            al_pedir_confirmacion=self.pausa_confirmacion,
+            al_fallo=self.notificar_fallo,
+            al_finalizar=self.finalizar_trabajo,
+            diario=self.diario,
+            perfil=nombre_perfil,
+            lote=lote,
+            hechas=hechas,
+        )
+        self.construir_panel_impresoras()
+
+    def ofrecer_reanudacion(self):
+        """
+        Revisa el diario al arrancar y ofrece retomar un lote interrumpido justo
+        en la primera copia que no llegó a imprimirse. Los lotes que el operador
+        descarta quedan cerrados en el diario.
+        """
+        if not self.impresoras_cargadas and self.diario.lotes_interrumpidos():
+            # Primer arranque sin caché: se espera a conocer las impresoras del lote.
+            self.master.after(INTERVALO_IMPRESORAS_MS, self.ofrecer_reanudacion)
+            return
+        for lote in self.diario.lotes_interrumpidos():
+            if self.controlador is not None:
+                # Ya se está reanudando otro lote; el resto se ofrecerá en el próximo arranque.
+                return
+            nombre = os.path.basename(lote.ruta or "")
+            grupo = [n for n in lote.impresoras if n in self.impresoras]
+            if not lote.ruta or not os.path.exists(lote.ruta) or not grupo:
+                messagebox.showwarning(
+                    "Trabajo interrumpido",
+                    f"El trabajo '{lote.perfil}' ({nombre}) quedó interrumpido, pero su archivo o sus "
+                    f"impresoras ya no están disponibles. Se descarta."
+                )
+                self.diario.registrar(EVENTO_LOTE_CANCELADO, lote.lote)
+                continue
+
+            reanudar = messagebox.askyesno(
+                "Trabajo interrumpido",
+                f"El trabajo '{lote.perfil}' ({nombre}) quedó interrumpido con {len(lote.hechas)} de "
+                f"{lote.total_copias} copias impresas.\n\n¿Reanudar desde la copia {lote.siguiente_copia}?"
+            )
+            if not reanudar:
+                self.diario.registrar(EVENTO_LOTE_CANCELADO, lote.lote)
+                continue
+
+            self.ruta_archivo_a_imprimir = lote.ruta
+            self.current_job = lote.config
+            self.total_copias = lote.total_copias
+            self.file_path_label.config(text=nombre, fg="green")
+            self.crear_controlador(grupo, lote.perfil, lote=lote.lote, hechas=lote.hechas)
+            self.start_button.config(state=tk.DISABLED, text="TRABAJO EN CURSO...")
+            self.update_status(f"Reanudando: {lote.perfil} desde la copia {lote.siguiente_copia} de {lote.total_copias}", "orange")
+            self.ejecutar_ciclo()
+        # Las entradas de la cola cuyos lotes no se reanudan vuelven a estar pendientes.
+        self.cola.recuperar({lote.lote for lote in self.diario.lotes_interrumpidos()})
+
     def ejecutar_ciclo(self):
         """
-        Controla el flujo de impresión. Verifica si hay copias pendientes y,
-        de haberlas, inicia un hilo de impresión para la copia actual.
+        Arranca el lote: el controlador reparte las primeras copias entre las
+        impresoras del grupo y la GUI empieza a vaciar la cola de resultados.
         """
-        if self.copia_actual <= self.total_copias:
-            # Si aún quedan copias, se prepara para imprimir la siguiente.
-            self.update_status(f"Imprimiendo COPIA {self.copia_actual} de {self.total_copias}...", "red")
-            
-            # Iniciar la impresión en un hilo separado para no congelar la GUI.
-            thread = threading.Thread(target=self.hilo_de_impresion, daemon=True)
-            thread.start()
-            
-            # Llama a `verificar_hilo` después de 500ms para empezar a monitorear.
-            self.master.after(500, self.verificar_hilo, thread)
+        self.controlador.iniciar()
+        self.master.after(INTERVALO_RESULTADOS_MS, self.verificar_resultados, self.controlador)
 
-        else:
-            # Si ya se completaron todas las copias.
-            self.finalizar_trabajo()
+    def verificar_resultados(self, controlador):
+        """
+        Vacía la cola de resultados de los despachadores desde el hilo de la GUI.
+        Se vuelve a programar cada `INTERVALO_RESULTADOS_MS` milisegundos
+        mientras el lote siga en curso.
 
-    def hilo_de_impresion(self):
+        :param controlador: El `ControladorLote` del lote que se está vigilando.
         """
-        Función que contiene la lógica de impresión real y se ejecuta en un hilo secundario.
-        Esta función llama a la utilidad externa `enviar_a_impresora`.
-        Almacena el resultado de la impresión en `self.thread_result`.
+        controlador.procesar_resultados()
+        if controlador.en_curso and controlador is self.controlador:
+            self.master.after(INTERVALO_RESULTADOS_MS, self.verificar_resultados, controlador)
+
+    def pausa_confirmacion(self, estado, trabajo):
         """
-        impresora = self.selected_printer.get()
-        ruta = self.ruta_archivo_a_imprimir
-        
-        # Llama a la función de impresión (puede tardar o fallar)
-        exito, mensaje = enviar_a_impresora(impresora, ruta, self.current_job)
-        
-        # Almacena el resultado para ser leído por el hilo principal (GUI)
-        self.thread_result = (exito, mensaje)
+        Encola la confirmación de una copia terminada y programa el diálogo que
+        la pide al operador. Vuelve enseguida: `verificar_resultados` sigue
+        procesando las demás impresoras mientras el diálogo está abierto, y las
+        confirmaciones se piden de una en una.
 
-    def verificar_hilo(self, thread):
+        :param estado: `EstadoImpresora` de la impresora que terminó la copia.
+        :param trabajo: `TrabajoCopia` terminado.
         """
-        Método llamado periódicamente por `self.master.after` para verificar
-        si el hilo de impresión ha finalizado.
-        
-        :param thread: El objeto Thread que está ejecutando la impresión.
+        self.avisos.emitir(
+            AVISO_CONFIRMACION,
+            f"🚨 COPIA TERMINADA ({self.controlador.perfil}) 🚨",
+            f"{trabajo.descripcion} de {trabajo.total} terminada(s) en '{estado.nombre}'. Confirme para continuar.",
+        )
+        self.confirmaciones.append((self.controlador, estado, trabajo))
+        if not self.preguntando:
+            # Si ya hay un diálogo abierto, esta copia se preguntará después.
+            self.preguntando = True
+            self.master.after(0, self.siguiente_confirmacion)
+
+    def siguiente_confirmacion(self):
         """
-        if thread.is_alive():
-            # Si el hilo sigue activo, vuelve a verificar en 500ms.
-            self.master.after(500, self.verificar_hilo, thread)
-        else:
-            # El hilo ha terminado. Recupera el resultado y actúa en consecuencia.
-            exito, mensaje = self.thread_result
-            
-            if exito:
-                # Si la impresión se mandó correctamente, muestra la pausa de confirmación.
-                self.pausa_confirmacion() 
-            else:
-                # Si hubo un fallo al mandar el trabajo.
-                self.update_status(f"FALLO: {mensaje}", "red")
-                self.start_button.config(state=tk.NORMAL, text="FALLO - REINICIAR")
+        Pide al operador la confirmación más antigua pendiente. Las de un lote
+        que ya terminó o se canceló se descartan.
+        """
+        while self.confirmaciones:
+            controlador, estado, trabajo = self.confirmaciones.popleft()
+            if controlador is self.controlador and controlador.en_curso:
+                self.preguntar_confirmacion(
+                    estado, trabajo,
+                    lambda confirmar: self.responder_confirmacion(controlador, estado, trabajo, confirmar))
+                return
+        self.preguntando = False
 
-    def pausa_confirmacion(self):
+    def responder_confirmacion(self, controlador, estado, trabajo, confirmar):
         """
-        Muestra la ventana modal de alerta (askyesno) para solicitar
-        la confirmación del usuario antes de continuar con la siguiente copia.
-        Esto actúa como la pausa obligatoria.
+        Aplica la respuesta del operador a la impresora que esperaba y pasa a
+        la siguiente confirmación pendiente.
+
+        :param confirmar: True para seguir, False para pausar esa impresora.
+        """
+        if controlador is self.controlador and controlador.en_curso:
+            controlador.confirmar(estado.nombre, confirmar)
+            if not confirmar:
+                # Si el usuario elige "No", pausa esa impresora y habilita el botón para reanudar.
+                self.update_status(f"'{estado.nombre}' PAUSADA tras la {trabajo.descripcion}. Presione REANUDAR para continuar.", "purple")
+                self.start_button.config(state=tk.NORMAL, text="REANUDAR TRABAJO")
+        self.master.after(0, self.siguiente_confirmacion)
+
+    def preguntar_confirmacion(self, estado, trabajo, responder):
         """
-        confirmar = messagebox.askyesno(
+        Pregunta al operador si se puede mandar la siguiente copia a una impresora.
+        Se separa de `pausa_confirmacion` para que los modos sin interfaz
+        (ej. el benchmark) puedan responder sin mostrar ventanas.
+
+        :param responder: Función que recibe la respuesta: True si el operador
+                          confirma, False si pausa esa impresora.
+        """
+        responder(messagebox.askyesno(
             "🚨 COPIA TERMINADA 🚨",
-            f"La copia {self.copia_actual} de {self.total_copias} ha finalizado.\n\n"
-            f"¿Está listo para mandar la siguiente copia?",
+            f"Punto de control: {trabajo.descripcion} de {trabajo.total} terminada(s) en '{estado.nombre}'.\n\n"
+            f"¿Está listo para mandar las siguientes copias a esta impresora?",
             icon=messagebox.WARNING
-        )
-        
-        if confirmar:
-            # Si el usuario confirma, incrementa el contador y continúa el ciclo.
-            self.copia_actual += 1
-            if self.copia_actual <= self.total_copias:
-                # Continúa con la siguiente copia después de un breve retraso
-                self.master.after(100, self.ejecutar_ciclo) 
-            else:
-                # Todas las copias han sido procesadas
-                self.finalizar_trabajo()
-        else:
-            # Si el usuario elige "No", pausa el proceso y habilita el botón para reanudar.
-            self.update_status(f"Proceso PAUSADO en copia {self.copia_actual}. Presione START para reanudar.", "purple")
-            self.start_button.config(state=tk.NORMAL, text="REANUDAR TRABAJO")
+        ))
+
+    def notificar_fallo(self, estado, trabajo):
+        """
+        Muestra el fallo de envío y habilita el botón para reanudar. La impresora
+        que falló queda parada; las demás del grupo siguen con el lote.
+
+        Si no se sabe si la copia llegó a imprimirse, se pregunta al operador
+        antes de volver a ponerla en la cola.
+
+        :param estado: `EstadoImpresora` de la impresora que falló.
+        :param trabajo: `TrabajoCopia` fallido (vuelve a la cola de pendientes).
+        """
+        self.update_status(f"FALLO en '{estado.nombre}': {trabajo.mensaje}", "red")
+        self.avisos.emitir(AVISO_FALLO, f"❌ FALLO en '{estado.nombre}'", trabajo.mensaje)
+        self.start_button.config(state=tk.NORMAL, text="FALLO - REINICIAR")
+        if trabajo.incierto:
+            controlador = self.controlador
+            self.master.after(0, self.preguntar_incierto, estado, trabajo,
+                              lambda impresa: self.responder_incierto(controlador, estado, impresa))
+
+    def responder_incierto(self, controlador, estado, impresa):
+        """
+        Aplica lo que el operador comprobó sobre una copia sin confirmar.
+
+        :param impresa: True si la copia salió impresa, False para reintentarla.
+        """
+        if controlador is self.controlador and controlador.en_curso:
+            controlador.resolver_incierto(estado.nombre, impresa)
+
+    def preguntar_incierto(self, estado, trabajo, responder):
+        """
+        Pregunta al operador si salió impresa una copia cuyo trabajo no terminó
+        a tiempo y no se pudo cancelar. Como `preguntar_confirmacion`, se separa
+        para que los modos sin interfaz puedan responder sin mostrar ventanas.
+
+        :param responder: Función que recibe True si la copia se imprimió.
+        """
+        responder(messagebox.askyesno(
+            "⚠️ COPIA SIN CONFIRMAR",
+            f"{trabajo.descripcion.capitalize()} en '{estado.nombre}': {trabajo.mensaje}\n\n¿Se imprimió?",
+            icon=messagebox.WARNING
+        ))
+
+    def reanudar_impresora(self, nombre):
+        """
+        Reanuda una impresora pausada o con fallo del lote en curso.
+        """
+        if self.controlador is not None and self.controlador.en_curso:
+            self.controlador.reanudar(nombre)
+            self.update_status(f"Reanudando '{nombre}'...", "orange")
 
     def finalizar_trabajo(self):
         """
         Restablece el estado de la aplicación una vez que se han completado
         todas las copias.
         """
+        self.controlador.detener()
         self.update_status("✅ PROCESO TERMINADO.", "green")
         self.start_button.config(state=tk.NORMAL, text="INICIAR TRABAJO")
-        messagebox.showinfo("Finalizado", "Todas las copias han sido impresas y confirmadas.")
+        self.avisos.emitir(AVISO_FINAL, "✅ LOTE TERMINADO",
+                           f"{self.controlador.total_copias} copias de '{self.controlador.perfil}' impresas.")
+        self.exportar_metricas()
+        self.preparacion_actual = clave_preparacion(self.controlador.config)
+        entrada = self.cola.entrada_de_lote(self.controlador.lote)
+        if entrada is not None:
+            self.cola.marcar(entrada.id, ENTRADA_TERMINADA)
+        if self.cola_activa and self.cola.pendientes():
+            # Con la cola en marcha se sigue con el siguiente trabajo sin más diálogos.
+            self.master.after(0, self.siguiente_de_cola)
+            return
+        self.cola_activa = False
+        self.refrescar_cola()
+        self.mostrar_aviso_final()
+
+    def exportar_metricas(self):
+        """
+        Guarda los tiempos del lote en el CSV histórico y en el archivo de
+        métricas de Prometheus (ver `metricas`).
+        """
+        try:
+            self.controlador.metricas.exportar_csv()
+            self.controlador.metricas.exportar_prometheus()
+        except OSError as e:
+            print(f"Advertencia: no se pudieron exportar las métricas: {e}")
+
+    def mostrar_aviso_final(self):
+        """
+        Informa al operador de que el lote ha terminado, con el resumen de
+        tiempos por etapa.
+        """
+        messagebox.showinfo(
+            "Finalizado",
+            "Todas las copias han sido impresas y confirmadas.\n\n" + self.controlador.metricas.texto_resumen(),
+        )
+
+
+def parsear_argumentos(argv=None):
+    """
+    Define las opciones de línea de comandos. Sin opciones se abre la GUI.
+    """
+    parser = argparse.ArgumentParser(description="PrintFlow - Automatización de Impresión")
+    parser.add_argument("--manifiesto", metavar="RUTA",
+                        help="Ejecuta sin GUI los trabajos de un manifiesto JSONL (un trabajo por línea).")
+    parser.add_argument("--confirmaciones", choices=POLITICAS, default=POLITICA_TERMINAL,
+                        help="'terminal' pregunta cada copia en la consola; 'auto' no pregunta.")
+    parser.add_argument("--reintentos", type=int, default=3,
+                        help="Fallos tolerados por trabajo con --confirmaciones auto y en --servidor.")
+    parser.add_argument("--servidor", action="store_true",
+                        help="Atiende sin GUI los trabajos que envían otros puestos por HTTP.")
+    # Los valores por defecto de --host y --puerto los pone `servidor_trabajos`,
+    # que solo se importa (con asyncio) si se arranca el servidor.
+    parser.add_argument("--host",
+                        help="Dirección del servidor (por defecto 127.0.0.1; 0.0.0.0 para aceptar otros equipos).")
+    parser.add_argument("--puerto", type=int, help="Puerto del servidor (por defecto 8631).")
+    parser.add_argument("--simular", type=int, metavar="N", default=0,
+                        help="Usa N impresoras simuladas en lugar de las reales (pruebas en seco).")
+    parser.add_argument("--medir-arranque", action="store_true",
+                        help="Abre la GUI, informa en JSON de cuándo se dibuja y cuándo está lista, y se cierra.")
+    return parser.parse_args(argv)
+
+
+def medir_arranque(root, app, intervalo_ms=10):
+    """
+    Escribe en la salida estándar una línea JSON con el `time.time()` del primer
+    cuadro dibujado y otra con el del momento en que perfiles e impresoras
+    están cargados; después cierra la ventana. Lo usa `benchmark.py --arranque`.
+    """
+    def informar(evento):
+        print(json.dumps({"evento": evento, "t": time.time()}), flush=True)
+
+    def esperar_listo():
+        if app.listo:
+            informar("listo")
+            root.destroy()
+        else:
+            root.after(intervalo_ms, esperar_listo)
+
+    def primer_cuadro():
+        root.update_idletasks()
+        informar("primer_cuadro")
+        esperar_listo()
+
+    root.after_idle(primer_cuadro)
 
 
 if __name__ == "__main__":
+    args = parsear_argumentos()
+    if args.simular:
+        establecer_backend(BackendSimulado(impresoras=[f"Simulada_{i + 1}" for i in range(args.simular)]))
+
+    if args.manifiesto:
+        # Modo por lotes sin interfaz: no necesita a nadie delante de la GUI.
+        sys.exit(ejecutar_desde_linea_de_comandos(args.manifiesto, args.confirmaciones, args.reintentos))
+    if args.servidor:
+        # Varios puestos envían trabajos a este controlador de impresión.
+        from servidor_trabajos import ejecutar_servidor, HOST_POR_DEFECTO, PUERTO_POR_DEFECTO
+        host = args.host if args.host is not None else HOST_POR_DEFECTO
+        puerto = args.puerto if args.puerto is not None else PUERTO_POR_DEFECTO
+        sys.exit(ejecutar_servidor(host, puerto, args.reintentos))
+
     # La impresión de archivos típicamente requiere librerías específicas del SO.
     # Se añade una advertencia si el programa no se ejecuta en Windows (nt).
-    if os.name != 'nt':
+    if os.name != 'nt' and not args.simular:
         messagebox.showerror("Advertencia", "Este programa usa API de Windows (pywin32) y podría no funcionar correctamente en su sistema operativo.")
         
     # Inicialización de la aplicación Tkinter
     root = tk.Tk()
-    app = PrintFlowApp(root)
+    # Con impresoras simuladas no se usa la caché de impresoras reales.
+    app = PrintFlowApp(root, indice_impresoras=IndiceImpresoras(ruta_cache=None) if args.simular else None)
+    if args.medir_arranque:
+        medir_arranque(root, app)
     # Inicia el bucle principal de Tkinter
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
@@ -1,30 +1,326 @@
-from plyer import notification
-import time 
+import collections
+import json
+import os
+import sys
+import threading
+import time
+
+from metricas import EstadisticaEtapa
+
+# `plyer`, `winsound` y `urllib.request` se importan en el hilo de avisos la
+# primera vez que se entregan, para no retrasar el arranque de la ventana.
+
+# Tipos de aviso. Los avisos del mismo tipo que llegan juntos se agrupan en uno.
+AVISO_CONFIRMACION = "confirmacion"
+AVISO_FALLO = "fallo"
+AVISO_FINAL = "final"
+
+# Mensajes distintos que guarda un aviso agrupado; los demás solo se cuentan.
+# Como hay un aviso pendiente por tipo, esto acota lo que puede esperar a la vez.
+MENSAJES_POR_AVISO = 5
+# Segundos que se esperan tras el primer aviso de una ráfaga para agruparla.
+VENTANA_AGRUPACION = 0.5
+# Segundos mínimos entre dos entregas, para no saturar al operador.
+INTERVALO_MINIMO = 2.0
+
+# Variable de entorno con la URL de un webhook local al que reenviar los avisos.
+VARIABLE_WEBHOOK = "PRINTFLOW_WEBHOOK"
+
+
+class Aviso:
+    """
+    Una notificación pendiente de entregar. `repeticiones` cuenta cuántos
+    avisos del mismo tipo se han agrupado en este y `entradas` guarda el
+    título y el mensaje de cada uno (hasta `MENSAJES_POR_AVISO` distintos).
+    """
+    def __init__(self, tipo, titulo, mensaje):
+        self.tipo = tipo
+        self.titulo = titulo
+        self.entradas = [(titulo, mensaje)]
+        self.creado_en = time.monotonic()
+        self.repeticiones = 1
+
+    def agrupar(self, otro):
+        """
+        Absorbe un aviso posterior del mismo tipo: el título pasa a ser el más
+        reciente y sus mensajes se añaden a los de este.
+        """
+        self.titulo = otro.titulo
+        for entrada in otro.entradas:
+            if entrada not in self.entradas and len(self.entradas) < MENSAJES_POR_AVISO:
+                self.entradas.append(entrada)
+        self.repeticiones += otro.repeticiones
+
+    @property
+    def mensaje(self):
+        """
+        :return: Los mensajes agrupados, uno por línea. Si tienen títulos
+                 distintos (ej. fallos en varias impresoras), cada línea
+                 lleva el suyo.
+        :rtype: str
+        """
+        if len({titulo for titulo, _ in self.entradas}) == 1:
+            return "\n".join(mensaje for _, mensaje in self.entradas)
+        return "\n".join(f"{titulo}: {mensaje}" for titulo, mensaje in self.entradas)
+
+    @property
+    def texto(self):
+        omitidos = self.repeticiones - len(self.entradas)
+        if omitidos == 0:
+            return self.mensaje
+        return f"{self.mensaje}\n(y {omitidos} aviso(s) más del mismo tipo)"
+
+
+class CanalAviso:
+    """Destino de los avisos. `entregar` puede tardar o fallar: se llama desde el hilo de avisos."""
+    nombre = "base"
+
+    def entregar(self, aviso):
+        raise NotImplementedError
+
+
+class CanalEscritorio(CanalAviso):
+    """
+    Notificación de escritorio con `plyer`. Si `plyer` no está instalado,
+    el canal lo avisa una vez y a partir de ahí no hace nada.
+    """
+    nombre = "escritorio"
+
+    def __init__(self, tiempo_visible=20):
+        self.tiempo_visible = tiempo_visible
+        self._notificacion = None
+        self._disponible = None
+
+    def entregar(self, aviso):
+        if self._disponible is None:
+            try:
+                from plyer import notification
+                self._notificacion, self._disponible = notification, True
+            except ImportError:
+                self._disponible = False
+                print("Advertencia: plyer no está instalado; no habrá notificaciones de escritorio.")
+        if not self._disponible:
+            return
+        self._notificacion.notify(
+            title=aviso.titulo,
+            message=aviso.texto,
+            app_name='PrintAutomation',
+            timeout=self.tiempo_visible
+        )
+
+
+class CanalConsola(CanalAviso):
+    """Escribe el aviso en la consola."""
+    nombre = "consola"
+
+    def __init__(self, salida=None):
+        self.salida = salida or sys.stdout
+
+    def entregar(self, aviso):
+        print(f"\n🚨 {aviso.titulo}: {aviso.texto}", file=self.salida)
+
+
+class CanalSonido(CanalAviso):
+    """Pitido del sistema (`winsound` en Windows, la campana de la terminal en otros)."""
+    nombre = "sonido"
+
+    def entregar(self, aviso):
+        try:
+            import winsound
+        except ImportError:
+            sys.stdout.write("\a")
+            sys.stdout.flush()
+            return
+        winsound.MessageBeep(winsound.MB_ICONEXCLAMATION)
+
+
+class CanalWebhook(CanalAviso):
+    """
+    Envía el aviso como JSON por HTTP POST, por ejemplo a un servicio local
+    que lo reenvía a un chat o a un panel del taller.
+    """
+    nombre = "webhook"
+
+    def __init__(self, url, tiempo_maximo=3.0):
+        self.url = url
+        self.tiempo_maximo = tiempo_maximo
+
+    def entregar(self, aviso):
+        import urllib.request
+
+        cuerpo = json.dumps({
+            'tipo': aviso.tipo,
+            'titulo': aviso.titulo,
+            'mensaje': aviso.mensaje,
+            'repeticiones': aviso.repeticiones,
+        }, ensure_ascii=False).encode('utf-8')
+        peticion = urllib.request.Request(self.url, data=cuerpo, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(peticion, timeout=self.tiempo_maximo):
+            pass
+
+
+class DespachadorAvisos:
+    """
+    Reparte avisos a varios canales desde un hilo propio.
+
+    `emitir` nunca bloquea: deja el aviso pendiente y vuelve, así que un canal
+    lento o caído no frena la impresión. Los avisos se agrupan por tipo ya al
+    emitirse, de modo que una ráfaga (por ejemplo, varias impresoras que
+    terminan a la vez) ocupa una sola entrada y llega como un único aviso con
+    sus mensajes juntos; lo pendiente queda acotado por el número de tipos y
+    `MENSAJES_POR_AVISO`.
+    El hilo espera una ventana corta para reunir la ráfaga, respeta un
+    intervalo mínimo entre entregas y mide cuánto tarda cada canal en entregar.
+    """
+    def __init__(self, canales=None, ventana_agrupacion=VENTANA_AGRUPACION, intervalo_minimo=INTERVALO_MINIMO):
+        """
+        :param canales: Lista de `CanalAviso` (por defecto, los de `canales_por_defecto`).
+        :param ventana_agrupacion: Segundos que se esperan para agrupar una ráfaga.
+        :param intervalo_minimo: Segundos mínimos entre dos entregas.
+        """
+        self.canales = list(canales) if canales is not None else canales_por_defecto()
+        self.ventana_agrupacion = ventana_agrupacion
+        self.intervalo_minimo = intervalo_minimo
+        self._pendientes = collections.OrderedDict()   # tipo -> Aviso
+        self._condicion = threading.Condition()
+        self._detener = False
+        self._hilo = None
+        self._ultima_entrega = None
+
+        self.emitidos = 0
+        self.agrupados = 0
+        self.entregados = 0
+        # Por canal: errores y latencia (desde que se emitió el aviso hasta que el canal lo entregó).
+        self.errores = collections.Counter()
+        self.latencias = {canal.nombre: EstadisticaEtapa() for canal in self.canales}
+
+    def iniciar(self):
+        """Arranca el hilo de avisos si no está ya en marcha."""
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener = False
+            self._hilo = threading.Thread(target=self._bucle, name="avisos", daemon=True)
+            self._hilo.start()
+
+    def emitir(self, tipo, titulo, mensaje):
+        """
+        Deja un aviso para entregar sin esperar a que se entregue.
+        """
+        self.iniciar()
+        aviso = Aviso(tipo, titulo, mensaje)
+        with self._condicion:
+            self.emitidos += 1
+            if tipo in self._pendientes:
+                self._pendientes[tipo].agrupar(aviso)
+                self.agrupados += 1
+            else:
+                self._pendientes[tipo] = aviso
+            self._condicion.notify()
+
+    def detener(self, esperar=True):
+        """Entrega lo que quede pendiente y termina el hilo."""
+        if self._hilo is None:
+            return
+        with self._condicion:
+            self._detener = True
+            self._condicion.notify()
+        if esperar:
+            self._hilo.join()
+
+    def _bucle(self):
+        while True:
+            with self._condicion:
+                self._condicion.wait_for(lambda: self._pendientes or self._detener)
+                if not self._pendientes:
+                    return
+
+                # Se reúne la ráfaga durante la ventana (o hasta que se cumpla
+                # el intervalo mínimo desde la entrega anterior).
+                limite = time.monotonic() + self.ventana_agrupacion
+                if self._ultima_entrega is not None:
+                    limite = max(limite, self._ultima_entrega + self.intervalo_minimo)
+                self._condicion.wait_for(lambda: self._detener, timeout=max(0.0, limite - time.monotonic()))
+                rafaga, self._pendientes = self._pendientes, collections.OrderedDict()
+
+            for aviso in rafaga.values():
+                self._entregar(aviso)
+            self._ultima_entrega = time.monotonic()
+
+    def _entregar(self, aviso):
+        for canal in self.canales:
+            try:
+                canal.entregar(aviso)
+            except Exception as e:
+                self.errores[canal.nombre] += 1
+                print(f"Advertencia: el canal de avisos '{canal.nombre}' falló: {e}")
+                continue
+            self.latencias[canal.nombre].agregar(time.monotonic() - aviso.creado_en)
+        self.entregados += 1
+
+    def resumen(self):
+        """
+        :return: Contadores del despachador y, por canal, la latencia p50/p95
+                 de entrega en segundos y los errores.
+        :rtype: dict
+        """
+        canales = {}
+        for nombre, estadistica in self.latencias.items():
+            p50, p95 = estadistica.percentiles(0.5, 0.95)
+            canales[nombre] = {
+                "entregas": estadistica.cuenta,
+                "p50": round(p50, 3),
+                "p95": round(p95, 3),
+                "errores": self.errores[nombre],
+            }
+        return {
+            "emitidos": self.emitidos,
+            "entregados": self.entregados,
+            "agrupados": self.agrupados,
+            "canales": canales,
+        }
+
+
+def canales_por_defecto():
+    """
+    :return: Escritorio, consola y sonido, más un webhook si la variable de
+             entorno `PRINTFLOW_WEBHOOK` tiene una URL.
+    :rtype: list[CanalAviso]
+    """
+    canales = [CanalEscritorio(), CanalConsola(), CanalSonido()]
+    if os.environ.get(VARIABLE_WEBHOOK):
+        canales.append(CanalWebhook(os.environ[VARIABLE_WEBHOOK]))
+    return canales
+
+
+_despachador = None
+
+
+def obtener_despachador():
+    """
+    :return: El `DespachadorAvisos` compartido de la aplicación (se crea al primer uso).
+    :rtype: DespachadorAvisos
+    """
+    global _despachador
+    if _despachador is None:
+        _despachador = DespachadorAvisos()
+    return _despachador
+
 
 def emitir_alerta(libro_actual, total, nombre_libro):
     """
-    Emite una notificación de escritorio (desktop notification) usando la librería 'plyer'.
+    Avisa al operador de que una copia ha terminado y se requiere intervención
+    manual (notificación de escritorio y mensaje en la consola).
 
-    El propósito es alertar al operador de forma visual y audible cuando una copia 
-    del trabajo de impresión ha terminado, indicando que se requiere intervención manual.
-    
-    Esta función requiere que la librería 'plyer' esté instalada (`pip install plyer`).
-    En caso de que falle la emisión de la notificación (por ejemplo, si 'plyer' no puede
-    interactuar con el sistema de notificaciones del OS), se imprime un mensaje 
-    de advertencia en la consola como mecanismo de respaldo.
+    Ya no espera a `plyer`: el aviso se encola en el despachador compartido y
+    se entrega desde su propio hilo. Si `plyer` no está instalado o falla, el
+    aviso sigue apareciendo en la consola.
 
     :param libro_actual: Número de la copia actual que acaba de finalizar (int).
     :param total: Número total de copias a imprimir para el trabajo (int).
     :param nombre_libro: El nombre del perfil del libro o trabajo que se está imprimiendo (str).
     :return: None
     """
-    try:
-        notification.notify(
-            title=f'🚨 LIBRO COMPLETADO ({nombre_libro}) 🚨',
-            message=f'La copia {libro_actual} de {total} ha finalizado. ¡Presione ENTER en la terminal para continuar!',
-            app_name='PrintAutomation',
-            timeout=20  # La notificación permanecerá visible por 20 segundos
-        )
-    except Exception as e:
-        # Mecanismo de fallback: si la notificación de escritorio falla, se imprime un aviso en la consola
-        print(f"\n🚨 ALERTA (Fallo de Notificación): Presione ENTER en la consola. {e}")
+    obtener_despachador().emitir(
+        AVISO_CONFIRMACION,
+        f'🚨 LIBRO COMPLETADO ({nombre_libro}) 🚨',
+        f'La copia {libro_actual} de {total} ha finalizado. ¡Confirme para continuar!',
+    )
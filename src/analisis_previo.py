@@ -0,0 +1,631 @@
+import collections
+import json
+import math
+import mmap
+import os
+import re
+import threading
+import time
+import zipfile
+import zlib
+
+from spool_raw import hash_archivo
+
+# Cambia cuando cambia lo que se extrae de los archivos; invalida la caché guardada.
+VERSION_ANALISIS = 1
+# Análisis que se guardan como máximo; al superarlo se olvidan los menos usados.
+MAXIMO_ENTRADAS_CACHE = 2000
+RUTA_CACHE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".analisis_cache.json")
+
+# Tamaño de cada bloque que se lee (o se descomprime) de una vez.
+TAMANO_BLOQUE = 1024 * 1024
+# Bytes tras "N 0 obj" en los que se busca el final del diccionario del objeto.
+VENTANA_OBJETO = 64 * 1024
+# Tamaño máximo descomprimido de un flujo de objetos (/ObjStm) de un PDF.
+MAXIMO_FLUJO_OBJETOS = 64 * 1024 * 1024
+# Bytes que se conservan entre dos bloques para no partir una coincidencia.
+SOLAPE = 256
+
+# Tamaños de página conocidos (ancho, alto) en puntos, con el nombre que usan los perfiles.
+TAMANOS_PAGINA = {
+    'Carta': (612, 792),
+    'Oficio': (612, 1008),
+    'Tabloide': (792, 1224),
+    'A3': (842, 1191),
+    'A4': (595, 842),
+    'A5': (420, 595),
+}
+SINONIMOS_TAMANO = {'letter': 'Carta', 'legal': 'Oficio', 'tabloid': 'Tabloide'}
+# Diferencia máxima, en puntos, para considerar que una página tiene un tamaño conocido.
+TOLERANCIA_PUNTOS = 3
+
+# Errores al leer un DOCX dañado (CRC incorrecto, datos cortados, compresión o
+# cifrado no admitidos, medidas absurdas); se informan como ValueError.
+_ERRORES_DOCX = (zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError, RuntimeError, OverflowError)
+
+_RE_OBJETO = re.compile(rb'(\d+)\s+\d+\s+obj\b')
+_RE_INICIO_FLUJO = re.compile(rb'(?<!end)stream(?:\r\n|\n|\r)')
+_RE_TIPO_PAGINAS = re.compile(rb'/Type\s*/Pages(?![A-Za-z])')
+_RE_TIPO_PAGINA = re.compile(rb'/Type\s*/Page(?![A-Za-z])')
+_RE_PADRE = re.compile(rb'/Parent\s+(\d+)\s+\d+\s+R')
+_RE_CUENTA = re.compile(rb'/Count\s+(\d+)')
+_RE_MEDIABOX = re.compile(rb'/MediaBox\s*\[\s*([-\d.]+)\s+([-\d.]+)\s+([-\d.]+)\s+([-\d.]+)\s*\]')
+_RE_LONGITUD = re.compile(rb'/Length\s+(\d+)(?!\s+\d+\s+R)')
+_RE_FILTRO = re.compile(rb'/Filter\s*(\[[^\]]*\]|/\w+)')
+_RE_PRIMERO = re.compile(rb'/First\s+(\d+)')
+_RE_IMAGEN = re.compile(rb'/Subtype\s*/Image(?![A-Za-z])')
+_RE_ESPACIO_COLOR = re.compile(rb'/(?:DeviceRGB|DeviceCMYK|CalRGB|Lab|Separation|DeviceN)(?![A-Za-z])')
+# Operadores de color de un flujo de contenido. Se buscan solo los operadores
+# (es mucho más rápido que buscarlos con sus operandos) y los operandos se
+# leen después de los bytes previos.
+_RE_OPERADOR_COLOR = re.compile(rb'(?:rg|RG|k|K|scn|SCN|sc|SC)(?!\w)')
+_OPERADORES_COLOR = (b'rg', b'RG', b' k', b' K', b'sc', b'SC')
+# Negro y blanco escritos como color, que son la inmensa mayoría de los operadores.
+_GRISES = (b' 0 0 0 rg', b' 0 0 0 RG', b' 1 1 1 rg', b' 1 1 1 RG',
+           b' 0 0 0 1 k', b' 0 0 0 1 K', b' 0 0 0 0 k', b' 0 0 0 0 K')
+
+_RE_PAGINAS_DOCX = re.compile(rb'<Pages>(\d+)</Pages>')
+# En `word/document.xml`: tamaño de sección, color de texto o sombreado, y resaltado.
+_RE_DOCUMENTO_DOCX = re.compile(
+    rb'<w:pgSz\b[^>]*?w:w="(?P<ancho>\d+)"[^>]*?w:h="(?P<alto>\d+)"'
+    rb'|<w:(?:color|shd)\b[^>]*?w:(?:val|fill)="(?P<color>[0-9A-Fa-f]{6})"'
+    rb'|<w:highlight\b[^>]*?w:val="(?!none")')
+
+
+class AnalisisArchivo:
+    """
+    Lo que el análisis previo sabe de un documento: páginas reales, tamaños de
+    página y si usa color. Cada dato es None si no se pudo determinar.
+    """
+    def __init__(self, formato=None, paginas=None, tamanos=None, color=None, detalle=""):
+        self.formato = formato          # 'pdf', 'docx' o None si el formato no se analiza.
+        self.paginas = paginas
+        # Nombre del tamaño -> páginas (PDF) o secciones (DOCX) con ese tamaño.
+        self.tamanos = tamanos or {}
+        self.color = color              # True, False o None (no se sabe).
+        self.detalle = detalle          # Observaciones para el operador.
+        self.segundos = 0.0             # Lo que tardó el análisis (0 si salió de la caché).
+        self.desde_cache = False
+
+    @property
+    def tamano(self):
+        """El tamaño de página más frecuente, o None."""
+        if not self.tamanos:
+            return None
+        return max(self.tamanos.items(), key=lambda par: par[1])[0]
+
+    def resumen(self):
+        """
+        :return: Texto corto para la interfaz, p. ej. "452 págs., Carta, B/N".
+        :rtype: str
+        """
+        partes = [f"{self.paginas} págs." if self.paginas else "págs. desconocidas"]
+        if self.tamanos:
+            partes.append(" + ".join(sorted(self.tamanos, key=self.tamanos.get, reverse=True)))
+        if self.color is not None:
+            partes.append("color" if self.color else "B/N")
+        return ", ".join(partes)
+
+    def discrepancias(self, perfil):
+        """
+        Compara el documento con lo que dice el perfil.
+
+        :return: Lista de discrepancias para el operador (vacía si todo coincide
+                 o si el análisis no pudo determinar nada).
+        :rtype: list[str]
+        """
+        avisos = []
+        if self.paginas and perfil.get('paginas') and self.paginas != perfil['paginas']:
+            avisos.append(f"El archivo tiene {self.paginas} páginas y el perfil indica {perfil['paginas']}.")
+
+        tamano = normalizar_tamano(perfil.get('tamano'))
+        if tamano is not None:
+            distintos = {nombre: n for nombre, n in self.tamanos.items() if nombre != tamano}
+            if distintos:
+                unidad = "página(s)" if self.formato == 'pdf' else "sección(es)"
+                detalle = ", ".join(f"{n} {unidad} en {nombre}" for nombre, n in distintos.items())
+                avisos.append(f"El perfil es tamaño {perfil['tamano']}, pero el archivo tiene {detalle}.")
+
+        if isinstance(perfil.get('color'), bool) and self.color is not None and self.color != perfil['color']:
+            if self.color:
+                avisos.append("El archivo tiene color y el perfil es en blanco y negro.")
+            else:
+                avisos.append("El perfil es a color, pero el archivo está en blanco y negro.")
+        return avisos
+
+    def aplicar(self, config):
+        """
+        :return: Una copia del perfil con las páginas reales del documento, para
+                 que las estimaciones de tiempo y de hojas usen el archivo elegido
+                 y no el valor escrito a mano. Si no se conocen, el mismo perfil.
+        :rtype: dict
+        """
+        if not self.paginas:
+            return config
+        return dict(config, paginas=self.paginas)
+
+    def datos(self):
+        return {
+            'formato': self.formato,
+            'paginas': self.paginas,
+            'tamanos': self.tamanos,
+            'color': self.color,
+            'detalle': self.detalle,
+        }
+
+    @classmethod
+    def desde_datos(cls, datos):
+        return cls(datos.get('formato'), datos.get('paginas'), datos.get('tamanos'), datos.get('color'),
+                   datos.get('detalle', ""))
+
+
+def nombre_tamano(ancho, alto):
+    """
+    :param ancho: Ancho de la página en puntos.
+    :param alto: Alto de la página en puntos.
+    :return: El nombre del tamaño conocido (sin importar la orientación) o sus
+             medidas en milímetros, p. ej. "200x250 mm".
+    :rtype: str
+    """
+    corto, largo = sorted((abs(ancho), abs(alto)))
+    for nombre, (a, b) in TAMANOS_PAGINA.items():
+        if abs(corto - a) <= TOLERANCIA_PUNTOS and abs(largo - b) <= TOLERANCIA_PUNTOS:
+            return nombre
+    return f"{round(corto / 72 * 25.4)}x{round(largo / 72 * 25.4)} mm"
+
+
+def normalizar_tamano(tamano):
+    """
+    :return: El nombre canónico de un tamaño escrito en un perfil ("letter" -> "Carta"),
+             o None si no es un tamaño conocido.
+    :rtype: str
+    """
+    texto = (tamano or "").strip().lower()
+    for nombre in TAMANOS_PAGINA:
+        if nombre.lower() == texto:
+            return nombre
+    return SINONIMOS_TAMANO.get(texto)
+
+
+def _coincidencias(trozos, patron):
+    """
+    Busca `patron` en una secuencia de bloques de bytes sin juntarlos todos:
+    entre dos bloques se conservan `SOLAPE` bytes para no partir una
+    coincidencia, y cada coincidencia se devuelve una sola vez.
+    """
+    resto = b''
+    for trozo in trozos:
+        bloque = resto + trozo
+        limite = len(bloque) - SOLAPE
+        for m in patron.finditer(bloque):
+            if m.start() < limite:
+                yield m
+        resto = bloque[max(0, limite):]
+    for m in patron.finditer(resto):
+        yield m
+
+
+def _operandos(previo):
+    """
+    :return: Los números (hasta cuatro) que preceden a un operador, en orden.
+    :rtype: list[float]
+    """
+    if not previo[-1:].isspace():
+        return []
+    valores = []
+    for token in reversed(previo.split()[-4:]):
+        try:
+            valores.append(float(token))
+        except ValueError:
+            break
+    return valores[::-1]
+
+
+def _solo_grises(bloque):
+    """
+    :return: True si todos los operadores de color del bloque son negro o
+             blanco. Contar subcadenas es mucho más rápido que la expresión
+             regular, así que los bloques sin color se descartan sin buscarla.
+    :rtype: bool
+    """
+    return sum(map(bloque.count, _OPERADORES_COLOR)) == sum(map(bloque.count, _GRISES))
+
+
+def _es_color(valores, operador):
+    if len(valores) < 3:
+        # Gris (un componente) o un color con nombre: no se puede saber aquí.
+        return False
+    if operador in (b'k', b'K') or len(valores) == 4:
+        # CMYK: hay color si alguna tinta que no es el negro se usa.
+        return max(valores[:3]) > 0.01
+    return max(valores) - min(valores) > 0.01
+
+
+class _EscanerPdf:
+    """
+    Recorre un PDF objeto a objeto sobre un `mmap`, sin cargarlo entero: lee el
+    diccionario de cada objeto y salta por encima de los flujos que no
+    interesan (imágenes, fuentes). Los flujos de objetos (/ObjStm) se
+    descomprimen para ver las páginas que guardan y los flujos de contenido se
+    descomprimen por bloques buscando operadores de color, hasta encontrar el
+    primero.
+    """
+    def __init__(self, mapa):
+        self.mapa = mapa
+        self.paginas = {}       # número de objeto -> (padre, mediabox)
+        self.nodos = {}         # número de objeto -> (padre, mediabox, /Count) de los /Pages
+        self.color = False
+        self.indeterminado = False
+        # En un PDF cifrado los flujos no se pueden descomprimir sin la clave.
+        self.cifrado = mapa.rfind(b'/Encrypt', max(0, len(mapa) - TAMANO_BLOQUE)) >= 0
+
+    def recorrer(self):
+        pos = 0
+        while True:
+            m = _RE_OBJETO.search(self.mapa, pos)
+            if m is None:
+                break
+            numero, inicio = int(m.group(1)), m.end()
+            limite = self.mapa.find(b'endobj', inicio, inicio + VENTANA_OBJETO)
+            if limite < 0:
+                limite = min(len(self.mapa), inicio + VENTANA_OBJETO)
+            flujo = _RE_INICIO_FLUJO.search(self.mapa, inicio, limite)
+            if flujo is None:
+                self._analizar_objeto(numero, self.mapa[inicio:limite])
+                pos = limite
+                continue
+            diccionario = self.mapa[inicio:flujo.start()]
+            datos = flujo.end()
+            fin = self._fin_flujo(diccionario, datos)
+            self._analizar_objeto(numero, diccionario)
+            self._analizar_flujo(diccionario, datos, fin)
+            pos = fin
+
+    def _fin_flujo(self, diccionario, datos):
+        longitud = _RE_LONGITUD.search(diccionario)
+        if longitud is not None:
+            fin = datos + int(longitud.group(1))
+            if self.mapa.find(b'endstream', fin, fin + 32) >= 0:
+                return fin
+        # /Length indirecta o incorrecta: se busca el final del flujo.
+        fin = self.mapa.find(b'endstream', datos)
+        return fin if fin >= 0 else len(self.mapa)
+
+    def _analizar_objeto(self, numero, texto):
+        padre = _RE_PADRE.search(texto)
+        padre = int(padre.group(1)) if padre else None
+        caja = _RE_MEDIABOX.search(texto)
+        if caja is not None:
+            try:
+                x0, y0, x1, y1 = (float(v) for v in caja.groups())
+                caja = (x1 - x0, y1 - y0)
+            except ValueError:
+                caja = None
+            if caja is not None and not all(map(math.isfinite, caja)):
+                # Números con cientos de cifras: una caja así no es un tamaño de página.
+                caja = None
+        if _RE_TIPO_PAGINAS.search(texto):
+            cuenta = _RE_CUENTA.search(texto)
+            self.nodos[numero] = (padre, caja, int(cuenta.group(1)) if cuenta else None)
+        elif _RE_TIPO_PAGINA.search(texto):
+            self.paginas[numero] = (padre, caja)
+
+    def _analizar_flujo(self, diccionario, inicio, fin):
+        if b'/ObjStm' in diccionario:
+            self._analizar_flujo_objetos(diccionario, inicio, fin)
+        elif _RE_IMAGEN.search(diccionario):
+            # Las imágenes no se descomprimen: basta con su espacio de color.
+            if _RE_ESPACIO_COLOR.search(diccionario):
+                self.color = True
+        elif b'/Form' in diccionario or not (b'/Type' in diccionario or b'/Subtype' in diccionario
+                                             or b'/Length1' in diccionario):
+            # Contenido de una página o de un formulario. El resto (fuentes,
+            # metadatos, tablas xref...) no dice nada del color de las páginas.
+            if not self.color:
+                self._buscar_color(diccionario, inicio, fin)
+
+    def _trozos(self, diccionario, inicio, fin, maximo=None):
+        """Bloques (descomprimidos si hace falta) del flujo entre `inicio` y `fin`."""
+        filtro = _RE_FILTRO.search(diccionario)
+        filtro = filtro.group(1).strip(b'[] \r\n') if filtro else None
+        if filtro not in (None, b'/FlateDecode') or (filtro and self.cifrado):
+            raise ValueError("filtro no admitido")
+        inflador = zlib.decompressobj() if filtro else None
+        total = 0
+        for desde in range(inicio, fin, TAMANO_BLOQUE):
+            datos = self.mapa[desde:min(fin, desde + TAMANO_BLOQUE)]
+            if inflador is None:
+                yield datos
+                continue
+            while datos:
+                salida = inflador.decompress(datos, TAMANO_BLOQUE)
+                datos = inflador.unconsumed_tail
+                total += len(salida)
+                if maximo is not None and total > maximo:
+                    raise ValueError("flujo demasiado grande")
+                yield salida
+            if inflador.eof:
+                return
+
+    def _buscar_color(self, diccionario, inicio, fin):
+        resto = b''
+        try:
+            for trozo in self._trozos(diccionario, inicio, fin):
+                bloque = resto + trozo
+                if not _solo_grises(bloque):
+                    for m in _RE_OPERADOR_COLOR.finditer(bloque):
+                        if _es_color(_operandos(bloque[max(0, m.start() - 48):m.start()]), m.group(0)):
+                            self.color = True
+                            return
+                resto = bloque[-SOLAPE:]
+        except (ValueError, zlib.error):
+            self.indeterminado = True
+
+    def _analizar_flujo_objetos(self, diccionario, inicio, fin):
+        try:
+            contenido = b''.join(self._trozos(diccionario, inicio, fin, MAXIMO_FLUJO_OBJETOS))
+        except (ValueError, zlib.error):
+            self.indeterminado = True
+            return
+        primero = _RE_PRIMERO.search(diccionario)
+        if primero is None:
+            return
+        primero = int(primero.group(1))
+        cabecera = contenido[:primero].split()
+        posiciones = []
+        for i in range(0, len(cabecera) - 1, 2):
+            try:
+                posiciones.append((int(cabecera[i]), primero + int(cabecera[i + 1])))
+            except ValueError:
+                return
+        for i, (numero, desde) in enumerate(posiciones):
+            hasta = posiciones[i + 1][1] if i + 1 < len(posiciones) else len(contenido)
+            self._analizar_objeto(numero, contenido[desde:hasta])
+
+    def _caja_heredada(self, padre, caja):
+        # La /MediaBox se hereda de los nodos /Pages si la página no la define.
+        vistos = set()
+        while caja is None and padre in self.nodos and padre not in vistos:
+            vistos.add(padre)
+            padre, caja, _ = self.nodos[padre]
+        return caja
+
+    def resultado(self):
+        raices = [cuenta for padre, _, cuenta in self.nodos.values() if padre not in self.nodos and cuenta]
+        paginas = max(raices) if raices else len(self.paginas)
+        tamanos = collections.Counter()
+        for padre, caja in self.paginas.values():
+            caja = self._caja_heredada(padre, caja)
+            if caja is not None:
+                tamanos[nombre_tamano(*caja)] += 1
+        color = self.color or (None if self.indeterminado or self.cifrado else False)
+        detalle = "PDF cifrado: no se pudo comprobar el color." if self.cifrado and not self.color else ""
+        return AnalisisArchivo('pdf', paginas or None, dict(tamanos), color, detalle)
+
+
+def analizar_pdf(ruta):
+    """
+    Analiza un PDF recorriéndolo por bloques sobre un `mmap`, sin cargarlo en memoria.
+
+    :raises ValueError: Si el archivo no es un PDF.
+    :rtype: AnalisisArchivo
+    """
+    with open(ruta, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError("el archivo está vacío")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            if mapa.find(b'%PDF-', 0, 1024) < 0:
+                raise ValueError("no es un PDF")
+            escaner = _EscanerPdf(mapa)
+            escaner.recorrer()
+            return escaner.resultado()
+
+
+def _imagen_en_color(cabecera):
+    """
+    :return: True/False según la cabecera de una imagen PNG o JPEG, o None si
+             el formato no se reconoce.
+    """
+    if cabecera.startswith(b'\x89PNG') and len(cabecera) > 25:
+        # Tipo de color del IHDR: 0 y 4 son escala de grises.
+        return cabecera[25] not in (0, 4)
+    if cabecera.startswith(b'\xff\xd8'):
+        # Número de componentes del primer marcador SOF: 1 es escala de grises.
+        i = 2
+        while i + 9 < len(cabecera):
+            if cabecera[i] != 0xFF:
+                return None
+            marcador = cabecera[i + 1]
+            if 0xC0 <= marcador <= 0xCF and marcador not in (0xC4, 0xC8, 0xCC):
+                return cabecera[i + 9] != 1
+            i += 2 + int.from_bytes(cabecera[i + 2:i + 4], 'big')
+    return None
+
+
+def analizar_docx(ruta):
+    """
+    Analiza un DOCX sin abrir Word: el número de páginas que Word guardó en
+    `docProps/app.xml`, el tamaño de cada sección y el color del texto, los
+    sombreados y las imágenes. `word/document.xml` se lee descomprimiéndolo
+    por bloques.
+
+    :raises ValueError: Si el archivo no es un DOCX o está dañado.
+    :rtype: AnalisisArchivo
+    """
+    try:
+        paquete = zipfile.ZipFile(ruta)
+    except zipfile.BadZipFile:
+        raise ValueError("no es un DOCX")
+    try:
+        with paquete:
+            paginas, tamanos, color = _leer_docx(paquete)
+    except _ERRORES_DOCX as e:
+        raise ValueError(f"el DOCX está dañado ({e})")
+
+    detalle = "Páginas según el último guardado en Word (puede no estar al día)." if paginas else \
+        "El DOCX no guarda el número de páginas."
+    return AnalisisArchivo('docx', paginas, dict(tamanos), color, detalle)
+
+
+def _leer_docx(paquete):
+    """
+    :return: Una tupla (páginas, tamaños, color) del DOCX abierto en `paquete`.
+    :raises ValueError: Si el paquete no es un DOCX.
+    """
+    nombres = set(paquete.namelist())
+    if 'word/document.xml' not in nombres:
+        raise ValueError("no es un DOCX")
+
+    paginas = None
+    if 'docProps/app.xml' in nombres:
+        m = _RE_PAGINAS_DOCX.search(paquete.read('docProps/app.xml'))
+        paginas = int(m.group(1)) if m and int(m.group(1)) > 0 else None
+
+    tamanos = collections.Counter()
+    color = False
+    with paquete.open('word/document.xml') as documento:
+        for m in _coincidencias(iter(lambda: documento.read(TAMANO_BLOQUE), b''), _RE_DOCUMENTO_DOCX):
+            if m.group('ancho'):
+                # Las medidas están en veinteavos de punto.
+                tamanos[nombre_tamano(int(m.group('ancho')) / 20, int(m.group('alto')) / 20)] += 1
+            elif m.group('color'):
+                r, g, b = (int(m.group('color')[i:i + 2], 16) for i in (0, 2, 4))
+                color = color or max(r, g, b) - min(r, g, b) > 8
+            else:
+                color = True
+
+    if not color:
+        for nombre in nombres:
+            if nombre.startswith('word/media/'):
+                with paquete.open(nombre) as imagen:
+                    en_color = _imagen_en_color(imagen.read(64 * 1024))
+                if en_color or en_color is None:
+                    color = en_color
+                    if en_color:
+                        break
+    return paginas, tamanos, color
+
+
+def analizar_archivo(ruta):
+    """
+    Analiza un documento según su extensión (PDF o DOCX). Los demás formatos
+    devuelven un análisis vacío.
+
+    :raises OSError: Si el archivo no se puede leer.
+    :raises ValueError: Si el contenido no corresponde a la extensión.
+    :rtype: AnalisisArchivo
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    inicio = time.perf_counter()
+    if extension == '.pdf':
+        analisis = analizar_pdf(ruta)
+    elif extension == '.docx':
+        analisis = analizar_docx(ruta)
+    else:
+        analisis = AnalisisArchivo(detalle=f"Los archivos {extension or 'sin extensión'} no se analizan.")
+    analisis.segundos = time.perf_counter() - inicio
+    return analisis
+
+
+class CacheAnalisis:
+    """
+    Caché de análisis por hash del contenido: volver a elegir el mismo
+    documento (aunque esté copiado en otra carpeta o con otro nombre) no lo
+    vuelve a leer. El hash se recuerda mientras el archivo no cambie
+    (ruta, mtime y tamaño), igual que en `spool_raw.CacheSpool`, y la caché
+    se guarda en disco para los próximos arranques.
+    """
+    def __init__(self, ruta=RUTA_CACHE, maximo=MAXIMO_ENTRADAS_CACHE):
+        """
+        :param ruta: Archivo donde se guarda la caché (None para tenerla solo en memoria).
+        :param maximo: Análisis que se guardan como máximo.
+        """
+        self.ruta = ruta
+        self.maximo = maximo
+        self._entradas = None     # hash -> datos del análisis + 'usado_en'; se carga al primer uso.
+        self._hashes = {}         # (ruta, mtime_ns, tamaño) -> hash del contenido
+        self._lock = threading.Lock()
+
+    def _cargar(self):
+        self._entradas = {}
+        if not self.ruta or not os.path.exists(self.ruta):
+            return
+        try:
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+            if datos.get('version') == VERSION_ANALISIS:
+                self._entradas = dict(datos['entradas'])
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"Advertencia: se ignora la caché de análisis ({e}).")
+
+    def _guardar(self):
+        if not self.ruta:
+            return
+        temporal = self.ruta + ".tmp"
+        try:
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump({'version': VERSION_ANALISIS, 'entradas': self._entradas}, f, ensure_ascii=False)
+            os.replace(temporal, self.ruta)
+        except OSError as e:
+            print(f"Advertencia: no se pudo guardar la caché de análisis: {e}")
+
+    def _hash(self, ruta):
+        info = os.stat(ruta)
+        firma = (os.path.abspath(ruta), info.st_mtime_ns, info.st_size)
+        with self._lock:
+            clave = self._hashes.get(firma)
+        if clave is None:
+            # Leer un documento grande lleva su tiempo: no se bloquea a los demás hilos.
+            clave = hash_archivo(ruta)
+            with self._lock:
+                self._hashes[firma] = clave
+        return clave
+
+    def analizar(self, ruta):
+        """
+        Devuelve el análisis del documento, de la caché si ya se analizó.
+
+        :raises OSError: Si el archivo no se puede leer.
+        :raises ValueError: Si el contenido no corresponde a la extensión.
+        :rtype: AnalisisArchivo
+        """
+        inicio = time.perf_counter()
+        clave = self._hash(ruta)
+        with self._lock:
+            if self._entradas is None:
+                self._cargar()
+            guardado = self._entradas.get(clave)
+            if guardado is not None:
+                # Se guarda también el uso: al podar se descartan los menos usados últimamente.
+                guardado['usado_en'] = time.time()
+                self._guardar()
+                analisis = AnalisisArchivo.desde_datos(guardado)
+                analisis.desde_cache = True
+                analisis.segundos = time.perf_counter() - inicio
+                return analisis
+
+        # El análisis puede tardar en documentos grandes: se hace fuera del lock.
+        analisis = analizar_archivo(ruta)
+        with self._lock:
+            self._entradas[clave] = dict(analisis.datos(), usado_en=time.time())
+            if len(self._entradas) > self.maximo:
+                sobrantes = sorted(self._entradas, key=lambda h: self._entradas[h].get('usado_en', 0))
+                for viejo in sobrantes[:len(self._entradas) - self.maximo]:
+                    del self._entradas[viejo]
+            self._guardar()
+        analisis.segundos = time.perf_counter() - inicio
+        return analisis
+
+
+_cache = None
+
+
+def obtener_cache_analisis():
+    """
+    :return: La `CacheAnalisis` compartida, guardada en la raíz del proyecto.
+    :rtype: CacheAnalisis
+    """
+    global _cache
+    if _cache is None:
+        _cache = CacheAnalisis()
+    return _cache
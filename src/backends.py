@@ -0,0 +1,612 @@
+import collections
+import os
+import random
+import threading
+import time
+
+# La API de Windows solo existe en Windows. En otros sistemas el backend real
+# queda deshabilitado, pero el backend simulado sigue disponible. Los módulos
+# se importan la primera vez que se usan (ver `cargar_win32`), no al arrancar.
+win32print = None
+win32api = None
+win32event = None
+_win32_cargado = False
+
+
+def cargar_win32():
+    """
+    Importa pywin32 la primera vez que se necesita, para no pagar su coste
+    al arrancar la aplicación.
+
+    :return: El módulo `win32print`, o None si pywin32 no está disponible.
+    """
+    global win32print, win32api, win32event, _win32_cargado
+    if not _win32_cargado:
+        try:
+            import win32print as _win32print # type: ignore
+            import win32api as _win32api # type: ignore
+            import win32event as _win32event # type: ignore
+            win32print, win32api, win32event = _win32print, _win32api, _win32event
+        except ImportError:
+            pass
+        _win32_cargado = True
+    return win32print
+
+# Estados de un trabajo en el spooler, comunes a todos los backends.
+ESTADO_EN_COLA = "en_cola"
+ESTADO_IMPRIMIENDO = "imprimiendo"
+ESTADO_COMPLETADO = "completado"
+ESTADO_ERROR = "error"
+ESTADOS_FINALES = (ESTADO_COMPLETADO, ESTADO_ERROR)
+
+# Estados de una impresora (del dispositivo, no de un trabajo).
+DISPOSITIVO_LISTO = "lista"
+DISPOSITIVO_PAUSADO = "pausada"
+DISPOSITIVO_ERROR = "error"
+DISPOSITIVO_DESCONECTADO = "desconectada"
+
+# Bits de estado de JOB_INFO_1 y filtros de notificación (winspool.h).
+_JOB_STATUS_ERROR = 0x00000002
+_JOB_STATUS_DELETING = 0x00000004
+_JOB_STATUS_PRINTING = 0x00000010
+_JOB_STATUS_PRINTED = 0x00000080
+_JOB_STATUS_DELETED = 0x00000100
+_PRINTER_CHANGE_JOB = 0x0000FF00
+_JOB_CONTROL_PAUSE = 1
+_JOB_CONTROL_RESUME = 2
+_JOB_CONTROL_DELETE = 5
+
+# Enumeración de impresoras, bits de PRINTER_INFO_2 y consultas de DeviceCapabilities.
+_PRINTER_ENUM_LOCAL = 0x00000002
+_PRINTER_ENUM_CONNECTIONS = 0x00000004
+_PRINTER_STATUS_PAUSED = 0x00000001
+_PRINTER_STATUS_ERROR = 0x00000002
+_PRINTER_STATUS_OFFLINE = 0x00000080
+_PRINTER_ATTRIBUTE_WORK_OFFLINE = 0x00000400
+_DC_DUPLEX = 7
+_DC_BINNAMES = 12
+_DC_PAPERNAMES = 16
+
+# Trabajos terminados cuyo estado final recuerda `BackendSimulado` (los más
+# recientes); los anteriores se dan por completados, como hace el spooler real.
+TRABAJOS_ARCHIVADOS = 10000
+
+
+class BackendImpresion:
+    """
+    Interfaz común para todos los backends de impresión.
+
+    Un backend sabe listar las impresoras disponibles, entregar un archivo al
+    spooler de una de ellas y consultar el estado real de los trabajos
+    entregados. `printer_utils` delega en el backend activo, por lo que la
+    aplicación no necesita saber si imprime de verdad o en un simulador.
+    """
+    nombre = "base"
+
+    def listar_impresoras(self):
+        """
+        :return: Lista con los nombres de las impresoras disponibles.
+        :rtype: list[str]
+        """
+        raise NotImplementedError
+
+    def someter_trabajo(self, printer_name, file_path, config, copias=1):
+        """
+        Entrega un archivo al spooler de la impresora sin esperar a que se imprima.
+        Con `copias` mayor que 1 se pide un único trabajo intercalado con todas
+        las copias, en lugar de un trabajo por copia.
+
+        :return: Una tupla (bool, str, id_trabajo) con el éxito del envío, un
+                 mensaje y el identificador del trabajo en el spooler (o None
+                 si no se pudo identificar).
+        :rtype: tuple[bool, str, object]
+        """
+        raise NotImplementedError
+
+    def estado_trabajo(self, printer_name, id_trabajo):
+        """
+        :return: Uno de `ESTADO_EN_COLA`, `ESTADO_IMPRIMIENDO`, `ESTADO_COMPLETADO`
+                 o `ESTADO_ERROR`.
+        :rtype: str
+        """
+        raise NotImplementedError
+
+    def profundidad_cola(self, printer_name):
+        """
+        :return: Trabajos aceptados por la impresora que aún no han terminado.
+        :rtype: int
+        """
+        raise NotImplementedError
+
+    def cancelar_trabajo(self, printer_name, id_trabajo):
+        """
+        Retira del spooler un trabajo que aún no ha terminado.
+
+        :return: True si se pudo cancelar.
+        :rtype: bool
+        """
+        return False
+
+    def estado_impresoras(self):
+        """
+        Consulta rápida del estado de todas las impresoras (sin capacidades).
+
+        :return: Lista de diccionarios {'nombre', 'estado', 'cola'}, con `estado`
+                 uno de los `DISPOSITIVO_*` y `cola` los trabajos pendientes.
+        :rtype: list[dict]
+        """
+        return [{'nombre': nombre, 'estado': DISPOSITIVO_LISTO, 'cola': self.profundidad_cola(nombre)}
+                for nombre in self.listar_impresoras()]
+
+    def capacidades_impresora(self, printer_name):
+        """
+        Consulta (potencialmente lenta) de lo que admite una impresora.
+
+        :return: Diccionario {'papeles': [...], 'duplex': bool, 'bandejas': [...]}.
+        :rtype: dict
+        """
+        return {'papeles': [], 'duplex': False, 'bandejas': []}
+
+    def sumidero_raw(self, printer_name, config):
+        """
+        Destino al que el modo RAW (`spool_raw.BackendRaw`) escribe los bytes de
+        un trabajo para esta impresora.
+
+        :return: Un `spool_raw.SumideroSpool` nuevo.
+        :raises NotImplementedError: Si el backend no admite trabajos RAW.
+        """
+        raise NotImplementedError(f"el backend '{self.nombre}' no admite trabajos RAW")
+
+    def ahora(self):
+        """
+        :return: Reloj del backend en segundos (monótono).
+        :rtype: float
+        """
+        return time.monotonic()
+
+    def esperar_cambio(self, printer_name, tiempo_maximo):
+        """
+        Bloquea hasta que cambie algo en la cola de la impresora o hasta que pasen
+        `tiempo_maximo` segundos. La implementación por defecto simplemente espera.
+        """
+        time.sleep(tiempo_maximo)
+
+
+class BackendWindows(BackendImpresion):
+    """
+    Backend real basado en la API de Windows (pywin32).
+    Usa `ShellExecute` con el verbo "print", es decir, el programa asociado
+    al tipo de archivo (Adobe Reader, Word...) es quien imprime. El trabajo que
+    ese programa deja en el spooler se localiza comparando la cola antes y
+    después del envío, y su estado se lee con `GetJob`.
+    """
+    nombre = "windows"
+
+    def __init__(self, tiempo_aparicion=60.0, copias_maximas_por_entrega=5):
+        """
+        :param tiempo_aparicion: Segundos máximos que se espera a que el programa
+                                 asociado entregue el trabajo al spooler.
+        :param copias_maximas_por_entrega: Si no se pueden fijar las copias en el
+                                 trabajo, cuántas se admiten enviando una entrega
+                                 por copia (cada una puede tardar hasta
+                                 `tiempo_aparicion`); con más, el envío falla.
+        """
+        self.tiempo_aparicion = tiempo_aparicion
+        self.copias_maximas_por_entrega = copias_maximas_por_entrega
+
+    def listar_impresoras(self):
+        cargar_win32()
+        try:
+            # El parámetro 2 indica que queremos enumerar impresoras locales.
+            impresoras = win32print.EnumPrinters(2)
+            # Extrae el segundo elemento de cada tupla (el nombre de la impresora).
+            return [p[1] for p in impresoras]
+        except Exception as e:
+            # Manejo de error para sistemas operativos no compatibles con win32print.
+            print(f"Error (no Windows?): {e}. Usando impresora 'Defecto'.")
+            # Intenta obtener la impresora por defecto si el módulo lo soporta, sino usa un placeholder.
+            return [win32print.GetDefaultPrinter()] if hasattr(win32print, 'GetDefaultPrinter') else ["Impresora_Defecto"]
+
+    def _trabajos_en_cola(self, printer_name):
+        """
+        :return: Diccionario {JobId: JOB_INFO_1} con los trabajos de la impresora.
+        :rtype: dict
+        """
+        cargar_win32()
+        handle = win32print.OpenPrinter(printer_name)
+        try:
+            return {j['JobId']: j for j in win32print.EnumJobs(handle, 0, -1, 1)}
+        finally:
+            win32print.ClosePrinter(handle)
+
+    def _cambiar_copias(self, printer_name, id_trabajo, copias):
+        """
+        Fija el número de copias (intercaladas) en el DEVMODE del propio trabajo,
+        no en el de la impresora, para no afectar a los trabajos de otros
+        usuarios. El trabajo se pausa mientras se cambia, para que el spooler no
+        empiece a imprimirlo con una sola copia.
+
+        :return: True si se pudo cambiar (ej. False si el trabajo ya terminó o el
+                 controlador no expone su DEVMODE).
+        :rtype: bool
+        """
+        cargar_win32()
+        handle = win32print.OpenPrinter(printer_name)
+        try:
+            win32print.SetJob(handle, id_trabajo, 0, None, _JOB_CONTROL_PAUSE)
+            try:
+                info = win32print.GetJob(handle, id_trabajo, 2)
+                devmode = info['pDevMode']
+                if devmode is None:
+                    return False
+                devmode.Copies = copias
+                devmode.Collate = 1
+                # Position 0 (JOB_POSITION_UNSPECIFIED): el trabajo no se mueve en la cola.
+                info['Position'] = 0
+                win32print.SetJob(handle, id_trabajo, 2, info, 0)
+                return True
+            finally:
+                win32print.SetJob(handle, id_trabajo, 0, None, _JOB_CONTROL_RESUME)
+        except Exception:
+            return False
+        finally:
+            win32print.ClosePrinter(handle)
+
+    def _lanzar(self, printer_name, file_path, antes):
+        """
+        Imprime el archivo con el programa asociado y espera a que aparezca el
+        trabajo nuevo en la cola.
+
+        :return: El JOB_INFO_1 del trabajo, o None si no se pudo localizar.
+        """
+        nombre_archivo = os.path.basename(file_path)
+        cargar_win32()
+
+        # "print" es la acción que le dice a Windows que imprima el archivo.
+        # '/d:"%s"' % printer_name especifica a qué impresora enviar el trabajo.
+        win32api.ShellExecute(
+            0, # hwnd (ventana handle): 0 para no tener ventana.
+            "print",
+            file_path,
+            '/d:"%s"' % printer_name,
+            ".", # dir: Directorio de trabajo
+            0    # showcmd: SW_HIDE (oculto)
+        )
+
+        # El programa asociado tarda un poco en abrir el archivo y entregarlo al
+        # spooler; se espera a que aparezca un trabajo nuevo en la cola.
+        limite = time.monotonic() + self.tiempo_aparicion
+        while time.monotonic() < limite:
+            nuevos = [j for jid, j in self._trabajos_en_cola(printer_name).items() if jid not in antes]
+            if nuevos:
+                propios = [j for j in nuevos if nombre_archivo in (j.get('pDocument') or '')]
+                return (propios or nuevos)[0]
+            self.esperar_cambio(printer_name, 0.5)
+
+        # Un trabajo muy corto puede entrar y salir de la cola sin que lo veamos.
+        return None
+
+    def someter_trabajo(self, printer_name, file_path, config, copias=1):
+        nombre_archivo = os.path.basename(file_path)
+        print(f"-> [REAL] Enviando '{nombre_archivo}' x {copias} a la impresora '{printer_name}'...")
+
+        try:
+            antes = set(self._trabajos_en_cola(printer_name))
+            trabajo = self._lanzar(printer_name, file_path, antes)
+            if copias > 1 and (trabajo is None or not self._cambiar_copias(printer_name, trabajo['JobId'], copias)):
+                # Sin poder fijar las copias en el trabajo: una entrega por copia,
+                # y se sigue el último trabajo (el spooler los imprime en orden).
+                # Cada entrega puede tardar hasta `tiempo_aparicion`, así que solo
+                # se hace con pocas copias.
+                if copias > self.copias_maximas_por_entrega:
+                    if trabajo is not None:
+                        self.cancelar_trabajo(printer_name, trabajo['JobId'])
+                    return False, (f"!!! ERROR al enviar trabajo: no se pudieron fijar {copias} copias en el trabajo "
+                                   f"y enviarlas una a una supera el límite de {self.copias_maximas_por_entrega}."), None
+                for _ in range(copias - 1):
+                    if trabajo is not None:
+                        antes.add(trabajo['JobId'])
+                    trabajo = self._lanzar(printer_name, file_path, antes)
+
+            if trabajo is None:
+                return True, "Trabajo enviado, pero no se pudo localizar en la cola.", None
+            return True, f"Trabajo {trabajo['JobId']} en cola.", trabajo['JobId']
+
+        except Exception as e:
+            return False, f"!!! ERROR al enviar trabajo: {e}", None
+
+    def estado_trabajo(self, printer_name, id_trabajo):
+        if id_trabajo is None:
+            return ESTADO_COMPLETADO
+        cargar_win32()
+        handle = win32print.OpenPrinter(printer_name)
+        try:
+            estado = win32print.GetJob(handle, id_trabajo, 1)['Status']
+        except Exception:
+            # El spooler borra el trabajo de la cola en cuanto termina de imprimirse.
+            return ESTADO_COMPLETADO
+        finally:
+            win32print.ClosePrinter(handle)
+
+        if estado & _JOB_STATUS_PRINTED:
+            return ESTADO_COMPLETADO
+        if estado & _JOB_STATUS_ERROR:
+            return ESTADO_ERROR
+        if estado & (_JOB_STATUS_DELETING | _JOB_STATUS_DELETED):
+            # El spooler retira así los trabajos terminados (PRINTED|DELETING),
+            # y sin el bit de error no hay nada que reimprimir.
+            return ESTADO_COMPLETADO
+        if estado & _JOB_STATUS_PRINTING:
+            return ESTADO_IMPRIMIENDO
+        return ESTADO_EN_COLA
+
+    def profundidad_cola(self, printer_name):
+        return len(self._trabajos_en_cola(printer_name))
+
+    def cancelar_trabajo(self, printer_name, id_trabajo):
+        if id_trabajo is None:
+            return False
+        cargar_win32()
+        handle = win32print.OpenPrinter(printer_name)
+        try:
+            win32print.SetJob(handle, id_trabajo, 0, None, _JOB_CONTROL_DELETE)
+            return True
+        except Exception:
+            # El trabajo ya terminó o no hay permiso sobre él.
+            return False
+        finally:
+            win32print.ClosePrinter(handle)
+
+    def estado_impresoras(self):
+        # Una sola llamada con PRINTER_INFO_2 trae el estado y la cola de todas,
+        # incluidas las compartidas en red a las que está conectado el equipo.
+        cargar_win32()
+        impresoras = win32print.EnumPrinters(_PRINTER_ENUM_LOCAL | _PRINTER_ENUM_CONNECTIONS, None, 2)
+        resultado = []
+        for info in impresoras:
+            estado = info['Status']
+            if estado & _PRINTER_STATUS_OFFLINE or info['Attributes'] & _PRINTER_ATTRIBUTE_WORK_OFFLINE:
+                texto = DISPOSITIVO_DESCONECTADO
+            elif estado & _PRINTER_STATUS_ERROR:
+                texto = DISPOSITIVO_ERROR
+            elif estado & _PRINTER_STATUS_PAUSED:
+                texto = DISPOSITIVO_PAUSADO
+            else:
+                texto = DISPOSITIVO_LISTO
+            resultado.append({'nombre': info['pPrinterName'], 'estado': texto, 'cola': info['cJobs']})
+        return resultado
+
+    def capacidades_impresora(self, printer_name):
+        cargar_win32()
+        handle = win32print.OpenPrinter(printer_name)
+        try:
+            puerto = win32print.GetPrinter(handle, 2)['pPortName']
+        finally:
+            win32print.ClosePrinter(handle)
+        papeles = win32print.DeviceCapabilities(printer_name, puerto, _DC_PAPERNAMES) or []
+        bandejas = win32print.DeviceCapabilities(printer_name, puerto, _DC_BINNAMES) or []
+        return {
+            'papeles': [p.strip('\0 ') for p in papeles],
+            'duplex': win32print.DeviceCapabilities(printer_name, puerto, _DC_DUPLEX) == 1,
+            'bandejas': [b.strip('\0 ') for b in bandejas],
+        }
+
+    def sumidero_raw(self, printer_name, config):
+        from spool_raw import SumideroWin32
+        return SumideroWin32(printer_name)
+
+    def esperar_cambio(self, printer_name, tiempo_maximo):
+        # Se usa la notificación de cambios del spooler cuando está disponible,
+        # así el monitor despierta en cuanto un trabajo cambia de estado.
+        cargar_win32()
+        if win32event is None or not hasattr(win32print, 'FindFirstPrinterChangeNotification'):
+            time.sleep(tiempo_maximo)
+            return
+        handle = win32print.OpenPrinter(printer_name)
+        try:
+            aviso = win32print.FindFirstPrinterChangeNotification(handle, _PRINTER_CHANGE_JOB, 0, None)
+            try:
+                win32event.WaitForSingleObject(aviso, int(tiempo_maximo * 1000))
+            finally:
+                win32print.FindClosePrinterChangeNotification(aviso)
+        finally:
+            win32print.ClosePrinter(handle)
+
+
+class BackendSimulado(BackendImpresion):
+    """
+    Spooler simulado y determinista para pruebas y benchmarks sin Windows.
+
+    Modela cada impresora como un dispositivo que procesa su cola en orden:
+    cada trabajo tarda `sobrecarga_trabajo + copias * paginas * segundos_por_pagina`
+    segundos simulados y pasa por los estados en cola -> imprimiendo ->
+    completado (o error). Los fallos se inyectan por número de envío: `fallos`
+    rechaza el envío y `fallos_dispositivo` hace que el trabajo termine en
+    error. También pueden inyectarse con una probabilidad fija y una semilla,
+    de modo que dos ejecuciones con los mismos parámetros son idénticas.
+
+    Para probar el descubrimiento de impresoras se pueden fijar sus
+    capacidades, marcar impresoras como `desconectadas` (el conjunto puede
+    cambiarse en caliente) y hacer que la enumeración tarde `retraso_descubrimiento`.
+
+    Todos los tiempos se expresan en segundos simulados; `escala_tiempo`
+    indica cuántos segundos reales dura cada segundo simulado (por ejemplo,
+    0.01 ejecuta un lote de una hora en 36 segundos).
+    """
+    nombre = "simulado"
+
+    def __init__(self, impresoras=None, segundos_por_pagina=0.6, sobrecarga_trabajo=5.0,
+                 fallos=None, fallos_dispositivo=None, probabilidad_fallo=0.0, semilla=0,
+                 escala_tiempo=1.0, profundidad_maxima=0, capacidades=None, desconectadas=None,
+                 retraso_descubrimiento=0.0):
+        """
+        :param impresoras: Nombres de las impresoras simuladas.
+        :param segundos_por_pagina: Tiempo de impresión de cada página, o un diccionario
+                                    {impresora: segundos} para modelar equipos de distinta velocidad.
+        :param sobrecarga_trabajo: Tiempo fijo por trabajo (calentamiento, spool).
+        :param fallos: Números de envío (empezando en 1) que el spooler rechaza.
+        :param fallos_dispositivo: Números de envío que terminan en estado de error.
+        :param probabilidad_fallo: Probabilidad de rechazo de cada envío (0-1).
+        :param semilla: Semilla del generador de fallos aleatorios.
+        :param escala_tiempo: Segundos reales por cada segundo simulado.
+        :param profundidad_maxima: Trabajos máximos en cola por impresora (0 = sin límite).
+        :param capacidades: Diccionario {impresora: capacidades} (ver `capacidades_impresora`).
+        :param desconectadas: Impresoras que se presentan como desconectadas.
+        :param retraso_descubrimiento: Segundos simulados que tarda `estado_impresoras`.
+        """
+        self.impresoras = list(impresoras or ["Simulada_1"])
+        self.segundos_por_pagina = segundos_por_pagina
+        self.sobrecarga_trabajo = sobrecarga_trabajo
+        self.fallos = set(fallos or ())
+        self.fallos_dispositivo = set(fallos_dispositivo or ())
+        self.probabilidad_fallo = probabilidad_fallo
+        self.escala_tiempo = escala_tiempo
+        self.profundidad_maxima = profundidad_maxima
+        self.capacidades = dict(capacidades or {})
+        self.desconectadas = set(desconectadas or ())
+        self.retraso_descubrimiento = retraso_descubrimiento
+
+        self._azar = random.Random(semilla)
+        self._lock = threading.Lock()
+        self._inicio = time.monotonic()
+        self._envios = 0
+        # Trabajos sin terminar: id -> (impresora, inicio, fin, termina_en_error),
+        # y sus ids por impresora en orden de envío. Al terminar pasan a
+        # `_terminados` (id -> termina_en_error), acotado a `TRABAJOS_ARCHIVADOS`,
+        # así que las consultas no recorren todos los trabajos de la ejecución.
+        self._trabajos = {}
+        self._colas = {nombre: collections.deque() for nombre in self.impresoras}
+        self._terminados = collections.OrderedDict()
+        # Por impresora: instante simulado en que el dispositivo queda libre
+        # y los intervalos (inicio, fin) en los que estuvo imprimiendo.
+        self._libre_en = {nombre: 0.0 for nombre in self.impresoras}
+        self.intervalos = {nombre: [] for nombre in self.impresoras}
+
+    def ahora(self):
+        """
+        :return: Segundos simulados transcurridos desde la creación del backend.
+        :rtype: float
+        """
+        return (time.monotonic() - self._inicio) / self.escala_tiempo
+
+    def dormir(self, segundos):
+        """Espera `segundos` simulados."""
+        if segundos > 0:
+            time.sleep(segundos * self.escala_tiempo)
+
+    def duracion_trabajo(self, printer_name, config, copias=1):
+        """
+        :return: Segundos simulados que tarda el dispositivo en imprimir el trabajo.
+        :rtype: float
+        """
+        por_pagina = self.segundos_por_pagina
+        if isinstance(por_pagina, dict):
+            por_pagina = por_pagina[printer_name]
+        return self.sobrecarga_trabajo + copias * config.get('paginas', 100) * por_pagina
+
+    def _archivar(self, printer_name, ahora):
+        # Los trabajos de una impresora terminan en orden de envío (salvo los
+        # cancelados, que se archivan cuando terminan los anteriores).
+        cola = self._colas[printer_name]
+        while cola and self._trabajos[cola[0]][2] <= ahora:
+            numero = cola.popleft()
+            self._terminados[numero] = self._trabajos.pop(numero)[3]
+            if len(self._terminados) > TRABAJOS_ARCHIVADOS:
+                self._terminados.popitem(last=False)
+
+    def _pendientes(self, printer_name, ahora):
+        self._archivar(printer_name, ahora)
+        return [t for t in map(self._trabajos.get, self._colas[printer_name]) if t[2] > ahora]
+
+    def listar_impresoras(self):
+        return list(self.impresoras)
+
+    def someter_trabajo(self, printer_name, file_path, config, copias=1):
+        if printer_name not in self._libre_en:
+            return False, f"!!! ERROR al enviar trabajo: impresora '{printer_name}' desconocida.", None
+
+        with self._lock:
+            self._envios += 1
+            numero = self._envios
+            ahora = self.ahora()
+
+            # 1. Fallos inyectados (deterministas por número de envío o por semilla)
+            if numero in self.fallos or self._azar.random() < self.probabilidad_fallo:
+                return False, f"!!! ERROR al enviar trabajo: fallo simulado en el envío {numero}.", None
+
+            # 2. Límite de profundidad de la cola del spooler
+            en_cola = len(self._pendientes(printer_name, ahora))
+            if self.profundidad_maxima and en_cola >= self.profundidad_maxima:
+                return False, f"!!! ERROR al enviar trabajo: cola de '{printer_name}' llena ({en_cola}).", None
+
+            # 3. El trabajo empieza cuando el dispositivo termina lo que tenía en cola
+            inicio = max(ahora, self._libre_en[printer_name])
+            fin = inicio + self.duracion_trabajo(printer_name, config, copias)
+            self._libre_en[printer_name] = fin
+            self._trabajos[numero] = (printer_name, inicio, fin, numero in self.fallos_dispositivo)
+            self._colas[printer_name].append(numero)
+            self.intervalos[printer_name].append((inicio, fin))
+
+        return True, f"Trabajo simulado {numero} en cola ({en_cola} por delante).", numero
+
+    def estado_trabajo(self, printer_name, id_trabajo):
+        with self._lock:
+            if id_trabajo not in self._trabajos:
+                # Ya terminó; si es muy antiguo se da por completado.
+                return ESTADO_ERROR if self._terminados.get(id_trabajo) else ESTADO_COMPLETADO
+            _, inicio, fin, con_error = self._trabajos[id_trabajo]
+            ahora = self.ahora()
+        if ahora < inicio:
+            return ESTADO_EN_COLA
+        if ahora < fin:
+            return ESTADO_IMPRIMIENDO
+        return ESTADO_ERROR if con_error else ESTADO_COMPLETADO
+
+    def profundidad_cola(self, printer_name):
+        with self._lock:
+            return len(self._pendientes(printer_name, self.ahora()))
+
+    def cancelar_trabajo(self, printer_name, id_trabajo):
+        # El trabajo termina (en error, como uno borrado) en este instante y,
+        # si era el último de la cola, el dispositivo queda libre antes.
+        with self._lock:
+            if id_trabajo not in self._trabajos:
+                return False
+            impresora, inicio, fin, _ = self._trabajos[id_trabajo]
+            ahora = self.ahora()
+            if fin <= ahora:
+                return False
+            # Un trabajo que aún esperaba turno se retira sin llegar a imprimirse.
+            nuevo_inicio = min(inicio, ahora)
+            self._trabajos[id_trabajo] = (impresora, nuevo_inicio, ahora, True)
+            intervalos = self.intervalos[impresora]
+            intervalos[intervalos.index((inicio, fin))] = (nuevo_inicio, ahora)
+            if self._libre_en[impresora] == fin:
+                self._libre_en[impresora] = max([ahora] + [self._trabajos[n][2] for n in self._colas[impresora]])
+        return True
+
+    def estado_impresoras(self):
+        self.dormir(self.retraso_descubrimiento)
+        return [{'nombre': nombre,
+                 'estado': DISPOSITIVO_DESCONECTADO if nombre in self.desconectadas else DISPOSITIVO_LISTO,
+                 'cola': self.profundidad_cola(nombre)}
+                for nombre in self.impresoras]
+
+    def capacidades_impresora(self, printer_name):
+        return self.capacidades.get(printer_name, {'papeles': ["Carta", "A4"], 'duplex': True, 'bandejas': ["Bandeja 1"]})
+
+    def sumidero_raw(self, printer_name, config):
+        from spool_raw import SumideroSimulado
+        return SumideroSimulado(self, printer_name, config)
+
+    def esperar_cambio(self, printer_name, tiempo_maximo):
+        # Los cambios de estado del simulador son instantes conocidos, así que se
+        # duerme exactamente hasta el próximo (como haría una notificación real).
+        with self._lock:
+            ahora = self.ahora()
+            if printer_name in self._colas:
+                self._archivar(printer_name, ahora)
+            proximos = [t for numero in self._colas.get(printer_name, ())
+                        for t in self._trabajos[numero][1:3] if t > ahora]
+        espera = min([tiempo_maximo] + [t - ahora for t in proximos])
+        self.dormir(espera)
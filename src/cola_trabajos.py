@@ -0,0 +1,410 @@
+import bisect
+import itertools
+import json
+import os
+import time
+import uuid
+
+from planificador import PPM_POR_DEFECTO
+
+# Estados de una entrada de la cola.
+ENTRADA_PENDIENTE = "pendiente"
+ENTRADA_EN_CURSO = "en_curso"
+ENTRADA_TERMINADA = "terminada"
+ENTRADA_CANCELADA = "cancelada"
+
+# Eventos del archivo de la cola (JSONL de solo añadido, como el diario).
+EVENTO_AGREGADA = "agregada"
+EVENTO_ESTADO = "estado"
+EVENTO_INSTANTANEA = "instantanea"
+
+# Tamaño a partir del cual el archivo se reescribe solo con las entradas vivas.
+UMBRAL_COMPACTACION = 512 * 1024
+
+# Segundos que se estima que tarda el operador en cada cambio. Cambiar de papel
+# (vaciar y recargar bandejas) cuesta más que ajustar el tamaño; si cambian
+# los dos se suman.
+SEGUNDOS_CAMBIO_PAPEL = 300.0
+SEGUNDOS_CAMBIO_TAMANO = 120.0
+
+RUTA_POR_DEFECTO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cola_trabajos.jsonl")
+
+
+class EntradaCola:
+    """
+    Un trabajo en espera: archivo, perfil, copias, prioridad (mayor primero) y
+    una fecha límite opcional (`time.time()` en la que debería estar impreso).
+    """
+    def __init__(self, id, archivo, perfil, copias, prioridad=0, fecha_limite=None, impresoras=None,
+                 estado=ENTRADA_PENDIENTE, orden=0, lote=None, paginas=None):
+        self.id = id
+        self.archivo = archivo
+        self.perfil = perfil
+        self.copias = copias
+        self.prioridad = prioridad
+        self.fecha_limite = fecha_limite
+        self.impresoras = list(impresoras or [])
+        self.estado = estado
+        self.orden = orden        # Orden de llegada; desempata a igualdad de todo lo demás.
+        self.lote = lote          # Lote del diario con el que se está imprimiendo.
+        self.paginas = paginas    # Páginas reales del archivo (análisis previo), si se conocen.
+
+    def datos(self):
+        return {
+            'id': self.id,
+            'archivo': self.archivo,
+            'perfil': self.perfil,
+            'copias': self.copias,
+            'prioridad': self.prioridad,
+            'fecha_limite': self.fecha_limite,
+            'impresoras': self.impresoras,
+            'estado': self.estado,
+            'orden': self.orden,
+            'lote': self.lote,
+            'paginas': self.paginas,
+        }
+
+    @classmethod
+    def desde_datos(cls, datos):
+        return cls(**datos)
+
+
+class ColaTrabajos:
+    """
+    Cola persistente de trabajos (archivo, perfil, copias) pendientes de imprimir.
+
+    Cada cambio se añade como una línea a un archivo JSONL, así que añadir o
+    terminar una entrada cuesta lo mismo con diez entradas que con diez mil.
+    Al abrirla se reproduce el archivo, y cuando crece demasiado se compacta
+    dejando solo las entradas pendientes o en curso. Con `ruta=None` la cola
+    vive solo en memoria. Quien la muestre compara `version` para saber si
+    debe refrescarse.
+    """
+    def __init__(self, ruta=RUTA_POR_DEFECTO, umbral_compactacion=UMBRAL_COMPACTACION):
+        self.ruta = ruta
+        self.umbral_compactacion = umbral_compactacion
+        self.entradas = {}        # id -> EntradaCola (solo pendientes y en curso)
+        self.version = 0
+        self._siguiente_orden = 0
+        self._archivo = None
+        # Tamaño del archivo tras la última compactación: se vuelve a compactar
+        # cuando lo supera en `umbral_compactacion`, no en cada escritura, aunque
+        # las entradas vivas por sí solas ya ocupen más que el umbral.
+        self._tamano_compactado = 0
+
+        if self.ruta:
+            self._reproducir()
+            if os.path.exists(self.ruta) and os.path.getsize(self.ruta) > self.umbral_compactacion:
+                self.compactar()
+            elif os.path.exists(self.ruta):
+                self._tamano_compactado = os.path.getsize(self.ruta)
+            self._archivo = open(self.ruta, 'a', encoding='utf-8')
+
+    def _reproducir(self):
+        if not os.path.exists(self.ruta):
+            return
+        with open(self.ruta, 'r', encoding='utf-8') as f:
+            for texto in f:
+                try:
+                    self._aplicar(json.loads(texto))
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    # Línea cortada por un cierre inesperado: se ignora.
+                    continue
+
+    def _aplicar(self, registro):
+        evento = registro['evento']
+        if evento in (EVENTO_AGREGADA, EVENTO_INSTANTANEA):
+            entrada = EntradaCola.desde_datos(registro['entrada'])
+            self.entradas[entrada.id] = entrada
+            self._siguiente_orden = max(self._siguiente_orden, entrada.orden + 1)
+        elif evento == EVENTO_ESTADO and registro['id'] in self.entradas:
+            if registro['estado'] in (ENTRADA_TERMINADA, ENTRADA_CANCELADA):
+                del self.entradas[registro['id']]
+            else:
+                entrada = self.entradas[registro['id']]
+                entrada.estado = registro['estado']
+                entrada.lote = registro.get('lote')
+        self.version += 1
+
+    def _registrar(self, registro):
+        registro['t'] = round(time.time(), 3)
+        self._aplicar(registro)
+        if self._archivo is None:
+            return
+        self._archivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        self._archivo.flush()
+        if self._archivo.tell() > self._tamano_compactado + self.umbral_compactacion:
+            self.compactar()
+
+    def agregar(self, archivo, perfil, copias, prioridad=0, fecha_limite=None, impresoras=None, paginas=None):
+        """
+        Añade un trabajo al final de la cola.
+
+        :param paginas: Páginas reales del archivo, si se conocen (si no, las del perfil).
+
+        :return: La entrada creada.
+        :rtype: EntradaCola
+        """
+        entrada = EntradaCola(uuid.uuid4().hex[:12], archivo, perfil, copias, prioridad, fecha_limite,
+                              impresoras, orden=self._siguiente_orden, paginas=paginas)
+        self._registrar({'evento': EVENTO_AGREGADA, 'entrada': entrada.datos()})
+        return self.entradas[entrada.id]
+
+    def marcar(self, id_entrada, estado, lote=None):
+        """
+        Cambia el estado de una entrada. Las terminadas o canceladas salen de la cola.
+
+        :param lote: Lote del diario con el que se imprime (para `ENTRADA_EN_CURSO`).
+        """
+        if id_entrada in self.entradas:
+            self._registrar({'evento': EVENTO_ESTADO, 'id': id_entrada, 'estado': estado, 'lote': lote})
+
+    def quitar(self, id_entrada):
+        self.marcar(id_entrada, ENTRADA_CANCELADA)
+
+    def entrada_de_lote(self, lote):
+        """
+        :return: La entrada que se está imprimiendo con ese lote del diario, o None.
+        :rtype: EntradaCola
+        """
+        return next((e for e in self.entradas.values() if e.lote is not None and e.lote == lote), None)
+
+    def recuperar(self, lotes_abiertos):
+        """
+        Tras un cierre inesperado, devuelve a pendientes las entradas que estaban
+        en curso salvo las de lotes que el diario todavía puede reanudar.
+
+        :param lotes_abiertos: Identificadores de los lotes interrumpidos del diario.
+        """
+        for entrada in list(self.entradas.values()):
+            if entrada.estado == ENTRADA_EN_CURSO and entrada.lote not in lotes_abiertos:
+                self.marcar(entrada.id, ENTRADA_PENDIENTE)
+
+    def pendientes(self):
+        """
+        :return: Entradas pendientes en orden de llegada.
+        :rtype: list[EntradaCola]
+        """
+        return sorted((e for e in self.entradas.values() if e.estado == ENTRADA_PENDIENTE), key=lambda e: e.orden)
+
+    def compactar(self):
+        """Reescribe el archivo con una instantánea por entrada viva (atómicamente)."""
+        if not self.ruta:
+            return
+        if self._archivo is not None:
+            self._archivo.close()
+        temporal = self.ruta + ".tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            for entrada in self.entradas.values():
+                f.write(json.dumps({'evento': EVENTO_INSTANTANEA, 'entrada': entrada.datos()}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, self.ruta)
+        self._tamano_compactado = os.path.getsize(self.ruta)
+        if self._archivo is not None:
+            self._archivo = open(self.ruta, 'a', encoding='utf-8')
+
+    def cerrar(self):
+        if self._archivo is not None:
+            self._archivo.flush()
+            os.fsync(self._archivo.fileno())
+            self._archivo.close()
+            self._archivo = None
+
+
+def clave_preparacion(perfil):
+    """
+    :return: Lo que el operador tiene que preparar en la impresora para un
+             perfil: la tupla (papel, tamaño).
+    :rtype: tuple[str, str]
+    """
+    return (perfil.get('papel', '?'), perfil.get('tamano', '?'))
+
+
+class PasoPlan:
+    """
+    Una entrada de la cola en la secuencia planificada, con su inicio y fin
+    estimados (`time.time()`) y el cambio que hay que hacer antes de ella.
+    """
+    def __init__(self, entrada, preparacion, inicio, fin, cambio=None):
+        self.entrada = entrada
+        self.preparacion = preparacion
+        self.inicio = inicio
+        self.fin = fin
+        self.cambio = cambio      # Texto del cambio de papel/tamaño previo, o None.
+
+    @property
+    def tarde(self):
+        """True si se estima que terminará después de su fecha límite."""
+        return self.entrada.fecha_limite is not None and self.fin > self.entrada.fecha_limite
+
+
+class _Grupo:
+    """Entradas de un mismo nivel de prioridad que comparten papel y tamaño."""
+    def __init__(self, clave, entradas, duraciones):
+        self.clave = clave
+        # Dentro del grupo no hay cambios: se ordena por fecha límite y luego por llegada.
+        pares = sorted(zip(entradas, duraciones),
+                       key=lambda p: (p[0].fecha_limite is None, p[0].fecha_limite or 0, p[0].orden))
+        self.entradas = [e for e, _ in pares]
+        self.duraciones = [d for _, d in pares]
+        self.duracion = sum(self.duraciones)
+        self.orden = min(e.orden for e in entradas)
+        # Para contar en O(log n) cuántas entradas llegan tarde si el grupo empieza
+        # en `t`: la entrada k llega tarde si t > fecha_limite_k - fin_relativo_k.
+        holguras = []
+        acumulado = 0.0
+        for entrada, duracion in pares:
+            acumulado += duracion
+            if entrada.fecha_limite is not None:
+                holguras.append(entrada.fecha_limite - acumulado)
+        self.holguras = sorted(holguras)
+
+    def tardias(self, inicio):
+        return bisect.bisect_left(self.holguras, inicio)
+
+
+class PlanificadorCambios:
+    """
+    Ordena la cola para minimizar los cambios de papel y tamaño.
+
+    Las prioridades se respetan siempre: todo un nivel de prioridad va antes
+    que el siguiente. Dentro de cada nivel las entradas se agrupan por
+    (papel, tamaño) y los grupos se encadenan empezando por lo que ya está
+    cargado en la impresora y siguiendo por el cambio más barato. Si con ese
+    orden alguna entrada no llega a su fecha límite, su grupo se adelanta a
+    la primera posición en la que se reducen las entradas tardías.
+
+    Con n entradas y G grupos (combinaciones distintas de papel y tamaño por
+    nivel), agrupar cuesta O(n log n), encadenar los grupos O(G²) y corregir
+    los plazos O(G³ log n) en el peor caso, solo si hay entradas que llegan
+    tarde. G suele ser pequeño (unas pocas combinaciones de papel), así que
+    replanificar miles de trabajos no frena la interfaz; con cientos de
+    combinaciones distintas la corrección de plazos sí se notaría.
+    """
+    def __init__(self, segundos_cambio_papel=SEGUNDOS_CAMBIO_PAPEL, segundos_cambio_tamano=SEGUNDOS_CAMBIO_TAMANO,
+                 ppm=PPM_POR_DEFECTO):
+        """
+        :param segundos_cambio_papel: Tiempo estimado de un cambio de papel.
+        :param segundos_cambio_tamano: Tiempo estimado de un cambio de tamaño.
+        :param ppm: Páginas por minuto con las que se estima la duración de cada trabajo.
+        """
+        self.segundos_cambio_papel = segundos_cambio_papel
+        self.segundos_cambio_tamano = segundos_cambio_tamano
+        self.ppm = ppm
+
+    def coste_cambio(self, desde, hasta):
+        """
+        :return: Segundos estimados para pasar de una preparación (papel, tamaño) a otra.
+        :rtype: float
+        """
+        if desde is None or desde == hasta:
+            return 0.0
+        coste = 0.0
+        if desde[0] != hasta[0]:
+            coste += self.segundos_cambio_papel
+        if desde[1] != hasta[1]:
+            coste += self.segundos_cambio_tamano
+        return coste
+
+    def duracion(self, entrada, perfil):
+        """
+        :return: Segundos estimados de impresión de una entrada.
+        :rtype: float
+        """
+        return entrada.copias * (entrada.paginas or perfil.get('paginas', 100)) / self.ppm * 60
+
+    def planificar(self, entradas, perfiles, ahora=None, preparacion_actual=None):
+        """
+        :param entradas: Entradas pendientes de la cola.
+        :param perfiles: Diccionario {nombre: perfil}; las entradas con un perfil
+                         desconocido se planifican con sus valores por defecto.
+        :param ahora: Instante (`time.time()`) en que empieza el plan.
+        :param preparacion_actual: (papel, tamaño) cargado ahora en la impresora, si se sabe.
+        :return: La secuencia planificada.
+        :rtype: list[PasoPlan]
+        """
+        t = time.time() if ahora is None else ahora
+        actual = preparacion_actual
+        plan = []
+        por_prioridad = sorted(entradas, key=lambda e: -e.prioridad)
+        for _, nivel in itertools.groupby(por_prioridad, key=lambda e: e.prioridad):
+            grupos = self._agrupar(list(nivel), perfiles)
+            orden = self._reparar_plazos(self._encadenar(grupos, actual), t, actual)
+            for grupo in orden:
+                cambio = self.coste_cambio(actual, grupo.clave)
+                if cambio:
+                    t += cambio
+                texto = self._texto_cambio(actual, grupo.clave) if cambio else None
+                for entrada, duracion in zip(grupo.entradas, grupo.duraciones):
+                    plan.append(PasoPlan(entrada, grupo.clave, t, t + duracion, texto))
+                    texto = None
+                    t += duracion
+                actual = grupo.clave
+        return plan
+
+    def _agrupar(self, entradas, perfiles):
+        por_clave = {}
+        for entrada in entradas:
+            perfil = perfiles.get(entrada.perfil, {})
+            lista = por_clave.setdefault(clave_preparacion(perfil), ([], []))
+            lista[0].append(entrada)
+            lista[1].append(self.duracion(entrada, perfil))
+        return [_Grupo(clave, e, d) for clave, (e, d) in por_clave.items()]
+
+    def _encadenar(self, grupos, actual):
+        """Vecino más cercano: cada grupo va seguido del que cuesta menos preparar."""
+        restantes = list(grupos)
+        orden = []
+        while restantes:
+            siguiente = min(restantes, key=lambda g: (self.coste_cambio(actual, g.clave), g.orden))
+            restantes.remove(siguiente)
+            orden.append(siguiente)
+            actual = siguiente.clave
+        return orden
+
+    def _tardias(self, orden, t, actual):
+        total = 0
+        for grupo in orden:
+            t += self.coste_cambio(actual, grupo.clave)
+            total += grupo.tardias(t)
+            t += grupo.duracion
+            actual = grupo.clave
+        return total
+
+    def _reparar_plazos(self, orden, t, actual):
+        tardias = self._tardias(orden, t, actual)
+        i = 1
+        while tardias and i < len(orden):
+            grupo = orden[i]
+            mejora = None
+            if grupo.holguras:
+                # Se prueba a adelantarlo una posición, luego dos... y se queda en
+                # la primera en la que llegan tarde menos entradas.
+                for j in range(i - 1, -1, -1):
+                    candidato = orden[:j] + [grupo] + orden[j:i] + orden[i + 1:]
+                    nuevas = self._tardias(candidato, t, actual)
+                    if nuevas < tardias:
+                        mejora = candidato, nuevas
+                        break
+            if mejora is not None:
+                orden, tardias = mejora
+            i += 1
+        return orden
+
+    @staticmethod
+    def _texto_cambio(desde, hasta):
+        partes = []
+        if desde[0] != hasta[0]:
+            partes.append(f"papel {desde[0]} → {hasta[0]}")
+        if desde[1] != hasta[1]:
+            partes.append(f"tamaño {desde[1]} → {hasta[1]}")
+        return ", ".join(partes)
+
+
+def contar_cambios(plan):
+    """
+    :return: Número de cambios de papel o tamaño que exige el plan.
+    :rtype: int
+    """
+    return sum(1 for paso in plan if paso.cambio)
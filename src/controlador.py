@@ -0,0 +1,327 @@
+import collections
+import queue
+import time
+
+from despachador import Despachador, TrabajoCopia
+from diario import (nuevo_id_lote, EVENTO_LOTE_INICIADO, EVENTO_ENVIADA, EVENTO_COMPLETADA,
+                    EVENTO_CONFIRMADA, EVENTO_FALLIDA, EVENTO_LOTE_FINALIZADO, EVENTO_LOTE_CANCELADO)
+from metricas import RegistroMetricas
+from planificador import PlanificadorCarga, RendimientoImpresora
+from puntos_control import copias_por_grupo
+
+# Estados de cada impresora dentro de un lote.
+IMPRESORA_LIBRE = "libre"
+IMPRESORA_IMPRIMIENDO = "imprimiendo"
+IMPRESORA_CONFIRMANDO = "confirmando"
+IMPRESORA_PAUSADA = "pausada"
+IMPRESORA_FALLO = "fallo"
+
+
+class EstadoImpresora:
+    """
+    Estado de una impresora del grupo durante un lote: su despachador, la copia
+    en curso y su propio flujo de pausa/confirmación.
+    """
+    def __init__(self, nombre, despachador):
+        self.nombre = nombre
+        self.despachador = despachador
+        self.rendimiento = RendimientoImpresora(nombre)
+        self.estado = IMPRESORA_LIBRE
+        self.trabajo = None           # `TrabajoCopia` en curso o pendiente de confirmar.
+        self.copias_hechas = 0
+        self.ultimo_mensaje = ""
+
+    def segundos_hasta_libre(self, paginas):
+        """
+        :return: Segundos estimados hasta que la impresora pueda empezar otra copia.
+        :rtype: float
+        """
+        if self.estado != IMPRESORA_IMPRIMIENDO or self.trabajo.iniciado_en is None:
+            return 0.0
+        transcurrido = time.monotonic() - self.trabajo.iniciado_en
+        return max(0.0, self.rendimiento.duracion_estimada(paginas * self.trabajo.cantidad) - transcurrido)
+
+
+class ControladorLote:
+    """
+    Ejecuta un lote de copias repartido entre un grupo de impresoras.
+
+    Es independiente de la interfaz: la GUI (o cualquier otro cliente) llama a
+    `procesar_resultados` desde su propio hilo y recibe los avisos a través de
+    las funciones `al_*`. Cada impresora tiene su propio `Despachador` y su
+    propio flujo de pausa/confirmación; todas comparten la cola de resultados.
+
+    Según los `puntos_control` del perfil, varias copias pueden enviarse como
+    un único trabajo intercalado; la confirmación se pide entonces al terminar
+    el grupo y cuenta para todas sus copias.
+    """
+    def __init__(self, impresoras, ruta, config, total_copias,
+                 al_cambiar=None, al_pedir_confirmacion=None, al_fallo=None, al_finalizar=None,
+                 planificador=None, funcion_envio=None, diario=None, perfil=None, lote=None, hechas=None):
+        """
+        :param impresoras: Nombres de las impresoras del grupo.
+        :param ruta: Ruta del archivo a imprimir.
+        :param config: Diccionario del perfil de impresión.
+        :param total_copias: Número de copias del lote.
+        :param al_cambiar: Función sin argumentos llamada cuando cambia el progreso.
+        :param al_pedir_confirmacion: Función (EstadoImpresora, TrabajoCopia) llamada cuando
+                                      una copia (o grupo) termina y el operador debe confirmarla.
+        :param al_fallo: Función (EstadoImpresora, TrabajoCopia) llamada cuando una copia falla.
+        :param al_finalizar: Función sin argumentos llamada al confirmar la última copia.
+        :param planificador: `PlanificadorCarga` a usar (opcional).
+        :param funcion_envio: Función de envío para los despachadores (opcional).
+        :param diario: `DiarioTrabajos` donde registrar cada transición (opcional).
+        :param perfil: Nombre del perfil, para poder reanudar el lote desde el diario.
+        :param lote: Identificador de un lote interrumpido que se reanuda.
+        :param hechas: Copias de ese lote que ya se imprimieron (no se repiten).
+        """
+        self.ruta = ruta
+        self.config = config
+        self.total_copias = total_copias
+        self.al_cambiar = al_cambiar or (lambda: None)
+        self.al_pedir_confirmacion = al_pedir_confirmacion or (lambda estado, trabajo: None)
+        self.al_fallo = al_fallo or (lambda estado, trabajo: None)
+        self.al_finalizar = al_finalizar or (lambda: None)
+        self.planificador = planificador or PlanificadorCarga()
+
+        self.resultados = queue.Queue()
+        self.impresoras = collections.OrderedDict(
+            (nombre, EstadoImpresora(nombre, Despachador(funcion_envio, self.resultados)))
+            for nombre in impresoras
+        )
+        hechas = set(hechas or ())
+        self.pendientes = collections.deque(c for c in range(1, total_copias + 1) if c not in hechas)
+        self.copias_confirmadas = len(hechas)
+        self.finalizado = False
+        # Copias que fallaron a mitad de un envío por fragmentos -> fragmentos ya
+        # impresos, para que el reintento (en cualquier impresora) siga desde ahí.
+        self.fragmentos_hechos = {}
+
+        self.diario = diario
+        self.perfil = perfil
+        self.reanudado = lote is not None
+        self.lote = lote or nuevo_id_lote()
+        # Tiempos de cada etapa de las copias de este lote (ver `metricas`).
+        self.metricas = RegistroMetricas(self.lote)
+
+    @property
+    def en_curso(self):
+        """True mientras quede alguna copia por confirmar."""
+        return not self.finalizado
+
+    def _registrar(self, evento, **campos):
+        if self.diario is not None:
+            self.diario.registrar(evento, self.lote, **campos)
+
+    def iniciar(self):
+        """Arranca los despachadores y reparte las primeras copias."""
+        if not self.reanudado:
+            self._registrar(EVENTO_LOTE_INICIADO, datos={
+                'ruta': self.ruta,
+                'perfil': self.perfil,
+                'config': self.config,
+                'impresoras': list(self.impresoras),
+                'total_copias': self.total_copias,
+            })
+        for estado in self.impresoras.values():
+            estado.despachador.iniciar()
+        if self.copias_confirmadas >= self.total_copias:
+            # Lote reanudado en el que ya se habían impreso todas las copias.
+            self._finalizar()
+            return
+        self.rellenar()
+
+    def cancelar(self):
+        """Abandona el lote: no se envían más copias y queda cerrado en el diario."""
+        if self.finalizado:
+            return
+        self.finalizado = True
+        self.pendientes.clear()
+        self.metricas.cerrar()
+        self._registrar(EVENTO_LOTE_CANCELADO, confirmadas=self.copias_confirmadas)
+        self.detener()
+        self.al_cambiar()
+
+    def _finalizar(self):
+        self.finalizado = True
+        self.metricas.cerrar()
+        self._registrar(EVENTO_LOTE_FINALIZADO, confirmadas=self.copias_confirmadas)
+        self.al_cambiar()
+        self.al_finalizar()
+
+    def detener(self):
+        """Detiene los hilos de los despachadores."""
+        for estado in self.impresoras.values():
+            estado.despachador.detener(esperar=False)
+
+    def rellenar(self):
+        """
+        Reparte las copias pendientes entre las impresoras libres según el plan
+        de `PlanificadorCarga`.
+        """
+        if not self.pendientes:
+            return
+        paginas = self.config.get('paginas', 100)
+        disponibles = {
+            nombre: (estado.rendimiento, estado.segundos_hasta_libre(paginas))
+            for nombre, estado in self.impresoras.items()
+            if estado.estado in (IMPRESORA_LIBRE, IMPRESORA_IMPRIMIENDO)
+        }
+        plan = self.planificador.planificar(disponibles, len(self.pendientes), paginas)
+        for nombre, asignadas in plan.items():
+            estado = self.impresoras[nombre]
+            if asignadas and estado.estado == IMPRESORA_LIBRE and self.pendientes:
+                grupo = copias_por_grupo(self.config, asignadas)
+                self._despachar(estado, [self.pendientes.popleft() for _ in range(min(grupo, len(self.pendientes)))])
+        self.al_cambiar()
+
+    def _despachar(self, estado, copias):
+        progreso = [self.fragmentos_hechos.pop(c, 0) for c in copias]
+        estado.trabajo = TrabajoCopia(estado.nombre, self.ruta, self.config, copias, self.total_copias, progreso)
+        estado.estado = IMPRESORA_IMPRIMIENDO
+        self._registrar(EVENTO_ENVIADA, copia=copias[0], copias=copias, impresora=estado.nombre)
+        estado.despachador.encolar(estado.trabajo)
+
+    def procesar_resultados(self, bloquear=False, tiempo_maximo=None):
+        """
+        Vacía la cola de resultados de los despachadores. Debe llamarse siempre
+        desde el mismo hilo (el de la GUI o el del cliente que use el controlador).
+
+        :param bloquear: Si es True, espera a que llegue al menos un resultado.
+        :param tiempo_maximo: Espera máxima en segundos cuando `bloquear` es True.
+        :return: Número de resultados procesados.
+        :rtype: int
+        """
+        procesados = 0
+        while True:
+            try:
+                if bloquear and procesados == 0:
+                    trabajo = self.resultados.get(timeout=tiempo_maximo)
+                else:
+                    trabajo = self.resultados.get_nowait()
+            except queue.Empty:
+                return procesados
+            procesados += 1
+            trabajo.recibido_en = time.monotonic()
+            self._registrar_resultado(trabajo)
+
+    def _registrar_resultado(self, trabajo):
+        estado = self.impresoras[trabajo.impresora]
+        estado.ultimo_mensaje = trabajo.mensaje
+        if self.finalizado:
+            # Resultado tardío de un lote cancelado.
+            return
+        if trabajo.exito:
+            self._registrar(EVENTO_COMPLETADA, copia=trabajo.copia, copias=trabajo.copias, impresora=trabajo.impresora)
+            segundos = trabajo.terminado_en - trabajo.iniciado_en
+            estado.rendimiento.registrar_exito(self.config.get('paginas', 100) * trabajo.cantidad, segundos)
+            estado.estado = IMPRESORA_CONFIRMANDO
+            self.al_cambiar()
+            self.al_pedir_confirmacion(estado, trabajo)
+        else:
+            # La copia vuelve a la cabeza de la cola y la impresora queda parada
+            # hasta que el operador la revise y la reanude.
+            estado.rendimiento.registrar_fallo()
+            self.metricas.registrar_fallo()
+            estado.estado = IMPRESORA_FALLO
+            self._registrar(EVENTO_FALLIDA, copia=trabajo.copia, copias=trabajo.copias,
+                            impresora=trabajo.impresora, mensaje=trabajo.mensaje, incierta=trabajo.incierto)
+            if not trabajo.incierto:
+                self._reencolar(trabajo)
+            # Si no se sabe si se imprimió, la copia se queda en la impresora
+            # hasta que el operador lo compruebe (ver `resolver_incierto`).
+            self.al_cambiar()
+            self.al_fallo(estado, trabajo)
+            # Las demás impresoras pueden hacerse cargo de la copia.
+            self.rellenar()
+
+    def _reencolar(self, trabajo):
+        for copia, hechos in zip(trabajo.copias, trabajo.progreso):
+            if hechos:
+                self.fragmentos_hechos[copia] = hechos
+        self.pendientes.extendleft(reversed(trabajo.copias))
+
+    def resolver_incierto(self, nombre, impresa):
+        """
+        Registra lo que el operador comprobó en una impresora cuya copia falló
+        sin saberse si llegó a imprimirse (`TrabajoCopia.incierto`). La
+        impresora sigue con fallo hasta que se reanude.
+
+        Si lo que quedó en duda es un fragmento (`paginas_por_fragmento`), la
+        copia vuelve a la cola en cualquier caso: si el fragmento salió, se
+        reanuda desde el siguiente.
+
+        :param nombre: Impresora de la copia.
+        :param impresa: True si la copia (o el fragmento) salió impresa;
+                        False para volver a ponerla en la cola.
+        """
+        estado = self.impresoras[nombre]
+        trabajo = estado.trabajo
+        if self.finalizado or estado.estado != IMPRESORA_FALLO or trabajo is None or not trabajo.incierto:
+            return
+        estado.trabajo = None
+        if trabajo.fragmento_incierto is not None:
+            if impresa:
+                trabajo.progreso[trabajo.fragmento_incierto] += 1
+            self._reencolar(trabajo)
+        elif impresa:
+            trabajo.confirmado_en = time.monotonic()
+            estado.copias_hechas += trabajo.cantidad
+            self.copias_confirmadas += trabajo.cantidad
+            self._registrar(EVENTO_CONFIRMADA, copia=trabajo.copia, copias=trabajo.copias, impresora=nombre)
+            if self.copias_confirmadas >= self.total_copias:
+                self._finalizar()
+                return
+        else:
+            self._reencolar(trabajo)
+        self.rellenar()
+
+    def pendientes_de_comprobar(self):
+        """
+        :return: Impresoras con una copia que falló sin saberse si se imprimió.
+        :rtype: list[EstadoImpresora]
+        """
+        return [e for e in self.impresoras.values()
+                if e.estado == IMPRESORA_FALLO and e.trabajo is not None and e.trabajo.incierto]
+
+    def confirmar(self, nombre, continuar=True):
+        """
+        Registra la respuesta del operador a la copia (o grupo) terminada en una impresora.
+
+        :param nombre: Impresora cuya copia se confirma.
+        :param continuar: False para pausar esa impresora tras confirmar la copia.
+        """
+        estado = self.impresoras[nombre]
+        if estado.estado != IMPRESORA_CONFIRMANDO:
+            return
+        trabajo = estado.trabajo
+        trabajo.confirmado_en = time.monotonic()
+        self.metricas.registrar_trabajo(trabajo)
+        estado.copias_hechas += trabajo.cantidad
+        self.copias_confirmadas += trabajo.cantidad
+        self._registrar(EVENTO_CONFIRMADA, copia=trabajo.copia, copias=trabajo.copias, impresora=nombre)
+        estado.trabajo = None
+        estado.estado = IMPRESORA_LIBRE if continuar else IMPRESORA_PAUSADA
+
+        if self.copias_confirmadas >= self.total_copias:
+            self._finalizar()
+            return
+        self.rellenar()
+
+    def reanudar(self, nombre=None):
+        """
+        Reanuda una impresora pausada o con fallo (o todas si `nombre` es None).
+        Las que tienen una copia pendiente de comprobar (ver `resolver_incierto`)
+        siguen paradas.
+        """
+        inciertas = self.pendientes_de_comprobar()
+        for estado in self.impresoras.values():
+            if estado in inciertas or (nombre is not None and estado.nombre != nombre):
+                continue
+            if estado.estado in (IMPRESORA_PAUSADA, IMPRESORA_FALLO):
+                estado.estado = IMPRESORA_LIBRE
+        self.rellenar()
+
+    def hay_impresora_activa(self):
+        """True si alguna impresora está imprimiendo o esperando confirmación."""
+        return any(e.estado in (IMPRESORA_IMPRIMIENDO, IMPRESORA_CONFIRMANDO) for e in self.impresoras.values())
@@ -1,5 +1,206 @@
 import json
 import os
+import threading
+
+from puntos_control import validar_puntos_control
+
+# Esquema mínimo de un perfil: campo -> tipo(s) aceptado(s).
+CAMPOS_OBLIGATORIOS = {
+    'paginas': int,
+    'tamano': str,
+    'papel': str,
+    'configuracion_impresora': str,
+}
+# Campos opcionales que, si aparecen, deben tener el tipo indicado.
+CAMPOS_OPCIONALES = {
+    'descripcion': str,
+    'marca_agua_cola': int,
+    'tiempo_maximo_espera': (int, float),
+    'modo_envio': str,
+    'pdf_directo': bool,
+    'duplex': bool,
+    'puntos_control': dict,
+    'paginas_por_fragmento': int,
+    'color': bool,
+}
+
+def validar_perfil(datos):
+    """
+    Comprueba que un perfil cargado de JSON cumpla el esquema mínimo
+    (`paginas`, `tamano`, `papel`, `configuracion_impresora`).
+
+    :param datos: Contenido decodificado del archivo JSON.
+    :return: Lista de errores encontrados (vacía si el perfil es válido).
+    :rtype: list[str]
+    """
+    if not isinstance(datos, dict):
+        return ["el perfil debe ser un objeto JSON"]
+
+    errores = []
+    for campo in CAMPOS_OBLIGATORIOS:
+        if campo not in datos:
+            errores.append(f"falta el campo '{campo}'")
+    for campo, tipo in {**CAMPOS_OBLIGATORIOS, **CAMPOS_OPCIONALES}.items():
+        # bool es subclase de int en Python, pero no es un número válido aquí.
+        if campo in datos and (not isinstance(datos[campo], tipo) or (isinstance(datos[campo], bool) and tipo is not bool)):
+            errores.append(f"el campo '{campo}' tiene un tipo no válido")
+    if isinstance(datos.get('paginas'), int) and datos['paginas'] <= 0:
+        errores.append("'paginas' debe ser mayor que 0")
+    if isinstance(datos.get('paginas_por_fragmento'), int) and datos['paginas_por_fragmento'] <= 0:
+        errores.append("'paginas_por_fragmento' debe ser mayor que 0")
+    if isinstance(datos.get('puntos_control'), dict):
+        errores.extend(validar_puntos_control(datos['puntos_control']))
+    return errores
+
+
+class IndicePerfiles:
+    """
+    Índice en memoria de los perfiles de `libros_config`.
+
+    Guarda cada perfil junto con el `mtime` y el tamaño de su archivo, de modo
+    que `actualizar` solo vuelve a leer (y a validar) los archivos que han
+    cambiado. Un hilo opcional de vigilancia lo mantiene al día en segundo
+    plano; quien lo use puede comparar `version` para saber si debe refrescarse.
+    """
+    def __init__(self, carpeta_config='libros_config'):
+        """
+        :param carpeta_config: Carpeta de perfiles, relativa a la raíz del proyecto.
+        """
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.carpeta_config = carpeta_config
+        self.full_path = os.path.join(base_dir, carpeta_config)
+
+        self.perfiles = {}     # nombre -> perfil validado
+        self.errores = {}      # nombre de archivo -> motivo por el que se ignora
+        self.version = 0       # Aumenta cada vez que cambia el contenido del índice.
+        self.cargado = False   # True tras la primera lectura completa de la carpeta.
+        self._entradas = {}    # nombre de archivo -> (mtime_ns, tamaño, perfil o None)
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._hilo = None
+
+    def _leer(self, filename, filepath):
+        """
+        Lee y valida un archivo de perfil.
+
+        :return: El perfil decodificado, o None si hay que ignorarlo.
+        """
+        try:
+            # Abre el archivo en modo lectura con codificación UTF-8.
+            with open(filepath, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+        except json.JSONDecodeError:
+            # Maneja el error si el contenido del archivo no es un JSON válido.
+            self.errores[filename] = "JSON mal formado"
+            print(f"Error al leer '{filename}': JSON mal formado. Ignorando.")
+            return None
+        except Exception as e:
+            # Manejo de cualquier otro error durante la lectura (ej. error de permisos).
+            self.errores[filename] = str(e)
+            print(f"Error inesperado al cargar '{filename}': {e}. Ignorando.")
+            return None
+
+        errores = validar_perfil(datos)
+        if errores:
+            self.errores[filename] = "; ".join(errores)
+            print(f"Perfil '{filename}' no válido: {self.errores[filename]}. Ignorando.")
+            return None
+        self.errores.pop(filename, None)
+        return datos
+
+    def actualizar(self):
+        """
+        Sincroniza el índice con la carpeta. Los archivos sin cambios de `mtime`
+        ni de tamaño no se vuelven a abrir.
+
+        :return: True si el conjunto de perfiles ha cambiado.
+        :rtype: bool
+        """
+        # Si la carpeta no existe, la crea: todavía no hay perfiles para cargar.
+        if not os.path.exists(self.full_path):
+            print(f"Advertencia: La carpeta '{self.carpeta_config}' no existe en la raíz del proyecto. Creándola...")
+            os.makedirs(self.full_path, exist_ok=True)
+
+        with self._lock:
+            cambiado = False
+            vistos = set()
+            with os.scandir(self.full_path) as entradas:
+                for entrada in entradas:
+                    # Procesa solo archivos con extensión .json.
+                    if not entrada.name.endswith(".json") or not entrada.is_file():
+                        continue
+                    vistos.add(entrada.name)
+                    info = entrada.stat()
+                    firma = (info.st_mtime_ns, info.st_size)
+                    anterior = self._entradas.get(entrada.name)
+                    if anterior is not None and anterior[:2] == firma:
+                        continue
+                    self._entradas[entrada.name] = firma + (self._leer(entrada.name, entrada.path),)
+                    cambiado = True
+
+            # Perfiles cuyo archivo ha desaparecido.
+            for filename in set(self._entradas) - vistos:
+                del self._entradas[filename]
+                self.errores.pop(filename, None)
+                cambiado = True
+
+            if cambiado:
+                # El nombre del libro/perfil es el nombre del archivo sin la extensión.
+                self.perfiles = {
+                    filename[:-len(".json")]: entrada[2]
+                    for filename, entrada in sorted(self._entradas.items())
+                    if entrada[2] is not None
+                }
+                self.version += 1
+            self.cargado = True
+            return cambiado
+
+    def obtener(self):
+        """
+        :return: Diccionario {nombre_perfil: perfil} con los perfiles válidos.
+        :rtype: dict
+        """
+        with self._lock:
+            return self.perfiles
+
+    def iniciar_vigilancia(self, intervalo=2.0):
+        """
+        Arranca un hilo que llama a `actualizar` cada `intervalo` segundos.
+        Cada comprobación solo hace un `stat` por archivo. Si el índice aún no
+        se ha cargado, la primera lectura se hace nada más arrancar el hilo,
+        así la interfaz puede mostrarse antes de leer los perfiles.
+        """
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._parar.clear()
+        self._hilo = threading.Thread(target=self._vigilar, args=(intervalo,), name="indice-perfiles", daemon=True)
+        self._hilo.start()
+
+    def detener_vigilancia(self):
+        self._parar.set()
+
+    def _vigilar(self, intervalo):
+        espera = intervalo if self.cargado else 0.0
+        while not self._parar.wait(espera):
+            espera = intervalo
+            try:
+                self.actualizar()
+            except Exception as e:
+                # La carpeta puede desaparecer o quedar inaccesible un momento.
+                print(f"Error al vigilar '{self.carpeta_config}': {e}")
+
+
+# Un índice por carpeta, compartido por todo el proceso.
+_indices = {}
+
+def obtener_indice(carpeta_config='libros_config'):
+    """
+    :return: El `IndicePerfiles` compartido de la carpeta indicada.
+    :rtype: IndicePerfiles
+    """
+    if carpeta_config not in _indices:
+        _indices[carpeta_config] = IndicePerfiles(carpeta_config)
+    return _indices[carpeta_config]
 
 def cargar_datos_libros_dinamicos(carpeta_config='libros_config'):
     """
@@ -10,48 +211,18 @@ def cargar_datos_libros_dinamicos(carpeta_config='libros_config'):
     1. Resuelve la ruta absoluta asumiendo que `carpeta_config` se encuentra 
        en la raíz del proyecto (dos niveles por encima del script actual).
     2. Si la carpeta no existe, la crea y devuelve un diccionario vacío.
-    3. Itera sobre los archivos `.json` y los carga.
-    4. Incluye manejo de errores para archivos JSON mal formados (`json.JSONDecodeError`).
+    3. Itera sobre los archivos `.json` y los carga, reutilizando los que no han
+       cambiado desde la llamada anterior (ver `IndicePerfiles`).
+    4. Incluye manejo de errores para archivos JSON mal formados (`json.JSONDecodeError`)
+       y descarta los perfiles que no cumplen el esquema (`validar_perfil`).
 
     :param carpeta_config: El nombre de la carpeta que contiene los archivos JSON.
                            Por defecto es 'libros_config'.
     :type carpeta_config: str
     :return: Un diccionario (dict) donde la clave es el nombre del perfil (nombre del archivo JSON sin extensión) 
-             y el valor es el contenido del perfil decodificado (otro diccionario o lista).
+             y el valor es el contenido del perfil decodificado (otro diccionario).
     :rtype: dict
     """
-    datos_libros = {}
-
-    # Determina la ruta absoluta de la carpeta de configuración.
-    # Sube dos niveles (os.path.dirname anidado) para encontrar la carpeta 'libros_config' en la raíz del proyecto.
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    full_path = os.path.join(base_dir, carpeta_config)
-    
-    # Verifica si la carpeta existe. Si no, la crea y retorna un diccionario vacío, 
-    # ya que no hay perfiles para cargar.
-    if not os.path.exists(full_path):
-        print(f"Advertencia: La carpeta '{carpeta_config}' no existe en la raíz del proyecto. Creándola...")
-        os.makedirs(full_path)
-        return datos_libros
-    
-    # Itera sobre todos los archivos en la carpeta de configuración.
-    for filename in os.listdir(full_path):
-        # Procesa solo archivos con extensión .json.
-        if filename.endswith(".json"):
-            filepath = os.path.join(full_path, filename)
-            # El nombre del libro/perfil es el nombre del archivo sin la extensión.
-            nombre_libro = filename.replace(".json", "")
-            
-            try:
-                # Abre el archivo en modo lectura con codificación UTF-8.
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    datos_libros[nombre_libro] = json.load(f)
-            except json.JSONDecodeError:
-                # Maneja el error si el contenido del archivo no es un JSON válido.
-                print(f"Error al leer '{filename}': JSON mal formado. Ignorando.")
-            except Exception as e:
-                # Manejo de cualquier otro error durante la lectura (ej. error de permisos).
-                print(f"Error inesperado al cargar '{filename}': {e}. Ignorando.")
-                
-    # Devuelve el diccionario de perfiles cargados.
-    return datos_libros
\ No newline at end of file
+    indice = obtener_indice(carpeta_config)
+    indice.actualizar()
+    return indice.obtener()
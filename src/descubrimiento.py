@@ -0,0 +1,176 @@
+import json
+import os
+import threading
+import time
+
+import printer_utils
+from backends import DISPOSITIVO_DESCONECTADO
+
+# Segundos durante los que el índice guardado en disco se considera al día;
+# pasado ese tiempo se vuelve a consultar al spooler en cuanto arranca la vigilancia.
+TTL_INDICE = 300.0
+# Las capacidades (papeles, dúplex, bandejas) casi nunca cambian y son la
+# consulta más lenta en impresoras de red, así que se refrescan mucho menos.
+TTL_CAPACIDADES = 24 * 3600.0
+# Segundos entre dos consultas del estado de las impresoras en segundo plano.
+INTERVALO_DESCUBRIMIENTO = 30.0
+
+RUTA_CACHE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".impresoras_cache.json")
+
+
+class IndiceImpresoras:
+    """
+    Índice de las impresoras del sistema: estado, trabajos en cola y
+    capacidades de cada una.
+
+    Al crearse carga el último índice guardado en disco, así que la aplicación
+    puede mostrar las impresoras al instante sin esperar a `EnumPrinters`. Un
+    hilo de vigilancia consulta el backend en segundo plano y guarda el
+    resultado; quien lo use compara `version` para saber si debe refrescarse
+    (igual que con `IndicePerfiles`).
+    """
+    def __init__(self, backend=None, ruta_cache=RUTA_CACHE, ttl=TTL_INDICE, ttl_capacidades=TTL_CAPACIDADES):
+        """
+        :param backend: Backend a consultar (por defecto, el activo en `printer_utils`).
+        :param ruta_cache: Archivo donde se guarda el índice (None para no guardarlo).
+        :param ttl: Segundos durante los que el índice guardado se considera al día.
+        :param ttl_capacidades: Segundos durante los que se reutilizan las capacidades.
+        """
+        self.backend = backend
+        self.ruta_cache = ruta_cache
+        self.ttl = ttl
+        self.ttl_capacidades = ttl_capacidades
+
+        self.impresoras = {}        # nombre -> {'nombre', 'estado', 'cola', 'capacidades', 'capacidades_en'}
+        self.actualizado_en = 0.0   # `time.time()` de la última consulta al backend.
+        self.version = 0            # Aumenta cada vez que cambia el contenido del índice.
+        self.cargado = False        # True si hay datos (de la caché o de una consulta).
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._hilo = None
+        self._cargar_cache()
+
+    @property
+    def al_dia(self):
+        """True si la última consulta al backend es más reciente que `ttl`."""
+        return time.time() - self.actualizado_en < self.ttl
+
+    def _cargar_cache(self):
+        if not self.ruta_cache or not os.path.exists(self.ruta_cache):
+            return
+        try:
+            with open(self.ruta_cache, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+            impresoras = {i['nombre']: i for i in datos['impresoras']}
+            actualizado_en = float(datos['actualizado_en'])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Advertencia: se ignora la caché de impresoras ({e}).")
+            return
+        self.impresoras = impresoras
+        self.actualizado_en = actualizado_en
+        self.version = 1
+        self.cargado = True
+
+    def _guardar_cache(self):
+        if not self.ruta_cache:
+            return
+        datos = {'actualizado_en': self.actualizado_en, 'impresoras': list(self.impresoras.values())}
+        temporal = self.ruta_cache + ".tmp"
+        try:
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(datos, f, ensure_ascii=False, indent=1)
+            os.replace(temporal, self.ruta_cache)
+        except OSError as e:
+            print(f"Advertencia: no se pudo guardar la caché de impresoras: {e}")
+
+    def actualizar(self):
+        """
+        Consulta al backend el estado de todas las impresoras y, para las nuevas
+        o con capacidades caducadas, sus capacidades.
+
+        :return: True si el índice ha cambiado.
+        :rtype: bool
+        """
+        backend = self.backend or printer_utils.obtener_backend()
+        try:
+            estados = backend.estado_impresoras()
+        except Exception as e:
+            print(f"Error al buscar impresoras: {e}")
+            return False
+
+        ahora = time.time()
+        nuevas = {}
+        for info in estados:
+            anterior = self.impresoras.get(info['nombre'], {})
+            capacidades = anterior.get('capacidades')
+            capacidades_en = anterior.get('capacidades_en', 0.0)
+            if capacidades is None or ahora - capacidades_en > self.ttl_capacidades:
+                try:
+                    capacidades = backend.capacidades_impresora(info['nombre'])
+                    capacidades_en = ahora
+                except Exception as e:
+                    # Una impresora de red apagada puede no responder; se reintenta en la próxima vuelta.
+                    print(f"No se pudieron leer las capacidades de '{info['nombre']}': {e}")
+                    capacidades = capacidades or {}
+            nuevas[info['nombre']] = dict(info, capacidades=capacidades, capacidades_en=capacidades_en)
+
+        with self._lock:
+            cambiado = nuevas != self.impresoras
+            self.impresoras = nuevas
+            self.actualizado_en = ahora
+            self.cargado = True
+            if cambiado:
+                self.version += 1
+        self._guardar_cache()
+        return cambiado
+
+    def obtener(self):
+        """
+        :return: Diccionario {nombre: información} con todas las impresoras conocidas.
+        :rtype: dict
+        """
+        with self._lock:
+            return dict(self.impresoras)
+
+    def nombres(self, incluir_desconectadas=True):
+        """
+        :return: Nombres de las impresoras en el orden del spooler.
+        :rtype: list[str]
+        """
+        with self._lock:
+            return [nombre for nombre, info in self.impresoras.items()
+                    if incluir_desconectadas or info['estado'] != DISPOSITIVO_DESCONECTADO]
+
+    def iniciar_vigilancia(self, intervalo=INTERVALO_DESCUBRIMIENTO):
+        """
+        Arranca un hilo que llama a `actualizar` cada `intervalo` segundos. Si el
+        índice cargado de disco ha caducado, la primera consulta es inmediata.
+        """
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._parar.clear()
+        self._hilo = threading.Thread(target=self._vigilar, args=(intervalo,), name="indice-impresoras", daemon=True)
+        self._hilo.start()
+
+    def detener_vigilancia(self):
+        self._parar.set()
+
+    def _vigilar(self, intervalo):
+        espera = intervalo if self.al_dia else 0.0
+        while not self._parar.wait(espera):
+            self.actualizar()
+            espera = intervalo
+
+
+# Índice compartido por todo el proceso.
+_indice = None
+
+def obtener_indice_impresoras():
+    """
+    :return: El `IndiceImpresoras` compartido, con la caché de la raíz del proyecto.
+    :rtype: IndiceImpresoras
+    """
+    global _indice
+    if _indice is None:
+        _indice = IndiceImpresoras()
+    return _indice
@@ -0,0 +1,159 @@
+import inspect
+import queue
+import threading
+import time
+
+import printer_utils
+
+class TrabajoCopia:
+    """
+    Estado de una copia (o de un grupo de copias enviado como un único
+    trabajo intercalado) entregada a imprimir.
+
+    Sustituye a los campos sueltos que antes vivían en la aplicación
+    (`thread_result`): cada trabajo lleva su destino, su resultado y las marcas
+    de tiempo de su paso por el despachador.
+    """
+    def __init__(self, impresora, ruta, config, copias, total, progreso=None):
+        """
+        :param impresora: Nombre de la impresora de destino.
+        :param ruta: Ruta del archivo a imprimir.
+        :param config: Diccionario del perfil de impresión.
+        :param copias: Números de las copias del lote que incluye este trabajo
+                       (empezando en 1), o un único número.
+        :param total: Número total de copias del lote.
+        :param progreso: Fragmentos ya impresos de cada copia (por defecto, ninguno).
+        """
+        self.impresora = impresora
+        self.ruta = ruta
+        self.config = config
+        self.copias = list(copias) if isinstance(copias, (list, tuple)) else [copias]
+        self.total = total
+        # Fragmentos ya impresos de cada copia cuando el perfil usa
+        # `paginas_por_fragmento`; el hilo de envío los va actualizando.
+        self.progreso = list(progreso) if progreso is not None else [0] * len(self.copias)
+
+        self.exito = None      # None mientras la copia no ha terminado.
+        self.mensaje = ""
+        # True si falló sin que se sepa si llegó a imprimirse (el trabajo no
+        # terminó a tiempo y no se pudo cancelar): el operador debe comprobarlo.
+        self.incierto = False
+        # Con `paginas_por_fragmento`, posición en `progreso` de la copia cuyo
+        # último fragmento quedó en duda (solo ese fragmento, no toda la copia).
+        self.fragmento_incierto = None
+        # Marcas de tiempo (`time.monotonic`) de cada etapa, ver `metricas`.
+        self.encolado_en = time.monotonic()
+        self.iniciado_en = None
+        self.sometido_en = None     # El spooler aceptó el trabajo.
+        self.terminado_en = None
+        self.recibido_en = None     # El controlador recogió el resultado.
+        self.confirmado_en = None   # El operador confirmó la copia.
+
+    @property
+    def terminado(self):
+        return self.exito is not None
+
+    @property
+    def copia(self):
+        """Primera copia del trabajo."""
+        return self.copias[0]
+
+    @property
+    def cantidad(self):
+        return len(self.copias)
+
+    @property
+    def descripcion(self):
+        """
+        :return: Texto como "copia 3" o "copias 1-5" para mostrar al operador.
+        :rtype: str
+        """
+        if self.cantidad == 1:
+            return f"copia {self.copia}"
+        if self.copias == list(range(self.copia, self.copia + self.cantidad)):
+            return f"copias {self.copia}-{self.copias[-1]}"
+        return "copias " + ", ".join(str(c) for c in self.copias)
+
+
+class Despachador:
+    """
+    Hilo de impresión persistente alimentado por una cola de trabajos.
+
+    En lugar de crear un `threading.Thread` por copia, un único hilo consume
+    los `TrabajoCopia` de `trabajos`, llama a `enviar_a_impresora` y deja cada
+    trabajo terminado en `resultados`, que la interfaz vacía desde su propio
+    hilo. Así no hay estado compartido entre hilos más allá de las dos colas.
+    """
+    def __init__(self, funcion_envio=None, resultados=None):
+        """
+        :param funcion_envio: Función `(impresora, ruta, config, copias=1)` que
+                              devuelve (bool, str), como `enviar_a_impresora`
+                              (la de `printer_utils` por defecto). Si además
+                              acepta `marcas` y/o `progreso`, se le pasan.
+        :param resultados: Cola donde dejar los trabajos terminados (se crea
+                           una nueva si no se indica).
+        """
+        self.funcion_envio = funcion_envio
+        self.trabajos = queue.Queue()
+        self.resultados = resultados if resultados is not None else queue.Queue()
+        self._hilo = None
+
+    def iniciar(self):
+        """Arranca el hilo de trabajo si no está ya en marcha."""
+        if self._hilo is None or not self._hilo.is_alive():
+            self._hilo = threading.Thread(target=self._bucle, name="despachador", daemon=True)
+            self._hilo.start()
+
+    def encolar(self, trabajo):
+        """
+        :param trabajo: `TrabajoCopia` a imprimir.
+        """
+        self.trabajos.put(trabajo)
+
+    def detener(self, esperar=True):
+        """Termina el hilo después de los trabajos ya encolados."""
+        self.trabajos.put(None)
+        if esperar and self._hilo is not None:
+            self._hilo.join()
+
+    def _bucle(self):
+        while True:
+            trabajo = self.trabajos.get()
+            if trabajo is None:
+                break
+
+            trabajo.iniciado_en = time.monotonic()
+            funcion = self.funcion_envio or printer_utils.enviar_a_impresora
+            marcas = {}
+            opcionales = {'marcas': marcas, 'progreso': trabajo.progreso}
+            try:
+                admitidos = _argumentos_admitidos(funcion, opcionales)
+                exito, mensaje = funcion(trabajo.impresora, trabajo.ruta, trabajo.config, copias=trabajo.cantidad,
+                                         **{nombre: opcionales[nombre] for nombre in admitidos})
+            except Exception as e:
+                # Un fallo inesperado no debe matar el hilo: se informa como fallo de la copia.
+                exito, mensaje = False, f"!!! ERROR inesperado al imprimir: {e}"
+            trabajo.sometido_en = marcas.get('sometido')
+            trabajo.incierto = not exito and marcas.get('incierto', False)
+            trabajo.fragmento_incierto = marcas.get('fragmento_incierto') if trabajo.incierto else None
+            trabajo.exito = exito
+            trabajo.mensaje = mensaje
+            trabajo.terminado_en = time.monotonic()
+            self.resultados.put(trabajo)
+
+
+def _argumentos_admitidos(funcion, nombres):
+    """
+    :return: Los `nombres` de argumento que `funcion` acepta por palabra clave
+             (todos si tiene `**kwargs`).
+    :rtype: list[str]
+    """
+    try:
+        parametros = inspect.signature(funcion).parameters.values()
+    except (TypeError, ValueError):
+        # Sin firma inspeccionable (algunas funciones en C): solo la básica.
+        return []
+    if any(p.kind == p.VAR_KEYWORD for p in parametros):
+        return list(nombres)
+    aceptados = {p.name for p in parametros if p.kind in (p.POSITIONAL_OR_KEYWORD, p.KEYWORD_ONLY)}
+    return [nombre for nombre in nombres if nombre in aceptados]
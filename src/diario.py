@@ -0,0 +1,192 @@
+import json
+import os
+import time
+import uuid
+
+# Eventos que se registran en el diario.
+EVENTO_LOTE_INICIADO = "lote_iniciado"
+EVENTO_ENVIADA = "enviada"
+EVENTO_COMPLETADA = "completada"
+EVENTO_CONFIRMADA = "confirmada"
+EVENTO_FALLIDA = "fallida"
+EVENTO_LOTE_FINALIZADO = "lote_finalizado"
+EVENTO_LOTE_CANCELADO = "lote_cancelado"
+EVENTO_INSTANTANEA = "instantanea"   # Estado completo de un lote, escrito al compactar.
+
+# Eventos que cambian lo que se reanudaría tras un corte de luz: se hace
+# `fsync` en cuanto se registran, aunque después no llegue ningún otro.
+EVENTOS_SINCRONOS = (EVENTO_LOTE_INICIADO, EVENTO_COMPLETADA, EVENTO_CONFIRMADA, EVENTO_FALLIDA,
+                     EVENTO_LOTE_FINALIZADO, EVENTO_LOTE_CANCELADO)
+# El fsync del resto (los envíos, que no cambian la reanudación) se agrupa:
+# se hace cada `REGISTROS_POR_FSYNC` registros o cada `SEGUNDOS_POR_FSYNC`
+# segundos, o junto con el siguiente evento síncrono.
+REGISTROS_POR_FSYNC = 16
+SEGUNDOS_POR_FSYNC = 2.0
+
+# Tamaño a partir del cual el diario se reescribe solo con los lotes abiertos.
+UMBRAL_COMPACTACION = 256 * 1024
+
+RUTA_POR_DEFECTO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "diario_trabajos.jsonl")
+
+
+class LoteInterrumpido:
+    """
+    Lote que quedó a medias según el diario: los datos necesarios para
+    recrearlo y las copias que ya salieron de la impresora.
+    """
+    def __init__(self, lote, datos, hechas=()):
+        self.lote = lote
+        self.ruta = datos.get('ruta')
+        self.perfil = datos.get('perfil')
+        self.config = datos.get('config', {})
+        self.impresoras = datos.get('impresoras', [])
+        self.total_copias = datos.get('total_copias', 0)
+        self.hechas = set(hechas)
+
+    def datos(self):
+        return {
+            'ruta': self.ruta,
+            'perfil': self.perfil,
+            'config': self.config,
+            'impresoras': self.impresoras,
+            'total_copias': self.total_copias,
+        }
+
+    @property
+    def siguiente_copia(self):
+        """Primera copia que todavía no se ha impreso."""
+        return min(set(range(1, self.total_copias + 1)) - self.hechas, default=self.total_copias + 1)
+
+
+class DiarioTrabajos:
+    """
+    Diario de solo añadido (JSONL) con cada transición de las copias.
+
+    Cada registro se escribe y se vacía al sistema operativo al momento, así que
+    sobrevive a un cierre inesperado de la aplicación. El `fsync` (necesario
+    para sobrevivir a un corte de luz) es inmediato para los `EVENTOS_SINCRONOS`
+    y se agrupa para los envíos, que son los únicos que no afectan a la reanudación.
+    Al abrirlo se reproduce para encontrar los lotes interrumpidos, y cuando
+    crece demasiado se compacta reescribiendo solo el estado de los lotes abiertos.
+    """
+    def __init__(self, ruta=RUTA_POR_DEFECTO, umbral_compactacion=UMBRAL_COMPACTACION):
+        self.ruta = ruta
+        self.umbral_compactacion = umbral_compactacion
+        self._lotes = {}                # Lotes abiertos: id -> LoteInterrumpido
+        self._archivo = None
+        self._sin_sincronizar = 0
+        self._ultimo_fsync = time.monotonic()
+
+        self._reproducir()
+        if os.path.exists(self.ruta) and os.path.getsize(self.ruta) > self.umbral_compactacion:
+            self.compactar()
+        self._abrir()
+
+    def _abrir(self):
+        self._archivo = open(self.ruta, 'a', encoding='utf-8')
+
+    def _reproducir(self):
+        """Reconstruye en memoria los lotes abiertos leyendo el diario completo."""
+        if not os.path.exists(self.ruta):
+            return
+        with open(self.ruta, 'r', encoding='utf-8') as f:
+            for texto in f:
+                try:
+                    registro = json.loads(texto)
+                except json.JSONDecodeError:
+                    # Última línea cortada por un cierre inesperado: se ignora.
+                    continue
+                self._aplicar(registro)
+
+    def _aplicar(self, registro):
+        evento = registro.get('evento')
+        lote = registro.get('lote')
+        if evento == EVENTO_LOTE_INICIADO:
+            self._lotes[lote] = LoteInterrumpido(lote, registro.get('datos', {}))
+        elif evento == EVENTO_INSTANTANEA:
+            self._lotes[lote] = LoteInterrumpido(lote, registro.get('datos', {}), registro.get('hechas', []))
+        elif evento in (EVENTO_COMPLETADA, EVENTO_CONFIRMADA) and lote in self._lotes:
+            # Un trabajo intercalado registra todas sus copias en `copias`.
+            self._lotes[lote].hechas.update(registro.get('copias') or [registro['copia']])
+        elif evento in (EVENTO_LOTE_FINALIZADO, EVENTO_LOTE_CANCELADO):
+            self._lotes.pop(lote, None)
+
+    def lotes_interrumpidos(self):
+        """
+        :return: Lotes que se iniciaron y no llegaron a finalizar ni cancelarse.
+        :rtype: list[LoteInterrumpido]
+        """
+        return list(self._lotes.values())
+
+    def registrar(self, evento, lote, **campos):
+        """
+        Añade un registro al diario.
+
+        :param evento: Uno de los `EVENTO_*`.
+        :param lote: Identificador del lote.
+        :param campos: Datos del evento (ej. `copia`, `impresora`, `mensaje`).
+        """
+        registro = {'t': round(time.time(), 3), 'evento': evento, 'lote': lote}
+        registro.update(campos)
+        self._aplicar(registro)
+
+        self._archivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        self._archivo.flush()
+        self._sin_sincronizar += 1
+
+        if (evento in EVENTOS_SINCRONOS or self._sin_sincronizar >= REGISTROS_POR_FSYNC
+                or time.monotonic() - self._ultimo_fsync >= SEGUNDOS_POR_FSYNC):
+            self.sincronizar()
+
+        cierra_lote = evento in (EVENTO_LOTE_FINALIZADO, EVENTO_LOTE_CANCELADO)
+        if cierra_lote and self._archivo.tell() > self.umbral_compactacion:
+            self.compactar()
+
+    def sincronizar(self):
+        """Fuerza el `fsync` de los registros pendientes."""
+        if self._archivo is not None and self._sin_sincronizar:
+            os.fsync(self._archivo.fileno())
+        self._sin_sincronizar = 0
+        self._ultimo_fsync = time.monotonic()
+
+    def compactar(self):
+        """
+        Reescribe el diario con una instantánea por lote abierto, de forma
+        atómica (archivo temporal + `os.replace`), para que la reproducción
+        siga siendo rápida tras meses de uso.
+        """
+        if self._archivo is not None:
+            self.sincronizar()
+            self._archivo.close()
+
+        temporal = self.ruta + ".tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            for lote in self._lotes.values():
+                registro = {
+                    't': round(time.time(), 3),
+                    'evento': EVENTO_INSTANTANEA,
+                    'lote': lote.lote,
+                    'datos': lote.datos(),
+                    'hechas': sorted(lote.hechas),
+                }
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, self.ruta)
+
+        if self._archivo is not None:
+            self._abrir()
+
+    def cerrar(self):
+        if self._archivo is not None:
+            self.sincronizar()
+            self._archivo.close()
+            self._archivo = None
+
+
+def nuevo_id_lote():
+    """
+    :return: Identificador único para un lote nuevo.
+    :rtype: str
+    """
+    return uuid.uuid4().hex[:12]
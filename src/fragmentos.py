@@ -0,0 +1,271 @@
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+from backends import ESTADO_COMPLETADO, ESTADO_ERROR
+from monitor_trabajos import MonitorTrabajos
+
+# Fragmentos que pueden estar a la vez en el spooler: mientras se imprime uno,
+# el siguiente ya está entregado y la impresora no se queda parada entre ambos.
+FRAGMENTOS_EN_VUELO = 2
+# Fragmentos que se preparan por adelantado (extraídos del documento y listos
+# para entregar). Junto con `FRAGMENTOS_EN_VUELO` acota el disco y la memoria
+# usados, sea cual sea el tamaño del documento.
+FRAGMENTOS_PREPARADOS = 1
+
+# Extensiones que `DivisorPdf` sabe partir por rangos de páginas.
+EXTENSIONES_DIVISIBLES = ('.pdf',)
+
+_aviso_sin_pypdf = False
+
+
+def rangos_fragmentos(total_paginas, paginas_por_fragmento):
+    """
+    Divide un documento en rangos consecutivos de páginas.
+
+    :param total_paginas: Páginas del documento.
+    :param paginas_por_fragmento: Páginas máximas de cada fragmento.
+    :return: Lista de tuplas (inicio, fin), con `inicio` incluido y `fin`
+             excluido, empezando en 0.
+    :rtype: list[tuple[int, int]]
+    """
+    return [(inicio, min(inicio + paginas_por_fragmento, total_paginas))
+            for inicio in range(0, total_paginas, paginas_por_fragmento)]
+
+
+class DivisorPdf:
+    """
+    Extrae rangos de páginas de un PDF con `pypdf` (dependencia opcional).
+
+    El lector se abre de nuevo para cada fragmento: `pypdf` guarda en memoria
+    los objetos que va resolviendo, así que reutilizar un único lector haría
+    crecer la memoria con el tamaño del documento.
+    """
+    def __init__(self):
+        # Falla con ImportError si `pypdf` no está instalado.
+        import pypdf
+        self._pypdf = pypdf
+
+    def contar_paginas(self, ruta, config):
+        return len(self._pypdf.PdfReader(ruta).pages)
+
+    def extraer(self, ruta, inicio, fin, destino):
+        lector = self._pypdf.PdfReader(ruta)
+        escritor = self._pypdf.PdfWriter()
+        for numero in range(inicio, fin):
+            escritor.add_page(lector.pages[numero])
+        with open(destino, 'wb') as f:
+            escritor.write(f)
+
+
+class DivisorSimulado:
+    """
+    Divisor para `BackendSimulado`: el número de páginas sale del perfil y cada
+    fragmento es una copia del archivo original (el backend solo mira `paginas`).
+    """
+    def contar_paginas(self, ruta, config):
+        return config.get('paginas', 100)
+
+    def extraer(self, ruta, inicio, fin, destino):
+        shutil.copyfile(ruta, destino)
+
+
+def divisor_para(backend, ruta):
+    """
+    :return: El divisor adecuado para el backend y el archivo, o None si el
+             documento no se puede partir (formato no admitido o sin `pypdf`).
+    """
+    global _aviso_sin_pypdf
+    if backend.nombre == "simulado":
+        return DivisorSimulado()
+    if not ruta.lower().endswith(EXTENSIONES_DIVISIBLES):
+        return None
+    try:
+        return DivisorPdf()
+    except ImportError:
+        if not _aviso_sin_pypdf:
+            _aviso_sin_pypdf = True
+            print("Advertencia: pypdf no está instalado; los documentos se envían sin fragmentar.")
+        return None
+
+
+class ImpresorFragmentos:
+    """
+    Imprime un documento grande como una secuencia de trabajos más pequeños
+    (rangos de `paginas_por_fragmento` páginas) en lugar de uno solo.
+
+    Un hilo prepara los fragmentos por adelantado mientras la impresora
+    imprime los anteriores, y se mantienen hasta `en_vuelo` fragmentos en el
+    spooler para que el dispositivo no se quede parado entre uno y otro. Cada
+    fragmento se borra en cuanto termina de imprimirse, así que el disco y la
+    memoria usados no dependen del tamaño del documento.
+
+    `progreso` tiene una entrada por copia del trabajo con los fragmentos que
+    ya salieron de la impresora; se actualiza a medida que terminan, de modo
+    que un reintento continúa desde el último fragmento completado.
+    """
+    def __init__(self, backend, divisor, paginas_por_fragmento, en_vuelo=FRAGMENTOS_EN_VUELO,
+                 preparados=FRAGMENTOS_PREPARADOS):
+        """
+        :param backend: Instancia de `backends.BackendImpresion`.
+        :param divisor: Objeto con `contar_paginas(ruta, config)` y `extraer(ruta, inicio, fin, destino)`.
+        :param paginas_por_fragmento: Páginas máximas de cada fragmento.
+        :param en_vuelo: Fragmentos que pueden estar a la vez en el spooler.
+        :param preparados: Fragmentos que se preparan por adelantado.
+        """
+        self.backend = backend
+        self.divisor = divisor
+        self.paginas_por_fragmento = paginas_por_fragmento
+        self.en_vuelo = max(1, en_vuelo)
+        self.preparados = max(1, preparados)
+        self.monitor = MonitorTrabajos(backend)
+
+    def imprimir(self, printer_name, file_path, config, rangos, progreso, marcas=None):
+        """
+        Envía las copias pendientes del documento fragmento a fragmento.
+
+        :param rangos: Rangos de páginas de cada fragmento (ver `rangos_fragmentos`).
+        :param progreso: Lista con los fragmentos ya impresos de cada copia
+                         (se modifica a medida que terminan).
+        :param marcas: Diccionario opcional donde se anota en 'sometido' el
+                       instante en que el spooler aceptó el primer fragmento y,
+                       si un fragmento no terminó a tiempo ni se pudo cancelar,
+                       'incierto' y en 'fragmento_incierto' la posición en
+                       `progreso` de su copia.
+        :return: Una tupla (bool, str) como la de `enviar_a_impresora`.
+        :rtype: tuple[bool, str]
+        """
+        secuencia = [(copia, indice) for copia, hechos in enumerate(progreso)
+                     for indice in range(hechos, len(rangos))]
+        if not secuencia:
+            return True, "Todos los fragmentos ya estaban impresos."
+
+        directorio = tempfile.mkdtemp(prefix="printflow_fragmentos_")
+        listos = queue.Queue(maxsize=self.preparados)
+        parar = threading.Event()
+        hilo = threading.Thread(target=self._preparar, name="fragmentos", daemon=True,
+                                args=(file_path, rangos, secuencia, directorio, listos, parar))
+        hilo.start()
+
+        tiempo_maximo = config.get('tiempo_maximo_espera')
+        en_spooler = []     # (copia, indice, id_trabajo, ruta_fragmento) en orden de envío.
+        enviados = 0
+        fallo = None        # Mensaje del primer envío fallido; se deja terminar lo ya entregado.
+        try:
+            while (enviados < len(secuencia) and fallo is None) or en_spooler:
+                # 1. Se llena la ventana de fragmentos en el spooler.
+                while fallo is None and enviados < len(secuencia) and len(en_spooler) < self.en_vuelo:
+                    preparado = listos.get()
+                    if isinstance(preparado, Exception):
+                        fallo = f"!!! ERROR al preparar el fragmento {secuencia[enviados][1] + 1}: {preparado}"
+                        break
+                    copia, indice, ruta_fragmento = preparado
+                    inicio, fin = rangos[indice]
+                    exito, mensaje, id_trabajo = self.backend.someter_trabajo(
+                        printer_name, ruta_fragmento, dict(config, paginas=fin - inicio), 1)
+                    if not exito:
+                        fallo = (f"{mensaje} (fragmento {indice + 1} de {len(rangos)}; "
+                                 f"la copia se reanudará desde ese fragmento)")
+                        break
+                    if marcas is not None and 'sometido' not in marcas:
+                        marcas['sometido'] = time.monotonic()
+                    en_spooler.append((copia, indice, id_trabajo, ruta_fragmento))
+                    enviados += 1
+                if not en_spooler:
+                    break
+
+                # 2. Se espera al más antiguo; mientras, el hilo prepara el siguiente.
+                copia, indice, id_trabajo, ruta_fragmento = en_spooler[0]
+                if id_trabajo is None:
+                    inicio, fin = rangos[indice]
+                    self.monitor.esperar_sin_localizar(printer_name, dict(config, paginas=fin - inicio))
+                    estado = ESTADO_COMPLETADO
+                else:
+                    estado = self.monitor.esperar_finalizacion(printer_name, id_trabajo, tiempo_maximo)
+                incierto = False
+                if estado is None and not self.backend.cancelar_trabajo(printer_name, id_trabajo):
+                    # O terminó justo al agotarse la espera, o sigue en la impresora.
+                    if self.backend.estado_trabajo(printer_name, id_trabajo) == ESTADO_COMPLETADO:
+                        estado = ESTADO_COMPLETADO
+                    else:
+                        incierto = True
+                elif estado == ESTADO_ERROR:
+                    # Puede seguir en la cola y reanudarse solo al arreglar la impresora.
+                    self.backend.cancelar_trabajo(printer_name, id_trabajo)
+                if estado != ESTADO_COMPLETADO:
+                    # Los fragmentos posteriores ya entregados saldrían desordenados
+                    # al reanudar: se retiran del spooler.
+                    for _, _, posterior, _ in en_spooler[1:]:
+                        self.backend.cancelar_trabajo(printer_name, posterior)
+                    if incierto:
+                        # `progreso` sigue en este fragmento: si no salió, la copia
+                        # se reanuda desde él; si salió, desde el siguiente.
+                        if marcas is not None:
+                            marcas['incierto'] = True
+                            marcas['fragmento_incierto'] = copia
+                        return False, (f"!!! ERROR: el fragmento {indice + 1} de {len(rangos)} no terminó en "
+                                       f"{tiempo_maximo}s y no se pudo cancelar. Compruebe en '{printer_name}' "
+                                       f"si se imprimió.")
+                    motivo = (f"la impresora '{printer_name}' marcó el trabajo con error" if estado == ESTADO_ERROR
+                              else f"el trabajo no terminó en {tiempo_maximo}s")
+                    return False, self._mensaje_fallo(indice, len(rangos), motivo)
+                en_spooler.pop(0)
+                progreso[copia] = indice + 1
+                os.remove(ruta_fragmento)
+        finally:
+            parar.set()
+            # Desbloquea al hilo si estaba esperando hueco en la cola.
+            while hilo.is_alive():
+                try:
+                    listos.get(timeout=0.05)
+                except queue.Empty:
+                    pass
+            shutil.rmtree(directorio, ignore_errors=True)
+
+        if fallo is not None:
+            return False, fallo
+        return True, f"Documento impreso en {len(rangos)} fragmentos de {self.paginas_por_fragmento} páginas."
+
+    def _preparar(self, file_path, rangos, secuencia, directorio, listos, parar):
+        for numero, (copia, indice) in enumerate(secuencia):
+            if parar.is_set():
+                return
+            inicio, fin = rangos[indice]
+            destino = os.path.join(directorio, f"{numero:06d}_{inicio + 1}-{fin}{os.path.splitext(file_path)[1]}")
+            try:
+                self.divisor.extraer(file_path, inicio, fin, destino)
+            except Exception as e:
+                listos.put(e)
+                return
+            listos.put((copia, indice, destino))
+
+    @staticmethod
+    def _mensaje_fallo(indice, total, motivo):
+        return (f"!!! ERROR en el fragmento {indice + 1} de {total}: {motivo}. "
+                f"La copia se reanudará desde ese fragmento.")
+
+
+def imprimir_por_fragmentos(backend, printer_name, file_path, config, progreso, marcas=None):
+    """
+    Imprime el documento por fragmentos si el perfil define `paginas_por_fragmento`
+    y el documento se puede partir.
+
+    :return: Una tupla (bool, str) como la de `enviar_a_impresora`, o None si
+             el documento debe enviarse entero.
+    """
+    divisor = divisor_para(backend, file_path)
+    if divisor is None:
+        return None
+    paginas_por_fragmento = config['paginas_por_fragmento']
+    try:
+        rangos = rangos_fragmentos(divisor.contar_paginas(file_path, config), paginas_por_fragmento)
+        if len(rangos) <= 1:
+            # Cabe en un solo fragmento: se envía entero, con las copias intercaladas.
+            return None
+        return ImpresorFragmentos(backend, divisor, paginas_por_fragmento).imprimir(
+            printer_name, file_path, config, rangos, progreso, marcas)
+    except Exception as e:
+        return False, f"!!! ERROR al fragmentar el documento: {e}"
@@ -0,0 +1,234 @@
+import collections
+import csv
+import math
+import os
+import time
+
+# Etapas que se miden en cada trabajo (una copia o un grupo de copias):
+ETAPA_COLA = "cola"           # En la cola del despachador hasta que su hilo lo toma.
+ETAPA_ENVIO = "envio"         # Entrega al spooler (`someter_trabajo`).
+ETAPA_ESPERA = "espera"       # Desde la entrega hasta que el monitor deja pasar la siguiente copia.
+ETAPA_SONDEO = "sondeo"       # Desde que el hilo termina hasta que la GUI/cliente recoge el resultado.
+ETAPA_OPERADOR = "operador"   # Desde que se pide la confirmación hasta que el operador responde.
+ETAPA_TOTAL = "total"         # Ciclo completo, de la cola a la confirmación.
+ETAPAS = (ETAPA_COLA, ETAPA_ENVIO, ETAPA_ESPERA, ETAPA_SONDEO, ETAPA_OPERADOR, ETAPA_TOTAL)
+
+# Muestras recientes por etapa que se guardan para calcular percentiles, y
+# filas por trabajo que se conservan para exportar a CSV. Acotan la memoria
+# sea cual sea la duración de la sesión.
+VENTANA_MUESTRAS = 1000
+MAXIMO_FILAS = 10000
+
+_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUTA_CSV = os.path.join(_RAIZ, "metricas_copias.csv")
+RUTA_PROMETHEUS = os.path.join(_RAIZ, "metricas_printflow.prom")
+
+COLUMNAS_CSV = ("lote", "impresora", "copias", "cantidad") + ETAPAS
+
+
+def percentil(ordenados, fraccion):
+    """
+    :param ordenados: Muestras ya ordenadas.
+    :param fraccion: Percentil entre 0 y 1 (ej. 0.95).
+    :return: El percentil por rango más cercano, o 0.0 si no hay muestras.
+    :rtype: float
+    """
+    if not ordenados:
+        return 0.0
+    indice = min(len(ordenados) - 1, max(0, math.ceil(fraccion * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+class EstadisticaEtapa:
+    """
+    Agregado de una etapa: contador, suma y máximo de todas las muestras, y
+    una ventana circular con las más recientes para los percentiles.
+    """
+    def __init__(self, ventana=VENTANA_MUESTRAS):
+        self.cuenta = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+        self.recientes = collections.deque(maxlen=ventana)
+
+    def agregar(self, segundos):
+        self.cuenta += 1
+        self.suma += segundos
+        self.maximo = max(self.maximo, segundos)
+        self.recientes.append(segundos)
+
+    @property
+    def media(self):
+        return self.suma / self.cuenta if self.cuenta else 0.0
+
+    def percentiles(self, *fracciones):
+        """
+        :return: Los percentiles pedidos sobre la ventana de muestras recientes.
+        :rtype: list[float]
+        """
+        ordenados = sorted(self.recientes)
+        return [percentil(ordenados, f) for f in fracciones]
+
+
+class RegistroMetricas:
+    """
+    Instrumentación de los tiempos de cada copia de un lote.
+
+    `ControladorLote` entrega cada `TrabajoCopia` confirmado a `registrar_trabajo`,
+    que calcula la duración de cada etapa a partir de sus marcas de tiempo. El
+    coste por copia es constante: solo se guardan agregados y ventanas acotadas.
+    """
+    def __init__(self, lote=None, ventana=VENTANA_MUESTRAS, maximo_filas=MAXIMO_FILAS):
+        self.lote = lote
+        self.etapas = {etapa: EstadisticaEtapa(ventana) for etapa in ETAPAS}
+        self.filas = collections.deque(maxlen=maximo_filas)
+        self.copias = 0
+        self.trabajos = 0
+        self.fallos = 0
+        self.inicio = time.monotonic()
+        self.fin = None
+
+    def registrar_trabajo(self, trabajo):
+        """
+        Añade las etapas de un trabajo confirmado. Las marcas que falten (por
+        ejemplo, si la función de envío no informa de la entrega) se omiten.
+
+        :param trabajo: `TrabajoCopia` con `confirmado_en` ya fijado.
+        """
+        marcas = (trabajo.encolado_en, trabajo.iniciado_en, trabajo.sometido_en,
+                  trabajo.terminado_en, trabajo.recibido_en, trabajo.confirmado_en)
+        tramos = {
+            ETAPA_COLA: (marcas[0], marcas[1]),
+            ETAPA_ENVIO: (marcas[1], marcas[2]),
+            ETAPA_ESPERA: (marcas[2], marcas[3]),
+            ETAPA_SONDEO: (marcas[3], marcas[4]),
+            ETAPA_OPERADOR: (marcas[4], marcas[5]),
+            ETAPA_TOTAL: (marcas[0], marcas[5]),
+        }
+        fila = {
+            "lote": self.lote,
+            "impresora": trabajo.impresora,
+            "copias": " ".join(str(c) for c in trabajo.copias),
+            "cantidad": trabajo.cantidad,
+        }
+        for etapa, (desde, hasta) in tramos.items():
+            if desde is None or hasta is None:
+                fila[etapa] = ""
+                continue
+            segundos = max(0.0, hasta - desde)
+            self.etapas[etapa].agregar(segundos)
+            fila[etapa] = round(segundos, 4)
+
+        self.filas.append(fila)
+        self.copias += trabajo.cantidad
+        self.trabajos += 1
+
+    def registrar_fallo(self):
+        self.fallos += 1
+
+    def cerrar(self):
+        """Marca el final del lote (fija la duración usada en copias por hora)."""
+        if self.fin is None:
+            self.fin = time.monotonic()
+
+    @property
+    def duracion(self):
+        return (self.fin or time.monotonic()) - self.inicio
+
+    @property
+    def copias_por_hora(self):
+        duracion = self.duracion
+        return self.copias / duracion * 3600 if duracion > 0 else 0.0
+
+    def resumen(self):
+        """
+        :return: Diccionario con los totales del lote y, por etapa, la media,
+                 p50, p95 y máximo en segundos.
+        :rtype: dict
+        """
+        etapas = {}
+        for etapa, estadistica in self.etapas.items():
+            if not estadistica.cuenta:
+                continue
+            p50, p95 = estadistica.percentiles(0.5, 0.95)
+            etapas[etapa] = {
+                "media": round(estadistica.media, 3),
+                "p50": round(p50, 3),
+                "p95": round(p95, 3),
+                "maximo": round(estadistica.maximo, 3),
+            }
+        return {
+            "copias": self.copias,
+            "trabajos": self.trabajos,
+            "fallos": self.fallos,
+            "duracion_s": round(self.duracion, 2),
+            "copias_por_hora": round(self.copias_por_hora, 2),
+            "etapas": etapas,
+        }
+
+    def texto_resumen(self):
+        """
+        :return: Resumen legible para mostrar al operador al terminar un lote.
+        :rtype: str
+        """
+        datos = self.resumen()
+        lineas = [
+            f"Copias: {datos['copias']} en {datos['trabajos']} trabajos ({datos['fallos']} fallos)",
+            f"Duración: {datos['duracion_s']:.0f} s — {datos['copias_por_hora']:.1f} copias/hora",
+            "",
+            f"{'Etapa':<10}{'p50':>9}{'p95':>9}{'máx':>9}",
+        ]
+        for etapa, valores in datos["etapas"].items():
+            lineas.append(f"{etapa:<10}{valores['p50']:>8.2f}s{valores['p95']:>8.2f}s{valores['maximo']:>8.2f}s")
+        return "\n".join(lineas)
+
+    def exportar_csv(self, ruta=RUTA_CSV):
+        """
+        Añade al CSV una fila por trabajo registrado (con cabecera si el archivo
+        es nuevo), de modo que el archivo acumula el histórico de todos los lotes.
+        """
+        nuevo = not os.path.exists(ruta) or os.path.getsize(ruta) == 0
+        with open(ruta, 'a', encoding='utf-8', newline='') as f:
+            escritor = csv.DictWriter(f, fieldnames=COLUMNAS_CSV)
+            if nuevo:
+                escritor.writeheader()
+            escritor.writerows(self.filas)
+
+    def exportar_prometheus(self, ruta=RUTA_PROMETHEUS):
+        """
+        Escribe las métricas en formato de texto de Prometheus (apto para el
+        colector `textfile` de node_exporter). El archivo se reemplaza de forma
+        atómica para que el colector nunca lea uno a medias.
+
+        Todas las series son `gauge`: describen el último lote y vuelven a
+        empezar con el siguiente, así que no cumplen la semántica de `counter`
+        ni de `summary` (que exigen totales que solo crecen).
+        """
+        lineas = [
+            "# HELP printflow_lote_etapa_segundos Percentiles de la duración de cada etapa en el último lote.",
+            "# TYPE printflow_lote_etapa_segundos gauge",
+        ]
+        trabajos = []
+        for etapa, estadistica in self.etapas.items():
+            p50, p95 = estadistica.percentiles(0.5, 0.95)
+            lineas.append(f'printflow_lote_etapa_segundos{{etapa="{etapa}",percentil="50"}} {p50:.6f}')
+            lineas.append(f'printflow_lote_etapa_segundos{{etapa="{etapa}",percentil="95"}} {p95:.6f}')
+            trabajos.append(f'printflow_lote_etapa_trabajos{{etapa="{etapa}"}} {estadistica.cuenta}')
+        lineas += [
+            "# HELP printflow_lote_etapa_trabajos Trabajos medidos en cada etapa en el último lote.",
+            "# TYPE printflow_lote_etapa_trabajos gauge",
+        ] + trabajos
+        lineas += [
+            "# HELP printflow_lote_copias Copias confirmadas en el último lote.",
+            "# TYPE printflow_lote_copias gauge",
+            f"printflow_lote_copias {self.copias}",
+            "# HELP printflow_lote_fallos Trabajos fallidos en el último lote.",
+            "# TYPE printflow_lote_fallos gauge",
+            f"printflow_lote_fallos {self.fallos}",
+            "# HELP printflow_copias_por_hora Ritmo del último lote.",
+            "# TYPE printflow_copias_por_hora gauge",
+            f"printflow_copias_por_hora {self.copias_por_hora:.3f}",
+        ]
+        temporal = ruta + ".tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lineas) + "\n")
+        os.replace(temporal, ruta)
@@ -0,0 +1,352 @@
+import heapq
+import json
+import math
+import os
+
+from alert_system import obtener_despachador, AVISO_CONFIRMACION, AVISO_FALLO
+from controlador import ControladorLote
+from data_manager import cargar_datos_libros_dinamicos
+from diario import DiarioTrabajos, EVENTO_LOTE_CANCELADO
+from printer_utils import listar_impresoras_disponibles
+
+# Políticas de confirmación del modo por lotes.
+POLITICA_TERMINAL = "terminal"   # El operador responde cada confirmación en la terminal.
+POLITICA_AUTO = "auto"           # Se confirman todas las copias sin preguntar.
+POLITICAS = (POLITICA_TERMINAL, POLITICA_AUTO)
+
+# Trabajos del manifiesto que se leen por adelantado para ordenarlos por
+# prioridad. Limita la memoria usada sea cual sea la longitud del manifiesto.
+VENTANA_PRIORIDAD = 32
+
+# Segundos máximos que se bloquea esperando resultados antes de revisar el lote.
+ESPERA_RESULTADOS = 0.5
+
+
+class TrabajoManifiesto:
+    """
+    Una línea del manifiesto JSONL: qué archivo imprimir, con qué perfil,
+    en qué impresora(s), cuántas copias y con qué prioridad.
+    """
+    def __init__(self, linea, archivo, perfil, impresoras, copias, prioridad=0):
+        self.linea = linea
+        self.archivo = archivo
+        self.perfil = perfil
+        self.impresoras = impresoras
+        self.copias = copias
+        self.prioridad = prioridad
+
+    @classmethod
+    def desde_json(cls, linea, datos):
+        """
+        Construye un trabajo a partir de un objeto JSON del manifiesto.
+        `impresora` puede ser un nombre o una lista de nombres (grupo).
+
+        :raises ValueError: Si faltan campos o tienen valores o tipos no válidos.
+        """
+        if not isinstance(datos, dict):
+            raise ValueError("cada línea debe ser un objeto JSON")
+        for campo in ('archivo', 'perfil'):
+            if not isinstance(datos.get(campo), str) or not datos[campo]:
+                raise ValueError(f"falta el campo '{campo}'")
+        impresoras = datos.get('impresora') or []
+        if isinstance(impresoras, str):
+            impresoras = [impresoras]
+        if not isinstance(impresoras, list) or not all(isinstance(n, str) and n for n in impresoras):
+            raise ValueError("'impresora' debe ser un nombre o una lista de nombres")
+        copias = datos.get('copias', 1)
+        if not isinstance(copias, int) or isinstance(copias, bool) or copias <= 0:
+            raise ValueError("'copias' debe ser un entero mayor que 0")
+        prioridad = datos.get('prioridad', 0)
+        if not isinstance(prioridad, (int, float)) or isinstance(prioridad, bool) or not math.isfinite(prioridad):
+            raise ValueError("'prioridad' debe ser un número")
+        return cls(linea, datos['archivo'], datos['perfil'], list(impresoras), copias, prioridad)
+
+
+def validar_trabajo(trabajo, perfiles, impresoras):
+    """
+    Comprueba que un trabajo se pueda ejecutar: que exista el archivo, el
+    perfil y las impresoras que pide.
+
+    :param trabajo: `TrabajoManifiesto` a comprobar.
+    :param perfiles: Diccionario {nombre: perfil}.
+    :param impresoras: Impresoras disponibles en el sistema.
+    :return: Mensaje de error, o None si el trabajo se puede ejecutar.
+    :rtype: str
+    """
+    if not os.path.exists(trabajo.archivo):
+        return f"archivo no encontrado: {trabajo.archivo}"
+    if trabajo.perfil not in perfiles:
+        return f"perfil desconocido: {trabajo.perfil}"
+    desconocidas = [n for n in trabajo.impresoras if n not in impresoras]
+    if desconocidas:
+        return f"impresora(s) desconocida(s): {', '.join(desconocidas)}"
+    if not trabajo.impresoras and not impresoras:
+        return "no hay impresoras disponibles"
+    return None
+
+
+def leer_manifiesto(ruta, ventana=VENTANA_PRIORIDAD, al_error=None):
+    """
+    Lee un manifiesto JSONL línea a línea y devuelve sus trabajos ordenados por
+    prioridad (mayor primero) dentro de una ventana de `ventana` trabajos.
+    Nunca tiene más de `ventana` trabajos en memoria.
+
+    Las líneas vacías y las que empiezan por '#' se ignoran; las líneas mal
+    formadas (JSON no válido, bytes que no son UTF-8, campos con tipos no
+    válidos) se notifican a `al_error(numero_linea, mensaje)` y se saltan.
+
+    :return: Generador de `TrabajoManifiesto`.
+    """
+    al_error = al_error or (lambda linea, mensaje: None)
+    pendientes = []
+
+    # Los bytes que no son UTF-8 se sustituyen: la línea falla al validarse
+    # en lugar de interrumpir la lectura del resto del manifiesto.
+    with open(ruta, 'r', encoding='utf-8', errors='replace') as f:
+        for numero, texto in enumerate(f, start=1):
+            texto = texto.strip()
+            if not texto or texto.startswith('#'):
+                continue
+            try:
+                trabajo = TrabajoManifiesto.desde_json(numero, json.loads(texto))
+            except (ValueError, RecursionError) as e:
+                # `RecursionError`: JSON anidado a demasiada profundidad.
+                al_error(numero, str(e) or type(e).__name__)
+                continue
+
+            # A igual prioridad se respeta el orden del archivo.
+            heapq.heappush(pendientes, (-trabajo.prioridad, numero, trabajo))
+            if len(pendientes) >= ventana:
+                yield heapq.heappop(pendientes)[2]
+
+    while pendientes:
+        yield heapq.heappop(pendientes)[2]
+
+
+class EjecutorLote:
+    """
+    Ejecuta los trabajos de un manifiesto sin interfaz gráfica, usando el mismo
+    `ControladorLote` que `PrintFlowApp`.
+
+    Con la política `terminal` el operador confirma cada copia y decide si
+    reanudar una impresora pausada o con fallo; con `auto` las copias se
+    confirman solas y cada copia fallida se reintenta hasta `max_reintentos` veces.
+    """
+    def __init__(self, perfiles, impresoras, politica=POLITICA_TERMINAL, max_reintentos=3,
+                 entrada=input, salida=print, diario=None, avisos=None):
+        """
+        :param perfiles: Diccionario {nombre: perfil} (ver `data_manager`).
+        :param impresoras: Impresoras disponibles en el sistema.
+        :param politica: `POLITICA_TERMINAL` o `POLITICA_AUTO`.
+        :param max_reintentos: Fallos tolerados por trabajo con la política `auto`.
+        :param entrada: Función para leer respuestas del operador.
+        :param salida: Función para escribir mensajes.
+        :param diario: `DiarioTrabajos` donde registrar el progreso (opcional).
+        :param avisos: `DespachadorAvisos` para avisar al operador de las
+                       confirmaciones y fallos (opcional).
+        """
+        self.perfiles = perfiles
+        self.impresoras = impresoras
+        self.politica = politica
+        self.max_reintentos = max_reintentos
+        self.entrada = entrada
+        self.salida = salida
+        self.diario = diario
+        self.avisos = avisos
+
+    def _preguntar(self, texto):
+        """
+        :return: True salvo que el operador responda "n".
+        :rtype: bool
+        """
+        try:
+            respuesta = self.entrada(f"{texto} [S/n] ")
+        except EOFError:
+            # Sin terminal interactiva (ej. entrada redirigida) se asume que sí.
+            return True
+        return not respuesta.strip().lower().startswith('n')
+
+    def validar(self, trabajo):
+        """
+        :return: Mensaje de error, o None si el trabajo se puede ejecutar.
+        :rtype: str
+        """
+        return validar_trabajo(trabajo, self.perfiles, self.impresoras)
+
+    def ejecutar_trabajo(self, trabajo):
+        """
+        Imprime todas las copias de un trabajo del manifiesto.
+
+        :return: True si todas las copias se imprimieron y confirmaron.
+        :rtype: bool
+        """
+        error = self.validar(trabajo)
+        if error:
+            self.salida(f"[línea {trabajo.linea}] Saltado: {error}")
+            return False
+
+        grupo = trabajo.impresoras or self.impresoras[:1]
+        return self._ejecutar(f"línea {trabajo.linea}", grupo, trabajo.archivo, trabajo.perfil,
+                              self.perfiles[trabajo.perfil], trabajo.copias)
+
+    def reanudar_interrumpidos(self):
+        """
+        Reanuda los lotes que el diario registra como interrumpidos (por ejemplo,
+        tras un corte de luz), empezando exactamente por la primera copia que no
+        llegó a imprimirse. Con la política `terminal` se pregunta antes cada uno.
+
+        :return: Una tupla (completados, fallidos).
+        :rtype: tuple[int, int]
+        """
+        completados = fallidos = 0
+        if self.diario is None:
+            return completados, fallidos
+
+        for lote in self.diario.lotes_interrumpidos():
+            etiqueta = f"lote {lote.lote}"
+            grupo = [n for n in lote.impresoras if n in self.impresoras]
+            if not lote.ruta or not os.path.exists(lote.ruta) or not grupo:
+                self.salida(f"[{etiqueta}] No se puede reanudar: falta el archivo o las impresoras.")
+                continue
+            if self.politica == POLITICA_TERMINAL and not self._preguntar(
+                    f"[{etiqueta}] '{lote.perfil}' quedó interrumpido con {len(lote.hechas)} de "
+                    f"{lote.total_copias} copias. ¿Reanudar desde la copia {lote.siguiente_copia}?"):
+                self.diario.registrar(EVENTO_LOTE_CANCELADO, lote.lote)
+                continue
+            if self._ejecutar(etiqueta, grupo, lote.ruta, lote.perfil, lote.config, lote.total_copias,
+                              lote=lote.lote, hechas=lote.hechas):
+                completados += 1
+            else:
+                fallidos += 1
+        return completados, fallidos
+
+    def _ejecutar(self, etiqueta, grupo, ruta, perfil, config, copias, lote=None, hechas=None):
+        """
+        Ejecuta un lote con `ControladorLote` hasta que termina o se cancela.
+
+        :return: True si todas las copias se imprimieron y confirmaron.
+        :rtype: bool
+        """
+        fallos = []
+
+        def al_pedir_confirmacion(estado, copia):
+            if self.politica == POLITICA_AUTO:
+                continuar = True
+            else:
+                if self.avisos is not None:
+                    self.avisos.emitir(AVISO_CONFIRMACION, f"🚨 COPIA TERMINADA ({perfil}) 🚨",
+                                       f"{copia.descripcion} terminada(s) en '{estado.nombre}'. Responda en la terminal.")
+                continuar = self._preguntar(
+                    f"Punto de control: {copia.descripcion} de {copia.total} terminada(s) en '{estado.nombre}'. "
+                    f"¿Mandar las siguientes a esta impresora?")
+            controlador.confirmar(estado.nombre, continuar)
+
+        def al_fallo(estado, copia):
+            fallos.append(copia)
+            if self.avisos is not None:
+                self.avisos.emitir(AVISO_FALLO, f"❌ FALLO en '{estado.nombre}'", copia.mensaje)
+            self.salida(f"[{etiqueta}] FALLO en '{estado.nombre}' ({copia.descripcion}): {copia.mensaje}")
+            if copia.incierto and self.politica == POLITICA_TERMINAL:
+                controlador.resolver_incierto(estado.nombre, self._preguntar(
+                    f"{copia.mensaje} ¿Se imprimió? (No = reintentarla)"))
+
+        controlador = ControladorLote(
+            grupo,
+            ruta,
+            config,
+            copias,
+            al_pedir_confirmacion=al_pedir_confirmacion,
+            al_fallo=al_fallo,
+            diario=self.diario,
+            perfil=perfil,
+            lote=lote,
+            hechas=hechas,
+        )
+        self.salida(f"[{etiqueta}] Iniciando: {perfil} x {copias} en {', '.join(grupo)} ({os.path.basename(ruta)})"
+                    + (f", desde la copia {min(controlador.pendientes, default=copias)}" if hechas else ""))
+        controlador.iniciar()
+        try:
+            while controlador.en_curso:
+                controlador.procesar_resultados(bloquear=True, tiempo_maximo=ESPERA_RESULTADOS)
+                if controlador.en_curso and not controlador.hay_impresora_activa():
+                    # Todas las impresoras del grupo están pausadas o con fallo.
+                    inciertas = controlador.pendientes_de_comprobar()
+                    if inciertas:
+                        # Sin operador que lo compruebe, no se reintenta una copia
+                        # que quizá ya se imprimió.
+                        sin_saber = ", ".join(f"{e.trabajo.descripcion} en '{e.nombre}'" for e in inciertas)
+                        self.salida(f"[{etiqueta}] Cancelado: no se sabe si salieron impresas ({sin_saber}). "
+                                    f"Compruébelo en la impresora.")
+                        controlador.cancelar()
+                        return False
+                    if not self._decidir_reanudar(copias, controlador, len(fallos)):
+                        self.salida(f"[{etiqueta}] Cancelado tras {controlador.copias_confirmadas} "
+                                    f"de {copias} copias.")
+                        controlador.cancelar()
+                        return False
+                    controlador.reanudar()
+        finally:
+            controlador.detener()
+
+        self.salida(f"[{etiqueta}] ✅ {copias} copias terminadas.")
+        self.salida(controlador.metricas.texto_resumen())
+        try:
+            controlador.metricas.exportar_csv()
+            controlador.metricas.exportar_prometheus()
+        except OSError as e:
+            self.salida(f"[{etiqueta}] No se pudieron exportar las métricas: {e}")
+        return True
+
+    def _decidir_reanudar(self, copias, controlador, fallos):
+        if self.politica == POLITICA_AUTO:
+            return fallos <= self.max_reintentos
+        return self._preguntar(
+            f"Trabajo detenido en {controlador.copias_confirmadas} de {copias} copias. ¿Reanudar?")
+
+    def ejecutar_manifiesto(self, ruta, ventana=VENTANA_PRIORIDAD):
+        """
+        Ejecuta en orden de prioridad todos los trabajos de un manifiesto JSONL.
+
+        :return: Una tupla (completados, fallidos).
+        :rtype: tuple[int, int]
+        """
+        completados = fallidos = 0
+
+        def al_error(linea, mensaje):
+            nonlocal fallidos
+            fallidos += 1
+            self.salida(f"[línea {linea}] Línea no válida: {mensaje}")
+
+        for trabajo in leer_manifiesto(ruta, ventana, al_error):
+            if self.ejecutar_trabajo(trabajo):
+                completados += 1
+            else:
+                fallidos += 1
+        self.salida(f"Manifiesto terminado: {completados} trabajos completados, {fallidos} con errores.")
+        return completados, fallidos
+
+
+def ejecutar_desde_linea_de_comandos(ruta, politica=POLITICA_TERMINAL, max_reintentos=3):
+    """
+    Punto de entrada del modo por lotes (ver `main.py --manifiesto`).
+
+    :return: Código de salida del proceso (0 si todos los trabajos terminaron bien).
+    :rtype: int
+    """
+    diario = DiarioTrabajos()
+    ejecutor = EjecutorLote(
+        cargar_datos_libros_dinamicos(),
+        listar_impresoras_disponibles(),
+        politica=politica,
+        max_reintentos=max_reintentos,
+        diario=diario,
+        avisos=obtener_despachador(),
+    )
+    try:
+        # Lo que quedó a medias en una ejecución anterior va primero.
+        _, fallidos_previos = ejecutor.reanudar_interrumpidos()
+        _, fallidos = ejecutor.ejecutar_manifiesto(ruta)
+    finally:
+        diario.cerrar()
+        ejecutor.avisos.detener()
+    return 1 if fallidos or fallidos_previos else 0
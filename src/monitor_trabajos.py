@@ -0,0 +1,130 @@
+from backends import ESTADO_COMPLETADO, ESTADO_ERROR, ESTADOS_FINALES
+
+
+def espera_estimada(config):
+    """
+    :return: Segundos que se espera a un trabajo que no se pudo localizar en
+             la cola: la espera fija de antes del monitor (`paginas / 100 + 3`),
+             acotada por `tiempo_maximo_espera` si el perfil lo define.
+    :rtype: float
+    """
+    espera = config.get('paginas', 100) / 100 + 3
+    tiempo_maximo = config.get('tiempo_maximo_espera')
+    return min(espera, tiempo_maximo) if tiempo_maximo else espera
+
+
+class MonitorTrabajos:
+    """
+    Sigue el estado real de un trabajo en el spooler a través del backend.
+
+    Sustituye a la espera fija (`paginas / 100 + 3` segundos) que se usaba
+    antes: el envío de la siguiente copia se decide por lo que informa la
+    impresora, ya sea cuando el trabajo termina o cuando la cola baja de una
+    marca de agua configurable.
+    """
+    def __init__(self, backend, intervalo_sondeo=0.5):
+        """
+        :param backend: Instancia de `backends.BackendImpresion`.
+        :param intervalo_sondeo: Espera máxima entre dos consultas de estado si
+                                 el backend no avisa antes de un cambio.
+        """
+        self.backend = backend
+        self.intervalo_sondeo = intervalo_sondeo
+
+    def esperar_finalizacion(self, printer_name, id_trabajo, tiempo_maximo=None):
+        """
+        Bloquea hasta que el trabajo termine (completado o con error).
+
+        :param tiempo_maximo: Segundos máximos de espera (None = sin límite).
+        :return: El estado final del trabajo, o None si se agotó el tiempo.
+        :rtype: str
+        """
+        limite = self.backend.ahora() + tiempo_maximo if tiempo_maximo else None
+        while True:
+            estado = self.backend.estado_trabajo(printer_name, id_trabajo)
+            if estado in ESTADOS_FINALES:
+                return estado
+            if limite is not None and self.backend.ahora() >= limite:
+                return None
+            self.backend.esperar_cambio(printer_name, self.intervalo_sondeo)
+
+    def esperar_sin_localizar(self, printer_name, config):
+        """
+        Espera por un trabajo que no se pudo localizar en la cola (ej. uno muy
+        corto que entró y salió antes de verlo): sin estado que seguir, se deja
+        pasar `espera_estimada(config)` antes de la siguiente copia, para no
+        inundar el spooler.
+
+        :return: Segundos esperados.
+        :rtype: float
+        """
+        inicio = self.backend.ahora()
+        limite = inicio + espera_estimada(config)
+        while self.backend.ahora() < limite:
+            self.backend.esperar_cambio(printer_name, min(self.intervalo_sondeo, limite - self.backend.ahora()))
+        return self.backend.ahora() - inicio
+
+    def esperar_hueco(self, printer_name, marca_agua, id_trabajo=None, tiempo_maximo=None):
+        """
+        Bloquea hasta que la cola de la impresora tenga menos de `marca_agua`
+        trabajos pendientes. Si se indica `id_trabajo` y ese trabajo termina en
+        error, se devuelve el error inmediatamente.
+
+        :return: `ESTADO_COMPLETADO` si hay hueco, `ESTADO_ERROR` si el trabajo
+                 falló, o None si se agotó el tiempo.
+        :rtype: str
+        """
+        limite = self.backend.ahora() + tiempo_maximo if tiempo_maximo else None
+        while True:
+            if id_trabajo is not None and self.backend.estado_trabajo(printer_name, id_trabajo) == ESTADO_ERROR:
+                return ESTADO_ERROR
+            if self.backend.profundidad_cola(printer_name) < marca_agua:
+                return ESTADO_COMPLETADO
+            if limite is not None and self.backend.ahora() >= limite:
+                return None
+            self.backend.esperar_cambio(printer_name, self.intervalo_sondeo)
+
+    def esperar_despacho(self, printer_name, id_trabajo, config, marcas=None):
+        """
+        Aplica la política de despacho del perfil: con `marca_agua_cola` mayor
+        que 0 se espera a que haya hueco en la cola; si no, a que el trabajo
+        termine. `tiempo_maximo_espera` limita la espera en ambos casos.
+
+        Si se agota el tiempo, el trabajo se cancela para que la copia pueda
+        reintentarse sin imprimirse dos veces. Si no se puede cancelar, no se
+        sabe si llegó a imprimirse: se anota `marcas['incierto'] = True` para
+        que el operador lo compruebe antes de reintentarla.
+
+        :param config: Diccionario del perfil de impresión.
+        :param marcas: Diccionario opcional donde anotar 'incierto'.
+        :return: Una tupla (bool, str) como la de `enviar_a_impresora`.
+        :rtype: tuple[bool, str]
+        """
+        marca_agua = config.get('marca_agua_cola', 0)
+        tiempo_maximo = config.get('tiempo_maximo_espera')
+        inicio = self.backend.ahora()
+
+        if id_trabajo is None:
+            transcurrido = self.esperar_sin_localizar(printer_name, config)
+            return True, f"Trabajo no localizado en la cola; se esperaron {transcurrido:.1f}s estimados."
+        if marca_agua > 0:
+            estado = self.esperar_hueco(printer_name, marca_agua, id_trabajo, tiempo_maximo)
+            motivo = f"cola por debajo de {marca_agua}"
+        else:
+            estado = self.esperar_finalizacion(printer_name, id_trabajo, tiempo_maximo)
+            motivo = "trabajo completado"
+
+        transcurrido = self.backend.ahora() - inicio
+        if estado == ESTADO_COMPLETADO:
+            return True, f"Listo para la siguiente copia ({motivo} en {transcurrido:.1f}s)."
+        if estado == ESTADO_ERROR:
+            return False, f"!!! ERROR: la impresora '{printer_name}' marcó el trabajo con error."
+        if self.backend.cancelar_trabajo(printer_name, id_trabajo):
+            return False, f"!!! ERROR: el trabajo no terminó en {tiempo_maximo}s; se canceló para reintentarlo."
+        if self.backend.estado_trabajo(printer_name, id_trabajo) == ESTADO_COMPLETADO:
+            # Terminó justo entre el fin de la espera y la cancelación.
+            return True, f"Listo para la siguiente copia ({motivo} en {transcurrido:.1f}s)."
+        if marcas is not None:
+            marcas['incierto'] = True
+        return False, (f"!!! ERROR: el trabajo no terminó en {tiempo_maximo}s y no se pudo cancelar. "
+                       f"Compruebe en '{printer_name}' si se imprimió antes de reintentarlo.")
@@ -0,0 +1,86 @@
+import heapq
+
+# Velocidad supuesta para una impresora de la que aún no hay mediciones.
+# Es optimista a propósito, para que las impresoras nuevas reciban trabajo
+# y se pueda medir su velocidad real.
+PPM_POR_DEFECTO = 30.0
+
+# Peso de la media móvil con la que se actualiza la velocidad medida.
+PESO_MEDICION = 0.3
+
+# Cuánto se encarece (en proporción) cada fallo reciente de una impresora.
+PENALIZACION_FALLO = 0.5
+
+
+class RendimientoImpresora:
+    """
+    Velocidad medida y fallos de una impresora, usados para repartir la carga.
+    """
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.ppm = None          # Páginas por minuto medidas (None = sin medir).
+        self.exitos = 0
+        self.fallos = 0
+        self.fallos_recientes = 0
+
+    def registrar_exito(self, paginas, segundos):
+        """
+        Actualiza la velocidad medida con una copia terminada.
+
+        :param paginas: Páginas de la copia.
+        :param segundos: Tiempo que tardó la copia desde que se envió.
+        """
+        self.exitos += 1
+        self.fallos_recientes = max(0, self.fallos_recientes - 1)
+        if segundos > 0 and paginas > 0:
+            medida = paginas / segundos * 60
+            self.ppm = medida if self.ppm is None else (1 - PESO_MEDICION) * self.ppm + PESO_MEDICION * medida
+
+    def registrar_fallo(self):
+        self.fallos += 1
+        self.fallos_recientes += 1
+
+    def duracion_estimada(self, paginas):
+        """
+        :return: Segundos estimados que tardará una copia de `paginas` páginas,
+                 encarecidos según los fallos recientes de la impresora.
+        :rtype: float
+        """
+        ppm = self.ppm or PPM_POR_DEFECTO
+        return paginas / ppm * 60 * (1 + PENALIZACION_FALLO * self.fallos_recientes)
+
+
+class PlanificadorCarga:
+    """
+    Reparte las copias pendientes de un lote entre un grupo de impresoras.
+
+    Simula la asignación de todas las copias pendientes con una cola de
+    prioridad (cada copia va a la impresora que antes la terminaría, según su
+    velocidad medida, lo que le queda de la copia en curso y sus fallos) y
+    devuelve cuántas copias recibe cada impresora. Una impresora libre solo
+    recibe trabajo si el plan le asigna alguna copia, de modo que al final de
+    un lote no se manda la última copia a una impresora lenta si una rápida
+    la terminaría antes.
+    """
+    def planificar(self, disponibles, pendientes, paginas):
+        """
+        :param disponibles: Diccionario {nombre: (RendimientoImpresora, segundos_hasta_libre)}
+                            con las impresoras que pueden recibir trabajo.
+        :param pendientes: Número de copias sin asignar.
+        :param paginas: Páginas de cada copia.
+        :return: Diccionario {nombre: copias_asignadas}.
+        :rtype: dict
+        """
+        asignaciones = {nombre: 0 for nombre in disponibles}
+        monticulo = []
+        for orden, (nombre, (rendimiento, hasta_libre)) in enumerate(disponibles.items()):
+            duracion = rendimiento.duracion_estimada(paginas)
+            heapq.heappush(monticulo, (hasta_libre + duracion, orden, nombre, duracion))
+
+        for _ in range(pendientes):
+            if not monticulo:
+                break
+            fin, orden, nombre, duracion = heapq.heappop(monticulo)
+            asignaciones[nombre] += 1
+            heapq.heappush(monticulo, (fin + duracion, orden, nombre, duracion))
+        return asignaciones
@@ -1,86 +1,155 @@
-import win32print # type: ignore 
-import win32api # type: ignore 
-import time
 import os
+import time
+
+from backends import BackendWindows, BackendSimulado
+from monitor_trabajos import MonitorTrabajos
+
+# Valor de la clave 'modo_envio' de un perfil que activa el envío RAW cacheado.
+MODO_RAW = "raw"
+
+# Backend activo. Por defecto se usa la API real de Windows; las pruebas y el
+# benchmark lo sustituyen por un `BackendSimulado` con `establecer_backend`.
+_backend = BackendWindows()
+# Backend RAW que se usa con los perfiles en `MODO_RAW`; se crea al primer uso.
+_backend_raw = None
+
+def establecer_backend(backend):
+    """
+    Sustituye el backend de impresión usado por `listar_impresoras_disponibles`
+    y `enviar_a_impresora`.
+
+    :param backend: Instancia de `backends.BackendImpresion`.
+    :return: El backend que estaba activo hasta ahora.
+    """
+    global _backend
+    anterior = _backend
+    _backend = backend
+    return anterior
+
+def obtener_backend():
+    """
+    :return: El backend de impresión activo.
+    :rtype: backends.BackendImpresion
+    """
+    return _backend
+
+def obtener_backend_raw(base=None):
+    """
+    Devuelve el backend RAW (render una vez + bytes cacheados) construido sobre
+    `base` (por defecto, el backend activo), que da el destino de los bytes
+    (`sumidero_raw`) y se usa para seguir los trabajos.
+
+    :rtype: spool_raw.BackendRaw
+    """
+    # `spool_raw` (hashlib, mmap, socket) solo se importa si algún perfil usa el modo RAW.
+    from spool_raw import BackendRaw
+
+    global _backend_raw
+    base = base or _backend
+    if _backend_raw is None or _backend_raw.backend_estado is not base:
+        _backend_raw = BackendRaw(backend_estado=base)
+    return _backend_raw
 
 def listar_impresoras_disponibles():
     """
     Obtiene una lista de los nombres de las impresoras instaladas en el sistema operativo Windows.
 
-    Utiliza la API de impresión de Windows (`win32print.EnumPrinters(2)`).
+    Utiliza la API de impresión de Windows (`win32print.EnumPrinters(2)`) a través
+    del backend activo.
 
     :return: Una lista de strings que contienen los nombres de las impresoras. 
              Si ocurre un error (ej. no se está ejecutando en Windows), retorna 
              una lista con el nombre de la impresora por defecto o un placeholder.
     :rtype: list[str]
     """
-    try:
-        # El parámetro 2 indica que queremos enumerar impresoras locales.
-        impresoras = win32print.EnumPrinters(2)
-        # Extrae el segundo elemento de cada tupla (el nombre de la impresora).
-        nombres = [p[1] for p in impresoras]
-        return nombres
-    except Exception as e:
-        # Manejo de error para sistemas operativos no compatibles con win32print.
-        print(f"Error (no Windows?): {e}. Usando impresora 'Defecto'.")
-        # Intenta obtener la impresora por defecto si el módulo lo soporta, sino usa un placeholder.
-        return [win32print.GetDefaultPrinter()] if hasattr(win32print, 'GetDefaultPrinter') else ["Impresora_Defecto"]
-
-def enviar_a_impresora(printer_name: str, file_path: str, config: dict):
+    return _backend.listar_impresoras()
+
+def enviar_a_impresora(printer_name: str, file_path: str, config: dict, backend=None, copias: int = 1,
+                       marcas: dict = None, progreso: list = None):
     """
     Envía un archivo (PDF o DOCX, típicamente) a una impresora específica utilizando 
-    la función ShellExecute de la API de Windows.
+    el backend activo (por defecto, la función ShellExecute de la API de Windows)
+    y espera a que la impresora esté lista para la siguiente copia.
 
     Nota: ShellExecute utiliza el programa asociado al tipo de archivo para manejar 
     la impresión (ej. Adobe Reader para PDF, Word para DOCX).
 
+    La espera ya no es un tiempo fijo: `MonitorTrabajos` sigue el estado real del
+    trabajo en el spooler. Por defecto se espera a que termine de imprimirse; si
+    el perfil define `marca_agua_cola` se vuelve en cuanto la cola de la impresora
+    baja de ese número de trabajos.
+
+    Si el perfil define `"modo_envio": "raw"`, el documento se renderiza una sola
+    vez y en cada copia se envían los bytes cacheados directamente a la impresora
+    (ver `spool_raw`), sin volver a abrir la aplicación asociada. Solo se admiten
+    formatos que la impresora entiende tal cual; los demás fallan sin imprimirse.
+
+    Si el perfil define `paginas_por_fragmento`, los documentos más largos se
+    envían como varios trabajos de ese número de páginas, preparando el
+    siguiente mientras se imprime el anterior (ver `fragmentos`).
+
     :param printer_name: Nombre exacto de la impresora de destino.
     :type printer_name: str
     :param file_path: Ruta absoluta al archivo a imprimir.
     :type file_path: str
-    :param config: Diccionario que contiene la configuración del trabajo. Se usa 
-                   la clave 'paginas' para estimar el tiempo de espera.
+    :param config: Diccionario que contiene la configuración del trabajo. Se usan 
+                   las claves opcionales 'marca_agua_cola', 'tiempo_maximo_espera',
+                   'modo_envio', 'pdf_directo' y 'paginas_por_fragmento'.
     :type config: dict
+    :param backend: Backend a usar en lugar del activo (opcional).
+    :param copias: Copias a imprimir como un único trabajo intercalado (por defecto 1).
+    :type copias: int
+    :param marcas: Diccionario opcional donde se anota en 'sometido' el instante
+                   (`time.monotonic`) en que el spooler aceptó el trabajo, y
+                   'incierto' si se agotó la espera y el trabajo no se pudo
+                   cancelar (ver `MonitorTrabajos.esperar_despacho`).
+    :type marcas: dict
+    :param progreso: Lista opcional con los fragmentos ya impresos de cada copia;
+                     se actualiza a medida que terminan para poder reanudar la
+                     copia desde el último fragmento completado.
+    :type progreso: list[int]
     :return: Una tupla (bool, str) indicando el éxito (True/False) y un mensaje 
              de estado o error.
     :rtype: tuple[bool, str]
     """
+    backend = backend or _backend
+    if config.get('modo_envio') == MODO_RAW and backend.nombre != "raw":
+        backend = obtener_backend_raw(backend)
+
     # 1. Validación de existencia del archivo
     if not os.path.exists(file_path):
         return False, f"ERROR: Archivo no encontrado en la ruta: {file_path}"
-    
-    print(f"-> [REAL] Enviando '{os.path.basename(file_path)}' a la impresora '{printer_name}'...")
-    
-    try:
-        # 2. Ejecución de la impresión usando ShellExecute
-        # "print" es la acción que le dice a Windows que imprima el archivo.
-        # '/d:"%s"' % printer_name especifica a qué impresora enviar el trabajo.
-        win32api.ShellExecute(
-            0, # hwnd (ventana handle): 0 para no tener ventana.
-            "print",
-            file_path,
-            '/d:"%s"' % printer_name,
-            ".", # dir: Directorio de trabajo
-            0    # showcmd: SW_HIDE (oculto)
-        )
-        
-        # 3. Pausa simulada para dar tiempo a Windows de procesar el trabajo.
-        # El tiempo de espera es crucial para evitar que el siguiente trabajo 
-        # se envíe antes de que la impresora esté lista.
-        # Se calcula en base al número de páginas (o un valor por defecto si no está en config).
-        tiempo_espera = config.get('paginas', 100) / 100 + 3 
-        time.sleep(tiempo_espera)
-        
-        return True, f"Trabajo enviado. Espera de {tiempo_espera:.1f}s."
-
-    except Exception as e:
-        return False, f"!!! ERROR al enviar trabajo: {e}"
-
-def simular_impresion(*args):
+
+    # 2. Documentos grandes: envío por fragmentos, si el perfil lo pide
+    if config.get('paginas_por_fragmento'):
+        # `fragmentos` (y `pypdf`) solo se cargan si algún perfil lo usa.
+        from fragmentos import imprimir_por_fragmentos
+
+        if progreso is None:
+            progreso = [0] * copias
+        resultado = imprimir_por_fragmentos(backend, printer_name, file_path, config, progreso, marcas)
+        if resultado is not None:
+            return resultado
+
+    # 3. Entrega del trabajo al spooler
+    exito, mensaje, id_trabajo = backend.someter_trabajo(printer_name, file_path, config, copias)
+    if not exito:
+        return False, mensaje
+    if marcas is not None:
+        marcas['sometido'] = time.monotonic()
+
+    # 4. Espera guiada por el estado real del trabajo
+    return MonitorTrabajos(backend).esperar_despacho(printer_name, id_trabajo, config, marcas)
+
+def simular_impresion(printer_name: str, file_path: str, config: dict, copias: int = 1, **opciones):
     """
-    Función de utilidad (placeholder) para simular el proceso de impresión 
-    en entornos donde win32print no es accesible o para pruebas rápidas.
-    Actualmente no tiene implementación, solo actúa como un stub.
+    Simula el proceso de impresión en entornos donde win32print no es accesible
+    o para pruebas rápidas, sin cambiar el backend activo.
+
+    :param opciones: Parámetros opcionales de `backends.BackendSimulado`
+                     (ej. `escala_tiempo`, `segundos_por_pagina`).
+    :return: Una tupla (bool, str) igual que `enviar_a_impresora`.
+    :rtype: tuple[bool, str]
     """
-    # Esta función puede ser implementada para fines de desarrollo o pruebas.
-    pass
+    backend = BackendSimulado(impresoras=[printer_name], **opciones)
+    return enviar_a_impresora(printer_name, file_path, config, backend=backend, copias=copias)
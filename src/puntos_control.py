@@ -0,0 +1,66 @@
+import math
+
+# Políticas de confirmación que un perfil puede declarar en "puntos_control".
+CONTROL_CADA_COPIA = "cada_copia"      # Comportamiento clásico: confirmar cada copia.
+CONTROL_CADA_N = "cada_n"              # Confirmar cada `n` copias.
+CONTROL_CAMBIO_PAPEL = "cambio_papel"  # Confirmar solo cuando hay que recargar la bandeja.
+CONTROL_FINAL = "final"                # Confirmar una sola vez, al terminar.
+TIPOS_CONTROL = (CONTROL_CADA_COPIA, CONTROL_CADA_N, CONTROL_CAMBIO_PAPEL, CONTROL_FINAL)
+
+
+def validar_puntos_control(valor):
+    """
+    Comprueba la sección "puntos_control" de un perfil, por ejemplo
+    `{"tipo": "cada_n", "n": 10}` o `{"tipo": "cambio_papel", "hojas_bandeja": 500}`.
+
+    :return: Lista de errores encontrados (vacía si es válida).
+    :rtype: list[str]
+    """
+    if not isinstance(valor, dict):
+        return ["'puntos_control' debe ser un objeto"]
+    tipo = valor.get('tipo', CONTROL_CADA_COPIA)
+    if tipo not in TIPOS_CONTROL:
+        return [f"'puntos_control.tipo' debe ser uno de: {', '.join(TIPOS_CONTROL)}"]
+    if tipo == CONTROL_CADA_N and not _entero_positivo(valor.get('n')):
+        return ["'puntos_control.n' debe ser un entero mayor que 0"]
+    if tipo == CONTROL_CAMBIO_PAPEL and not _entero_positivo(valor.get('hojas_bandeja')):
+        return ["'puntos_control.hojas_bandeja' debe ser un entero mayor que 0"]
+    return []
+
+
+def _entero_positivo(valor):
+    return isinstance(valor, int) and not isinstance(valor, bool) and valor > 0
+
+
+def hojas_por_copia(config):
+    """
+    :return: Hojas de papel que consume una copia del perfil (la mitad de las
+             páginas, redondeando hacia arriba, si el perfil es a doble cara).
+    :rtype: int
+    """
+    paginas = config.get('paginas', 100)
+    return math.ceil(paginas / 2) if config.get('duplex') else paginas
+
+
+def copias_por_grupo(config, asignadas):
+    """
+    Decide cuántas copias se envían juntas, como un único trabajo intercalado,
+    antes del siguiente punto de confirmación.
+
+    :param config: Diccionario del perfil de impresión.
+    :param asignadas: Copias que el planificador reserva ahora para la impresora.
+    :return: Tamaño del grupo (al menos 1).
+    :rtype: int
+    """
+    control = config.get('puntos_control') or {}
+    tipo = control.get('tipo', CONTROL_CADA_COPIA)
+    if tipo == CONTROL_CADA_N:
+        limite = control['n']
+    elif tipo == CONTROL_CAMBIO_PAPEL:
+        # Tantas copias como quepan en una carga de la bandeja.
+        limite = control['hojas_bandeja'] // max(1, hojas_por_copia(config))
+    elif tipo == CONTROL_FINAL:
+        limite = asignadas
+    else:
+        limite = 1
+    return max(1, min(limite, asignadas))
@@ -0,0 +1,624 @@
+import asyncio
+import collections
+import heapq
+import hmac
+import itertools
+import json
+import os
+import time
+
+from alert_system import obtener_despachador, AVISO_FALLO, AVISO_FINAL
+from controlador import ControladorLote
+from data_manager import cargar_datos_libros_dinamicos
+from diario import DiarioTrabajos
+from modo_lote import TrabajoManifiesto, validar_trabajo
+from printer_utils import listar_impresoras_disponibles
+
+HOST_POR_DEFECTO = "127.0.0.1"
+PUERTO_POR_DEFECTO = 8631
+
+# Trabajos que pueden esperar turno a la vez. Con la cola llena el servidor
+# responde 503 con `Retry-After` en lugar de acumular trabajos sin límite.
+COLA_MAXIMA = 64
+# Conexiones abiertas a la vez (envíos y seguimientos de eventos).
+CONEXIONES_MAXIMAS = 256
+# Segundos que se sugiere esperar a un cliente rechazado por cola llena.
+SEGUNDOS_REINTENTO = 5
+
+# Eventos pendientes de enviar a cada cliente. Un cliente que no lee al ritmo
+# del trabajo se desconecta en lugar de hacer crecer la memoria del servidor;
+# puede volver a conectarse con `GET /trabajos/<id>` y recibe el historial.
+EVENTOS_POR_CLIENTE = 256
+# Eventos que se guardan de cada trabajo para quien se conecte más tarde.
+HISTORIAL_EVENTOS = 200
+# Trabajos terminados que se conservan para consultar su historial.
+TRABAJOS_TERMINADOS = 500
+
+# Límites de las peticiones HTTP.
+TAMANO_MAXIMO_CABECERA = 16 * 1024
+TAMANO_MAXIMO_CUERPO = 64 * 1024
+SEGUNDOS_MAXIMOS_PETICION = 10.0
+
+# Segundos entre dos revisiones de los resultados de cada lote (como
+# `INTERVALO_RESULTADOS_MS` en la GUI).
+INTERVALO_RESULTADOS = 0.02
+
+# Estados de un trabajo del servidor.
+TRABAJO_PENDIENTE = "pendiente"
+TRABAJO_EN_CURSO = "en_curso"
+TRABAJO_TERMINADO = "terminado"
+TRABAJO_CANCELADO = "cancelado"
+ESTADOS_FINALES = (TRABAJO_TERMINADO, TRABAJO_CANCELADO)
+
+_RAZONES = {
+    200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 405: "Method Not Allowed",
+    409: "Conflict", 413: "Payload Too Large", 422: "Unprocessable Entity", 500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class ErrorPeticion(Exception):
+    """Petición que se responde con un error HTTP sin llegar a procesarla."""
+    def __init__(self, codigo, mensaje, cabeceras=()):
+        super().__init__(mensaje)
+        self.codigo = codigo
+        self.cabeceras = list(cabeceras)
+
+
+class _Suscripcion:
+    """Cola acotada de eventos de un trabajo hacia un cliente conectado."""
+    def __init__(self):
+        self.eventos = asyncio.Queue(maxsize=EVENTOS_POR_CLIENTE)
+        self.desbordada = False
+
+
+class TrabajoServidor:
+    """
+    Un trabajo recibido por el servidor: el `TrabajoManifiesto` que lo
+    describe, su estado, el historial de eventos y los clientes que lo siguen.
+    """
+    def __init__(self, id_trabajo, trabajo, orden):
+        self.id = id_trabajo
+        self.trabajo = trabajo
+        self.orden = orden
+        self.estado = TRABAJO_PENDIENTE
+        self.recibido_en = time.time()
+        self.impresoras = []          # Grupo asignado al empezar.
+        self.controlador = None
+        self.fallos = 0
+        self.motivo_cancelacion = None  # Motivo si se pidió cancelarlo (DELETE o cierre del servidor).
+        self.eventos = collections.deque(maxlen=HISTORIAL_EVENTOS)
+        self.suscripciones = set()
+
+    def __lt__(self, otro):
+        # Mayor prioridad primero; a igual prioridad, por orden de llegada.
+        return (-self.trabajo.prioridad, self.orden) < (-otro.trabajo.prioridad, otro.orden)
+
+    @property
+    def terminado(self):
+        return self.estado in ESTADOS_FINALES
+
+    def datos(self):
+        datos = {
+            'id': self.id,
+            'estado': self.estado,
+            'archivo': self.trabajo.archivo,
+            'perfil': self.trabajo.perfil,
+            'copias': self.trabajo.copias,
+            'prioridad': self.trabajo.prioridad,
+            'impresoras': self.impresoras or self.trabajo.impresoras,
+        }
+        if self.controlador is not None:
+            datos['lote'] = self.controlador.lote
+            datos['confirmadas'] = self.controlador.copias_confirmadas
+        return datos
+
+
+class ServidorTrabajos:
+    """
+    Servicio local que recibe trabajos de varios puestos y los imprime con el
+    mismo `ControladorLote` que la GUI y el modo por lotes.
+
+    Habla HTTP/1.1 sobre `asyncio`, sin dependencias externas:
+
+    - `POST /trabajos` con un objeto JSON como los del manifiesto (`archivo`,
+      `perfil`, `impresora`, `copias`, `prioridad`). La respuesta es un flujo
+      NDJSON con los eventos del trabajo (`aceptado`, `iniciado`, `copias`,
+      `fallo`, `terminado` o `cancelado`) que se cierra al terminar.
+    - `GET /trabajos/<id>` repite el historial del trabajo y sigue sus eventos.
+    - `DELETE /trabajos/<id>` cancela un trabajo pendiente o en curso.
+    - `GET /estado` devuelve la cola, los trabajos en curso y las impresoras ocupadas.
+
+    Todo se ejecuta en el hilo del bucle de eventos: cada lote en curso revisa
+    sus resultados cada `INTERVALO_RESULTADOS` segundos, como hace la GUI con
+    `after`, así que `ControladorLote` nunca se usa desde dos hilos. Las copias
+    se confirman solas y un lote cuyas impresoras fallaron se reanuda hasta
+    `max_reintentos` veces (como `--confirmaciones auto`).
+
+    Trabajos de impresoras distintas se imprimen a la vez; uno sin impresoras
+    usa todas las que estén libres al empezar. Con más de `capacidad` trabajos
+    esperando turno se responde 503, y un cliente que se desconecta no cancela
+    su trabajo.
+    """
+    def __init__(self, perfiles, impresoras, host=HOST_POR_DEFECTO, puerto=PUERTO_POR_DEFECTO,
+                 capacidad=COLA_MAXIMA, max_reintentos=3, diario=None, avisos=None, token=None,
+                 exportar_metricas=True, salida=print):
+        """
+        :param perfiles: Diccionario {nombre: perfil} (ver `cargar_datos_libros_dinamicos`).
+        :param impresoras: Impresoras disponibles en el sistema.
+        :param host: Dirección en la que escuchar (por defecto solo este equipo).
+        :param puerto: Puerto TCP (0 elige uno libre; ver `puerto` tras `iniciar`).
+        :param capacidad: Trabajos máximos esperando turno.
+        :param max_reintentos: Fallos tolerados por trabajo antes de cancelarlo.
+        :param diario: `DiarioTrabajos` opcional para registrar los lotes.
+        :param avisos: `DespachadorAvisos` opcional para avisar de fallos y finales.
+        :param token: Si se indica, las peticiones deben llevar `Authorization: Bearer <token>`.
+        :param exportar_metricas: Si se exportan las métricas de cada lote al terminar.
+        :param salida: Función para el registro en consola.
+        """
+        self.perfiles = perfiles
+        self.impresoras = list(impresoras)
+        self.host = host
+        self.puerto = puerto
+        self.capacidad = capacidad
+        self.max_reintentos = max_reintentos
+        self.diario = diario
+        self.avisos = avisos
+        self.token = token
+        self.exportar_metricas = exportar_metricas
+        self.salida = salida
+
+        self.trabajos = collections.OrderedDict()   # id -> TrabajoServidor
+        self.pendientes = []                        # Montículo de TrabajoServidor.
+        self.ocupadas = set()                       # Impresoras con un lote en curso.
+        self.conexiones = 0
+        self._orden = itertools.count(1)
+        self._tareas = set()
+        self._servidor = None
+
+    async def iniciar(self):
+        """Empieza a aceptar conexiones. Con `puerto=0`, actualiza `puerto` con el elegido."""
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.puerto,
+                                                    limit=TAMANO_MAXIMO_CABECERA)
+        self.puerto = self._servidor.sockets[0].getsockname()[1]
+        self.salida(f"Servidor de trabajos escuchando en http://{self.host}:{self.puerto}")
+
+    async def servir(self):
+        """Inicia el servidor y atiende peticiones hasta que se cancela la tarea."""
+        await self.iniciar()
+        try:
+            await self._servidor.serve_forever()
+        finally:
+            await self.detener()
+
+    async def detener(self):
+        """Deja de aceptar conexiones y cancela los lotes en curso."""
+        if self._servidor is not None:
+            self._servidor.close()
+            self._servidor = None
+        for trabajo in list(self.trabajos.values()):
+            if not trabajo.terminado:
+                self.cancelar(trabajo.id, "servidor detenido")
+        if self._tareas:
+            await asyncio.gather(*self._tareas, return_exceptions=True)
+
+    def recibir(self, datos):
+        """
+        Valida un trabajo y lo pone en la cola.
+
+        :param datos: Objeto JSON con los campos del manifiesto.
+        :return: El `TrabajoServidor` creado.
+        :rtype: TrabajoServidor
+        :raises ErrorPeticion: Si el trabajo no es válido o la cola está llena.
+        """
+        if len(self.pendientes) >= self.capacidad:
+            raise ErrorPeticion(503, f"cola llena ({self.capacidad} trabajos esperando)",
+                                [("Retry-After", str(SEGUNDOS_REINTENTO))])
+        try:
+            # `desde_json` comprueba el tipo de cada campo; TypeError por si
+            # algún valor inesperado se le escapa.
+            trabajo = TrabajoManifiesto.desde_json(None, datos)
+        except (ValueError, TypeError) as e:
+            raise ErrorPeticion(422, str(e) or type(e).__name__)
+        error = validar_trabajo(trabajo, self.perfiles, self.impresoras)
+        if error:
+            raise ErrorPeticion(422, error)
+
+        orden = trabajo.linea = next(self._orden)
+        trabajo_servidor = TrabajoServidor(f"t{orden}", trabajo, orden)
+        self.trabajos[trabajo_servidor.id] = trabajo_servidor
+        heapq.heappush(self.pendientes, trabajo_servidor)
+        self._publicar(trabajo_servidor, "aceptado", posicion=len(self.pendientes))
+        self._planificar()
+        return trabajo_servidor
+
+    def cancelar(self, id_trabajo, motivo="cancelado por un cliente"):
+        """
+        Cancela un trabajo pendiente o en curso.
+
+        :return: True si el trabajo existía y no había terminado.
+        :rtype: bool
+        """
+        trabajo = self.trabajos.get(id_trabajo)
+        if trabajo is None or trabajo.terminado:
+            return False
+        trabajo.motivo_cancelacion = motivo
+        if trabajo.estado == TRABAJO_EN_CURSO:
+            # `_ejecutar` lo ve en la próxima revisión y publica el evento.
+            if trabajo.controlador is not None:
+                trabajo.controlador.cancelar()
+        else:
+            self.pendientes.remove(trabajo)
+            heapq.heapify(self.pendientes)
+            self._finalizar(trabajo, TRABAJO_CANCELADO, motivo)
+        return True
+
+    def _planificar(self):
+        """
+        Arranca, por orden de prioridad, los trabajos cuyas impresoras están
+        libres. Un trabajo que espera impresoras ocupadas no bloquea a otros
+        de menor prioridad que usan impresoras distintas.
+        """
+        arrancados = []
+        for trabajo in sorted(self.pendientes):
+            if trabajo.trabajo.impresoras:
+                grupo = trabajo.trabajo.impresoras
+                if self.ocupadas.intersection(grupo):
+                    continue
+            else:
+                grupo = [n for n in self.impresoras if n not in self.ocupadas]
+                if not grupo:
+                    continue
+            self.ocupadas.update(grupo)
+            trabajo.impresoras = list(grupo)
+            trabajo.estado = TRABAJO_EN_CURSO
+            arrancados.append(trabajo)
+            tarea = asyncio.get_running_loop().create_task(self._ejecutar(trabajo))
+            self._tareas.add(tarea)
+            tarea.add_done_callback(self._tareas.discard)
+        if arrancados:
+            self.pendientes = [t for t in self.pendientes if t.estado == TRABAJO_PENDIENTE]
+            heapq.heapify(self.pendientes)
+
+    async def _ejecutar(self, trabajo):
+        """Imprime un trabajo con `ControladorLote` hasta que termina o se cancela."""
+        manifiesto = trabajo.trabajo
+        config = self.perfiles[manifiesto.perfil]
+        if trabajo.motivo_cancelacion is not None:
+            # Cancelado entre `_planificar` y el arranque de esta tarea.
+            self.ocupadas.difference_update(trabajo.impresoras)
+            self._finalizar(trabajo, TRABAJO_CANCELADO, trabajo.motivo_cancelacion)
+            self._planificar()
+            return
+
+        def al_pedir_confirmacion(estado, copia):
+            controlador.confirmar(estado.nombre, True)
+            self._publicar(trabajo, "copias", impresora=estado.nombre, copias=copia.descripcion,
+                           confirmadas=controlador.copias_confirmadas, total=controlador.total_copias)
+
+        def al_fallo(estado, copia):
+            trabajo.fallos += 1
+            if self.avisos is not None:
+                self.avisos.emitir(AVISO_FALLO, f"❌ FALLO en '{estado.nombre}'", copia.mensaje)
+            self._publicar(trabajo, "fallo", impresora=estado.nombre, copias=copia.descripcion,
+                           mensaje=copia.mensaje, fallos=trabajo.fallos)
+
+        controlador = ControladorLote(
+            trabajo.impresoras,
+            manifiesto.archivo,
+            config,
+            manifiesto.copias,
+            al_pedir_confirmacion=al_pedir_confirmacion,
+            al_fallo=al_fallo,
+            diario=self.diario,
+            perfil=manifiesto.perfil,
+        )
+        trabajo.controlador = controlador
+        self._publicar(trabajo, "iniciado", impresoras=trabajo.impresoras, lote=controlador.lote)
+        self.salida(f"[{trabajo.id}] Iniciando: {manifiesto.perfil} x {manifiesto.copias} en "
+                    f"{', '.join(trabajo.impresoras)} ({os.path.basename(manifiesto.archivo)})")
+        motivo = None
+        try:
+            controlador.iniciar()
+            while controlador.en_curso:
+                await asyncio.sleep(INTERVALO_RESULTADOS)
+                controlador.procesar_resultados()
+                if controlador.en_curso and not controlador.hay_impresora_activa():
+                    # Todas las impresoras del grupo fallaron.
+                    inciertas = controlador.pendientes_de_comprobar()
+                    if inciertas:
+                        # Nadie puede comprobar si se imprimieron: no se reintentan.
+                        sin_saber = ", ".join(f"{e.trabajo.descripcion} en '{e.nombre}'" for e in inciertas)
+                        motivo = f"no se sabe si salieron impresas ({sin_saber}); compruébelo en la impresora"
+                        controlador.cancelar()
+                        break
+                    if trabajo.fallos > self.max_reintentos:
+                        motivo = f"{trabajo.fallos} fallos (máximo {self.max_reintentos} reintentos)"
+                        controlador.cancelar()
+                        break
+                    controlador.reanudar()
+            if motivo is None:
+                motivo = trabajo.motivo_cancelacion
+        except Exception as e:
+            motivo = f"error interno: {e}"
+            controlador.cancelar()
+        finally:
+            controlador.detener()
+            self.ocupadas.difference_update(trabajo.impresoras)
+
+        if motivo is None and controlador.copias_confirmadas >= manifiesto.copias:
+            self._finalizar(trabajo, TRABAJO_TERMINADO, confirmadas=controlador.copias_confirmadas,
+                            resumen=controlador.metricas.texto_resumen())
+            if self.exportar_metricas:
+                try:
+                    controlador.metricas.exportar_csv()
+                    controlador.metricas.exportar_prometheus()
+                except OSError as e:
+                    self.salida(f"[{trabajo.id}] No se pudieron exportar las métricas: {e}")
+        else:
+            self._finalizar(trabajo, TRABAJO_CANCELADO, motivo or "cancelado",
+                            confirmadas=controlador.copias_confirmadas)
+        self._planificar()
+
+    def _finalizar(self, trabajo, estado, motivo=None, **campos):
+        trabajo.estado = estado
+        if motivo is not None:
+            campos['motivo'] = motivo
+        self._publicar(trabajo, estado, **campos)
+        for suscripcion in list(trabajo.suscripciones):
+            self._entregar(trabajo, suscripcion, None)
+        self.salida(f"[{trabajo.id}] {estado.capitalize()}" + (f": {motivo}" if motivo else "."))
+        if self.avisos is not None and estado == TRABAJO_TERMINADO:
+            self.avisos.emitir(AVISO_FINAL, "✅ TRABAJO TERMINADO",
+                               f"{trabajo.trabajo.perfil} x {trabajo.trabajo.copias} ({trabajo.id}).")
+        # Solo se conserva el historial de los últimos trabajos terminados.
+        terminados = [t for t in self.trabajos.values() if t.terminado]
+        for antiguo in terminados[:max(0, len(terminados) - TRABAJOS_TERMINADOS)]:
+            del self.trabajos[antiguo.id]
+
+    def _publicar(self, trabajo, evento, **campos):
+        datos = {'evento': evento, 'trabajo': trabajo.id, 't': round(time.time(), 3)}
+        datos.update(campos)
+        trabajo.eventos.append(datos)
+        for suscripcion in list(trabajo.suscripciones):
+            self._entregar(trabajo, suscripcion, datos)
+
+    @staticmethod
+    def _entregar(trabajo, suscripcion, datos):
+        try:
+            suscripcion.eventos.put_nowait(datos)
+        except asyncio.QueueFull:
+            # El cliente no lee: se le desconecta en lugar de acumular eventos.
+            suscripcion.desbordada = True
+            trabajo.suscripciones.discard(suscripcion)
+
+    def estado(self):
+        """
+        :return: Diccionario con la cola, los trabajos en curso y las impresoras ocupadas.
+        :rtype: dict
+        """
+        return {
+            'pendientes': [t.datos() for t in sorted(self.pendientes)],
+            'en_curso': [t.datos() for t in self.trabajos.values() if t.estado == TRABAJO_EN_CURSO],
+            'impresoras': self.impresoras,
+            'ocupadas': sorted(self.ocupadas),
+            'capacidad': self.capacidad,
+            'conexiones': self.conexiones,
+        }
+
+    async def _atender(self, lector, escritor):
+        self.conexiones += 1
+        try:
+            if self.conexiones > CONEXIONES_MAXIMAS:
+                raise ErrorPeticion(503, "demasiadas conexiones", [("Retry-After", str(SEGUNDOS_REINTENTO))])
+            metodo, ruta, cabeceras, cuerpo = await asyncio.wait_for(
+                self._leer_peticion(lector), SEGUNDOS_MAXIMOS_PETICION)
+            self._autorizar(cabeceras)
+            partes = [p for p in ruta.split('?', 1)[0].split('/') if p]
+            if partes == ['trabajos']:
+                if metodo != 'POST':
+                    raise ErrorPeticion(405, "use POST /trabajos")
+                try:
+                    datos = json.loads(cuerpo.decode('utf-8'))
+                except (UnicodeDecodeError, json.JSONDecodeError, RecursionError) as e:
+                    raise ErrorPeticion(400, f"JSON no válido: {e}")
+                trabajo = self.recibir(datos)
+                await self._transmitir(escritor, trabajo)
+            elif len(partes) == 2 and partes[0] == 'trabajos':
+                trabajo = self.trabajos.get(partes[1])
+                if trabajo is None:
+                    raise ErrorPeticion(404, f"trabajo desconocido: {partes[1]}")
+                if metodo == 'GET':
+                    await self._transmitir(escritor, trabajo)
+                elif metodo == 'DELETE':
+                    if not self.cancelar(trabajo.id):
+                        raise ErrorPeticion(409, f"el trabajo ya está {trabajo.estado}")
+                    await self._responder(escritor, 200, trabajo.datos())
+                else:
+                    raise ErrorPeticion(405, "use GET o DELETE /trabajos/<id>")
+            elif partes == ['estado'] and metodo == 'GET':
+                await self._responder(escritor, 200, self.estado())
+            else:
+                raise ErrorPeticion(404, f"ruta desconocida: {metodo} {ruta}")
+        except ErrorPeticion as e:
+            await self._responder(escritor, e.codigo, {'error': str(e)}, e.cabeceras)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            await self._responder(escritor, 400, {'error': "petición incompleta o demasiado grande"})
+        except ConnectionError:
+            pass
+        except Exception as e:
+            # Un fallo inesperado se contesta en lugar de cerrar la conexión sin
+            # más (el cliente solo vería la respuesta cortada).
+            self.salida(f"Error interno atendiendo una petición: {e!r}")
+            try:
+                await self._responder(escritor, 500, {'error': f"error interno: {e}"})
+            except Exception:
+                pass
+        finally:
+            self.conexiones -= 1
+            escritor.close()
+            try:
+                await escritor.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _leer_peticion(self, lector):
+        cabecera = await lector.readuntil(b"\r\n\r\n")
+        lineas = cabecera.decode('latin-1').split("\r\n")
+        try:
+            metodo, ruta, _ = lineas[0].split(" ", 2)
+        except ValueError:
+            raise ErrorPeticion(400, "línea de petición no válida")
+        cabeceras = {}
+        for linea in lineas[1:]:
+            if ":" in linea:
+                clave, valor = linea.split(":", 1)
+                cabeceras[clave.strip().lower()] = valor.strip()
+        try:
+            longitud = int(cabeceras.get('content-length', 0))
+        except ValueError:
+            raise ErrorPeticion(400, "Content-Length no válido")
+        if longitud > TAMANO_MAXIMO_CUERPO:
+            raise ErrorPeticion(413, f"el cuerpo supera {TAMANO_MAXIMO_CUERPO} bytes")
+        cuerpo = await lector.readexactly(longitud) if longitud > 0 else b""
+        return metodo.upper(), ruta, cabeceras, cuerpo
+
+    def _autorizar(self, cabeceras):
+        if not self.token:
+            return
+        esperado = f"Bearer {self.token}"
+        if not hmac.compare_digest(cabeceras.get('authorization', '').encode(), esperado.encode()):
+            raise ErrorPeticion(401, "falta el token o no es válido")
+
+    @staticmethod
+    async def _responder(escritor, codigo, datos, cabeceras=()):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+        lineas = [f"HTTP/1.1 {codigo} {_RAZONES.get(codigo, '')}",
+                  "Content-Type: application/json; charset=utf-8",
+                  f"Content-Length: {len(cuerpo)}",
+                  "Connection: close"]
+        lineas += [f"{clave}: {valor}" for clave, valor in cabeceras]
+        escritor.write(("\r\n".join(lineas) + "\r\n\r\n").encode('latin-1') + cuerpo)
+        try:
+            await escritor.drain()
+        except ConnectionError:
+            pass
+
+    async def _transmitir(self, escritor, trabajo):
+        """
+        Envía como NDJSON el historial del trabajo y, si no ha terminado, sus
+        eventos a medida que ocurren. El cuerpo termina al cerrar la conexión.
+        Un fallo inesperado a mitad del flujo se informa con un evento 'error',
+        porque la cabecera 200 ya está enviada.
+        """
+        # Historial y suscripción sin `await` entre medias: no se pierde ningún evento.
+        historial = list(trabajo.eventos)
+        suscripcion = None
+        if not trabajo.terminado:
+            suscripcion = _Suscripcion()
+            trabajo.suscripciones.add(suscripcion)
+        try:
+            escritor.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                           b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+            for datos in historial:
+                escritor.write(_linea(datos))
+            # `drain` espera a que el cliente lea: es la contrapresión de cada conexión.
+            await escritor.drain()
+            while suscripcion is not None:
+                datos = await suscripcion.eventos.get()
+                if datos is None:
+                    break
+                escritor.write(_linea(datos))
+                if suscripcion.desbordada and suscripcion.eventos.empty():
+                    escritor.write(_linea({'evento': "desbordado", 'trabajo': trabajo.id,
+                                           'motivo': f"vuelva a conectar con GET /trabajos/{trabajo.id}"}))
+                    break
+                await escritor.drain()
+            await escritor.drain()
+        except ConnectionError:
+            raise
+        except Exception as e:
+            self.salida(f"[{trabajo.id}] Error interno enviando eventos: {e!r}")
+            escritor.write(_linea({'evento': "error", 'trabajo': trabajo.id, 'error': f"error interno: {e}"}))
+        finally:
+            if suscripcion is not None:
+                trabajo.suscripciones.discard(suscripcion)
+
+
+def _linea(datos):
+    return json.dumps(datos, ensure_ascii=False).encode('utf-8') + b"\n"
+
+
+async def enviar_trabajo(datos, host=HOST_POR_DEFECTO, puerto=PUERTO_POR_DEFECTO, token=None):
+    """
+    Cliente mínimo: envía un trabajo al servidor y devuelve sus eventos a
+    medida que llegan.
+
+    Si el servidor rechaza el trabajo se obtiene un único evento 'rechazado'
+    con el código HTTP, el error y, si la cola estaba llena, `reintentar_en`.
+
+    :param datos: Objeto JSON con los campos del manifiesto.
+    :return: Generador asíncrono de diccionarios de evento.
+    """
+    cuerpo = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+    cabeceras = ["POST /trabajos HTTP/1.1", f"Host: {host}:{puerto}",
+                 "Content-Type: application/json", f"Content-Length: {len(cuerpo)}"]
+    if token:
+        cabeceras.append(f"Authorization: Bearer {token}")
+    lector, escritor = await asyncio.open_connection(host, puerto)
+    try:
+        escritor.write(("\r\n".join(cabeceras) + "\r\n\r\n").encode('latin-1') + cuerpo)
+        await escritor.drain()
+        respuesta = (await lector.readuntil(b"\r\n\r\n")).decode('latin-1').split("\r\n")
+        codigo = int(respuesta[0].split(" ", 2)[1])
+        if codigo != 200:
+            rechazo = {'evento': "rechazado", 'codigo': codigo}
+            rechazo.update(json.loads((await lector.read()) or b"{}"))
+            for linea in respuesta[1:]:
+                if linea.lower().startswith("retry-after:"):
+                    rechazo['reintentar_en'] = float(linea.split(":", 1)[1])
+            yield rechazo
+            return
+        async for linea in lector:
+            if linea.strip():
+                yield json.loads(linea)
+    finally:
+        escritor.close()
+
+
+def ejecutar_servidor(host=HOST_POR_DEFECTO, puerto=PUERTO_POR_DEFECTO, max_reintentos=3, capacidad=COLA_MAXIMA):
+    """
+    Punto de entrada del servidor de trabajos (ver `main.py --servidor`).
+    El token, si lo hay, se lee de la variable de entorno `PRINTFLOW_TOKEN`.
+
+    :return: Código de salida del proceso: 0 si se detuvo con normalidad y 1
+             si no pudo arrancar (por ejemplo, con el puerto ya en uso).
+    :rtype: int
+    """
+    diario = DiarioTrabajos()
+    avisos = obtener_despachador()
+    servidor = ServidorTrabajos(
+        cargar_datos_libros_dinamicos(),
+        listar_impresoras_disponibles(),
+        host=host,
+        puerto=puerto,
+        capacidad=capacidad,
+        max_reintentos=max_reintentos,
+        diario=diario,
+        avisos=avisos,
+        token=os.environ.get("PRINTFLOW_TOKEN"),
+    )
+    if host not in ("127.0.0.1", "localhost", "::1") and not servidor.token:
+        print("Advertencia: el servidor acepta trabajos de otros equipos sin token (defina PRINTFLOW_TOKEN).")
+    codigo = 0
+    try:
+        asyncio.run(servidor.servir())
+    except KeyboardInterrupt:
+        print("Servidor detenido.")
+    except OSError as e:
+        print(f"!!! ERROR: no se pudo iniciar el servidor en {host}:{puerto}: {e}")
+        codigo = 1
+    finally:
+        diario.cerrar()
+        avisos.detener()
+    return codigo
@@ -0,0 +1,396 @@
+import collections
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import socket
+import threading
+
+from backends import BackendImpresion, ESTADO_COMPLETADO, cargar_win32
+
+# Tamaño de cada bloque que se lee del archivo y se escribe en el destino.
+TAMANO_BLOQUE = 1024 * 1024
+
+# Espacio máximo que ocupa la caché de spool antes de borrar lo más antiguo.
+TAMANO_MAXIMO_CACHE = 2 * 1024 * 1024 * 1024
+
+# Hashes de archivos que se recuerdan como máximo (los menos usados se olvidan).
+HASHES_RECORDADOS = 4096
+
+# Formatos que cualquier impresora con envío RAW entiende tal cual (lenguajes de
+# impresión y texto plano). Los PDF solo si el perfil indica `pdf_directo`.
+FORMATOS_DIRECTOS = ('.prn', '.pcl', '.ps', '.txt')
+
+DIRECTORIO_POR_DEFECTO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".spool_cache")
+
+
+def hash_archivo(ruta, bloque=TAMANO_BLOQUE):
+    """
+    Calcula el SHA-256 del contenido de un archivo leyéndolo por bloques.
+
+    :return: El hash en hexadecimal.
+    :rtype: str
+    """
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for trozo in iter(lambda: f.read(bloque), b''):
+            sha.update(trozo)
+    return sha.hexdigest()
+
+
+def renderizar_directo(ruta, printer_name, config, destino):
+    """
+    Renderizador por defecto: si el documento ya está en un formato que la
+    impresora entiende (PRN/PCL/PostScript/texto, o PDF cuando el perfil indica
+    `pdf_directo`), el spool es una copia exacta del archivo.
+
+    :raises ValueError: Si el formato necesita una aplicación o un controlador
+                        para convertirse (DOCX, o PDF sin `pdf_directo`); enviado
+                        en RAW saldría como basura en la impresora.
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension not in FORMATOS_DIRECTOS and not (extension == '.pdf' and config.get('pdf_directo')):
+        raise ValueError(f"la impresora '{printer_name}' no puede recibir archivos '{extension or 'sin extensión'}' "
+                         f"en modo RAW; use el envío normal o un perfil con 'pdf_directo' si admite PDF")
+    shutil.copyfile(ruta, destino)
+
+
+class CacheSpool:
+    """
+    Caché de archivos de spool listos para la impresora.
+
+    Cada documento se renderiza una sola vez por combinación de contenido
+    (hash), impresora y perfil; las copias siguientes reutilizan el archivo
+    de la caché. El renderizador es intercambiable: recibe
+    `(ruta, impresora, config, destino)` y debe escribir el spool en `destino`.
+    """
+    def __init__(self, directorio=DIRECTORIO_POR_DEFECTO, renderizador=renderizar_directo,
+                 tamano_maximo=TAMANO_MAXIMO_CACHE):
+        self.directorio = directorio
+        self.renderizador = renderizador
+        self.tamano_maximo = tamano_maximo
+        self._hashes = collections.OrderedDict()     # (ruta, mtime_ns, tamaño) -> hash del contenido
+        self._lock = threading.Lock()
+        os.makedirs(self.directorio, exist_ok=True)
+
+    def _hash(self, ruta):
+        # El hash se recuerda mientras el archivo no cambie, para no releerlo en cada copia.
+        info = os.stat(ruta)
+        firma = (os.path.abspath(ruta), info.st_mtime_ns, info.st_size)
+        if firma in self._hashes:
+            self._hashes.move_to_end(firma)
+        else:
+            self._hashes[firma] = hash_archivo(ruta)
+            if len(self._hashes) > HASHES_RECORDADOS:
+                self._hashes.popitem(last=False)
+        return self._hashes[firma]
+
+    def clave(self, ruta, printer_name, config):
+        """
+        :return: Clave de caché para el documento, la impresora y el perfil.
+        :rtype: str
+        """
+        perfil = json.dumps(config, sort_keys=True, ensure_ascii=False)
+        sha = hashlib.sha256()
+        for parte in (self._hash(ruta), printer_name, perfil):
+            sha.update(parte.encode('utf-8') + b'\0')
+        return sha.hexdigest()
+
+    def obtener(self, ruta, printer_name, config):
+        """
+        Devuelve el archivo de spool del documento, renderizándolo si no estaba
+        en la caché.
+
+        :return: Una tupla (ruta_spool, recien_renderizado).
+        :rtype: tuple[str, bool]
+        """
+        with self._lock:
+            destino = os.path.join(self.directorio, self.clave(ruta, printer_name, config) + ".prn")
+            if os.path.exists(destino):
+                # Se actualiza la fecha para que la limpieza borre primero lo menos usado.
+                os.utime(destino)
+                return destino, False
+
+            temporal = destino + ".tmp"
+            try:
+                self.renderizador(ruta, printer_name, config, temporal)
+                os.replace(temporal, destino)
+            finally:
+                if os.path.exists(temporal):
+                    os.remove(temporal)
+            self._limpiar()
+            return destino, True
+
+    def _limpiar(self):
+        """Borra los spools menos usados hasta quedar por debajo de `tamano_maximo`."""
+        archivos = []
+        for entrada in os.scandir(self.directorio):
+            if entrada.is_file() and entrada.name.endswith(".prn"):
+                info = entrada.stat()
+                archivos.append((info.st_mtime, info.st_size, entrada.path))
+        total = sum(tamano for _, tamano, _ in archivos)
+        for _, tamano, ruta in sorted(archivos):
+            if total <= self.tamano_maximo:
+                break
+            os.remove(ruta)
+            total -= tamano
+
+
+class SumideroSpool:
+    """
+    Destino de los bytes RAW de un trabajo. `abrir` empieza el trabajo,
+    `escribir` recibe bloques y `cerrar` lo termina y devuelve el
+    identificador del trabajo en el spooler (o None si no lo hay). Si la
+    escritura falla, `abortar` descarta el trabajo a medias sin imprimirlo.
+    """
+    def abrir(self, nombre_documento):
+        raise NotImplementedError
+
+    def escribir(self, datos):
+        raise NotImplementedError
+
+    def cerrar(self):
+        raise NotImplementedError
+
+    def abortar(self):
+        raise NotImplementedError
+
+
+class SumideroWin32(SumideroSpool):
+    """
+    Envía los bytes a la impresora de Windows como un trabajo RAW
+    (`StartDocPrinter` + `WritePrinter`), sin pasar por ninguna aplicación.
+    """
+    def __init__(self, printer_name):
+        self.printer_name = printer_name
+        self._win32print = cargar_win32()
+        self._handle = None
+        self._id = None
+
+    def abrir(self, nombre_documento):
+        self._handle = self._win32print.OpenPrinter(self.printer_name)
+        self._id = self._win32print.StartDocPrinter(self._handle, 1, (nombre_documento, None, "RAW"))
+        self._win32print.StartPagePrinter(self._handle)
+
+    def escribir(self, datos):
+        self._win32print.WritePrinter(self._handle, bytes(datos))
+
+    def cerrar(self):
+        try:
+            self._win32print.EndPagePrinter(self._handle)
+            self._win32print.EndDocPrinter(self._handle)
+        finally:
+            self._win32print.ClosePrinter(self._handle)
+            self._handle = None
+        return self._id
+
+    def abortar(self):
+        if self._handle is None:
+            return
+        try:
+            # `AbortPrinter` borra el trabajo del spooler con lo que llevara escrito.
+            self._win32print.AbortPrinter(self._handle)
+        finally:
+            self._win32print.ClosePrinter(self._handle)
+            self._handle = None
+
+
+class SumideroArchivo(SumideroSpool):
+    """
+    Escribe cada trabajo en un archivo de un directorio local. Sirve como
+    sustituto de la impresora para pruebas en Linux.
+    """
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self.trabajos = 0
+        self._archivo = None
+        os.makedirs(self.directorio, exist_ok=True)
+
+    def abrir(self, nombre_documento):
+        self.trabajos += 1
+        self._archivo = open(os.path.join(self.directorio, f"{self.trabajos:06d}_{nombre_documento}"), 'wb')
+
+    def escribir(self, datos):
+        self._archivo.write(datos)
+
+    def cerrar(self):
+        self._archivo.close()
+        self._archivo = None
+        return None
+
+    def abortar(self):
+        if self._archivo is None:
+            return
+        self._archivo.close()
+        os.remove(self._archivo.name)
+        self._archivo = None
+
+
+class SumideroSocket(SumideroSpool):
+    """
+    Envía los bytes por TCP, como a un puerto RAW/JetDirect (9100) de una
+    impresora de red o a un servidor local de pruebas.
+    """
+    def __init__(self, host, puerto=9100, tiempo_maximo=30.0):
+        self.host = host
+        self.puerto = puerto
+        self.tiempo_maximo = tiempo_maximo
+        self._socket = None
+
+    def abrir(self, nombre_documento):
+        self._socket = socket.create_connection((self.host, self.puerto), timeout=self.tiempo_maximo)
+
+    def escribir(self, datos):
+        self._socket.sendall(datos)
+
+    def cerrar(self):
+        self._socket.close()
+        self._socket = None
+        return None
+
+    def abortar(self):
+        # La impresora descarta lo recibido al cerrarse la conexión sin fin de trabajo.
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+class SumideroSimulado(SumideroSpool):
+    """
+    Entrega cada trabajo RAW a un `backends.BackendSimulado`, que lo pone en la
+    cola de la impresora simulada como cualquier otro trabajo; así el modo RAW
+    se puede probar y medir sin Windows.
+    """
+    def __init__(self, backend, printer_name, config):
+        self.backend = backend
+        self.printer_name = printer_name
+        self.config = config
+        self.bytes_escritos = 0
+        self._nombre = None
+
+    def abrir(self, nombre_documento):
+        self._nombre = nombre_documento
+        self.bytes_escritos = 0
+
+    def escribir(self, datos):
+        self.bytes_escritos += len(datos)
+
+    def cerrar(self):
+        exito, mensaje, id_trabajo = self.backend.someter_trabajo(self.printer_name, self._nombre, self.config)
+        if not exito:
+            raise OSError(mensaje)
+        return id_trabajo
+
+    def abortar(self):
+        self._nombre = None
+        self.bytes_escritos = 0
+
+
+def transmitir(ruta_spool, sumidero, nombre_documento, copias=1, bloque=TAMANO_BLOQUE):
+    """
+    Envía un archivo de spool al sumidero por bloques a través de `mmap`,
+    sin cargarlo entero en memoria. Cada copia es un trabajo RAW propio: un
+    PDF (o cualquier documento con estructura) no sigue siendo válido si se
+    repiten sus bytes dentro del mismo trabajo.
+
+    Si falla el envío de una copia, esa copia se aborta en el sumidero en
+    lugar de cerrarse, para que no se imprima un trabajo truncado.
+
+    :return: El identificador del último trabajo que devuelve el sumidero; el
+             spooler imprime las copias en orden, así que es el que termina último.
+    """
+    id_trabajo = None
+    with open(ruta_spool, 'rb') as f:
+        # `mmap` no admite archivos vacíos; un spool vacío se envía sin datos.
+        mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(ruta_spool) > 0 else None
+        try:
+            vista = memoryview(mapa) if mapa is not None else memoryview(b'')
+            try:
+                for _ in range(copias):
+                    try:
+                        sumidero.abrir(nombre_documento)
+                        for inicio in range(0, len(vista), bloque):
+                            # Cada trozo se libera aunque `escribir` falle: el traceback
+                            # lo mantendría vivo y `mmap` no se podría cerrar.
+                            with vista[inicio:inicio + bloque] as trozo:
+                                sumidero.escribir(trozo)
+                    except BaseException:
+                        sumidero.abortar()
+                        raise
+                    id_trabajo = sumidero.cerrar()
+            finally:
+                vista.release()
+        finally:
+            if mapa is not None:
+                mapa.close()
+    return id_trabajo
+
+
+class BackendRaw(BackendImpresion):
+    """
+    Backend que renderiza cada documento una sola vez y envía los bytes
+    cacheados directamente al dispositivo en cada copia, en lugar de volver a
+    abrir la aplicación asociada con `ShellExecute`.
+
+    El seguimiento del estado de los trabajos se delega en `backend_estado`
+    (por ejemplo, `BackendWindows`, que sabe leer el trabajo RAW por su id), y
+    los bytes se escriben en el sumidero que ese backend da con `sumidero_raw`
+    salvo que se indique otro. Si el sumidero no devuelve id (archivo, socket),
+    el trabajo se da por completado al terminar de escribir los bytes.
+    """
+    nombre = "raw"
+
+    def __init__(self, fabrica_sumidero=None, cache=None, backend_estado=None):
+        """
+        :param fabrica_sumidero: Función (impresora, config) -> `SumideroSpool`
+                                 (por defecto, `backend_estado.sumidero_raw`).
+        :param cache: `CacheSpool` a usar (por defecto, la del proyecto).
+        :param backend_estado: Backend para listar impresoras y seguir trabajos.
+        """
+        self.fabrica_sumidero = fabrica_sumidero or (backend_estado.sumidero_raw if backend_estado else None)
+        self.cache = cache or CacheSpool()
+        self.backend_estado = backend_estado
+
+    def listar_impresoras(self):
+        return self.backend_estado.listar_impresoras() if self.backend_estado else []
+
+    def someter_trabajo(self, printer_name, file_path, config, copias=1):
+        try:
+            ruta_spool, nuevo = self.cache.obtener(file_path, printer_name, config)
+            sumidero = self.fabrica_sumidero(printer_name, config)
+            id_trabajo = transmitir(ruta_spool, sumidero, os.path.basename(file_path), copias)
+        except Exception as e:
+            return False, f"!!! ERROR al enviar trabajo RAW: {e}", None
+        origen = "renderizado" if nuevo else "desde caché"
+        return True, f"Trabajo RAW enviado ({origen}).", id_trabajo
+
+    def estado_trabajo(self, printer_name, id_trabajo):
+        if id_trabajo is None or self.backend_estado is None:
+            return ESTADO_COMPLETADO
+        return self.backend_estado.estado_trabajo(printer_name, id_trabajo)
+
+    def profundidad_cola(self, printer_name):
+        return self.backend_estado.profundidad_cola(printer_name) if self.backend_estado else 0
+
+    def cancelar_trabajo(self, printer_name, id_trabajo):
+        if id_trabajo is None or self.backend_estado is None:
+            return False
+        return self.backend_estado.cancelar_trabajo(printer_name, id_trabajo)
+
+    def estado_impresoras(self):
+        return self.backend_estado.estado_impresoras() if self.backend_estado else []
+
+    def capacidades_impresora(self, printer_name):
+        if self.backend_estado is None:
+            return super().capacidades_impresora(printer_name)
+        return self.backend_estado.capacidades_impresora(printer_name)
+
+    def ahora(self):
+        return self.backend_estado.ahora() if self.backend_estado else super().ahora()
+
+    def esperar_cambio(self, printer_name, tiempo_maximo):
+        if self.backend_estado is not None:
+            self.backend_estado.esperar_cambio(printer_name, tiempo_maximo)
+        else:
+            super().esperar_cambio(printer_name, tiempo_maximo)
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Los módulos de `src` se importan igual que desde `main.py`; la raíz, para
+# poder usar `main` y `benchmark` sin ventanas.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, 'src'))
@@ -0,0 +1,120 @@
+import time
+
+import alert_system
+from alert_system import AVISO_CONFIRMACION, AVISO_FALLO, AVISO_FINAL, CanalAviso, DespachadorAvisos
+
+
+class _CanalRegistro(CanalAviso):
+    nombre = "registro"
+
+    def __init__(self):
+        self.avisos = []
+        self.instantes = []
+
+    def entregar(self, aviso):
+        self.avisos.append(aviso)
+        self.instantes.append(time.monotonic())
+
+
+class _CanalLento(CanalAviso):
+    nombre = "lento"
+
+    def __init__(self, segundos):
+        self.segundos = segundos
+
+    def entregar(self, aviso):
+        time.sleep(self.segundos)
+
+
+class _CanalQueFalla(CanalAviso):
+    nombre = "falla"
+
+    def entregar(self, aviso):
+        raise OSError("sin conexión")
+
+
+def _esperar(condicion, tiempo_maximo=5.0):
+    limite = time.monotonic() + tiempo_maximo
+    while not condicion():
+        assert time.monotonic() < limite, "no llegó a cumplirse"
+        time.sleep(0.005)
+
+
+def test_una_rafaga_del_mismo_tipo_llega_como_un_aviso():
+    registro = _CanalRegistro()
+    avisos = DespachadorAvisos(canales=[registro], ventana_agrupacion=0.1, intervalo_minimo=0)
+    for impresora in "ABC":
+        avisos.emitir(AVISO_CONFIRMACION, "COPIA TERMINADA", f"Copia terminada en '{impresora}'.")
+    avisos.emitir(AVISO_FALLO, "FALLO en 'D'", "Sin papel.")
+    avisos.emitir(AVISO_FALLO, "FALLO en 'E'", "Atasco.")
+    avisos.detener()
+
+    confirmacion, fallo = registro.avisos
+    assert confirmacion.repeticiones == 3
+    assert confirmacion.texto == "\n".join(f"Copia terminada en '{i}'." for i in "ABC")
+    # Con títulos distintos, cada mensaje conserva el suyo.
+    assert fallo.texto == "FALLO en 'D': Sin papel.\nFALLO en 'E': Atasco."
+    assert avisos.resumen()['agrupados'] == 3
+    assert avisos.entregados == 2
+
+
+def test_los_mensajes_agrupados_estan_acotados(monkeypatch):
+    monkeypatch.setattr(alert_system, 'MENSAJES_POR_AVISO', 2)
+    registro = _CanalRegistro()
+    avisos = DespachadorAvisos(canales=[registro], ventana_agrupacion=0.1, intervalo_minimo=0)
+    for copia in range(5):
+        avisos.emitir(AVISO_CONFIRMACION, "COPIA TERMINADA", f"Copia {copia}.")
+    avisos.emitir(AVISO_CONFIRMACION, "COPIA TERMINADA", "Copia 0.")
+    avisos.detener()
+
+    aviso, = registro.avisos
+    assert aviso.repeticiones == 6
+    assert len(aviso.entradas) == 2
+    assert aviso.texto == "Copia 0.\nCopia 1.\n(y 4 aviso(s) más del mismo tipo)"
+
+
+def test_intervalo_minimo_entre_entregas():
+    registro = _CanalRegistro()
+    avisos = DespachadorAvisos(canales=[registro], ventana_agrupacion=0, intervalo_minimo=0.2)
+    avisos.emitir(AVISO_CONFIRMACION, "COPIA TERMINADA", "Primera.")
+    _esperar(lambda: avisos.entregados == 1)
+    avisos.emitir(AVISO_CONFIRMACION, "COPIA TERMINADA", "Segunda.")
+    avisos.emitir(AVISO_CONFIRMACION, "COPIA TERMINADA", "Tercera.")
+    # `detener` entregaría ya lo pendiente: se espera a la entrega normal.
+    _esperar(lambda: avisos.entregados == 2)
+    avisos.detener()
+
+    assert [a.texto for a in registro.avisos] == ["Primera.", "Segunda.\nTercera."]
+    assert registro.instantes[1] - registro.instantes[0] >= 0.2
+
+
+def test_un_canal_lento_o_caido_no_frena_a_quien_emite_ni_a_los_demas():
+    registro = _CanalRegistro()
+    avisos = DespachadorAvisos(canales=[_CanalLento(0.3), _CanalQueFalla(), registro],
+                               ventana_agrupacion=0, intervalo_minimo=0)
+    avisos.emitir(AVISO_FALLO, "FALLO", "Sin papel.")
+    time.sleep(0.05)
+    inicio = time.monotonic()
+    avisos.emitir(AVISO_CONFIRMACION, "COPIA TERMINADA", "Copia 1.")
+    # `emitir` vuelve enseguida aunque el canal lento esté entregando.
+    assert time.monotonic() - inicio < 0.05
+    avisos.detener()
+
+    assert [a.tipo for a in registro.avisos] == [AVISO_FALLO, AVISO_CONFIRMACION]
+    resumen = avisos.resumen()
+    assert resumen['canales']['falla'] == {"entregas": 0, "p50": 0.0, "p95": 0.0, "errores": 2}
+    assert resumen['canales']['registro']['entregas'] == 2
+
+
+def test_latencia_de_entrega_por_canal():
+    avisos = DespachadorAvisos(canales=[_CanalLento(0.1), _CanalRegistro()], ventana_agrupacion=0.05,
+                               intervalo_minimo=0)
+    avisos.emitir(AVISO_FINAL, "LOTE TERMINADO", "Listo.")
+    _esperar(lambda: avisos.entregados == 1)
+    avisos.detener()
+
+    canales = avisos.resumen()['canales']
+    # La latencia va desde que se emitió el aviso: incluye la ventana y los canales anteriores.
+    assert canales['lento']['entregas'] == 1
+    assert 0.15 <= canales['lento']['p50'] < 1.0
+    assert canales['registro']['p50'] >= canales['lento']['p50']
@@ -0,0 +1,215 @@
+import io
+import zipfile
+import zlib
+
+import pytest
+
+from analisis_previo import CacheAnalisis, analizar_archivo
+
+
+def _pdf(*objetos):
+    """Un PDF mínimo con los objetos dados (cuerpo en bytes, sin 'N 0 obj')."""
+    partes = [b"%PDF-1.7\n"]
+    for numero, cuerpo in enumerate(objetos, start=1):
+        partes.append(b"%d 0 obj\n" % numero + cuerpo + b"\nendobj\n")
+    partes.append(b"trailer\n<< /Root 1 0 R >>\n%%EOF\n")
+    return b"".join(partes)
+
+
+def _flujo(datos, comprimir=False, extra=b""):
+    if comprimir:
+        datos = zlib.compress(datos)
+        extra += b" /Filter /FlateDecode"
+    return b"<< /Length %d%s >>\nstream\n" % (len(datos), extra) + datos + b"\nendstream"
+
+
+def _paginas(cuenta, caja=b"[0 0 595 842]"):
+    return b"<< /Type /Pages /Kids [3 0 R] /Count %d /MediaBox %s >>" % (cuenta, caja)
+
+
+@pytest.fixture
+def escribir(tmp_path):
+    def escribir(nombre, contenido):
+        ruta = tmp_path / nombre
+        ruta.write_bytes(contenido)
+        return str(ruta)
+    return escribir
+
+
+def test_pdf_en_blanco_y_negro(escribir):
+    ruta = escribir("bn.pdf", _pdf(
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        _paginas(2),
+        b"<< /Type /Page /Parent 2 0 R /Contents 4 0 R >>",
+        _flujo(b"0 0 0 rg 1 1 1 RG 0.5 g BT (hola) Tj ET", comprimir=True),
+    ))
+    analisis = analizar_archivo(ruta)
+    assert analisis.formato == 'pdf'
+    assert analisis.paginas == 2
+    assert analisis.tamanos == {'A4': 1}
+    assert analisis.color is False
+
+
+def test_pdf_con_color_en_el_contenido_o_en_una_imagen(escribir):
+    contenido = escribir("texto.pdf", _pdf(
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        _paginas(1, b"[0 0 612 792]"),
+        b"<< /Type /Page /Parent 2 0 R /Contents 4 0 R >>",
+        _flujo(b"0 0 0 rg 0.9 0.1 0.1 rg", comprimir=True),
+    ))
+    imagen = escribir("imagen.pdf", _pdf(
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        _paginas(1),
+        b"<< /Type /Page /Parent 2 0 R >>",
+        _flujo(b"\x00" * 16, extra=b" /Type /XObject /Subtype /Image /ColorSpace /DeviceRGB"),
+    ))
+    assert analizar_archivo(contenido).color is True
+    assert analizar_archivo(contenido).tamanos == {'Carta': 1}
+    assert analizar_archivo(imagen).color is True
+
+
+def test_pdf_con_paginas_en_un_flujo_de_objetos(escribir):
+    paginas = _paginas(1, b"[0 0 420 595]") + b" "
+    cabecera = b"2 0 3 %d " % len(paginas)
+    objetos = paginas + b"<< /Type /Page /Parent 2 0 R >>"
+    ruta = escribir("objstm.pdf", _pdf(
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        _flujo(cabecera + objetos, comprimir=True, extra=b" /Type /ObjStm /N 2 /First %d" % len(cabecera)),
+    ))
+    analisis = analizar_archivo(ruta)
+    assert analisis.paginas == 1
+    assert analisis.tamanos == {'A5': 1}
+
+
+def test_pdf_con_un_flujo_dañado_deja_el_color_sin_determinar(escribir):
+    ruta = escribir("roto.pdf", _pdf(
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        _paginas(1),
+        b"<< /Type /Page /Parent 2 0 R /Contents 4 0 R >>",
+        b"<< /Length 9 /Filter /FlateDecode >>\nstream\nno es zip\nendstream",
+    ))
+    analisis = analizar_archivo(ruta)
+    assert analisis.paginas == 1
+    assert analisis.color is None
+
+
+def test_pdf_con_medidas_absurdas(escribir):
+    ruta = escribir("enorme.pdf", _pdf(
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        _paginas(1, b"[0 0 " + b"9" * 400 + b" 842]"),
+        b"<< /Type /Page /Parent 2 0 R >>",
+    ))
+    analisis = analizar_archivo(ruta)
+    assert analisis.paginas == 1
+    assert analisis.tamanos == {}
+
+
+@pytest.mark.parametrize("contenido", [b"", b"hola, no soy un PDF"])
+def test_lo_que_no_es_pdf(escribir, contenido):
+    with pytest.raises(ValueError):
+        analizar_archivo(escribir("falso.pdf", contenido))
+
+
+def _docx(documento, paginas=3, imagenes=None):
+    memoria = io.BytesIO()
+    with zipfile.ZipFile(memoria, 'w', zipfile.ZIP_DEFLATED) as paquete:
+        paquete.writestr('word/document.xml', documento)
+        if paginas is not None:
+            paquete.writestr('docProps/app.xml', f"<Properties><Pages>{paginas}</Pages></Properties>")
+        for nombre, datos in (imagenes or {}).items():
+            paquete.writestr('word/media/' + nombre, datos)
+    return memoria.getvalue()
+
+
+CARTA = '<w:sectPr><w:pgSz w:w="12240" w:h="15840"/></w:sectPr>'
+
+
+def test_docx_en_blanco_y_negro(escribir):
+    analisis = analizar_archivo(escribir("bn.docx", _docx(f'<w:r><w:color w:val="000000"/></w:r>{CARTA}')))
+    assert analisis.formato == 'docx'
+    assert analisis.paginas == 3
+    assert analisis.tamanos == {'Carta': 1}
+    assert analisis.color is False
+
+
+def test_docx_con_color(escribir):
+    texto = escribir("texto.docx", _docx(f'<w:r><w:color w:val="C00000"/></w:r>{CARTA}'))
+    resaltado = escribir("resaltado.docx", _docx('<w:highlight w:val="yellow"/>', paginas=None))
+    png_color = b"\x89PNG\r\n\x1a\n" + b"\x00" * 17 + bytes([8, 2]) + b"\x00" * 8
+    imagen = escribir("imagen.docx", _docx(CARTA, imagenes={'image1.png': png_color}))
+    assert analizar_archivo(texto).color is True
+    assert analizar_archivo(resaltado).color is True
+    assert analizar_archivo(resaltado).paginas is None
+    assert analizar_archivo(imagen).color is True
+
+
+def test_docx_con_crc_incorrecto(escribir):
+    documento = f'<w:body>{"x" * 2000}{CARTA}</w:body>'
+    datos = bytearray(_docx(documento))
+    # Se cambia un byte del contenido comprimido de word/document.xml.
+    inicio = datos.index(b'word/document.xml') + len('word/document.xml')
+    datos[inicio + 10] ^= 0xFF
+    with pytest.raises(ValueError):
+        analizar_archivo(escribir("crc.docx", bytes(datos)))
+
+
+@pytest.mark.parametrize("contenido", [b"no soy un zip", _docx("<w:body/>")[:-40]])
+def test_docx_que_no_se_puede_abrir(escribir, contenido):
+    with pytest.raises(ValueError):
+        analizar_archivo(escribir("roto.docx", contenido))
+
+
+def test_zip_sin_documento_de_word(escribir):
+    memoria = io.BytesIO()
+    with zipfile.ZipFile(memoria, 'w') as paquete:
+        paquete.writestr('hola.txt', "hola")
+    with pytest.raises(ValueError):
+        analizar_archivo(escribir("otro.docx", memoria.getvalue()))
+
+
+def test_la_cache_reutiliza_el_analisis(escribir, tmp_path):
+    ruta = escribir("bn.docx", _docx(CARTA))
+    cache = CacheAnalisis(ruta=str(tmp_path / "cache.json"))
+    assert not analizar_archivo(ruta).desde_cache
+    cache.analizar(ruta)
+    otra = CacheAnalisis(ruta=str(tmp_path / "cache.json"))
+    segundo = otra.analizar(ruta)
+    assert segundo.desde_cache
+    assert segundo.paginas == 3
+
+
+class _CacheQueFalla:
+    def analizar(self, ruta):
+        raise zipfile.BadZipFile("Bad CRC-32 for file 'word/document.xml'")
+
+
+def test_un_error_inesperado_no_deja_el_analisis_colgado(escribir):
+    benchmark = pytest.importorskip("benchmark")
+    from backends import BackendSimulado
+
+    maestro = benchmark.MaestroSimulado()
+    app = benchmark.AppSinCabeza(maestro, BackendSimulado(impresoras=["A"]))
+    try:
+        app.cache_analisis = _CacheQueFalla()
+        app.update_status = lambda texto, color="black": (app.status_label.config(text=texto), maestro.quit())
+        app.iniciar_analisis(escribir("crc.docx", b""))
+        # Si el hilo muriera sin resultado, el sondeo seguiría hasta este límite.
+        maestro.after(5000, maestro.quit)
+        maestro.mainloop()
+    finally:
+        app.diario.cerrar()
+    assert "No se pudo analizar 'crc.docx'" in app.status_label.opciones['text']
+
+
+def test_la_cache_descarta_el_analisis_usado_hace_mas_tiempo(escribir, tmp_path):
+    rutas = [escribir(f"{nombre}.docx", _docx(CARTA + nombre)) for nombre in ("uno", "dos", "tres")]
+    cache = CacheAnalisis(ruta=str(tmp_path / "cache.json"), maximo=2)
+    cache.analizar(rutas[0])
+    cache.analizar(rutas[1])
+    # El uso del primero se recuerda aunque se vuelva a abrir la caché.
+    assert CacheAnalisis(ruta=str(tmp_path / "cache.json")).analizar(rutas[0]).desde_cache
+
+    otra = CacheAnalisis(ruta=str(tmp_path / "cache.json"), maximo=2)
+    otra.analizar(rutas[2])
+    assert otra.analizar(rutas[0]).desde_cache
+    assert not otra.analizar(rutas[1]).desde_cache
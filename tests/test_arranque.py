@@ -0,0 +1,39 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que solo deben cargarse cuando se usan (Windows, PDF, servidor HTTP).
+PEREZOSOS = ("win32print", "pypdf", "servidor_trabajos", "spool_raw", "fragmentos", "analisis_previo")
+
+
+def test_importar_main_no_carga_los_modulos_perezosos():
+    pytest.importorskip("tkinter")
+    codigo = (f"import json, sys; sys.path.insert(0, {RAIZ!r}); import main; "
+              f"print(json.dumps([m for m in {PEREZOSOS!r} if m in sys.modules]))")
+    salida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True, cwd=RAIZ)
+    assert json.loads(salida.stdout.splitlines()[-1]) == []
+
+
+def test_el_historial_se_carga_despues_de_construir_la_ventana():
+    benchmark = pytest.importorskip("benchmark")
+    from backends import BackendSimulado
+
+    maestro = benchmark.MaestroSimulado()
+    app = benchmark.AppSinCabeza(maestro, BackendSimulado(impresoras=["A"]))
+    ofrecida = []
+    try:
+        # El diario y la cola se leen en un hilo; la GUI los recoge desde el bucle.
+        assert not app.historial_cargado
+        assert not app.listo
+        app.ofrecer_reanudacion = lambda: (ofrecida.append(True), maestro.quit())
+        maestro.after(5000, maestro.quit)
+        maestro.mainloop()
+    finally:
+        app.diario.cerrar()
+    assert app.historial_cargado
+    assert ofrecida
@@ -0,0 +1,127 @@
+import os
+
+import pytest
+
+import backends
+from backends import BackendSimulado, BackendWindows, ESTADO_COMPLETADO, ESTADO_ERROR, ESTADO_EN_COLA, ESTADO_IMPRIMIENDO
+
+
+def test_estados_de_un_trabajo_simulado():
+    backend = BackendSimulado(impresoras=["A"], segundos_por_pagina=1.0, sobrecarga_trabajo=0.0, escala_tiempo=0.001)
+    _, _, primero = backend.someter_trabajo("A", "x.pdf", {'paginas': 20})
+    _, _, segundo = backend.someter_trabajo("A", "x.pdf", {'paginas': 20})
+    assert backend.estado_trabajo("A", primero) == ESTADO_IMPRIMIENDO
+    assert backend.estado_trabajo("A", segundo) == ESTADO_EN_COLA
+    assert backend.profundidad_cola("A") == 2
+    backend.dormir(41)
+    assert backend.estado_trabajo("A", primero) == ESTADO_COMPLETADO
+    assert backend.estado_trabajo("A", segundo) == ESTADO_COMPLETADO
+    assert backend.profundidad_cola("A") == 0
+
+
+def test_los_trabajos_terminados_se_archivan(monkeypatch):
+    monkeypatch.setattr(backends, "TRABAJOS_ARCHIVADOS", 3)
+    backend = BackendSimulado(impresoras=["A"], segundos_por_pagina=0.0, sobrecarga_trabajo=0.0,
+                              fallos_dispositivo=[2], escala_tiempo=0.001)
+    ids = [backend.someter_trabajo("A", "x.pdf", {'paginas': 1})[2] for _ in range(10)]
+    assert backend.profundidad_cola("A") == 0
+    assert backend._trabajos == {}
+    assert len(backend._terminados) == 3
+    # Los archivados conservan su estado final; los más antiguos se dan por completados.
+    assert backend.estado_trabajo("A", ids[-1]) == ESTADO_COMPLETADO
+    assert backend.estado_trabajo("A", ids[1]) == ESTADO_COMPLETADO
+    assert not backend.cancelar_trabajo("A", ids[-1])
+
+
+def test_un_trabajo_con_error_archivado_sigue_en_error():
+    backend = BackendSimulado(impresoras=["A"], segundos_por_pagina=0.0, sobrecarga_trabajo=0.0,
+                              fallos_dispositivo=[1], escala_tiempo=0.001)
+    _, _, numero = backend.someter_trabajo("A", "x.pdf", {'paginas': 1})
+    backend.profundidad_cola("A")
+    assert numero not in backend._trabajos
+    assert backend.estado_trabajo("A", numero) == ESTADO_ERROR
+
+
+def test_cancelar_un_trabajo_en_cola():
+    backend = BackendSimulado(impresoras=["A"], segundos_por_pagina=1.0, sobrecarga_trabajo=0.0, escala_tiempo=0.001)
+    backend.someter_trabajo("A", "x.pdf", {'paginas': 50})
+    _, _, segundo = backend.someter_trabajo("A", "x.pdf", {'paginas': 50})
+    assert backend.cancelar_trabajo("A", segundo)
+    assert backend.estado_trabajo("A", segundo) == ESTADO_ERROR
+    assert backend.profundidad_cola("A") == 1
+    # El siguiente trabajo empieza cuando termina el que se estaba imprimiendo.
+    backend.someter_trabajo("A", "x.pdf", {'paginas': 50})
+    assert backend.intervalos["A"][-1][0] == backend.intervalos["A"][0][1]
+
+
+class _DevModeFalso:
+    Copies = 1
+    Collate = 0
+
+
+class _SpoolerFalso:
+    """Lo justo de `win32print`/`win32api` para someter trabajos con `BackendWindows`."""
+    def __init__(self, con_devmode=True):
+        self.con_devmode = con_devmode
+        self.cola = {}
+        self.devmodes = {}
+        self.llamadas = []
+
+    def OpenPrinter(self, nombre, *args):
+        return nombre
+
+    def ClosePrinter(self, handle):
+        pass
+
+    def EnumJobs(self, handle, primero, cuantos, nivel):
+        return list(self.cola.values())
+
+    def ShellExecute(self, hwnd, verbo, ruta, parametros, directorio, mostrar):
+        id_trabajo = len(self.cola) + 1
+        self.cola[id_trabajo] = {'JobId': id_trabajo, 'pDocument': os.path.basename(ruta)}
+        self.devmodes[id_trabajo] = _DevModeFalso() if self.con_devmode else None
+
+    def GetJob(self, handle, id_trabajo, nivel):
+        return {'JobId': id_trabajo, 'pDevMode': self.devmodes[id_trabajo], 'Position': 3}
+
+    def SetJob(self, handle, id_trabajo, nivel, info, comando):
+        self.llamadas.append((id_trabajo, nivel, comando))
+
+    def SetPrinter(self, *args):
+        raise AssertionError("no se debe cambiar el DEVMODE de la impresora")
+
+
+@pytest.fixture
+def spooler(monkeypatch):
+    spooler = _SpoolerFalso()
+    monkeypatch.setattr(backends, "_win32_cargado", True)
+    monkeypatch.setattr(backends, "win32print", spooler)
+    monkeypatch.setattr(backends, "win32api", spooler)
+    return spooler
+
+
+def test_las_copias_se_fijan_en_el_trabajo(spooler):
+    exito, _, id_trabajo = BackendWindows().someter_trabajo("A", "libro.pdf", {}, copias=4)
+    assert exito
+    assert len(spooler.cola) == 1
+    assert spooler.devmodes[id_trabajo].Copies == 4
+    assert spooler.devmodes[id_trabajo].Collate == 1
+    # Pausa, cambio del JOB_INFO_2 y reanudación, todo sobre el trabajo.
+    assert [nivel for _, nivel, _ in spooler.llamadas] == [0, 2, 0]
+
+
+def test_sin_devmode_se_envia_una_entrega_por_copia(spooler):
+    spooler.con_devmode = False
+    exito, _, id_trabajo = BackendWindows().someter_trabajo("A", "libro.pdf", {}, copias=3)
+    assert exito
+    assert len(spooler.cola) == 3
+    assert id_trabajo == 3
+
+
+def test_sin_devmode_se_rechazan_muchas_copias(spooler):
+    spooler.con_devmode = False
+    exito, mensaje, _ = BackendWindows(copias_maximas_por_entrega=2).someter_trabajo("A", "libro.pdf", {}, copias=3)
+    assert not exito
+    assert "límite de 2" in mensaje
+    assert len(spooler.cola) == 1
+    assert (1, 0, backends._JOB_CONTROL_DELETE) in spooler.llamadas
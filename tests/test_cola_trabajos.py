@@ -0,0 +1,78 @@
+from cola_trabajos import (ColaTrabajos, ENTRADA_EN_CURSO, ENTRADA_TERMINADA, EntradaCola, PlanificadorCambios,
+                           contar_cambios)
+
+PERFILES = {
+    'bond_a4': {'papel': "Bond", 'tamano': "A4", 'paginas': 10},
+    'bond_carta': {'papel': "Bond", 'tamano': "Carta", 'paginas': 10},
+    'couche_a4': {'papel': "Couché", 'tamano': "A4", 'paginas': 10},
+}
+
+
+def _entradas(*perfiles, **opciones):
+    return [EntradaCola(str(i), "x.pdf", perfil, 1, orden=i, **opciones) for i, perfil in enumerate(perfiles)]
+
+
+def _planificar(entradas, **opciones):
+    # 60 ppm: cada entrada de 10 páginas dura 10 s; cambio de papel 300 s, de tamaño 120 s.
+    return PlanificadorCambios(ppm=60).planificar(entradas, PERFILES, ahora=0, **opciones)
+
+
+def test_agrupa_por_papel_y_tamano():
+    entradas = _entradas('bond_a4', 'couche_a4', 'bond_a4', 'couche_a4', 'bond_a4')
+    plan = _planificar(entradas)
+    assert [p.entrada.perfil for p in plan] == ['bond_a4'] * 3 + ['couche_a4'] * 2
+    assert contar_cambios(plan) == 1
+    assert plan[3].cambio == "papel Bond → Couché"
+
+
+def test_empieza_por_lo_cargado_y_sigue_por_el_cambio_mas_barato():
+    entradas = _entradas('couche_a4', 'bond_carta', 'bond_a4')
+    plan = _planificar(entradas, preparacion_actual=("Bond", "A4"))
+    assert [p.entrada.perfil for p in plan] == ['bond_a4', 'bond_carta', 'couche_a4']
+    assert plan[0].cambio is None
+    assert plan[1].inicio == 10 + 120
+
+
+def test_la_prioridad_va_antes_que_los_cambios():
+    entradas = _entradas('bond_a4', 'couche_a4', 'bond_a4')
+    entradas[1].prioridad = 5
+    plan = _planificar(entradas, preparacion_actual=("Bond", "A4"))
+    assert plan[0].entrada.perfil == 'couche_a4'
+
+
+def test_un_plazo_adelanta_su_grupo():
+    entradas = _entradas('bond_a4', 'bond_a4', 'couche_a4')
+    entradas[2].fecha_limite = 320
+    plan = _planificar(entradas, preparacion_actual=("Bond", "A4"))
+    assert plan[0].entrada.perfil == 'couche_a4'
+    assert not any(p.tarde for p in plan)
+
+
+def test_la_cola_se_reproduce_desde_el_archivo(tmp_path):
+    ruta = str(tmp_path / "cola.jsonl")
+    cola = ColaTrabajos(ruta)
+    primera = cola.agregar("a.pdf", 'bond_a4', 2)
+    segunda = cola.agregar("b.pdf", 'couche_a4', 1, prioridad=3)
+    cola.marcar(primera.id, ENTRADA_TERMINADA)
+    cola.marcar(segunda.id, ENTRADA_EN_CURSO, lote="L1")
+    cola.cerrar()
+
+    reabierta = ColaTrabajos(ruta)
+    assert list(reabierta.entradas) == [segunda.id]
+    assert reabierta.entrada_de_lote("L1").prioridad == 3
+    reabierta.recuperar(lotes_abiertos=set())
+    assert [e.id for e in reabierta.pendientes()] == [segunda.id]
+    reabierta.cerrar()
+
+
+def test_la_compactacion_conserva_solo_las_vivas(tmp_path):
+    ruta = str(tmp_path / "cola.jsonl")
+    cola = ColaTrabajos(ruta, umbral_compactacion=2048)
+    for i in range(40):
+        entrada = cola.agregar(f"{i}.pdf", 'bond_a4', 1)
+        if i % 4:
+            cola.marcar(entrada.id, ENTRADA_TERMINADA)
+    cola.cerrar()
+    with open(ruta, encoding='utf-8') as f:
+        assert len(f.readlines()) < 80
+    assert len(ColaTrabajos(ruta).entradas) == 10
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from backends import BackendSimulado
+from controlador import IMPRESORA_CONFIRMANDO
+from printer_utils import establecer_backend
+
+benchmark = pytest.importorskip("benchmark")
+
+
+class AppConOperadorLento(benchmark.AppSinCabeza):
+    """Anota, cada vez que el operador responde, el estado de las demás impresoras."""
+    def __init__(self, *args, **kwargs):
+        self.respuestas = []
+        super().__init__(*args, **kwargs)
+
+    def preguntar_confirmacion(self, estado, trabajo, responder):
+        def contestar():
+            otras = [e.estado for n, e in self.controlador.impresoras.items() if n != estado.nombre]
+            self.respuestas.append((estado.nombre, otras))
+            responder(True)
+        self.confirmadas += 1
+        self.master.after(int(self.tiempo_operador * 1000), contestar)
+
+
+def test_el_dialogo_no_detiene_los_resultados_de_otras_impresoras(tmp_path):
+    backend = BackendSimulado(impresoras=["Simulada_1", "Simulada_2"], segundos_por_pagina=0.1,
+                              sobrecarga_trabajo=1.0, escala_tiempo=0.0005)
+    anterior = establecer_backend(backend)
+    maestro = benchmark.MaestroSimulado(backend.escala_tiempo)
+    app = AppConOperadorLento(maestro, backend, tiempo_operador=60.0)
+    ruta = tmp_path / "libro.pdf"
+    ruta.write_bytes(b"%PDF-1.4")
+    try:
+        app.iniciar_lote(str(ruta), {"paginas": 10}, 4)
+        maestro.mainloop()
+    finally:
+        establecer_backend(anterior)
+        app.diario.cerrar()
+        os.remove(app.ruta_diario)
+
+    assert app.controlador.copias_confirmadas == 4
+    # Mientras el operador pensaba la primera respuesta, el resultado de la
+    # otra impresora ya se había procesado y esperaba su propia confirmación.
+    _, otras = app.respuestas[0]
+    assert otras == [IMPRESORA_CONFIRMANDO]
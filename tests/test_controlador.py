@@ -0,0 +1,147 @@
+import pytest
+
+from backends import BackendSimulado, ESTADO_ERROR
+from controlador import ControladorLote, IMPRESORA_FALLO, IMPRESORA_PAUSADA
+from printer_utils import establecer_backend
+
+
+@pytest.fixture
+def archivo(tmp_path):
+    ruta = tmp_path / "libro.pdf"
+    ruta.write_bytes(b"%PDF-1.4")
+    return str(ruta)
+
+
+@pytest.fixture
+def backend():
+    backend = BackendSimulado(impresoras=["A", "B"], segundos_por_pagina=0.1, sobrecarga_trabajo=1.0,
+                              escala_tiempo=0.0005)
+    anterior = establecer_backend(backend)
+    yield backend
+    establecer_backend(anterior)
+
+
+def _ejecutar(controlador, al_confirmar=lambda estado, trabajo: True, al_detenerse=None, maximo=2000):
+    """Bucle como el del modo por lotes: confirma cada copia según `al_confirmar`."""
+    controlador.al_pedir_confirmacion = lambda estado, trabajo: controlador.confirmar(
+        estado.nombre, al_confirmar(estado, trabajo))
+    controlador.iniciar()
+    try:
+        for _ in range(maximo):
+            if not controlador.en_curso:
+                return
+            controlador.procesar_resultados(bloquear=True, tiempo_maximo=0.05)
+            if controlador.en_curso and not controlador.hay_impresora_activa():
+                if al_detenerse is None or not al_detenerse():
+                    return
+        pytest.fail("el lote no terminó")
+    finally:
+        controlador.detener()
+
+
+def test_reparte_el_lote_entre_las_impresoras(backend, archivo):
+    controlador = ControladorLote(["A", "B"], archivo, {'paginas': 20}, 6)
+    _ejecutar(controlador)
+    assert controlador.copias_confirmadas == 6
+    assert not controlador.en_curso
+    assert sum(e.copias_hechas for e in controlador.impresoras.values()) == 6
+    assert all(e.copias_hechas > 0 for e in controlador.impresoras.values())
+
+
+def test_una_copia_fallida_la_termina_otra_impresora(backend, archivo):
+    backend.fallos = {1}
+    fallos = []
+    controlador = ControladorLote(["A", "B"], archivo, {'paginas': 20}, 4,
+                                  al_fallo=lambda estado, trabajo: fallos.append((estado.nombre, trabajo.copias)))
+    _ejecutar(controlador)
+    assert controlador.copias_confirmadas == 4
+    assert len(fallos) == 1
+    nombre, _ = fallos[0]
+    assert controlador.impresoras[nombre].estado == IMPRESORA_FALLO
+
+
+def test_pausar_una_impresora_no_detiene_a_las_demas(backend, archivo):
+    controlador = ControladorLote(["A", "B"], archivo, {'paginas': 20}, 5)
+    _ejecutar(controlador, al_confirmar=lambda estado, trabajo: estado.nombre != "A")
+    assert controlador.impresoras["A"].estado == IMPRESORA_PAUSADA
+    assert controlador.impresoras["A"].copias_hechas == 1
+    assert controlador.copias_confirmadas == 5
+
+
+def test_reanudar_tras_detenerse_todas(backend, archivo):
+    backend.fallos = {1, 2}
+    controlador = ControladorLote(["A", "B"], archivo, {'paginas': 20}, 3)
+    reanudaciones = []
+
+    def reanudar():
+        reanudaciones.append(controlador.copias_confirmadas)
+        controlador.reanudar()
+        return True
+
+    _ejecutar(controlador, al_detenerse=reanudar)
+    assert reanudaciones == [0]
+    assert controlador.copias_confirmadas == 3
+
+
+def test_cancelar_un_lote(backend, archivo):
+    controlador = ControladorLote(["A"], archivo, {'paginas': 20}, 10)
+    _ejecutar(controlador, al_confirmar=lambda estado, trabajo: controlador.cancelar() or True)
+    assert not controlador.en_curso
+    # Tras cancelar no se envía ninguna copia más.
+    assert backend._envios == 1
+    assert not controlador.pendientes
+
+
+# Trabajo que no termina nunca dentro de `tiempo_maximo_espera` (1000 s simulados).
+SIN_TERMINAR = {'paginas': 10000, 'tiempo_maximo_espera': 5}
+
+
+def test_un_trabajo_que_no_termina_se_cancela_y_se_reintenta(backend, archivo):
+    fallos = []
+    controlador = ControladorLote(["A"], archivo, SIN_TERMINAR, 1,
+                                  al_fallo=lambda estado, trabajo: fallos.append(trabajo))
+    _ejecutar(controlador)
+    assert len(fallos) == 1
+    assert not fallos[0].incierto
+    assert backend.estado_trabajo("A", 1) == ESTADO_ERROR
+    assert list(controlador.pendientes) == [1]
+
+
+@pytest.mark.parametrize("impresa", [True, False])
+def test_un_trabajo_que_no_se_puede_cancelar_lo_decide_el_operador(backend, archivo, monkeypatch, impresa):
+    monkeypatch.setattr(backend, 'cancelar_trabajo', lambda printer_name, id_trabajo: False)
+    fallos = []
+    controlador = ControladorLote(["A"], archivo, SIN_TERMINAR, 1,
+                                  al_fallo=lambda estado, trabajo: fallos.append(trabajo))
+    _ejecutar(controlador)
+    assert fallos[0].incierto
+    # La copia no vuelve a la cola ni la impresora se reanuda hasta que el operador lo comprueba.
+    assert not controlador.pendientes
+    assert [e.nombre for e in controlador.pendientes_de_comprobar()] == ["A"]
+    controlador.reanudar()
+    assert controlador.impresoras["A"].estado == IMPRESORA_FALLO
+
+    controlador.resolver_incierto("A", impresa)
+    assert not controlador.pendientes_de_comprobar()
+    if impresa:
+        assert controlador.copias_confirmadas == 1
+        assert not controlador.en_curso
+    else:
+        assert list(controlador.pendientes) == [1]
+        assert controlador.en_curso
+
+
+def test_si_el_fragmento_en_duda_salio_la_copia_sigue_desde_el_siguiente(backend, archivo, monkeypatch):
+    monkeypatch.setattr(backend, 'cancelar_trabajo', lambda printer_name, id_trabajo: False)
+    config = {'paginas': 1000, 'paginas_por_fragmento': 200, 'tiempo_maximo_espera': 5}
+    controlador = ControladorLote(["A"], archivo, config, 1)
+    _ejecutar(controlador)
+    trabajo = controlador.impresoras["A"].trabajo
+    assert trabajo.incierto
+    assert trabajo.fragmento_incierto == 0
+
+    controlador.resolver_incierto("A", True)
+    # No cuenta como copia terminada: vuelve a la cola desde el segundo fragmento.
+    assert controlador.copias_confirmadas == 0
+    assert list(controlador.pendientes) == [1]
+    assert controlador.fragmentos_hechos == {1: 1}
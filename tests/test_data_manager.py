@@ -0,0 +1,55 @@
+import json
+import os
+
+from data_manager import IndicePerfiles, validar_perfil
+
+PERFIL = {'paginas': 120, 'tamano': "Carta", 'papel': "Bond 75g", 'configuracion_impresora': "normal"}
+
+
+def _escribir(carpeta, nombre, datos):
+    ruta = carpeta / f"{nombre}.json"
+    ruta.write_text(datos if isinstance(datos, str) else json.dumps(datos), encoding='utf-8')
+    return ruta
+
+
+def test_validar_perfil():
+    assert validar_perfil(PERFIL) == []
+    assert validar_perfil(dict(PERFIL, paginas=True)) == ["el campo 'paginas' tiene un tipo no válido"]
+    assert "'paginas' debe ser mayor que 0" in validar_perfil(dict(PERFIL, paginas=0))
+    assert "falta el campo 'papel'" in validar_perfil({k: v for k, v in PERFIL.items() if k != 'papel'})
+    assert validar_perfil([]) == ["el perfil debe ser un objeto JSON"]
+
+
+def test_el_indice_ignora_los_perfiles_no_validos(tmp_path):
+    _escribir(tmp_path, "libro", PERFIL)
+    _escribir(tmp_path, "roto", "{no es json")
+    _escribir(tmp_path, "incompleto", {'paginas': 10})
+    indice = IndicePerfiles(str(tmp_path))
+    assert indice.actualizar()
+    assert list(indice.obtener()) == ["libro"]
+    assert set(indice.errores) == {"roto.json", "incompleto.json"}
+
+
+def test_solo_se_releen_los_archivos_que_cambian(tmp_path, monkeypatch):
+    _escribir(tmp_path, "a", PERFIL)
+    ruta_b = _escribir(tmp_path, "b", PERFIL)
+    indice = IndicePerfiles(str(tmp_path))
+    indice.actualizar()
+    version = indice.version
+
+    leidos = []
+    leer = indice._leer
+    monkeypatch.setattr(indice, "_leer", lambda nombre, ruta: leidos.append(nombre) or leer(nombre, ruta))
+    assert not indice.actualizar()
+    assert leidos == [] and indice.version == version
+
+    _escribir(tmp_path, "b", dict(PERFIL, paginas=300))
+    os.utime(ruta_b, ns=(0, os.stat(ruta_b).st_mtime_ns + 1))
+    assert indice.actualizar()
+    assert leidos == ["b.json"]
+    assert indice.obtener()["b"]['paginas'] == 300
+
+    ruta_b.unlink()
+    assert indice.actualizar()
+    assert list(indice.obtener()) == ["a"]
+    assert indice.version == version + 2
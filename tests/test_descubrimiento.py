@@ -0,0 +1,120 @@
+import json
+import time
+
+import pytest
+
+from backends import BackendSimulado, DISPOSITIVO_DESCONECTADO
+from descubrimiento import IndiceImpresoras
+
+
+@pytest.fixture
+def ruta_cache(tmp_path):
+    return str(tmp_path / ".impresoras_cache.json")
+
+
+def _backend(**opciones):
+    return BackendSimulado(impresoras=["A", "B"], escala_tiempo=0.001, **opciones)
+
+
+def _contar_capacidades(backend, monkeypatch):
+    consultas = []
+    original = backend.capacidades_impresora
+
+    def capacidades_impresora(printer_name):
+        consultas.append(printer_name)
+        return original(printer_name)
+
+    monkeypatch.setattr(backend, 'capacidades_impresora', capacidades_impresora)
+    return consultas
+
+
+def test_el_indice_se_guarda_y_se_carga_de_disco(ruta_cache):
+    indice = IndiceImpresoras(_backend(desconectadas={"B"}), ruta_cache=ruta_cache)
+    assert not indice.cargado
+    assert indice.actualizar()
+
+    with open(ruta_cache, encoding='utf-8') as f:
+        guardado = json.load(f)
+    assert [i['nombre'] for i in guardado['impresoras']] == ["A", "B"]
+
+    otro = IndiceImpresoras(_backend(), ruta_cache=ruta_cache)
+    assert otro.cargado
+    assert otro.al_dia
+    assert otro.nombres() == ["A", "B"]
+    assert otro.nombres(incluir_desconectadas=False) == ["A"]
+    assert otro.obtener()["A"]['capacidades']['duplex'] is True
+
+
+def _vigilar_hasta(indice, condicion, tiempo_maximo=2.0):
+    indice.iniciar_vigilancia(intervalo=60)
+    try:
+        limite = time.monotonic() + tiempo_maximo
+        while not condicion() and time.monotonic() < limite:
+            time.sleep(0.01)
+    finally:
+        indice.detener_vigilancia()
+    return condicion()
+
+
+def test_un_indice_caducado_se_refresca_al_arrancar_la_vigilancia(ruta_cache):
+    IndiceImpresoras(_backend(), ruta_cache=ruta_cache).actualizar()
+
+    al_dia = IndiceImpresoras(_backend(retraso_descubrimiento=5), ruta_cache=ruta_cache)
+    guardado_en = al_dia.actualizado_en
+    assert not _vigilar_hasta(al_dia, lambda: al_dia.actualizado_en != guardado_en, tiempo_maximo=0.1)
+
+    caducado = IndiceImpresoras(_backend(retraso_descubrimiento=5), ruta_cache=ruta_cache, ttl=0)
+    assert not caducado.al_dia
+    assert _vigilar_hasta(caducado, lambda: caducado.actualizado_en != guardado_en)
+
+
+def test_las_capacidades_se_reutilizan_mientras_no_caducan(ruta_cache, monkeypatch):
+    backend = _backend()
+    consultas = _contar_capacidades(backend, monkeypatch)
+    indice = IndiceImpresoras(backend, ruta_cache=ruta_cache)
+    indice.actualizar()
+    indice.actualizar()
+    assert consultas == ["A", "B"]
+
+    # También las que vienen de la caché en disco.
+    IndiceImpresoras(backend, ruta_cache=ruta_cache).actualizar()
+    assert consultas == ["A", "B"]
+
+    IndiceImpresoras(backend, ruta_cache=ruta_cache, ttl_capacidades=-1).actualizar()
+    assert consultas == ["A", "B", "A", "B"]
+
+
+def test_la_version_sube_cuando_una_impresora_se_desconecta_o_vuelve(ruta_cache):
+    backend = _backend()
+    indice = IndiceImpresoras(backend, ruta_cache=ruta_cache)
+    indice.actualizar()
+    version = indice.version
+    assert not indice.actualizar()
+    assert indice.version == version
+
+    backend.desconectadas.add("A")
+    assert indice.actualizar()
+    assert indice.version == version + 1
+    assert indice.obtener()["A"]['estado'] == DISPOSITIVO_DESCONECTADO
+
+    backend.desconectadas.clear()
+    assert indice.actualizar()
+    assert indice.version == version + 2
+    assert indice.nombres(incluir_desconectadas=False) == ["A", "B"]
+
+
+@pytest.mark.parametrize("contenido", [
+    "{no es json",
+    '{"impresoras": []}',
+    '{"actualizado_en": 1, "impresoras": [{"estado": "listo"}]}',
+    '{"actualizado_en": "ayer", "impresoras": []}',
+    '[1, 2]',
+])
+def test_una_cache_dañada_se_ignora(ruta_cache, contenido):
+    with open(ruta_cache, 'w', encoding='utf-8') as f:
+        f.write(contenido)
+    indice = IndiceImpresoras(_backend(), ruta_cache=ruta_cache)
+    assert not indice.cargado
+    assert indice.version == 0
+    assert indice.actualizar()
+    assert indice.nombres() == ["A", "B"]
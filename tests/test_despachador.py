@@ -0,0 +1,67 @@
+from backends import BackendSimulado
+from despachador import Despachador, TrabajoCopia
+from metricas import RegistroMetricas
+from printer_utils import enviar_a_impresora
+
+
+def _despachar(funcion, copias=(1,)):
+    despachador = Despachador(funcion)
+    despachador.iniciar()
+    despachador.encolar(TrabajoCopia("A", "x.pdf", {'paginas': 1}, list(copias), len(copias)))
+    trabajo = despachador.resultados.get(timeout=5)
+    despachador.detener()
+    return trabajo
+
+
+def test_funcion_de_envio_con_la_firma_basica():
+    llamadas = []
+
+    def enviar(impresora, ruta, config, copias=1):
+        llamadas.append(copias)
+        return True, "ok"
+
+    trabajo = _despachar(enviar, copias=(1, 2))
+    assert trabajo.exito, trabajo.mensaje
+    assert llamadas == [2]
+    assert trabajo.sometido_en is None
+
+
+def test_funcion_de_envio_con_marcas_y_kwargs():
+    def con_marcas(impresora, ruta, config, copias=1, marcas=None):
+        marcas['sometido'] = 1.0
+        return True, "ok"
+
+    def con_kwargs(impresora, ruta, config, **opciones):
+        assert set(opciones) == {'copias', 'marcas', 'progreso'}
+        return True, "ok"
+
+    assert _despachar(con_marcas).sometido_en == 1.0
+    assert _despachar(con_kwargs).exito
+
+
+def test_sometido_solo_si_el_spooler_acepta(tmp_path):
+    ruta = tmp_path / "x.pdf"
+    ruta.write_bytes(b"%PDF-1.4")
+    backend = BackendSimulado(impresoras=["A"], fallos=[1], escala_tiempo=0.0005)
+    marcas = {}
+    exito, _ = enviar_a_impresora("A", str(ruta), {'paginas': 1}, backend=backend, marcas=marcas)
+    assert not exito
+    assert 'sometido' not in marcas
+    exito, _ = enviar_a_impresora("A", str(ruta), {'paginas': 1}, backend=backend, marcas=marcas)
+    assert exito
+    assert 'sometido' in marcas
+
+
+def test_prometheus_solo_exporta_gauges(tmp_path):
+    metricas = RegistroMetricas(lote="L1")
+    trabajo = TrabajoCopia("A", "x.pdf", {}, [1], 1)
+    trabajo.iniciado_en = trabajo.sometido_en = trabajo.terminado_en = trabajo.encolado_en
+    trabajo.recibido_en = trabajo.confirmado_en = trabajo.encolado_en + 1
+    metricas.registrar_trabajo(trabajo)
+    ruta = str(tmp_path / "m.prom")
+    metricas.exportar_prometheus(ruta)
+    with open(ruta, encoding='utf-8') as f:
+        texto = f.read()
+    tipos = {linea.split()[3] for linea in texto.splitlines() if linea.startswith("# TYPE")}
+    assert tipos == {"gauge"}
+    assert "printflow_lote_copias 1" in texto
@@ -0,0 +1,65 @@
+import json
+import os
+
+import diario
+from diario import (DiarioTrabajos, EVENTO_LOTE_INICIADO, EVENTO_ENVIADA, EVENTO_COMPLETADA, EVENTO_CONFIRMADA,
+                    EVENTO_LOTE_FINALIZADO, EVENTO_LOTE_CANCELADO, EVENTO_INSTANTANEA)
+
+DATOS = {'ruta': "libro.pdf", 'perfil': "libro", 'config': {'paginas': 10}, 'impresoras': ["A"], 'total_copias': 5}
+
+
+def _ruta(tmp_path):
+    return str(tmp_path / "diario.jsonl")
+
+
+def test_reproducir_encuentra_los_lotes_interrumpidos(tmp_path):
+    d = DiarioTrabajos(_ruta(tmp_path))
+    d.registrar(EVENTO_LOTE_INICIADO, "l1", datos=DATOS)
+    d.registrar(EVENTO_ENVIADA, "l1", copia=1, copias=[1, 2], impresora="A")
+    d.registrar(EVENTO_COMPLETADA, "l1", copia=1, copias=[1, 2], impresora="A")
+    d.registrar(EVENTO_LOTE_INICIADO, "l2", datos=DATOS)
+    d.registrar(EVENTO_LOTE_CANCELADO, "l2")
+    d.cerrar()
+    with open(_ruta(tmp_path), 'a', encoding='utf-8') as f:
+        f.write('{"evento": "confirmada", "lote": "l1", "cop')   # Línea cortada por un apagón.
+
+    lotes = DiarioTrabajos(_ruta(tmp_path)).lotes_interrumpidos()
+    assert [l.lote for l in lotes] == ["l1"]
+    assert lotes[0].hechas == {1, 2}
+    assert lotes[0].siguiente_copia == 3
+    assert lotes[0].datos() == DATOS
+
+
+def test_compactar_deja_una_instantanea_por_lote_abierto(tmp_path):
+    d = DiarioTrabajos(_ruta(tmp_path), umbral_compactacion=2000)
+    for numero in range(30):
+        lote = f"l{numero}"
+        d.registrar(EVENTO_LOTE_INICIADO, lote, datos=DATOS)
+        d.registrar(EVENTO_CONFIRMADA, lote, copia=1, impresora="A")
+        if numero != 7:
+            d.registrar(EVENTO_LOTE_FINALIZADO, lote)
+    d.cerrar()
+
+    with open(_ruta(tmp_path), encoding='utf-8') as f:
+        registros = [json.loads(linea) for linea in f]
+    # La compactación se hizo al cerrar un lote: queda la instantánea del
+    # lote abierto y lo que se registró después.
+    assert os.path.getsize(_ruta(tmp_path)) < 2000
+    assert registros[0]['evento'] == EVENTO_INSTANTANEA
+    lotes = DiarioTrabajos(_ruta(tmp_path)).lotes_interrumpidos()
+    assert [(l.lote, l.hechas) for l in lotes] == [("l7", {1})]
+
+
+def test_los_eventos_que_cambian_la_reanudacion_se_sincronizan_al_momento(tmp_path, monkeypatch):
+    sincronizados = []
+    monkeypatch.setattr(diario.os, "fsync", lambda fd: sincronizados.append(fd))
+    d = DiarioTrabajos(_ruta(tmp_path))
+    d.registrar(EVENTO_LOTE_INICIADO, "l1", datos=DATOS)
+    assert len(sincronizados) == 1
+    d.registrar(EVENTO_ENVIADA, "l1", copia=1, impresora="A")
+    assert len(sincronizados) == 1
+    d.registrar(EVENTO_COMPLETADA, "l1", copia=1, impresora="A")
+    assert len(sincronizados) == 2
+    d.registrar(EVENTO_CONFIRMADA, "l1", copia=1, impresora="A")
+    assert len(sincronizados) == 3
+    d.cerrar()
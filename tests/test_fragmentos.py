@@ -0,0 +1,136 @@
+import os
+
+import pytest
+
+from backends import BackendSimulado, ESTADO_COMPLETADO, ESTADO_ERROR
+from fragmentos import DivisorSimulado, ImpresorFragmentos, imprimir_por_fragmentos, rangos_fragmentos
+from printer_utils import enviar_a_impresora
+
+CONFIG = {'paginas': 100, 'paginas_por_fragmento': 25}
+
+
+@pytest.fixture
+def archivo(tmp_path):
+    ruta = tmp_path / "libro.pdf"
+    ruta.write_bytes(b"%PDF-1.4")
+    return str(ruta)
+
+
+def _backend(monkeypatch, **opciones):
+    """BackendSimulado que anota el nombre de cada fragmento que recibe."""
+    opciones.setdefault('segundos_por_pagina', 1.0)
+    backend = BackendSimulado(impresoras=["A"], sobrecarga_trabajo=0.0, escala_tiempo=0.0005, **opciones)
+    backend.recibidos = []
+    someter = backend.someter_trabajo
+
+    def someter_trabajo(printer_name, file_path, config, copias=1):
+        backend.recibidos.append(os.path.basename(file_path).split("_", 1)[-1])
+        return someter(printer_name, file_path, config, copias)
+
+    monkeypatch.setattr(backend, 'someter_trabajo', someter_trabajo)
+    return backend
+
+
+def _imprimir(backend, archivo, progreso, config=CONFIG, marcas=None):
+    impresor = ImpresorFragmentos(backend, DivisorSimulado(), config['paginas_por_fragmento'])
+    return impresor.imprimir("A", archivo, config, rangos_fragmentos(100, 25), progreso, marcas)
+
+
+def test_los_fragmentos_se_encadenan_en_orden_sin_huecos(monkeypatch, archivo):
+    backend = _backend(monkeypatch)
+    progreso = [0, 0]
+    exito, mensaje = _imprimir(backend, archivo, progreso)
+    assert exito, mensaje
+    assert progreso == [4, 4]
+    assert backend.recibidos == ["1-25.pdf", "26-50.pdf", "51-75.pdf", "76-100.pdf"] * 2
+    # El siguiente fragmento ya estaba en el spooler cuando terminó el anterior.
+    intervalos = backend.intervalos["A"]
+    assert all(siguiente[0] == anterior[1] for anterior, siguiente in zip(intervalos, intervalos[1:]))
+
+
+def test_se_reanuda_desde_el_ultimo_fragmento_terminado(monkeypatch, archivo):
+    backend = _backend(monkeypatch)
+    progreso = [4, 2]
+    exito, _ = _imprimir(backend, archivo, progreso)
+    assert exito
+    assert progreso == [4, 4]
+    assert backend.recibidos == ["51-75.pdf", "76-100.pdf"]
+
+
+def test_un_fragmento_con_error_retira_los_posteriores(monkeypatch, archivo):
+    backend = _backend(monkeypatch, fallos_dispositivo=[2])
+    progreso = [0]
+    exito, mensaje = _imprimir(backend, archivo, progreso)
+    assert not exito
+    assert "fragmento 2 de 4" in mensaje
+    assert progreso == [1]
+    # El tercero ya estaba entregado y se canceló para no salir desordenado.
+    assert backend.recibidos == ["1-25.pdf", "26-50.pdf", "51-75.pdf"]
+    assert backend.estado_trabajo("A", 3) == ESTADO_ERROR
+
+
+def test_un_fragmento_que_no_termina_se_cancela(monkeypatch, archivo):
+    backend = _backend(monkeypatch)
+    progreso = [0]
+    marcas = {}
+    exito, mensaje = _imprimir(backend, archivo, progreso, dict(CONFIG, tiempo_maximo_espera=10), marcas)
+    assert not exito
+    assert "no terminó en 10s" in mensaje
+    assert progreso == [0]
+    assert 'incierto' not in marcas
+    assert backend.estado_trabajo("A", 1) == ESTADO_ERROR
+    assert backend.estado_trabajo("A", 2) == ESTADO_ERROR
+
+
+def test_un_fragmento_que_no_se_puede_cancelar_queda_en_duda(monkeypatch, archivo):
+    backend = _backend(monkeypatch)
+    cancelar = backend.cancelar_trabajo
+    monkeypatch.setattr(backend, 'cancelar_trabajo',
+                        lambda printer_name, id_trabajo: id_trabajo != 1 and cancelar(printer_name, id_trabajo))
+    progreso = [4, 0]
+    marcas = {}
+    exito, mensaje = _imprimir(backend, archivo, progreso, dict(CONFIG, tiempo_maximo_espera=10), marcas)
+    assert not exito
+    assert "Compruebe" in mensaje
+    assert marcas['incierto'] is True
+    assert marcas['fragmento_incierto'] == 1
+    assert progreso == [4, 0]
+    # El fragmento siguiente sí se retira.
+    assert backend.estado_trabajo("A", 2) == ESTADO_ERROR
+
+
+def test_un_fragmento_que_termina_al_agotarse_la_espera_cuenta_como_impreso(monkeypatch, archivo):
+    backend = _backend(monkeypatch)
+    estado = backend.estado_trabajo
+    terminados = set()
+
+    def cancelar_trabajo(printer_name, id_trabajo):
+        # El trabajo termina justo entre el fin de la espera y la cancelación.
+        terminados.add(id_trabajo)
+        return False
+
+    monkeypatch.setattr(backend, 'cancelar_trabajo', cancelar_trabajo)
+    monkeypatch.setattr(backend, 'estado_trabajo', lambda printer_name, id_trabajo: (
+        ESTADO_COMPLETADO if id_trabajo in terminados else estado(printer_name, id_trabajo)))
+    progreso = [0]
+    exito, _ = _imprimir(backend, archivo, progreso, dict(CONFIG, tiempo_maximo_espera=10))
+    assert exito
+    assert progreso == [4]
+
+
+@pytest.mark.parametrize("paginas", [0, 10, 25])
+def test_un_documento_vacio_o_de_un_fragmento_se_envia_entero(monkeypatch, archivo, paginas):
+    backend = _backend(monkeypatch)
+    config = dict(CONFIG, paginas=paginas)
+    assert imprimir_por_fragmentos(backend, "A", archivo, config, [0]) is None
+    exito, _ = enviar_a_impresora("A", archivo, config, backend=backend, copias=2)
+    assert exito
+    assert backend.recibidos == ["libro.pdf"]
+
+
+def test_sin_fragmentos_pendientes_no_se_envia_nada(monkeypatch, archivo):
+    backend = _backend(monkeypatch)
+    exito, mensaje = _imprimir(backend, archivo, [4, 4])
+    assert exito
+    assert "ya estaban impresos" in mensaje
+    assert backend.recibidos == []
@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+from backends import BackendSimulado
+from modo_lote import EjecutorLote, TrabajoManifiesto, leer_manifiesto, validar_trabajo, POLITICA_AUTO
+from printer_utils import establecer_backend
+
+
+def _manifiesto(tmp_path, lineas):
+    ruta = tmp_path / "trabajos.jsonl"
+    ruta.write_bytes(b"\n".join(l if isinstance(l, bytes) else json.dumps(l).encode() for l in lineas))
+    return str(ruta)
+
+
+@pytest.mark.parametrize("datos", [
+    {'archivo': "a.pdf", 'perfil': "p", 'impresora': 5},
+    {'archivo': "a.pdf", 'perfil': "p", 'impresora': {"HP": 1}},
+    {'archivo': "a.pdf", 'perfil': "p", 'impresora': ["HP", 3]},
+    {'archivo': "a.pdf", 'perfil': "p", 'copias': "3"},
+    {'archivo': "a.pdf", 'perfil': "p", 'copias': True},
+    {'archivo': "a.pdf", 'perfil': "p", 'prioridad': [1]},
+    {'archivo': "a.pdf", 'perfil': "p", 'prioridad': float("nan")},
+    {'archivo': 7, 'perfil': "p"},
+    ["no", "es", "un", "objeto"],
+])
+def test_campos_con_tipos_no_validos(datos):
+    with pytest.raises(ValueError):
+        TrabajoManifiesto.desde_json(1, datos)
+
+
+def test_impresora_como_nombre_o_grupo():
+    assert TrabajoManifiesto.desde_json(1, {'archivo': "a", 'perfil': "p", 'impresora': "HP"}).impresoras == ["HP"]
+    assert TrabajoManifiesto.desde_json(1, {'archivo': "a", 'perfil': "p", 'impresora': ["A", "B"]}).impresoras == ["A", "B"]
+    assert TrabajoManifiesto.desde_json(1, {'archivo': "a", 'perfil': "p"}).impresoras == []
+
+
+def test_las_lineas_no_validas_se_saltan_sin_interrumpir_la_lectura(tmp_path):
+    ruta = _manifiesto(tmp_path, [
+        {'archivo': "a.pdf", 'perfil': "p", 'prioridad': 1},
+        {'archivo': "b.pdf", 'perfil': "p", 'impresora': 5},
+        b"{no es json",
+        b"# comentario",
+        b"",
+        b'{"archivo": "\xff\xfe.pdf", "perfil": "p"}',   # No es UTF-8: se lee y fallará al validarse.
+        b"[" * 100000,
+        {'archivo': "c.pdf", 'perfil': "p", 'prioridad': 9},
+    ])
+    errores = []
+    trabajos = list(leer_manifiesto(ruta, al_error=lambda linea, mensaje: errores.append(linea)))
+    assert [t.archivo for t in trabajos] == ["c.pdf", "a.pdf", "\ufffd\ufffd.pdf"]
+    assert errores == [2, 3, 7]
+
+
+def test_la_ventana_de_prioridad_limita_la_reordenacion(tmp_path):
+    ruta = _manifiesto(tmp_path, [{'archivo': f"{i}.pdf", 'perfil': "p", 'prioridad': i} for i in range(6)])
+    assert [t.archivo for t in leer_manifiesto(ruta, ventana=2)] == ["1.pdf", "2.pdf", "3.pdf", "4.pdf", "5.pdf", "0.pdf"]
+
+
+def test_validar_trabajo(tmp_path):
+    archivo = tmp_path / "a.pdf"
+    archivo.write_bytes(b"%PDF")
+    trabajo = TrabajoManifiesto.desde_json(1, {'archivo': str(archivo), 'perfil': "p", 'impresora': "Z"})
+    assert validar_trabajo(trabajo, {'p': {}}, ["A"]) == "impresora(s) desconocida(s): Z"
+    trabajo.impresoras = []
+    assert validar_trabajo(trabajo, {'p': {}}, ["A"]) is None
+    assert validar_trabajo(trabajo, {}, ["A"]) == "perfil desconocido: p"
+
+
+def test_ejecutar_un_manifiesto_con_impresoras_simuladas(tmp_path):
+    backend = BackendSimulado(impresoras=["A", "B"], segundos_por_pagina=0.1, sobrecarga_trabajo=1.0,
+                              fallos=[2], escala_tiempo=0.0005)
+    anterior = establecer_backend(backend)
+    archivo = tmp_path / "a.pdf"
+    archivo.write_bytes(b"%PDF")
+    ruta = _manifiesto(tmp_path, [
+        {'archivo': str(archivo), 'perfil': "p", 'copias': 3},
+        {'archivo': str(archivo), 'perfil': "desconocido"},
+        {'archivo': str(archivo), 'perfil': "p", 'impresora': "B", 'copias': 2},
+    ])
+    salida = []
+    try:
+        ejecutor = EjecutorLote({'p': {'paginas': 10}}, ["A", "B"], politica=POLITICA_AUTO, salida=salida.append)
+        assert ejecutor.ejecutar_manifiesto(ruta) == (2, 1)
+    finally:
+        establecer_backend(anterior)
+
+
+def test_en_modo_automatico_no_se_reintenta_una_copia_incierta(tmp_path, monkeypatch):
+    backend = BackendSimulado(impresoras=["A"], segundos_por_pagina=0.1, escala_tiempo=0.0005)
+    monkeypatch.setattr(backend, 'cancelar_trabajo', lambda printer_name, id_trabajo: False)
+    anterior = establecer_backend(backend)
+    archivo = tmp_path / "a.pdf"
+    archivo.write_bytes(b"%PDF")
+    salida = []
+    try:
+        ejecutor = EjecutorLote({'p': {'paginas': 10000, 'tiempo_maximo_espera': 5}}, ["A"],
+                                politica=POLITICA_AUTO, salida=salida.append)
+        assert not ejecutor.ejecutar_trabajo(TrabajoManifiesto.desde_json(1, {'archivo': str(archivo), 'perfil': "p"}))
+    finally:
+        establecer_backend(anterior)
+    assert backend._envios == 1
+    assert "no se sabe si salieron impresas (copia 1 en 'A')" in salida[-1]
@@ -0,0 +1,100 @@
+import pytest
+
+import backends
+from backends import BackendSimulado, BackendWindows, ESTADO_COMPLETADO, ESTADO_ERROR, ESTADO_IMPRIMIENDO
+from monitor_trabajos import MonitorTrabajos, espera_estimada
+
+
+def _backend(**opciones):
+    opciones.setdefault('segundos_por_pagina', 1.0)
+    opciones.setdefault('sobrecarga_trabajo', 0.0)
+    return BackendSimulado(impresoras=["A"], escala_tiempo=0.001, **opciones)
+
+
+def test_sin_marca_de_agua_espera_a_que_termine_el_trabajo():
+    backend = _backend()
+    _, _, numero = backend.someter_trabajo("A", "x.pdf", {'paginas': 30})
+    exito, _ = MonitorTrabajos(backend, intervalo_sondeo=5).esperar_despacho("A", numero, {'paginas': 30})
+    assert exito
+    assert backend.ahora() >= 30
+    assert backend.estado_trabajo("A", numero) == ESTADO_COMPLETADO
+
+
+def test_con_marca_de_agua_deja_pasar_en_cuanto_hay_hueco():
+    backend = _backend()
+    config = {'paginas': 30, 'marca_agua_cola': 2}
+    backend.someter_trabajo("A", "x.pdf", config)
+    _, _, segundo = backend.someter_trabajo("A", "x.pdf", config)
+    exito, _ = MonitorTrabajos(backend, intervalo_sondeo=5).esperar_despacho("A", segundo, config)
+    assert exito
+    # Sale al terminar el primero, con el segundo aún imprimiéndose.
+    assert 30 <= backend.ahora() < 60
+    assert backend.estado_trabajo("A", segundo) == ESTADO_IMPRIMIENDO
+
+
+def test_un_trabajo_con_error_no_deja_pasar():
+    backend = _backend(fallos_dispositivo=[1])
+    _, _, numero = backend.someter_trabajo("A", "x.pdf", {'paginas': 5})
+    exito, mensaje = MonitorTrabajos(backend).esperar_despacho("A", numero, {'paginas': 5})
+    assert not exito
+    assert "error" in mensaje
+
+
+def test_tiempo_maximo_de_espera():
+    backend = _backend()
+    _, _, numero = backend.someter_trabajo("A", "x.pdf", {'paginas': 100})
+    exito, mensaje = MonitorTrabajos(backend).esperar_despacho(
+        "A", numero, {'paginas': 100, 'tiempo_maximo_espera': 10})
+    assert not exito
+    assert "10s" in mensaje
+    assert backend.ahora() < 100
+    # El trabajo se cancela para que reintentarlo no imprima la copia dos veces.
+    assert backend.estado_trabajo("A", numero) == ESTADO_ERROR
+
+
+def test_tiempo_agotado_sin_poder_cancelar_el_trabajo(monkeypatch):
+    backend = _backend()
+    monkeypatch.setattr(backend, 'cancelar_trabajo', lambda printer_name, id_trabajo: False)
+    _, _, numero = backend.someter_trabajo("A", "x.pdf", {'paginas': 100})
+    marcas = {}
+    exito, mensaje = MonitorTrabajos(backend).esperar_despacho(
+        "A", numero, {'paginas': 100, 'tiempo_maximo_espera': 10}, marcas)
+    assert not exito
+    assert marcas['incierto'] is True
+    assert "Compruebe" in mensaje
+
+
+def test_trabajo_sin_localizar_espera_el_tiempo_estimado():
+    backend = _backend()
+    config = {'paginas': 200}
+    exito, _ = MonitorTrabajos(backend).esperar_despacho("A", None, config)
+    assert exito
+    assert espera_estimada(config) <= backend.ahora() < espera_estimada(config) + 5
+    assert espera_estimada({'paginas': 200, 'tiempo_maximo_espera': 2}) == 2
+
+
+class _Win32PrintFalso:
+    """Solo `OpenPrinter`, `ClosePrinter` y `GetJob` con un estado fijo."""
+    def __init__(self, estado):
+        self.estado = estado
+
+    def OpenPrinter(self, nombre, *args):
+        return nombre
+
+    def ClosePrinter(self, handle):
+        pass
+
+    def GetJob(self, handle, id_trabajo, nivel):
+        return {'Status': self.estado}
+
+
+@pytest.mark.parametrize("estado, esperado", [
+    (backends._JOB_STATUS_PRINTED | backends._JOB_STATUS_DELETING, ESTADO_COMPLETADO),
+    (backends._JOB_STATUS_DELETED, ESTADO_COMPLETADO),
+    (backends._JOB_STATUS_ERROR | backends._JOB_STATUS_DELETING, ESTADO_ERROR),
+    (backends._JOB_STATUS_PRINTING, ESTADO_IMPRIMIENDO),
+])
+def test_estado_de_un_trabajo_en_el_spooler_de_windows(monkeypatch, estado, esperado):
+    monkeypatch.setattr(backends, "_win32_cargado", True)
+    monkeypatch.setattr(backends, "win32print", _Win32PrintFalso(estado))
+    assert BackendWindows().estado_trabajo("HP", 7) == esperado
@@ -0,0 +1,35 @@
+from planificador import PlanificadorCarga, RendimientoImpresora, PPM_POR_DEFECTO
+
+
+def _rendimiento(nombre, ppm=None, fallos=0):
+    rendimiento = RendimientoImpresora(nombre)
+    rendimiento.ppm = ppm
+    rendimiento.fallos_recientes = fallos
+    return rendimiento
+
+
+def test_reparte_segun_la_velocidad_medida():
+    disponibles = {"rapida": (_rendimiento("rapida", 60), 0.0), "lenta": (_rendimiento("lenta", 20), 0.0)}
+    plan = PlanificadorCarga().planificar(disponibles, 8, paginas=100)
+    assert plan == {"rapida": 6, "lenta": 2}
+
+
+def test_la_ultima_copia_no_va_a_una_impresora_lenta():
+    disponibles = {"rapida": (_rendimiento("rapida", 60), 0.0), "lenta": (_rendimiento("lenta", 10), 0.0)}
+    assert PlanificadorCarga().planificar(disponibles, 1, paginas=100) == {"rapida": 1, "lenta": 0}
+
+
+def test_tiene_en_cuenta_lo_que_falta_de_la_copia_en_curso_y_los_fallos():
+    disponibles = {"ocupada": (_rendimiento("ocupada", 60), 500.0), "libre": (_rendimiento("libre", 60), 0.0)}
+    assert PlanificadorCarga().planificar(disponibles, 2, paginas=100)["libre"] == 2
+    disponibles = {"fallona": (_rendimiento("fallona", 60, fallos=3), 0.0), "fiable": (_rendimiento("fiable", 60), 0.0)}
+    assert PlanificadorCarga().planificar(disponibles, 1, paginas=100) == {"fallona": 0, "fiable": 1}
+
+
+def test_medicion_de_velocidad():
+    rendimiento = RendimientoImpresora("A")
+    assert rendimiento.duracion_estimada(PPM_POR_DEFECTO) == 60
+    rendimiento.registrar_exito(100, 60)
+    assert rendimiento.ppm == 100
+    rendimiento.registrar_fallo()
+    assert rendimiento.fallos == 1 and rendimiento.fallos_recientes == 1
@@ -0,0 +1,67 @@
+import pytest
+
+from backends import BackendSimulado
+from controlador import ControladorLote
+from printer_utils import establecer_backend
+from puntos_control import copias_por_grupo, hojas_por_copia, validar_puntos_control
+
+
+@pytest.mark.parametrize("control, asignadas, esperado", [
+    (None, 10, 1),
+    ({'tipo': 'cada_copia'}, 10, 1),
+    ({'tipo': 'cada_n', 'n': 4}, 10, 4),
+    ({'tipo': 'cada_n', 'n': 4}, 3, 3),
+    ({'tipo': 'final'}, 7, 7),
+    ({'tipo': 'cambio_papel', 'hojas_bandeja': 500}, 20, 10),
+])
+def test_copias_por_grupo(control, asignadas, esperado):
+    config = {'paginas': 50, 'puntos_control': control}
+    assert copias_por_grupo(config, asignadas) == esperado
+
+
+def test_cambio_papel_cuenta_hojas_a_doble_cara():
+    config = {'paginas': 101, 'duplex': True, 'puntos_control': {'tipo': 'cambio_papel', 'hojas_bandeja': 500}}
+    assert hojas_por_copia(config) == 51
+    assert copias_por_grupo(config, 20) == 9
+    # Una copia que no cabe en la bandeja se envía igualmente sola.
+    assert copias_por_grupo({'paginas': 900, 'puntos_control': {'tipo': 'cambio_papel', 'hojas_bandeja': 500}}, 5) == 1
+
+
+@pytest.mark.parametrize("valor", [
+    [], {'tipo': 'semanal'}, {'tipo': 'cada_n'}, {'tipo': 'cada_n', 'n': 0}, {'tipo': 'cada_n', 'n': True},
+    {'tipo': 'cambio_papel', 'hojas_bandeja': '500'},
+])
+def test_puntos_control_invalidos(valor):
+    assert validar_puntos_control(valor)
+
+
+@pytest.fixture
+def backend():
+    backend = BackendSimulado(impresoras=["A"], segundos_por_pagina=0.1, sobrecarga_trabajo=1.0, escala_tiempo=0.0005)
+    anterior = establecer_backend(backend)
+    yield backend
+    establecer_backend(anterior)
+
+
+def test_las_copias_de_un_grupo_van_en_un_solo_trabajo(backend, tmp_path):
+    ruta = tmp_path / "libro.pdf"
+    ruta.write_bytes(b"%PDF-1.4")
+    confirmaciones = []
+    controlador = ControladorLote(["A"], str(ruta), {'paginas': 20, 'puntos_control': {'tipo': 'cada_n', 'n': 3}}, 7)
+
+    def confirmar(estado, trabajo):
+        confirmaciones.append(trabajo.copias)
+        controlador.confirmar(estado.nombre, True)
+
+    controlador.al_pedir_confirmacion = confirmar
+    controlador.iniciar()
+    try:
+        for _ in range(2000):
+            if not controlador.en_curso:
+                break
+            controlador.procesar_resultados(bloquear=True, tiempo_maximo=0.05)
+    finally:
+        controlador.detener()
+    assert confirmaciones == [[1, 2, 3], [4, 5, 6], [7]]
+    assert backend._envios == 3
+    assert controlador.copias_confirmadas == 7
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import socket
+
+import pytest
+
+import servidor_trabajos
+from alert_system import DespachadorAvisos
+from backends import BackendSimulado
+from diario import DiarioTrabajos
+from printer_utils import establecer_backend
+from servidor_trabajos import ServidorTrabajos, ejecutar_servidor, enviar_trabajo
+
+PERFILES = {'guia': {'paginas': 10, 'tamano': "A4", 'papel': "Bond", 'configuracion_impresora': "Normal"}}
+
+
+@pytest.fixture
+def backend():
+    backend = BackendSimulado(impresoras=["A", "B"], segundos_por_pagina=0.1, sobrecarga_trabajo=1.0,
+                              escala_tiempo=0.0005)
+    anterior = establecer_backend(backend)
+    yield backend
+    establecer_backend(anterior)
+
+
+@pytest.fixture
+def archivo(tmp_path):
+    ruta = tmp_path / "guia.pdf"
+    ruta.write_bytes(b"%PDF-1.4")
+    return str(ruta)
+
+
+def _con_servidor(prueba, **opciones):
+    """Ejecuta `prueba(servidor)` con un servidor escuchando en un puerto libre."""
+    async def principal():
+        servidor = ServidorTrabajos(PERFILES, ["A", "B"], puerto=0, exportar_metricas=False,
+                                    salida=lambda *args: None, **opciones)
+        await servidor.iniciar()
+        try:
+            return await prueba(servidor)
+        finally:
+            await servidor.detener()
+    return asyncio.run(principal())
+
+
+async def _eventos(servidor, datos, **opciones):
+    return [e async for e in enviar_trabajo(datos, puerto=servidor.puerto, **opciones)]
+
+
+async def _peticion(servidor, metodo, ruta, cuerpo=b""):
+    """:return: (código, cuerpo decodificado) de una petición HTTP en crudo."""
+    lector, escritor = await asyncio.open_connection("127.0.0.1", servidor.puerto)
+    escritor.write(f"{metodo} {ruta} HTTP/1.1\r\nContent-Length: {len(cuerpo)}\r\n\r\n".encode() + cuerpo)
+    await escritor.drain()
+    respuesta = await lector.read()
+    escritor.close()
+    cabecera, _, contenido = respuesta.partition(b"\r\n\r\n")
+    return int(cabecera.split(b" ", 2)[1]), json.loads(contenido)
+
+
+def test_un_trabajo_se_imprime_y_se_siguen_sus_eventos(backend, archivo):
+    async def prueba(servidor):
+        return await _eventos(servidor, {'archivo': archivo, 'perfil': 'guia', 'copias': 3})
+
+    eventos = _con_servidor(prueba)
+    nombres = [e['evento'] for e in eventos]
+    assert nombres[:2] == ["aceptado", "iniciado"]
+    assert nombres.count("copias") >= 1
+    assert eventos[-1]['evento'] == "terminado"
+    assert eventos[-1]['confirmadas'] == 3
+
+
+@pytest.mark.parametrize("datos, error", [
+    ({'archivo': "x.pdf", 'perfil': 'guia', 'impresora': 5}, "'impresora'"),
+    ({'archivo': "x.pdf", 'perfil': 'guia', 'copias': "3"}, "'copias'"),
+    ({'archivo': "x.pdf", 'perfil': 'guia', 'impresora': [None]}, "'impresora'"),
+    ({'perfil': 'guia'}, "'archivo'"),
+    ([1, 2], "objeto JSON"),
+])
+def test_trabajos_mal_formados_se_rechazan_con_422(backend, datos, error):
+    async def prueba(servidor):
+        return await _eventos(servidor, datos)
+
+    eventos = _con_servidor(prueba)
+    assert len(eventos) == 1
+    assert eventos[0]['evento'] == "rechazado"
+    assert eventos[0]['codigo'] == 422
+    assert error in eventos[0]['error']
+
+
+def test_trabajo_que_no_se_puede_ejecutar(backend, archivo):
+    async def prueba(servidor):
+        return (await _eventos(servidor, {'archivo': archivo, 'perfil': 'otro'}),
+                await _eventos(servidor, {'archivo': archivo, 'perfil': 'guia', 'impresora': "Z"}))
+
+    sin_perfil, sin_impresora = _con_servidor(prueba)
+    assert "perfil desconocido" in sin_perfil[0]['error']
+    assert "impresora(s) desconocida(s)" in sin_impresora[0]['error']
+
+
+def test_errores_de_la_peticion(backend):
+    async def prueba(servidor):
+        return [
+            await _peticion(servidor, "POST", "/trabajos", b"{no es json"),
+            await _peticion(servidor, "POST", "/trabajos", b"[" * 60000),
+            await _peticion(servidor, "GET", "/trabajos"),
+            await _peticion(servidor, "GET", "/trabajos/t999"),
+            await _peticion(servidor, "GET", "/otra"),
+        ]
+
+    codigos = [codigo for codigo, _ in _con_servidor(prueba)]
+    assert codigos == [400, 400, 405, 404, 404]
+
+
+def test_cola_llena_responde_503_con_reintento(backend, archivo):
+    async def prueba(servidor):
+        return await _eventos(servidor, {'archivo': archivo, 'perfil': 'guia'})
+
+    eventos = _con_servidor(prueba, capacidad=0)
+    assert eventos[0]['codigo'] == 503
+    assert eventos[0]['reintentar_en'] == servidor_trabajos.SEGUNDOS_REINTENTO
+
+
+def test_token(backend, archivo):
+    async def prueba(servidor):
+        return (await _eventos(servidor, {'archivo': archivo, 'perfil': 'guia'}),
+                await _eventos(servidor, {'archivo': archivo, 'perfil': 'guia'}, token="secreto"))
+
+    sin_token, con_token = _con_servidor(prueba, token="secreto")
+    assert sin_token[0]['codigo'] == 401
+    assert con_token[-1]['evento'] == "terminado"
+
+
+def test_un_error_interno_se_contesta_con_500(backend):
+    async def prueba(servidor):
+        def estado():
+            raise TypeError("fallo inesperado")
+        servidor.estado = estado
+        primera = await _peticion(servidor, "GET", "/estado")
+        # El servidor sigue atendiendo después del fallo.
+        segunda = await _peticion(servidor, "GET", "/trabajos/t1")
+        return primera, segunda
+
+    (codigo, cuerpo), (siguiente, _) = _con_servidor(prueba)
+    assert codigo == 500
+    assert "fallo inesperado" in cuerpo['error']
+    assert siguiente == 404
+
+
+def test_cancelar_un_trabajo(backend, archivo):
+    async def prueba(servidor):
+        eventos = []
+        async for evento in enviar_trabajo({'archivo': archivo, 'perfil': 'guia', 'copias': 50},
+                                           puerto=servidor.puerto):
+            eventos.append(evento)
+            if evento['evento'] == "iniciado":
+                codigo, _ = await _peticion(servidor, "DELETE", f"/trabajos/{evento['trabajo']}")
+                assert codigo == 200
+        repetido = await _peticion(servidor, "DELETE", f"/trabajos/{eventos[0]['trabajo']}")
+        return eventos, repetido
+
+    eventos, (codigo, _) = _con_servidor(prueba)
+    assert eventos[-1]['evento'] == "cancelado"
+    assert codigo == 409
+
+
+def test_ejecutar_servidor_con_el_puerto_ocupado(tmp_path, monkeypatch):
+    monkeypatch.setattr(servidor_trabajos, "DiarioTrabajos", lambda: DiarioTrabajos(str(tmp_path / "diario.jsonl")))
+    monkeypatch.setattr(servidor_trabajos, "obtener_despachador", lambda: DespachadorAvisos(canales=[]))
+    monkeypatch.setattr(servidor_trabajos, "cargar_datos_libros_dinamicos", lambda: PERFILES)
+    monkeypatch.setattr(servidor_trabajos, "listar_impresoras_disponibles", lambda: ["A"])
+    with socket.socket() as ocupado:
+        ocupado.bind(("127.0.0.1", 0))
+        ocupado.listen()
+        assert ejecutar_servidor("127.0.0.1", ocupado.getsockname()[1]) != 0
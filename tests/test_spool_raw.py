@@ -0,0 +1,153 @@
+import os
+
+import pytest
+
+import backends
+import printer_utils
+import spool_raw
+from backends import BackendSimulado
+from printer_utils import enviar_a_impresora, obtener_backend_raw
+from spool_raw import BackendRaw, CacheSpool, SumideroArchivo, SumideroSimulado, SumideroWin32, transmitir
+
+
+@pytest.fixture
+def backend():
+    return BackendSimulado(impresoras=["A"], escala_tiempo=0.0005, segundos_por_pagina=0.1, sobrecarga_trabajo=0.0)
+
+
+@pytest.fixture
+def raw(backend, tmp_path):
+    return BackendRaw(cache=CacheSpool(str(tmp_path / "cache")), backend_estado=backend)
+
+
+def _archivo(tmp_path, nombre, contenido=b"%-12345X@PJL\r\nE\x1b&l0O hola\x0c"):
+    ruta = tmp_path / nombre
+    ruta.write_bytes(contenido)
+    return str(ruta)
+
+
+def test_el_sumidero_sale_del_backend_activo(backend):
+    raw = obtener_backend_raw(backend)
+    assert raw.backend_estado is backend
+    assert isinstance(raw.fabrica_sumidero("A", {}), SumideroSimulado)
+
+
+def test_cada_copia_es_un_trabajo_raw_propio(raw, backend, tmp_path):
+    ruta = _archivo(tmp_path, "etiquetas.prn")
+    exito, mensaje = enviar_a_impresora("A", ruta, {'paginas': 2, 'modo_envio': 'raw'}, backend=raw, copias=3)
+    assert exito, mensaje
+    assert backend._envios == 3
+
+
+def test_la_segunda_vez_se_usa_la_cache(raw, tmp_path):
+    ruta = _archivo(tmp_path, "etiquetas.prn")
+    config = {'paginas': 1, 'modo_envio': 'raw'}
+    _, primero, _ = raw.someter_trabajo("A", ruta, config)
+    _, segundo, _ = raw.someter_trabajo("A", ruta, config)
+    assert "renderizado" in primero
+    assert "desde caché" in segundo
+
+
+@pytest.mark.parametrize("nombre, config", [
+    ("informe.docx", {}),
+    ("libro.pdf", {}),
+])
+def test_formatos_que_la_impresora_no_entiende_se_rechazan(raw, backend, tmp_path, nombre, config):
+    ruta = _archivo(tmp_path, nombre, b"PK\x03\x04")
+    exito, mensaje = enviar_a_impresora("A", ruta, dict(config, paginas=1, modo_envio='raw'), backend=raw)
+    assert not exito
+    assert "modo RAW" in mensaje
+    assert backend._envios == 0
+    assert not os.listdir(raw.cache.directorio)
+
+
+def test_pdf_directo_admite_pdf(raw, backend, tmp_path):
+    ruta = _archivo(tmp_path, "libro.pdf", b"%PDF-1.7\n%%EOF\n")
+    exito, mensaje = enviar_a_impresora("A", ruta, {'paginas': 1, 'modo_envio': 'raw', 'pdf_directo': True},
+                                        backend=raw)
+    assert exito, mensaje
+    assert backend._envios == 1
+
+
+def test_transmitir_no_repite_bytes_dentro_de_un_trabajo(tmp_path):
+    ruta = _archivo(tmp_path, "a.prn", b"x" * 10)
+    sumidero = SumideroArchivo(str(tmp_path / "salida"))
+    transmitir(ruta, sumidero, "a.prn", copias=2, bloque=4)
+    salidas = sorted(os.listdir(sumidero.directorio))
+    assert len(salidas) == 2
+    assert all(os.path.getsize(os.path.join(sumidero.directorio, s)) == 10 for s in salidas)
+
+
+def test_los_hashes_recordados_estan_acotados(tmp_path, monkeypatch):
+    monkeypatch.setattr(spool_raw, 'HASHES_RECORDADOS', 3)
+    cache = CacheSpool(str(tmp_path / "cache"))
+    for i in range(5):
+        cache.clave(_archivo(tmp_path, f"{i}.prn", bytes([i])), "A", {})
+    assert len(cache._hashes) == 3
+
+
+@pytest.fixture(autouse=True)
+def _restaurar_backend_raw():
+    anterior = printer_utils._backend_raw
+    yield
+    printer_utils._backend_raw = anterior
+
+
+class _SumideroQueFalla(SumideroSimulado):
+    """Falla al escribir el segundo bloque, con el trabajo ya empezado."""
+    def escribir(self, datos):
+        if self.bytes_escritos:
+            raise OSError("conexión perdida")
+        super().escribir(datos)
+
+
+def test_un_envio_interrumpido_no_se_entrega_truncado(backend, tmp_path):
+    ruta = _archivo(tmp_path, "a.prn", b"x" * (spool_raw.TAMANO_BLOQUE + 1))
+    with pytest.raises(OSError):
+        transmitir(ruta, _SumideroQueFalla(backend, "A", {'paginas': 1}), "a.prn")
+    assert backend._envios == 0
+
+    raw = BackendRaw(fabrica_sumidero=lambda impresora, config: _SumideroQueFalla(backend, impresora, config),
+                     cache=CacheSpool(str(tmp_path / "cache")), backend_estado=backend)
+    exito, mensaje = enviar_a_impresora("A", ruta, {'paginas': 1, 'modo_envio': 'raw'}, backend=raw)
+    assert not exito
+    assert "conexión perdida" in mensaje
+    assert backend._envios == 0
+
+
+def test_el_archivo_de_un_envio_interrumpido_se_borra(tmp_path):
+    ruta = _archivo(tmp_path, "a.prn", b"x" * 10)
+    sumidero = SumideroArchivo(str(tmp_path / "salida"))
+    escribir = sumidero.escribir
+
+    def escribir_y_fallar(datos):
+        escribir(datos)
+        raise OSError("disco lleno")
+
+    sumidero.escribir = escribir_y_fallar
+    with pytest.raises(OSError):
+        transmitir(ruta, sumidero, "a.prn", bloque=4)
+    assert not os.listdir(sumidero.directorio)
+
+
+class _Win32Falso:
+    def __init__(self):
+        self.llamadas = []
+
+    def __getattr__(self, nombre):
+        def llamada(*args):
+            self.llamadas.append(nombre)
+            if nombre == "WritePrinter":
+                raise OSError("impresora desconectada")
+            return 7
+        return llamada
+
+
+def test_el_trabajo_win32_interrumpido_se_aborta(tmp_path, monkeypatch):
+    falso = _Win32Falso()
+    monkeypatch.setattr(backends, '_win32_cargado', True)
+    monkeypatch.setattr(backends, 'win32print', falso)
+    with pytest.raises(OSError):
+        transmitir(_archivo(tmp_path, "a.prn"), SumideroWin32("A"), "a.prn")
+    assert falso.llamadas[-2:] == ["AbortPrinter", "ClosePrinter"]
+    assert "EndDocPrinter" not in falso.llamadas